@@ -1,48 +1,51 @@
-from flask import Flask, render_template, jsonify, request
-from core.redis_manager import RedisManager
-from core.video_downloader import VideoParser, VideoDownloader
-from platforms.platform_auth import PlatformAuth
-from core.video_transcoder import VideoTranscoder
-from core.storage_manager import StorageManager
+from flask import Blueprint, Flask, render_template, jsonify, request, Response
+from core.services import services
+from core import metrics
 from config.config import Config
 import uuid
 import os
-import threading
+import json
+import logging
 import time
 
+logger = logging.getLogger(__name__)
+
 # 获取项目根目录
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
-app = Flask(__name__)
-app.config['SECRET_KEY'] = Config.SECRET_KEY
-# 配置模板和静态文件路径
-app.template_folder = os.path.join(BASE_DIR, 'frontend', 'templates')
-app.static_folder = os.path.join(BASE_DIR, 'frontend', 'static')
+api = Blueprint('api', __name__)
+
+
+def create_app():
+    """创建Flask应用
 
-redis_manager = RedisManager()
-video_parser = VideoParser()
-video_downloader = VideoDownloader(redis_manager)
-platform_auth = PlatformAuth(redis_manager)
-video_transcoder = VideoTranscoder(redis_manager)
-storage_manager = StorageManager(redis_manager)
+    共享的服务实例都在 core.services 里按需创建，这里只注册路由，
+    导入本模块和创建应用都不会加载下载器、解析器、浏览器等重模块。
+    """
+    app = Flask(__name__,
+                template_folder=os.path.join(BASE_DIR, 'frontend', 'templates'),
+                static_folder=os.path.join(BASE_DIR, 'frontend', 'static'))
+    app.config['SECRET_KEY'] = Config.SECRET_KEY
+    app.register_blueprint(api)
+    return app
 
-@app.route('/')
+@api.route('/')
 def index():
     return render_template('index.html')
 
-@app.route('/api/tasks', methods=['GET'])
+@api.route('/api/tasks', methods=['GET'])
 def get_tasks():
     try:
-        tasks = redis_manager.get_all_tasks()
+        tasks = services.redis_manager.get_all_tasks()
         
         # 检查任务是否还存在，过滤掉已删除的任务
         valid_tasks = []
         for task in tasks:
             task_id = task.get('id')
-            if task_id and redis_manager.task_exists(task_id):
+            if task_id and services.redis_manager.task_exists(task_id):
                 valid_tasks.append(task)
             else:
-                print(f"⚠️  任务 {task_id} 已不存在，已过滤")
+                logger.warning(f"⚠️  任务 {task_id} 已不存在，已过滤")
         
         return jsonify({
             'success': True,
@@ -54,30 +57,28 @@ def get_tasks():
             'message': str(e)
         }), 500
 
-@app.route('/api/tasks', methods=['POST'])
+@api.route('/api/tasks', methods=['POST'])
 def create_task():
     try:
-        print("=" * 60)
-        print("📝 开始创建下载任务")
-        print("=" * 60)
+        logger.debug("📝 开始创建下载任务")
         
         data = request.get_json()
         url = data.get('url')
         
-        print(f"📥 收到URL: {url}")
+        logger.debug(f"📥 收到URL: {url}")
         
         if not url:
-            print("❌ 错误：未提供视频链接")
+            logger.error("❌ 错误：未提供视频链接")
             return jsonify({
                 'success': False,
                 'message': '请提供视频链接'
             }), 400
         
         task_id = str(uuid.uuid4())
-        print(f"🆔 生成任务ID: {task_id}")
+        logger.debug(f"🆔 生成任务ID: {task_id}")
         
         # 检测平台
-        print(f"🔍 检测视频平台...")
+        logger.debug(f"🔍 检测视频平台...")
         if 'douyin.com' in url or 'v.douyin.com' in url:
             platform = 'douyin'
         elif 'bilibili.com' in url:
@@ -86,11 +87,11 @@ def create_task():
             platform = 'toutiao'
         else:
             platform = 'unknown'
-        print(f"✅ 平台检测完成: {platform}")
+        logger.debug(f"✅ 平台检测完成: {platform}")
         
         # 抖音平台特殊处理：跳过parser，直接创建任务
         if platform == 'douyin':
-            print(f"📱 检测到抖音平台，跳过parser，直接创建任务")
+            logger.debug(f"📱 检测到抖音平台，跳过parser，直接创建任务")
             task_data = {
                 'id': task_id,
                 'url': url,
@@ -102,17 +103,15 @@ def create_task():
                 'created_at': time.strftime('%Y-%m-%d %H:%M:%S')
             }
             
-            print(f"💾 保存任务到Redis...")
-            redis_manager.set_task(task_id, task_data)
-            print(f"✅ 任务已保存到Redis")
+            logger.debug(f"💾 保存任务到Redis...")
+            services.redis_manager.set_task(task_id, task_data)
+            logger.debug(f"✅ 任务已保存到Redis")
             
-            print(f"📤 添加任务到下载队列...")
-            redis_manager.add_task_to_queue(task_data)
-            print(f"✅ 任务已添加到队列")
+            logger.debug(f"📤 添加任务到下载队列...")
+            services.redis_manager.add_task_to_queue(task_data)
+            logger.debug(f"✅ 任务已添加到队列")
             
-            print("=" * 60)
-            print(f"✅ 任务创建成功")
-            print("=" * 60)
+            logger.debug(f"✅ 任务创建成功")
             
             return jsonify({
                 'success': True,
@@ -121,19 +120,17 @@ def create_task():
             })
         
         # 其他平台使用parser解析视频信息
-        print(f"🔍 开始解析视频信息...")
+        logger.debug(f"🔍 开始解析视频信息...")
         try:
-            video_info = video_parser.parse_video_info(url)
-            print(f"✅ 视频信息解析成功")
-            print(f"   标题: {video_info.get('title', 'N/A')}")
-            print(f"   平台: {video_info.get('platform', 'N/A')}")
-            print(f"   类型: {video_info.get('video_type', 'N/A')}")
+            video_info = services.video_parser.parse_video_info(url)
+            logger.debug(f"✅ 视频信息解析成功")
+            logger.debug(f"   标题: {video_info.get('title', 'N/A')}")
+            logger.debug(f"   平台: {video_info.get('platform', 'N/A')}")
+            logger.debug(f"   类型: {video_info.get('video_type', 'N/A')}")
         except Exception as parse_error:
-            print(f"❌ 错误：视频信息解析失败")
-            print(f"   错误详情: {str(parse_error)}")
-            print(f"   错误类型: {type(parse_error).__name__}")
-            import traceback
-            traceback.print_exc()
+            logger.error(f"❌ 错误：视频信息解析失败")
+            logger.error(f"   错误详情: {str(parse_error)}")
+            logger.exception(f"   错误类型: {type(parse_error).__name__}")
             return jsonify({
                 'success': False,
                 'message': f'视频信息解析失败: {str(parse_error)}',
@@ -145,7 +142,7 @@ def create_task():
                 }
             }), 500
         
-        print(f"💾 准备保存任务数据...")
+        logger.debug(f"💾 准备保存任务数据...")
         task_data = {
             'id': task_id,
             'url': url,
@@ -157,17 +154,15 @@ def create_task():
             'created_at': time.strftime('%Y-%m-%d %H:%M:%S')
         }
         
-        print(f"💾 保存任务到Redis...")
-        redis_manager.set_task(task_id, task_data)
-        print(f"✅ 任务已保存到Redis")
+        logger.debug(f"💾 保存任务到Redis...")
+        services.redis_manager.set_task(task_id, task_data)
+        logger.debug(f"✅ 任务已保存到Redis")
         
-        print(f"📤 添加任务到下载队列...")
-        redis_manager.add_task_to_queue(task_data)
-        print(f"✅ 任务已添加到队列")
+        logger.debug(f"📤 添加任务到下载队列...")
+        services.redis_manager.add_task_to_queue(task_data)
+        logger.debug(f"✅ 任务已添加到队列")
         
-        print("=" * 60)
-        print(f"✅ 任务创建成功")
-        print("=" * 60)
+        logger.debug(f"✅ 任务创建成功")
         
         return jsonify({
             'success': True,
@@ -175,24 +170,19 @@ def create_task():
             'message': '任务已添加到队列'
         })
     except Exception as e:
-        print("=" * 60)
-        print(f"❌ 错误：创建任务失败")
-        print(f"   错误阶段: 任务创建流程")
-        print(f"   错误详情: {str(e)}")
-        print(f"   错误类型: {type(e).__name__}")
-        import traceback
-        traceback.print_exc()
-        print("=" * 60)
+        logger.exception(f"❌ 创建任务失败: {str(e)}")
         return jsonify({
             'success': False,
             'message': f'创建任务失败: {str(e)}'
         }), 500
 
-@app.route('/api/tasks/<task_id>', methods=['GET'])
+@api.route('/api/tasks/<task_id>', methods=['GET'])
 def get_task(task_id):
     try:
-        task = redis_manager.get_task(task_id)
+        task = services.redis_manager.get_task(task_id)
         if task:
+            if task.get('timings'):
+                task['timings'] = json.loads(task['timings'])
             return jsonify({
                 'success': True,
                 'task': task
@@ -208,10 +198,24 @@ def get_task(task_id):
             'message': str(e)
         }), 500
 
-@app.route('/api/tasks/<task_id>/pause', methods=['POST'])
+@api.route('/api/timings/summary', methods=['GET'])
+def get_timings_summary():
+    try:
+        return jsonify({
+            'success': True,
+            'summary': services.task_timings.summary()
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 500
+
+@api.route('/api/tasks/<task_id>/pause', methods=['POST'])
 def pause_task(task_id):
     try:
-        redis_manager.update_task_status(task_id, 'paused')
+        services.redis_manager.update_task_status(task_id, 'paused')
+        services.task_control.send(task_id, 'pause')
         return jsonify({
             'success': True,
             'message': '任务已暂停'
@@ -222,10 +226,11 @@ def pause_task(task_id):
             'message': str(e)
         }), 500
 
-@app.route('/api/tasks/<task_id>/cancel', methods=['POST'])
+@api.route('/api/tasks/<task_id>/cancel', methods=['POST'])
 def cancel_task(task_id):
     try:
-        redis_manager.update_task_status(task_id, 'cancelled')
+        services.redis_manager.update_task_status(task_id, 'cancelled')
+        services.task_control.send(task_id, 'cancel')
         return jsonify({
             'success': True,
             'message': '任务已取消'
@@ -236,11 +241,43 @@ def cancel_task(task_id):
             'message': str(e)
         }), 500
 
-@app.route('/api/tasks/<task_id>/retry', methods=['POST'])
+@api.route('/api/tasks/<task_id>/resume', methods=['POST'])
+def resume_task(task_id):
+    try:
+        task = services.redis_manager.get_task(task_id)
+        if not task:
+            return jsonify({
+                'success': False,
+                'message': '任务不存在'
+            }), 404
+        
+        # 只有已暂停且没有线程还在执行的任务才能继续，否则会重复入队
+        if task.get('status') != 'paused' or services.redis_manager.get_task_lease(task_id):
+            return jsonify({
+                'success': False,
+                'message': '任务未暂停或仍在执行中，暂时无法继续'
+            }), 409
+        
+        services.task_control.clear(task_id)
+        services.redis_manager.update_task_status(task_id, 'pending')
+        services.redis_manager.add_task_to_queue(services.redis_manager.get_task(task_id))
+        return jsonify({
+            'success': True,
+            'message': '任务已继续'
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 500
+
+@api.route('/api/tasks/<task_id>/retry', methods=['POST'])
 def retry_task(task_id):
     try:
-        redis_manager.update_task_status(task_id, 'pending', clear_error=True)
-        redis_manager.add_task_to_queue(redis_manager.get_task(task_id))
+        services.task_control.clear(task_id)
+        services.redis_manager.update_task_status(task_id, 'pending', clear_error=True)
+        services.redis_manager.reset_task_retry(task_id)
+        services.redis_manager.add_task_to_queue(services.redis_manager.get_task(task_id))
         return jsonify({
             'success': True,
             'message': '任务已重新加入队列'
@@ -251,44 +288,46 @@ def retry_task(task_id):
             'message': str(e)
         }), 500
 
-@app.route('/api/tasks/<task_id>/open', methods=['POST'])
+@api.route('/api/tasks/<task_id>/open', methods=['POST'])
 def open_task(task_id):
     try:
-        print(f'Opening task: {task_id}')
-        task = redis_manager.get_task(task_id)
-        print(f'Task data: {task}')
+        logger.debug(f'Opening task: {task_id}')
+        task = services.redis_manager.get_task(task_id)
+        logger.debug(f'Task data: {task}')
         if task:
             save_path = task.get('save_path')
-            print(f'Save path: {save_path}')
+            logger.debug(f'Save path: {save_path}')
             if save_path and os.path.exists(save_path):
-                print(f'File exists, opening: {save_path}')
+                logger.debug(f'File exists, opening: {save_path}')
                 return jsonify({
                     'success': True,
                     'path': save_path
                 })
             else:
-                print(f'File does not exist or save_path is empty')
+                logger.debug(f'File does not exist or save_path is empty')
                 return jsonify({
                     'success': False,
                     'message': '文件不存在'
                 })
         else:
-            print(f'Task not found')
+            logger.debug(f'Task not found')
             return jsonify({
                 'success': False,
                 'message': '任务不存在'
             }), 404
     except Exception as e:
-        print(f'Error opening task: {str(e)}')
+        logger.error(f'Error opening task: {str(e)}')
         return jsonify({
             'success': False,
             'message': str(e)
         }), 500
 
-@app.route('/api/tasks/<task_id>/logs', methods=['GET'])
+@api.route('/api/tasks/<task_id>/logs', methods=['GET'])
 def get_task_logs(task_id):
     try:
-        logs = redis_manager.get_task_logs(task_id)
+        # 本进程还在缓冲的日志先写入，保证刚发生的日志可见
+        services.task_log_sink.flush(task_id)
+        logs = services.redis_manager.get_task_logs(task_id)
         return jsonify({
             'success': True,
             'logs': logs
@@ -299,16 +338,19 @@ def get_task_logs(task_id):
             'message': str(e)
         }), 500
 
-@app.route('/api/tasks/<task_id>', methods=['DELETE'])
+@api.route('/api/tasks/<task_id>', methods=['DELETE'])
 def delete_task(task_id):
     try:
-        task = redis_manager.get_task(task_id)
+        task = services.redis_manager.get_task(task_id)
         if task:
             save_path = task.get('save_path')
             if save_path and os.path.exists(save_path):
                 os.remove(save_path)
             
-            redis_manager.delete_task(task_id)
+            # 正在执行的任务先停下来，避免工作线程稍后又把任务写回
+            if task.get('status') in ('downloading', 'transcoding'):
+                services.task_control.send(task_id, 'cancel')
+            services.redis_manager.delete_task(task_id)
             
             return jsonify({
                 'success': True,
@@ -325,10 +367,10 @@ def delete_task(task_id):
             'message': str(e)
         }), 500
 
-@app.route('/api/videos', methods=['GET'])
+@api.route('/api/videos', methods=['GET'])
 def get_videos():
     try:
-        videos = redis_manager.get_all_videos()
+        videos = services.redis_manager.get_all_videos()
         return jsonify({
             'success': True,
             'videos': videos
@@ -339,10 +381,10 @@ def get_videos():
             'message': str(e)
         }), 500
 
-@app.route('/api/videos/scan', methods=['POST'])
+@api.route('/api/videos/scan', methods=['POST'])
 def scan_videos():
     try:
-        storage_path = storage_manager.get_storage_path()
+        storage_path = services.storage_manager.get_storage_path()
         
         if not os.path.exists(storage_path):
             return jsonify({
@@ -382,7 +424,7 @@ def scan_videos():
                         'created_at': time.strftime('%Y-%m-%d %H:%M:%S')
                     }
                     
-                    redis_manager.set_video(video_id, video_data)
+                    services.redis_manager.set_video(video_id, video_data)
                     scanned_videos.append(video_data)
         
         return jsonify({
@@ -396,11 +438,11 @@ def scan_videos():
             'message': str(e)
         }), 500
 
-@app.route('/api/videos/search', methods=['GET'])
+@api.route('/api/videos/search', methods=['GET'])
 def search_videos():
     try:
         query = request.args.get('q', '')
-        videos = redis_manager.get_all_videos()
+        videos = services.redis_manager.get_all_videos()
         
         if query:
             filtered_videos = []
@@ -426,7 +468,7 @@ def search_videos():
             'message': str(e)
         }), 500
 
-@app.route('/api/videos/delete', methods=['POST'])
+@api.route('/api/videos/delete', methods=['POST'])
 def delete_video():
     try:
         data = request.get_json()
@@ -451,11 +493,11 @@ def delete_video():
                 shutil.rmtree(path)
                 
                 deleted_videos = []
-                videos = redis_manager.get_all_videos()
+                videos = services.redis_manager.get_all_videos()
                 for video in videos:
                     video_path = video.get('save_path', '')
                     if video_path and video_path.startswith(path):
-                        redis_manager.redis_client.delete(f"video:{video.get('id')}")
+                        services.redis_manager.redis_client.delete(f"video:{video.get('id')}")
                         deleted_videos.append(video.get('title'))
                 
                 return jsonify({
@@ -471,10 +513,10 @@ def delete_video():
             if os.path.isfile(path):
                 os.remove(path)
                 
-                videos = redis_manager.get_all_videos()
+                videos = services.redis_manager.get_all_videos()
                 for video in videos:
                     if video.get('save_path') == path:
-                        redis_manager.redis_client.delete(f"video:{video.get('id')}")
+                        services.redis_manager.redis_client.delete(f"video:{video.get('id')}")
                         return jsonify({
                             'success': True,
                             'message': f'已删除视频：{video.get("title")}'
@@ -495,10 +537,10 @@ def delete_video():
             'message': str(e)
         }), 500
 
-@app.route('/api/storage/info', methods=['GET'])
+@api.route('/api/storage/info', methods=['GET'])
 def get_storage_info():
     try:
-        info = storage_manager.get_storage_info()
+        info = services.storage_manager.get_storage_info()
         return jsonify({
             'success': True,
             'info': info
@@ -509,10 +551,10 @@ def get_storage_info():
             'message': str(e)
         }), 500
 
-@app.route('/api/storage/path', methods=['GET'])
+@api.route('/api/storage/path', methods=['GET'])
 def get_storage_path():
     try:
-        path = storage_manager.get_storage_path()
+        path = services.storage_manager.get_storage_path()
         return jsonify({
             'success': True,
             'storage_path': path
@@ -523,19 +565,19 @@ def get_storage_path():
             'message': str(e)
         }), 500
 
-@app.route('/api/storage/select-directory', methods=['POST'])
+@api.route('/api/storage/select-directory', methods=['POST'])
 def select_storage_directory():
     try:
         data = request.get_json()
         platform = data.get('platform', 'macos')
         
-        selected_path = storage_manager.select_storage_directory()
+        selected_path = services.storage_manager.select_storage_directory()
         
         if selected_path:
             return jsonify({
                 'success': True,
                 'selected_path': selected_path,
-                'current_path': storage_manager.get_storage_path()
+                'current_path': services.storage_manager.get_storage_path()
             })
         else:
             return jsonify({
@@ -548,7 +590,7 @@ def select_storage_directory():
             'message': str(e)
         }), 500
 
-@app.route('/api/storage/migrate', methods=['POST'])
+@api.route('/api/storage/migrate', methods=['POST'])
 def migrate_storage():
     try:
         data = request.get_json()
@@ -561,7 +603,7 @@ def migrate_storage():
                 'message': '请提供新路径'
             }), 400
         
-        result = storage_manager.migrate_storage(new_path, migrate_files)
+        result = services.storage_manager.migrate_storage(new_path, migrate_files)
         
         return jsonify({
             'success': result['failed'] == 0,
@@ -576,10 +618,10 @@ def migrate_storage():
             'message': str(e)
         }), 500
 
-@app.route('/api/storage/migration-status', methods=['GET'])
+@api.route('/api/storage/migration-status', methods=['GET'])
 def get_migration_status():
     try:
-        status = storage_manager.check_migration_status()
+        status = services.storage_manager.check_migration_status()
         return jsonify({
             'success': True,
             'status': status
@@ -590,10 +632,10 @@ def get_migration_status():
             'message': str(e)
         }), 500
 
-@app.route('/api/storage/cancel-migration', methods=['POST'])
+@api.route('/api/storage/cancel-migration', methods=['POST'])
 def cancel_migration():
     try:
-        result = storage_manager.cancel_migration()
+        result = services.storage_manager.cancel_migration()
         return jsonify({
             'success': True,
             'message': result
@@ -604,7 +646,7 @@ def cancel_migration():
             'message': str(e)
         }), 500
 
-@app.route('/api/storage/open-directory', methods=['POST'])
+@api.route('/api/storage/open-directory', methods=['POST'])
 def open_directory():
     try:
         data = request.get_json()
@@ -647,7 +689,7 @@ def open_directory():
             'message': str(e)
         }), 500
 
-@app.route('/api/storage/move', methods=['POST'])
+@api.route('/api/storage/move', methods=['POST'])
 def move_file():
     try:
         data = request.get_json()
@@ -673,10 +715,54 @@ def move_file():
             'message': str(e)
         }), 500
 
-@app.route('/api/auth/status', methods=['GET'])
+@api.route('/api/config', methods=['GET'])
+def get_runtime_config():
+    try:
+        return jsonify({
+            'success': True,
+            'config': {'bandwidth': services.bandwidth.get_config()},
+            'effective': {'bandwidth': services.bandwidth.effective()}
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 500
+
+@api.route('/api/config', methods=['POST'])
+def update_runtime_config():
+    """修改运行时配置；后台任务进程在 BANDWIDTH_REFRESH_SECONDS 秒内生效，不必重启"""
+    try:
+        data = request.get_json() or {}
+        if 'bandwidth' not in data:
+            return jsonify({
+                'success': False,
+                'message': '请提供要修改的配置（bandwidth）'
+            }), 400
+        
+        try:
+            bandwidth = services.bandwidth.set_config(data['bandwidth'])
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': f'限速配置无效: {e}'
+            }), 400
+        
+        return jsonify({
+            'success': True,
+            'config': {'bandwidth': bandwidth},
+            'effective': {'bandwidth': services.bandwidth.effective()}
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 500
+
+@api.route('/api/auth/status', methods=['GET'])
 def get_auth_status():
     try:
-        status = platform_auth.get_platform_login_status()
+        status = services.platform_auth.get_platform_login_status()
         return jsonify({
             'success': True,
             'status': status
@@ -687,7 +773,7 @@ def get_auth_status():
             'message': str(e)
         }), 500
 
-@app.route('/api/auth/login/<platform>', methods=['POST'])
+@api.route('/api/auth/login/<platform>', methods=['POST'])
 def login_platform(platform):
     try:
         data = request.get_json()
@@ -703,11 +789,11 @@ def login_platform(platform):
                 }), 400
             
             if platform == 'bilibili':
-                success, message = platform_auth.login_bilibili_manual(cookie_string)
+                success, message = services.platform_auth.login_bilibili_manual(cookie_string)
             elif platform == 'douyin':
-                success, message = platform_auth.login_douyin_manual(cookie_string)
+                success, message = services.platform_auth.login_douyin_manual(cookie_string)
             elif platform == 'toutiao':
-                success, message = platform_auth.login_toutiao_manual(cookie_string)
+                success, message = services.platform_auth.login_toutiao_manual(cookie_string)
             else:
                 return jsonify({
                     'success': False,
@@ -715,17 +801,24 @@ def login_platform(platform):
                 }), 400
         else:
             if platform == 'bilibili':
-                success, message = platform_auth.login_bilibili('', '')
+                success, message = services.platform_auth.login_bilibili('', '')
             elif platform == 'douyin':
-                success, message = platform_auth.login_douyin('', '')
+                success, message = services.platform_auth.login_douyin('', '')
             elif platform == 'toutiao':
-                success, message = platform_auth.login_toutiao('', '')
+                success, message = services.platform_auth.login_toutiao('', '')
             else:
                 return jsonify({
                     'success': False,
                     'message': '不支持的平台'
                 }), 400
         
+        if success:
+            # 新Cookie立即校验一次，状态页不用等下一轮定时校验
+            try:
+                services.cookie_health.check(platform, refresh=False)
+            except Exception as e:
+                logger.warning(f'⚠️  校验 {platform} Cookie 出错: {e}')
+        
         return jsonify({
             'success': success,
             'message': message
@@ -736,93 +829,34 @@ def login_platform(platform):
             'message': str(e)
         }), 500
 
-def process_download_queue():
-    while True:
-        task_data = redis_manager.get_next_task()
-        if task_data:
-            task_id = task_data.get('id')
-            storage_path = storage_manager.get_storage_path()
-            
-            success, message = video_downloader.download_video(
-                task_data.get('url'),
-                task_id,
-                storage_path
-            )
-            
-            if success:
-                task = redis_manager.get_task(task_id)
-                downloaded_path = task.get('save_path')
-                
-                if not downloaded_path or not os.path.exists(downloaded_path):
-                    redis_manager.update_task_status(task_id, 'failed')
-                    continue
-                
-                video_info = video_parser.parse_video_info(task_data.get('url'))
-                video_path = os.path.join(
-                    storage_path,
-                    video_info['platform'],
-                    video_info['title'],
-                    f"{video_info['title']}.{Config.OUTPUT_FORMAT}"
-                )
-                
-                transcode_success, transcode_message = video_transcoder.transcode_video(
-                    downloaded_path,
-                    video_path,
-                    task_id
-                )
-                
-                if transcode_success:
-                    video_data = {
-                        'id': str(uuid.uuid4()),
-                        'task_id': task_id,
-                        'title': video_info['title'],
-                        'url': task_data.get('url'),
-                        'platform': video_info['platform'],
-                        'video_type': video_info['video_type'],
-                        'save_path': video_path,
-                        'created_at': time.strftime('%Y-%m-%d %H:%M:%S')
-                    }
-                    
-                    redis_manager.set_video(video_data['id'], video_data)
-                    redis_manager.update_task_status(task_id, 'completed', progress=100, save_path=video_path)
-                else:
-                    if os.path.exists(downloaded_path):
-                        video_data = {
-                            'id': str(uuid.uuid4()),
-                            'task_id': task_id,
-                            'title': video_info['title'],
-                            'url': task_data.get('url'),
-                            'platform': video_info['platform'],
-                            'video_type': video_info['video_type'],
-                            'save_path': downloaded_path,
-                            'created_at': time.strftime('%Y-%m-%d %H:%M:%S')
-                        }
-                        
-                        redis_manager.set_video(video_data['id'], video_data)
-                        redis_manager.update_task_status(task_id, 'completed', progress=100, save_path=downloaded_path)
-                    else:
-                        redis_manager.update_task_status(task_id, 'failed')
-            else:
-                redis_manager.update_task_status(task_id, 'failed')
-        else:
-            time.sleep(1)
+@api.route('/metrics', methods=['GET'])
+def get_metrics():
+    # 队列长度和任务状态分布在抓取时从Redis读取（状态分布读索引，不扫描任务），其余指标在各阶段边界累加
+    metrics.QUEUE_DEPTH.set(services.redis_manager.get_queue_length())
+    metrics.TASKS_BY_STATUS.clear()
+    for status, count in services.redis_manager.count_tasks_by_status().items():
+        metrics.TASKS_BY_STATUS.labels(status).set(count)
+    return Response(metrics.REGISTRY.render(), mimetype='text/plain; version=0.0.4')
 
 if __name__ == '__main__':
-    import logging
-    import os
+    # 开发模式：单进程同时提供接口和处理下载
+    from core.task_logger import setup_logging
+    from worker import start_background_workers
     
+    setup_logging()
     log = logging.getLogger('werkzeug')
     log.setLevel(logging.ERROR)
     
     if os.environ.get('WERKZEUG_RUN_MAIN') != 'true':
-        print('\n🚀 启动自动下载视频应用...')
+        print('\n🚀 启动自动下载视频应用（开发模式）...')
         print('=' * 60)
-        print(f'📡 服务器地址: http://192.168.31.226:5001')
+        print(f'📡 服务器地址: http://{Config.HOST}:{Config.PORT}')
         print('💡 按 Ctrl+C 停止服务器')
         print('=' * 60)
         print()
     
-    download_thread = threading.Thread(target=process_download_queue, daemon=True)
-    download_thread.start()
+    # 调试模式下reloader会先启动一个监控进程，只在真正的服务进程里启动后台线程
+    if not Config.DEBUG or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_background_workers()
     
-    app.run(host='192.168.31.226', port=5001, debug=Config.DEBUG)
\ No newline at end of file
+    create_app().run(host=Config.HOST, port=Config.PORT, debug=Config.DEBUG, threaded=True)
@@ -1,7 +1,14 @@
 import os
 
 class Config:
-    DEBUG = True
+    DEBUG = os.environ.get('BUBBLETV_DEBUG', '0') == '1'
+    
+    # 服务监听地址，生产环境用 gunicorn（见 gunicorn.conf.py）
+    HOST = os.environ.get('BUBBLETV_HOST', '0.0.0.0')
+    PORT = int(os.environ.get('BUBBLETV_PORT', '5001'))
+    WEB_WORKERS = int(os.environ.get('BUBBLETV_WEB_WORKERS', '2'))  # gunicorn 进程数
+    WEB_THREADS = int(os.environ.get('BUBBLETV_WEB_THREADS', '8'))  # 每个进程的处理线程数
+    WORKER_METRICS_PORT = int(os.environ.get('BUBBLETV_WORKER_METRICS_PORT', '9101'))  # 后台任务进程的 /metrics 端口，0为不开启
     
     SECRET_KEY = 'your-secret-key-here'
     
@@ -15,14 +22,127 @@ class Config:
     
     DEFAULT_STORAGE_PATH = os.path.join(os.path.expanduser('~'), 'Downloads', 'Videos')
     
-    MAX_DOWNLOAD_THREADS = 3
+    MAX_DOWNLOAD_THREADS = int(os.environ.get('BUBBLETV_DOWNLOAD_THREADS', '3'))  # worker.py 启动的下载线程数
     DOWNLOAD_TIMEOUT = 300
     
+    # 日志
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')  # DEBUG/INFO/WARNING/ERROR，低于该级别的日志直接丢弃
+    LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json')  # json 或 text
+    TASK_LOG_BATCH_SIZE = 20  # 单个任务缓冲这么多条日志后立即写入Redis
+    TASK_LOG_FLUSH_INTERVAL = 1  # 缓冲日志最长等待秒数
+    
+    TIMINGS_HISTORY_SIZE = 500  # 阶段耗时汇总统计最近这么多个任务
+    
     FFMPEG_PATH = 'ffmpeg'
+    FFPROBE_PATH = 'ffprobe'
     OUTPUT_FORMAT = 'mov'
     
+    # 转码编码策略：空闲时用慢预设换画质，积压时逐级换快预设
+    X264_PRESET_LADDER = ['slow', 'medium', 'fast', 'faster', 'veryfast']  # 由慢到快
+    TRANSCODE_QUEUE_STEP = 3  # 队列中每多这么多任务，预设往快的方向走一级
+    TRANSCODE_LARGE_PIXELS = 1920 * 1080  # 超过该分辨率额外加快一级
+    TRANSCODE_LONG_VIDEO_SECONDS = 1800  # 超过该时长额外加快一级
+    TRANSCODE_CRF_BY_HEIGHT = [(480, 21), (720, 22), (1080, 23)]  # (最大高度, CRF)，更高分辨率用 TRANSCODE_DEFAULT_CRF
+    TRANSCODE_DEFAULT_CRF = 24
+    TRANSCODE_MAX_CRF_BOOST = 2  # 预设已经最快仍然积压时，CRF 最多再提高这么多
+    TRANSCODE_THREADS = 0  # 0 表示按CPU核数和并发转码数自动分配
+    
+    # 转码超时按视频时长计算，不再固定30分钟
+    TRANSCODE_TIMEOUT_FACTOR = 3  # 超时 = 视频时长 × 该倍数
+    TRANSCODE_MIN_TIMEOUT = 600
+    FFMPEG_STDERR_TAIL_LINES = 50  # 转码失败时保留的FFmpeg错误输出行数
+    
+    # B站DASH音视频合并：复制两路流封装，不重新编码
+    REMUX_COMPATIBLE = True  # 视频为H.264、音频为AAC时直接封装成mov，省去转码；False 时仍统一转码
+    REMUX_TIMEOUT_FACTOR = 0.5  # 封装超时 = 视频时长 × 该倍数，不低于 TRANSCODE_MIN_TIMEOUT
+    
+    # 长视频分段并行转码
+    SEGMENTED_TRANSCODE_MIN_DURATION = 1200  # 超过该时长（秒）自动分段
+    TRANSCODE_SEGMENT_SECONDS = 300  # 每段目标时长，实际在其后的第一个关键帧处切分
+    TRANSCODE_SEGMENT_WORKERS = 0  # 同时编码的段数，0 表示按分配到的线程数自动计算
+    TRANSCODE_PROGRESS_INTERVAL = 30  # 分段转码进度百分比不变时，至少每隔这么多秒刷新一次任务状态，避免被当作卡死
+    
     BROWSER_HEADLESS = True
     
+    # 无头浏览器池（平台登录、抖音页面渲染）
+    BROWSER_POOL_SIZE = 2  # 每个进程最多同时保留的浏览器数
+    BROWSER_IDLE_TIMEOUT = 300  # 空闲超过该秒数关闭浏览器
+    BROWSER_MAX_USES = 50  # 每个浏览器用满这么多次后重启，防止内存持续增长
+    BROWSER_READY_TIMEOUT = 15  # 等待页面就绪的最长秒数
+    BROWSER_PROFILE_DIR = os.path.join(os.path.expanduser('~'), '.bubbletv', 'browser_profiles')  # 每个平台一个子目录
+    DOUYIN_BROWSER_RENDER = True  # 抖音页面HTML里没有视频地址时用浏览器渲染后再提取
+    
+    # 抖音视频地址解析：多种提取方法并发竞速
+    DOUYIN_HEDGE_DELAY = 1.0  # 已启动的方法这么多秒还没结果时再启动下一个；有方法失败时立即启动下一个
+    DOUYIN_RESOLVE_TIMEOUT = 25  # 一次解析的总超时（秒）
+    RESOLVER_STATS_CACHE_SECONDS = 60  # 各方法成功率和耗时统计在进程内缓存的时间
+    
+    # B站 DASH 格式选择
+    BILIBILI_CODECS = ['avc', 'hevc', 'av1']  # 可接受的视频编码，按偏好排列；AVC 下载后可直接封装，不必转码
+    BILIBILI_PREFER_CODEC = True  # True 时编码偏好优先于分辨率，False 时先选分辨率最高的
+    BILIBILI_MAX_HEIGHT = 1080  # 最高分辨率，0 为不限
+    BILIBILI_MAX_BITRATE = 0  # 视频最高码率（bit/s），0 为不限
+    BILIBILI_MAX_AUDIO_BITRATE = 0  # 音频最高码率（bit/s），0 为不限
+    
+    # CDN 镜像探测：主地址和备用地址中选响应最快的
+    MIRROR_PROBE_ENABLED = True
+    MIRROR_PROBE_BYTES = 64 * 1024  # 每个镜像请求开头这么多字节计时
+    MIRROR_PROBE_TIMEOUT = 3  # 探测最长等待秒数，超时的镜像排在最后
+    MIRROR_PROBE_CACHE_SECONDS = 60  # 同一CDN主机的探测结果复用时间
+    MIRROR_PENALTY_SECONDS = 300  # 下载中途被放弃的主机在这段时间内排在最后
+    MIRROR_MIN_SPEED = 128 * 1024  # 下载速度（字节/秒）持续低于该值时换到下一个镜像
+    MIRROR_SPEED_WINDOW = 5  # 按这么多秒的窗口计算速度
+    MIRROR_SWITCH_GRACE = 10  # 连接建立后这么多秒内不因速度切换
+    MIRROR_CONNECT_TIMEOUT = 10  # 还有备用镜像时的连接超时
+    MIRROR_STALL_TIMEOUT = 20  # 还有备用镜像时，这么多秒收不到数据就切换
+    
+    # 下载写入
+    DOWNLOAD_CHUNK_SIZE = 1024 * 1024  # 每次读取的字节数，建议 1~4 MiB；块越大Python层循环和系统调用越少
+    DOWNLOAD_PREALLOCATE = True  # 已知文件大小时用 posix_fallocate 预分配，磁盘空间不足时下载前就失败
+    
+    # 边下载边转码：响应体经命名管道直接送入FFmpeg，省去中间mp4的写入和读回
+    STREAM_TRANSCODE = False  # 需要随机读取的文件（moov在末尾的MP4）、分段转码的长视频仍先下载再转码
+    STREAM_STALL_TIMEOUT = 300  # FFmpeg 这么多秒不读取管道输入时放弃，改为先下载再转码
+    
+    # 下载限速（字节/秒，0 为不限）。这里是默认值，运行时通过 /api/config 修改，保存在Redis
+    BANDWIDTH_GLOBAL_LIMIT = 0  # 所有下载合计
+    BANDWIDTH_TASK_LIMIT = 0  # 单个下载
+    BANDWIDTH_SCHEDULE = []  # 按时段覆盖，如 [{'start': '08:00', 'end': '23:00', 'global_limit': 2 * 1024 * 1024}]
+    BANDWIDTH_REFRESH_SECONDS = 5  # 重新读取配置、重新分配全局额度的间隔
+    BANDWIDTH_BURST_SECONDS = 1  # 令牌桶最多积攒这么多秒的额度
+    
+    # yt-dlp 实例池和视频信息缓存
+    YTDLP_POOL_SIZE = 4  # 每个平台保留的空闲 YoutubeDL 实例数
+    YTDLP_INFO_TTL = 300  # 解析结果缓存秒数，下载阶段在此时间内直接复用；视频地址带签名，不宜过长
+    YTDLP_INFO_CACHE_SIZE = 256  # 最多缓存的解析结果条数
+    
+    # 上游主机熔断，状态在Redis中各进程共享
+    CIRCUIT_BREAKER_ENABLED = True
+    CIRCUIT_WINDOW_SECONDS = 60  # 统计失败率的滚动窗口
+    CIRCUIT_BUCKET_SECONDS = 10  # 窗口按这个粒度分桶计数
+    CIRCUIT_MIN_REQUESTS = 5  # 窗口内请求数不足时不判定
+    CIRCUIT_ERROR_RATE = 0.5  # 失败率达到该值时熔断
+    CIRCUIT_SLOW_SECONDS = 10  # 响应耗时滑动平均超过该秒数时熔断
+    CIRCUIT_LATENCY_ALPHA = 0.3  # 耗时滑动平均中最新一次的权重
+    CIRCUIT_OPEN_SECONDS = 30  # 熔断持续时间，到期后放一个探测请求
+    CIRCUIT_PROBE_TIMEOUT = 30  # 探测请求占用的最长时间，超时后允许别的进程再探测
+    
     COOKIE_EXPIRY_DAYS = 30
     
-    MIGRATION_CHECK_INTERVAL = 60
\ No newline at end of file
+    # Cookie健康检查（后台任务进程定时执行）
+    COOKIE_CHECK_INTERVAL = 3600  # 校验间隔（秒）
+    COOKIE_HEALTH_TTL = 3 * 3600  # 校验结果保留时间，超时视为未校验
+    COOKIE_REFRESH_BEFORE_DAYS = 3  # 距离过期不足这么多天时告警并尝试刷新
+    COOKIE_AUTO_REFRESH = True  # 失效或临近过期时用浏览器池里已登录的资料目录刷新
+    COOKIE_REQUIRED_PLATFORMS = []  # 这些平台没有有效Cookie时任务直接失败，不再白白下载
+    
+    MIGRATION_CHECK_INTERVAL = 60
+    
+    # 任务租约与僵尸任务回收
+    TASK_LEASE_TTL = 30  # 租约有效期（秒），工作进程消失后最多这么久被发现
+    TASK_HEARTBEAT_INTERVAL = 10  # 心跳续约间隔（秒）
+    TASK_STALL_TIMEOUT = 600  # 超过该时间没有任何进度更新视为卡死（秒）
+    TASK_MAX_RETRIES = 3
+    TASK_RETRY_BACKOFF_BASE = 30  # 重试退避基数（秒），按 2^n 递增
+    TASK_RETRY_BACKOFF_MAX = 600
+    REAPER_INTERVAL = 15
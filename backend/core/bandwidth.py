@@ -0,0 +1,240 @@
+import logging
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from config.config import Config
+
+logger = logging.getLogger(__name__)
+
+# 每次睡眠最长这么久就检查一次取消/暂停信号
+SLEEP_SLICE = 0.25
+# 限速时读取块的下限
+MIN_CHUNK_SIZE = 64 * 1024
+
+
+class TokenBucket:
+    """令牌桶：每秒补充 rate 字节，最多积攒 BANDWIDTH_BURST_SECONDS 秒的量；rate 为0不限速"""
+
+    def __init__(self, rate=0):
+        self._lock = threading.Lock()
+        self.rate = 0
+        self.capacity = 0
+        self.tokens = 0.0
+        self.updated = time.monotonic()
+        self.set_rate(rate)
+
+    def set_rate(self, rate):
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = max(0, int(rate or 0))
+            self.capacity = self.rate * Config.BANDWIDTH_BURST_SECONDS
+            self.tokens = min(self.tokens, self.capacity)
+
+    def _refill(self, now):
+        if self.rate:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount):
+        """取走 amount 字节的令牌，返回需要等待的秒数
+
+        令牌允许透支：数据已经收到，只能事后睡眠补上，下一次取令牌时继续排在后面。
+        """
+        with self._lock:
+            if not self.rate:
+                return 0.0
+            self._refill(time.monotonic())
+            self.tokens -= amount
+            return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+
+def _minutes(text):
+    hour, minute = str(text).split(':')
+    hour, minute = int(hour), int(minute)
+    if not (0 <= hour <= 24 and 0 <= minute < 60) or hour * 60 + minute > 24 * 60:
+        raise ValueError
+    return hour * 60 + minute
+
+
+def _limit(value, name):
+    try:
+        value = int(value or 0)
+    except (TypeError, ValueError):
+        raise ValueError(f'{name} 必须是整数（字节/秒）')
+    if value < 0:
+        raise ValueError(f'{name} 不能为负数')
+    return value
+
+
+def default_config():
+    return {
+        'global_limit': Config.BANDWIDTH_GLOBAL_LIMIT,
+        'task_limit': Config.BANDWIDTH_TASK_LIMIT,
+        'schedule': [dict(window) for window in Config.BANDWIDTH_SCHEDULE],
+    }
+
+
+def validate_config(data, base=None):
+    """校验并补全限速配置，未给出的字段沿用 base；不合法时抛 ValueError"""
+    if not isinstance(data, dict):
+        raise ValueError('限速配置必须是对象')
+    config = dict(base or default_config())
+    for key in ('global_limit', 'task_limit'):
+        if key in data:
+            config[key] = _limit(data[key], key)
+    if 'schedule' in data:
+        if not isinstance(data['schedule'], list):
+            raise ValueError('schedule 必须是列表')
+        schedule = []
+        for window in data['schedule']:
+            if not isinstance(window, dict):
+                raise ValueError('schedule 的每一项必须是对象')
+            try:
+                start, end = _minutes(window['start']), _minutes(window['end'])
+            except (KeyError, ValueError):
+                raise ValueError('时段需要 start、end，格式为 HH:MM')
+            if start == end:
+                raise ValueError('时段的 start 和 end 不能相同')
+            entry = {'start': window['start'], 'end': window['end']}
+            for key in ('global_limit', 'task_limit'):
+                if key in window:
+                    entry[key] = _limit(window[key], key)
+            schedule.append(entry)
+        config['schedule'] = schedule
+    return config
+
+
+def active_limits(config, now=None):
+    """当前生效的 (全局限速, 单任务限速)：落在某个时段内时用该时段的值，未给出的沿用默认值"""
+    now = now or time.localtime()
+    minute = now.tm_hour * 60 + now.tm_min
+    for window in config.get('schedule') or []:
+        start, end = _minutes(window['start']), _minutes(window['end'])
+        # end 小于 start 表示跨过午夜，如 23:00-07:00
+        inside = start <= minute < end if start < end else (minute >= start or minute < end)
+        if inside:
+            return (window.get('global_limit', config['global_limit']),
+                    window.get('task_limit', config['task_limit']))
+    return config['global_limit'], config['task_limit']
+
+
+class BandwidthGovernor:
+    """所有下载线程共用的限速器
+
+    全局限速对所有进程生效：各进程定时把自己正在下载的数量登记到Redis，
+    按数量分得全局额度，进程内的下载共用一个令牌桶；每个任务再有自己的单任务令牌桶，
+    同一任务同时下载的多路（如边下载边转码时的音频和视频）共用它。
+    配置保存在Redis（/api/config 修改），每 BANDWIDTH_REFRESH_SECONDS 秒重新读取，
+    按时段切换限速，例如白天限速、夜间不限，队列照常处理。
+    """
+
+    def __init__(self, redis_manager=None):
+        self.redis = redis_manager
+        self.process_id = f'{socket.gethostname()}:{os.getpid()}'
+        self.global_bucket = TokenBucket()
+        # 任务ID → [单任务令牌桶, 正在下载的路数]
+        self._tasks = {}
+        self._lock = threading.Lock()
+        self._refreshed = 0.0
+        self.limits = (0, 0)
+        self.share = 0
+
+    def get_config(self):
+        config = None
+        if self.redis:
+            try:
+                config = self.redis.get_bandwidth_config()
+            except Exception as e:
+                logger.warning(f'⚠️  读取限速配置失败，使用默认配置: {e}')
+        if not isinstance(config, dict):
+            return default_config()
+        try:
+            return validate_config(config)
+        except ValueError as e:
+            logger.warning(f'⚠️  Redis中的限速配置无效，使用默认配置: {e}')
+            return default_config()
+
+    def set_config(self, data):
+        """合并到当前配置后保存，返回保存后的完整配置；不合法时抛 ValueError"""
+        config = validate_config(data, self.get_config())
+        self.redis.set_bandwidth_config(config)
+        self._refresh(force=True)
+        return config
+
+    def effective(self):
+        global_limit, task_limit = active_limits(self.get_config())
+        return {'global_limit': global_limit, 'task_limit': task_limit}
+
+    def _refresh(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._refreshed < Config.BANDWIDTH_REFRESH_SECONDS:
+            return
+        self._refreshed = now
+        global_limit, task_limit = active_limits(self.get_config())
+        with self._lock:
+            local = len(self._tasks)
+        total = local
+        if self.redis:
+            try:
+                total = max(local, int(self.redis.report_active_downloads(
+                    self.process_id, local, Config.BANDWIDTH_REFRESH_SECONDS * 3)))
+            except Exception as e:
+                logger.debug(f'登记下载数量失败，按本进程独占全局额度: {e}')
+        # 按正在下载的数量分配全局额度；没有下载时保留整份，下一个下载开始时再重新分配
+        share = global_limit * local // total if global_limit and total else global_limit
+        self.limits = (global_limit, task_limit)
+        self.share = share
+        self.global_bucket.set_rate(share)
+        with self._lock:
+            buckets = [bucket for bucket, _ in self._tasks.values()]
+        for bucket in buckets:
+            bucket.set_rate(task_limit)
+
+    @contextmanager
+    def track(self, task_id):
+        """一个文件下载期间登记为活动下载，结束后让出全局额度
+
+        同一任务的多路下载可以同时登记，共用一个单任务令牌桶，最后一路结束时才移除。
+        """
+        with self._lock:
+            entry = self._tasks.setdefault(task_id, [TokenBucket(), 0])
+            entry[1] += 1
+        try:
+            self._refresh(force=True)
+            yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    self._tasks.pop(task_id, None)
+            self._refresh(force=True)
+
+    def _bucket(self, task_id):
+        entry = self._tasks.get(task_id)
+        return entry[0] if entry else None
+
+    def chunk_size(self, task_id, default):
+        """下载每次读取的块大小：限速较低时缩到约 1/4 秒的量，避免读一大块后长时间不读、连接空闲"""
+        self._refresh()
+        bucket = self._bucket(task_id)
+        rates = [rate for rate in (self.global_bucket.rate, bucket.rate if bucket else 0) if rate]
+        if not rates:
+            return default
+        return max(MIN_CHUNK_SIZE, min(default, min(rates) // 4))
+
+    def consume(self, task_id, amount, token=None):
+        """下载了 amount 字节后调用，超出限速时睡眠；返回睡眠的秒数"""
+        self._refresh()
+        bucket = self._bucket(task_id)
+        wait = self.global_bucket.reserve(amount)
+        if bucket:
+            wait = max(wait, bucket.reserve(amount))
+        remaining = wait
+        while remaining > 0:
+            if token:
+                token.check()
+            time.sleep(min(SLEEP_SLICE, remaining))
+            remaining -= SLEEP_SLICE
+        return wait
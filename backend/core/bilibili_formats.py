@@ -0,0 +1,119 @@
+from config.config import Config
+from . import mirrors
+
+# DASH 表示里的 codecid
+CODEC_IDS = {7: 'avc', 12: 'hevc', 13: 'av1'}
+CODEC_PREFIXES = (('avc1', 'avc'), ('hev1', 'hevc'), ('hvc1', 'hevc'), ('av01', 'av1'))
+
+# playurl 的 fnval 位：16 DASH，128 4K，2048 AV1
+FNVAL_DASH = 16
+FNVAL_4K = 128
+FNVAL_AV1 = 2048
+
+# 最高分辨率对应的 qn
+QN_BY_HEIGHT = [(360, 16), (480, 32), (720, 64), (1080, 80)]
+QN_4K = 120
+
+
+def codec_of(stream):
+    codec = CODEC_IDS.get(stream.get('codecid'))
+    if codec:
+        return codec
+    codecs = (stream.get('codecs') or '').lower()
+    for prefix, name in CODEC_PREFIXES:
+        if codecs.startswith(prefix):
+            return name
+    return codecs or None
+
+
+def stream_urls(stream):
+    """主地址在前、备用地址在后；接口里两种命名都出现过"""
+    return mirrors.candidates(stream.get('baseUrl') or stream.get('base_url'),
+                              stream.get('backupUrl') or stream.get('backup_url'))
+
+
+class FormatSelector:
+    """按配置的策略从B站 DASH 表示中选出视频流和音频流
+
+    默认优先 AVC：下载后可以直接封装成 mov 不必重新编码；其次再看分辨率和码率。
+    超出 BILIBILI_MAX_HEIGHT / BILIBILI_MAX_BITRATE 的表示不选，没有可接受的编码时
+    退回任意编码，所有表示都超出限制时选码率最低的。
+    """
+
+    def play_params(self):
+        """playurl 请求的 qn 和 fnval：不请求用不到的分辨率和编码"""
+        max_height = Config.BILIBILI_MAX_HEIGHT
+        fnval = FNVAL_DASH
+        if 'av1' in Config.BILIBILI_CODECS:
+            fnval |= FNVAL_AV1
+        if not max_height or max_height > 1080:
+            return QN_4K, fnval | FNVAL_4K
+        qn = next((qn for height, qn in QN_BY_HEIGHT if max_height <= height), 80)
+        return qn, fnval
+
+    def _within_limits(self, stream):
+        height = stream.get('height') or 0
+        bandwidth = stream.get('bandwidth') or 0
+        if Config.BILIBILI_MAX_HEIGHT and height > Config.BILIBILI_MAX_HEIGHT:
+            return False
+        if Config.BILIBILI_MAX_BITRATE and bandwidth > Config.BILIBILI_MAX_BITRATE:
+            return False
+        return True
+
+    def _video_key(self, stream):
+        codecs = Config.BILIBILI_CODECS
+        codec = codec_of(stream)
+        codec_rank = codecs.index(codec) if codec in codecs else len(codecs)
+        quality = (-(stream.get('height') or 0), -(stream.get('bandwidth') or 0))
+        if Config.BILIBILI_PREFER_CODEC:
+            return (codec_rank,) + quality
+        return quality + (codec_rank,)
+
+    def rank_video(self, videos):
+        """可选的视频表示，最合适的在前"""
+        videos = [v for v in videos or [] if stream_urls(v)]
+        within = [v for v in videos if self._within_limits(v)]
+        accepted = [v for v in within if codec_of(v) in Config.BILIBILI_CODECS] or within
+        if not accepted:
+            return sorted(videos, key=lambda v: v.get('bandwidth') or 0)
+        return sorted(accepted, key=self._video_key)
+
+    def rank_audio(self, audios):
+        audios = [a for a in audios or [] if stream_urls(a)]
+        limit = Config.BILIBILI_MAX_AUDIO_BITRATE
+        within = [a for a in audios if not limit or (a.get('bandwidth') or 0) <= limit]
+        if not within:
+            return sorted(audios, key=lambda a: a.get('bandwidth') or 0)
+        return sorted(within, key=lambda a: -(a.get('bandwidth') or 0))
+
+    def select(self, play_info, headers=None):
+        """从 playurl 的 data（番剧为 video_info）中选出要下载的流
+
+        返回视频和音频的地址列表（探测后最快的镜像在前）、所选视频的编码和分辨率以及时长（秒）；
+        没有可用的流时返回None。
+        """
+        dash = play_info.get('dash') or {}
+        duration = (play_info.get('timelength') or 0) / 1000 or dash.get('duration') or 0
+        videos = self.rank_video(dash.get('video'))
+        if videos:
+            video = videos[0]
+            audios = self.rank_audio(dash.get('audio'))
+            return {
+                'video_urls': mirrors.rank(stream_urls(video), headers),
+                'audio_urls': mirrors.rank(stream_urls(audios[0]), headers) if audios else [],
+                'video_codec': codec_of(video),
+                'width': video.get('width'),
+                'height': video.get('height'),
+                'video_bandwidth': video.get('bandwidth'),
+                'duration': duration,
+            }
+
+        # 不支持 DASH 的老视频只有 durl：单个 flv/mp4，音视频在一起
+        durl = play_info.get('durl') or []
+        if durl:
+            urls = mirrors.candidates(durl[0].get('url'), durl[0].get('backup_url') or durl[0].get('backupUrl'))
+            if urls:
+                return {'video_urls': mirrors.rank(urls, headers), 'audio_urls': [],
+                        'video_codec': None, 'width': None, 'height': None, 'video_bandwidth': None,
+                        'duration': duration}
+        return None
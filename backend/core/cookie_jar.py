@@ -0,0 +1,79 @@
+import http.cookiejar
+import threading
+
+PLATFORM_DOMAINS = {
+    'bilibili': '.bilibili.com',
+    'douyin': '.douyin.com',
+    'toutiao': '.toutiao.com',
+}
+
+
+def parse_cookie_data(cookie_data):
+    """Redis里的Cookie统一成 {名称: 值}
+
+    手动登录保存的是 {'cookie': 'a=1; b=2'} 或 {'SESSDATA': ...}，浏览器登录保存的是逐个字段。
+    """
+    cookies = {}
+    for name, value in (cookie_data or {}).items():
+        if name == 'cookie':
+            for item in value.split(';'):
+                key, sep, item_value = item.strip().partition('=')
+                if sep and key.strip():
+                    cookies[key.strip()] = item_value.strip()
+        else:
+            cookies[name] = value
+    return cookies
+
+
+def _make_cookie(domain, name, value):
+    return http.cookiejar.Cookie(
+        version=0, name=name, value=value, port=None, port_specified=False,
+        domain=domain, domain_specified=True, domain_initial_dot=domain.startswith('.'),
+        path='/', path_specified=True, secure=False, expires=None, discard=False,
+        comment=None, comment_url=None, rest={}
+    )
+
+
+class PlatformCookies:
+    """某个平台某个版本的Cookie，请求头和cookiejar在构建时一次生成"""
+
+    def __init__(self, platform, version, data):
+        self.platform = platform
+        self.version = version
+        self.data = data
+        self.cookies = parse_cookie_data(data)
+        self.header = '; '.join(f'{name}={value}' for name, value in self.cookies.items())
+        self.jar = http.cookiejar.CookieJar()
+        domain = PLATFORM_DOMAINS.get(platform, '')
+        for name, value in self.cookies.items():
+            self.jar.set_cookie(_make_cookie(domain, name, value))
+
+    def __bool__(self):
+        return bool(self.cookies)
+
+    def apply_to(self, jar):
+        """放进别的cookiejar（例如 yt-dlp 的 ydl.cookiejar）"""
+        for cookie in self.jar:
+            jar.set_cookie(cookie)
+
+
+class CookieJarCache:
+    """按平台和Cookie版本缓存转换好的Cookie
+
+    set_cookie 每次写入都会递增 cookie_version:<平台>，这里每次只读一下版本号，
+    版本没变就直接复用上次构建的请求头和cookiejar。
+    """
+
+    def __init__(self, redis_manager):
+        self.redis = redis_manager
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, platform):
+        version = self.redis.get_cookie_version(platform)
+        entry = self._entries.get(platform)
+        if entry is None or entry.version != version:
+            entry = PlatformCookies(platform, version, self.redis.get_cookie(platform) or {})
+            with self._lock:
+                self._entries[platform] = entry
+        return entry
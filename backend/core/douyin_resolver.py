@@ -0,0 +1,242 @@
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from config.config import Config
+from . import html_extract, http_client, metrics, mirrors
+
+logger = logging.getLogger(__name__)
+
+_UNSET = object()
+
+DOUYIN_API_URLS = [
+    ('aweme_detail', 'https://www.douyin.com/aweme/v1/web/aweme/detail/?aweme_id={item_id}'),
+    ('iteminfo', 'https://www.iesdouyin.com/web/api/v2/aweme/iteminfo/?item_ids={item_id}'),
+]
+
+DOUYIN_THIRD_PARTY_URLS = [
+    ('douyin_wtf_api', 'https://api.douyin.wtf/api?url=https://www.douyin.com/video/{item_id}'),
+    ('douyin_wtf', 'https://douyin.wtf/api?url=https://www.douyin.com/video/{item_id}'),
+    ('peark', 'https://api.peark.com/api/douyin/video?url=https://www.douyin.com/video/{item_id}'),
+    ('52dyc', 'https://api.52dyc.cn/douyin/api?url=https://www.douyin.com/video/{item_id}'),
+]
+
+
+class ResolveContext:
+    """一次解析中各方法共享的页面和视频ID，谁先用到谁去请求和扫描，其余方法直接复用"""
+
+    def __init__(self, scraper, url, headers):
+        self.scraper = scraper
+        self.url = url
+        self.headers = headers
+        self.cancelled = threading.Event()
+        self._page = _UNSET
+        self._item_id = _UNSET
+        self._page_lock = threading.Lock()
+        self._item_id_lock = threading.Lock()
+
+    def page(self):
+        """返回 html_extract.Page，页面获取失败时为空页面"""
+        with self._page_lock:
+            if self._page is _UNSET:
+                html = ''
+                try:
+                    response = http_client.get(self.url, headers=self.headers, timeout=15, allow_redirects=True)
+                    response.encoding = 'utf-8'
+                    html = response.text
+                except Exception as e:
+                    logger.warning(f'获取抖音页面失败: {e}')
+                self._page = html_extract.scan(html)
+            return self._page
+
+    def item_id(self):
+        with self._item_id_lock:
+            if self._item_id is _UNSET:
+                # 链接里能直接取到ID时不必等页面
+                item_id = self.scraper._extract_douyin_video_id(self.url)
+                if not item_id:
+                    page = self.page()
+                    item_ids = self.scraper._extract_douyin_item_ids(page.html, page)
+                    item_id = item_ids[0] if item_ids else None
+                self._item_id = item_id
+            return self._item_id
+
+    def known_title(self):
+        """页面已经取到时从中提取标题，不为标题单独发请求"""
+        if self._page is _UNSET or not self._page.html:
+            return None
+        return self.scraper._extract_douyin_title(self._page.html, self._page)
+
+    def known_item_id(self):
+        return None if self._item_id is _UNSET else self._item_id
+
+
+class DouyinResolver:
+    """抖音视频地址解析：多种提取方法对冲竞速
+
+    先启动统计上最快拿到地址的方法，DOUYIN_HEDGE_DELAY 秒内没有结果（或它已失败）
+    再启动下一个，第一个拿到地址的胜出，其余还没开始的取消、正在跑的结果丢弃。
+    每个方法的尝试次数、成功次数和耗时累计在 Redis 的 resolver_stats:douyin 里，
+    各进程据此调整启动顺序；没有 Redis 时只在本进程内统计。
+    """
+
+    PLATFORM = 'douyin'
+
+    def __init__(self, scraper, redis_manager=None):
+        self.scraper = scraper
+        self.redis = redis_manager
+        self.strategies = self._build_strategies()
+        self._local_stats = {}
+        self._stats_cache = None
+        self._stats_loaded_at = 0
+        self._lock = threading.Lock()
+
+    def _build_strategies(self):
+        scraper = self.scraper
+        strategies = [
+            ('ytdlp', lambda ctx: scraper._douyin_ytdlp_info(ctx.url, ctx.headers)),
+            ('html', lambda ctx: {'video_url': scraper._extract_douyin_video_url_from_html(ctx.page().html, ctx.page())}),
+        ]
+        for name, template in DOUYIN_API_URLS:
+            strategies.append((name, self._item_strategy(
+                lambda api_url, ctx: scraper._fetch_douyin_api(api_url, ctx.headers), template)))
+        if scraper.browser_pool and Config.DOUYIN_BROWSER_RENDER:
+            strategies.append(('browser', lambda ctx: {'video_url': scraper._render_douyin_video_url(ctx.url)}))
+        for name, template in DOUYIN_THIRD_PARTY_URLS:
+            strategies.append((name, self._item_strategy(
+                lambda parser_url, ctx: scraper._fetch_douyin_third_party(parser_url), template)))
+        return strategies
+
+    @staticmethod
+    def _item_strategy(fetch, template):
+        def run(ctx):
+            item_id = ctx.item_id()
+            if not item_id:
+                raise ValueError('无法获取视频ID')
+            if ctx.cancelled.is_set():
+                return None
+            # API返回 url_list 的全部镜像，第三方解析只有一个地址
+            urls = mirrors.candidates(fetch(template.format(item_id=item_id), ctx))
+            return {'video_url': urls[0] if urls else None, 'video_urls': urls, 'video_id': item_id}
+        return run
+
+    def resolve(self, url, headers):
+        ctx = ResolveContext(self.scraper, url, headers)
+        queue = self.ordered_strategies()
+        executor = ThreadPoolExecutor(max_workers=len(queue), thread_name_prefix='douyin-resolve')
+        pending = {}
+        errors = []
+        deadline = time.monotonic() + Config.DOUYIN_RESOLVE_TIMEOUT
+        next_launch = time.monotonic()
+        try:
+            while queue or pending:
+                now = time.monotonic()
+                if now >= deadline:
+                    errors.append('解析超时')
+                    break
+                if queue and (not pending or now >= next_launch):
+                    name, run = queue.pop(0)
+                    logger.debug(f'启动抖音解析方法: {name}')
+                    pending[executor.submit(self._run, run, ctx)] = (name, now)
+                    next_launch = now + Config.DOUYIN_HEDGE_DELAY
+                    continue
+
+                wake_at = min(deadline, next_launch) if queue else deadline
+                done, _ = wait(pending, timeout=max(0, wake_at - now), return_when=FIRST_COMPLETED)
+                for future in done:
+                    name, started = pending.pop(future)
+                    elapsed = time.monotonic() - started
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        result = None
+                        errors.append(f'{name}: {e}')
+                    else:
+                        if not (result and result.get('video_url')):
+                            errors.append(f'{name}: 未找到视频地址')
+                    success = bool(result and result.get('video_url'))
+                    self._record(name, success, elapsed)
+                    if success:
+                        logger.info(f'🎯 抖音解析方法 {name} 胜出，用时 {elapsed:.2f}s')
+                        return self._build_info(ctx, result)
+                    # 有方法失败时不必等对冲延迟，立即补上下一个
+                    next_launch = time.monotonic()
+        finally:
+            ctx.cancelled.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+            # 其他方法胜出或超时时仍在跑的方法记为失败，耗时算到胜出或截止的时刻，
+            # 否则慢方法永远不会被记录，排序里一直按先验估计
+            ended = min(time.monotonic(), deadline)
+            for name, started in pending.values():
+                self._record(name, False, max(0.0, ended - started))
+
+        message = '; '.join(errors)
+        title = ctx.known_title()
+        if title:
+            message = f'{message} (网页标题: {title})'
+        raise Exception(f'无法获取抖音视频下载链接: {message}')
+
+    @staticmethod
+    def _run(run, ctx):
+        if ctx.cancelled.is_set():
+            return None
+        return run(ctx)
+
+    def _build_info(self, ctx, result):
+        return {
+            'title': result.get('title') or ctx.known_title() or '抖音视频',
+            'platform': 'douyin',
+            'url': ctx.url,
+            'video_url': result['video_url'],
+            'video_urls': result.get('video_urls') or [result['video_url']],
+            'video_id': result.get('video_id') or ctx.known_item_id() or '',
+            'video_type': '短视频'
+        }
+
+    def ordered_strategies(self):
+        """按“期望多少秒能拿到一次地址”从小到大排序
+
+        期望耗时 = 平均耗时 / 成功率，两者都带先验：没有统计时按定义顺序，
+        越靠后的先验耗时越长；成功率用拉普拉斯平滑，偶尔一次失败不会被立刻排到最后。
+        """
+        stats = self.get_stats()
+
+        def expected_cost(index):
+            name = self.strategies[index][0]
+            entry = stats.get(name, {})
+            attempts = entry.get('attempts', 0)
+            prior_seconds = Config.DOUYIN_HEDGE_DELAY * (index + 1)
+            mean_seconds = (entry.get('seconds', 0.0) + prior_seconds) / (attempts + 1)
+            success_rate = (entry.get('successes', 0) + 1) / (attempts + 2)
+            return mean_seconds / success_rate
+
+        order = sorted(range(len(self.strategies)), key=lambda index: (expected_cost(index), index))
+        return [self.strategies[index] for index in order]
+
+    def get_stats(self):
+        if not self.redis:
+            return self._local_stats
+        now = time.monotonic()
+        if self._stats_cache is None or now - self._stats_loaded_at > Config.RESOLVER_STATS_CACHE_SECONDS:
+            try:
+                self._stats_cache = self.redis.get_resolver_stats(self.PLATFORM)
+            except Exception as e:
+                logger.warning(f'⚠️  读取解析统计失败: {e}')
+                self._stats_cache = self._stats_cache or {}
+            self._stats_loaded_at = now
+        return self._stats_cache
+
+    def _record(self, name, success, seconds):
+        metrics.RESOLVER_ATTEMPTS.labels(self.PLATFORM, name, 'success' if success else 'failure').inc()
+        if self.redis:
+            try:
+                self.redis.record_resolver_result(self.PLATFORM, name, success, seconds)
+            except Exception as e:
+                logger.warning(f'⚠️  记录解析统计失败: {e}')
+            return
+        with self._lock:
+            entry = self._local_stats.setdefault(name, {'attempts': 0, 'successes': 0, 'seconds': 0.0})
+            entry['attempts'] += 1
+            entry['successes'] += 1 if success else 0
+            entry['seconds'] += seconds
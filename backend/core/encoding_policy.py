@@ -0,0 +1,48 @@
+import os
+from config.config import Config
+
+
+class EncodingPolicy:
+    """根据视频内容和转码积压情况选择 x264 预设、CRF 和线程数
+
+    空闲时使用阶梯中最慢（画质最好）的预设；分辨率高、时长长或下载队列积压时
+    逐级换成更快的预设。已经是最快预设仍然积压时，再小幅提高 CRF 缩短编码时间，
+    让吞吐量平滑下降而不是让队列无限增长。
+    """
+
+    def __init__(self, cpu_count=None):
+        self.cpu_count = cpu_count or os.cpu_count() or 1
+
+    def select(self, width, height, duration, queue_depth=0, active_transcodes=1):
+        ladder = Config.X264_PRESET_LADDER
+        step = 0
+
+        if width and height and width * height > Config.TRANSCODE_LARGE_PIXELS:
+            step += 1
+        if duration and duration > Config.TRANSCODE_LONG_VIDEO_SECONDS:
+            step += 1
+        step += queue_depth // max(1, Config.TRANSCODE_QUEUE_STEP)
+
+        overflow = max(0, step - (len(ladder) - 1))
+        preset = ladder[min(step, len(ladder) - 1)]
+        crf = self._base_crf(height) + min(overflow, Config.TRANSCODE_MAX_CRF_BOOST)
+
+        return {
+            'preset': preset,
+            'crf': crf,
+            'threads': self._threads(active_transcodes)
+        }
+
+    def _base_crf(self, height):
+        if not height:
+            return Config.TRANSCODE_DEFAULT_CRF
+        for max_height, crf in Config.TRANSCODE_CRF_BY_HEIGHT:
+            if height <= max_height:
+                return crf
+        return Config.TRANSCODE_DEFAULT_CRF
+
+    def _threads(self, active_transcodes):
+        if Config.TRANSCODE_THREADS:
+            return Config.TRANSCODE_THREADS
+        # 多个转码同时进行时平分CPU，避免互相抢占
+        return max(1, self.cpu_count // max(1, active_transcodes))
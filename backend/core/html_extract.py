@@ -0,0 +1,180 @@
+import codecs
+import html as html_lib
+import json
+import re
+from urllib.parse import unquote
+
+# 只找这三种标签；<script> 的内容整段跳过，页面里的大段JS只被 str.find 扫过一次
+_TAG_RE = re.compile(r'<(script|title|meta)\b([^>]*)>', re.IGNORECASE)
+_TITLE_RE = re.compile(r'<title[^>]*>([^<]*)</title>', re.IGNORECASE)
+_ATTR_RE = re.compile(r'([\w:-]+)\s*=\s*(?:"([^"]*)"|\'([^\']*)\')')
+_UNDEFINED_RE = re.compile(r'(?<=[:\[,])\s*undefined\b')
+
+# 内联脚本以这些前缀开头时作为页面状态保存，键为状态名
+STATE_PREFIXES = (
+    ('window._ROUTER_DATA', '_ROUTER_DATA'),
+    ('window._SSR_HYDRATED_DATA', '_SSR_HYDRATED_DATA'),
+    ('window.__INITIAL_STATE__', '__INITIAL_STATE__'),
+    ('window.__data', '__data'),
+)
+# 抖音网页版把整个状态URL编码后放在 <script id="RENDER_DATA" type="application/json">
+RENDER_DATA = 'RENDER_DATA'
+STATE_ORDER = (RENDER_DATA, '_ROUTER_DATA', '_SSR_HYDRATED_DATA', '__INITIAL_STATE__', '__data')
+
+_DECODER = json.JSONDecoder()
+
+
+def compile_path(path):
+    """'a.*.b.0' → ('a', '*', 'b', 0)；* 匹配任意键或下标"""
+    return tuple(int(part) if part.isdigit() else part for part in path.split('.'))
+
+
+def compile_paths(*paths):
+    return tuple(compile_path(path) for path in paths)
+
+
+def walk(data, path, start=0):
+    """按路径取值，取不到返回None"""
+    current = data
+    for index in range(start, len(path)):
+        key = path[index]
+        if key == '*':
+            children = current.values() if isinstance(current, dict) else current if isinstance(current, list) else ()
+            for child in children:
+                value = walk(child, path, index + 1)
+                if value is not None:
+                    return value
+            return None
+        if isinstance(current, dict):
+            current = current.get(key)
+        elif isinstance(current, list) and isinstance(key, int) and key < len(current):
+            current = current[key]
+        else:
+            return None
+        if current is None:
+            return None
+    return current
+
+
+def page_title(html):
+    """只要标题时不必扫描整页，<title> 在 <head> 里，找到第一个就停"""
+    match = _TITLE_RE.search(html or '')
+    return html_lib.unescape(match.group(1)).strip() if match else None
+
+
+def _attrs(text):
+    return {m.group(1).lower(): m.group(2) if m.group(2) is not None else m.group(3)
+            for m in _ATTR_RE.finditer(text)}
+
+
+def _percent_decode(text):
+    """URL解码。RENDER_DATA 几乎每个字符都是 %XX，unquote 逐个处理要几毫秒，
+    换成 \\xXX 交给C实现的 escape_decode 一次完成；格式不规范时退回 unquote"""
+    try:
+        raw = codecs.escape_decode(text.replace('\\', '\\\\').replace('%', '\\x').encode('utf-8'))[0]
+        return raw.decode('utf-8')
+    except ValueError:
+        return unquote(text)
+
+
+def _decode_state(body, encoded):
+    if encoded:
+        return json.loads(_percent_decode(body))
+    # window.X = {...};(function(){...})() —— 从等号后解析一个JSON值，后面的JS忽略
+    text = body[body.index('=') + 1:].lstrip()
+    try:
+        return _DECODER.raw_decode(text)[0]
+    except ValueError:
+        # 抖音的SSR数据里有JS的 undefined
+        return _DECODER.raw_decode(_UNDEFINED_RE.sub('null', text))[0]
+
+
+class Page:
+    """一次扫描得到的页面结构：标题、meta、JSON-LD 和页面状态（按需解码）"""
+
+    def __init__(self, html):
+        self.html = html
+        self.title = None
+        self.meta = {}
+        self.json_ld = []
+        self._states = {}
+        self._decoded = {}
+
+    def state(self, name):
+        """解码后的页面状态，没有或解析失败时返回None"""
+        if name not in self._decoded:
+            raw = self._states.get(name)
+            try:
+                self._decoded[name] = _decode_state(*raw) if raw else None
+            except ValueError:
+                self._decoded[name] = None
+        return self._decoded[name]
+
+    def find(self, paths, accept=None):
+        """依次在各页面状态里按路径查找，返回第一个（满足 accept 的）值"""
+        for name in STATE_ORDER:
+            if name not in self._states:
+                continue
+            data = self.state(name)
+            if data is None:
+                continue
+            for path in paths:
+                value = walk(data, path)
+                if value is not None and (accept is None or accept(value)):
+                    return value
+        return None
+
+    def json_ld_values(self, key):
+        for raw in self.json_ld:
+            try:
+                data = json.loads(raw)
+            except ValueError:
+                continue
+            if isinstance(data, dict) and data.get(key):
+                yield data[key]
+
+
+def scan(html):
+    """单遍扫描HTML，定位 <title>、<meta> 和 <script>
+
+    页面状态只按前缀识别并记下原文，真正用到时才解码，脚本内容不做任何正则匹配。
+    """
+    page = Page(html or '')
+    html = page.html
+    pos = 0
+    while True:
+        match = _TAG_RE.search(html, pos)
+        if not match:
+            break
+        tag = match.group(1).lower()
+        pos = match.end()
+        if tag == 'meta':
+            attrs = _attrs(match.group(2))
+            key = attrs.get('property') or attrs.get('name')
+            if key and 'content' in attrs:
+                page.meta.setdefault(key, html_lib.unescape(attrs['content']))
+        elif tag == 'title':
+            end = html.find('</title>', pos)
+            if end == -1:
+                continue
+            if page.title is None:
+                page.title = html_lib.unescape(html[pos:end]).strip()
+            pos = end + 8
+        else:
+            end = html.find('</script>', pos)
+            if end == -1:
+                break
+            attr_text = match.group(2)
+            body = html[pos:end]
+            pos = end + 9
+            if RENDER_DATA in attr_text:
+                page._states[RENDER_DATA] = (body, True)
+            elif 'ld+json' in attr_text:
+                page.json_ld.append(body)
+            else:
+                head = body[:64].lstrip()
+                for prefix, name in STATE_PREFIXES:
+                    if head.startswith(prefix):
+                        page._states.setdefault(name, (body, False))
+                        break
+    return page
@@ -0,0 +1,175 @@
+import logging
+import threading
+import time
+from urllib.parse import urlparse
+import requests
+from config.config import Config
+from .metrics import CIRCUIT_OPEN, HTTP_ERRORS, UPSTREAM_LATENCY
+
+logger = logging.getLogger(__name__)
+
+# 这些状态码说明上游本身有问题或在限流（B站风控返回412），计为失败；其余4xx是请求本身的问题
+FAILURE_STATUS = {412, 429}
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """主机处于熔断状态，请求没有发出"""
+
+
+class LocalCircuitStore:
+    """没有Redis时在本进程内保存熔断状态，接口与 RedisManager 的 circuit 方法一致"""
+
+    def __init__(self):
+        self._circuits = {}
+        self._buckets = {}
+        self._probes = {}
+        self._lock = threading.Lock()
+
+    def get_circuit(self, host):
+        with self._lock:
+            return dict(self._circuits.get(host, {}))
+
+    def record_circuit_call(self, host, buckets, success, latency, ttl):
+        with self._lock:
+            counts = self._buckets.setdefault(host, {})
+            entry = counts.setdefault(buckets[-1], [0, 0])
+            entry[0 if success else 1] += 1
+            for old in [b for b in counts if b < buckets[0]]:
+                del counts[old]
+            self._circuits.setdefault(host, {})['latency'] = latency
+            return sum(c[0] for c in counts.values()), sum(c[1] for c in counts.values())
+
+    def open_circuit(self, host, until, buckets):
+        with self._lock:
+            self._circuits.setdefault(host, {}).update({'state': 'open', 'until': until})
+            self._buckets.pop(host, None)
+            self._probes.pop(host, None)
+
+    def close_circuit(self, host, buckets):
+        with self._lock:
+            self._circuits.setdefault(host, {})['state'] = 'closed'
+            self._buckets.pop(host, None)
+            self._probes.pop(host, None)
+
+    def acquire_circuit_probe(self, host, ttl):
+        with self._lock:
+            now = time.time()
+            if self._probes.get(host, 0) > now:
+                return False
+            self._probes[host] = now + ttl
+            return True
+
+
+class CircuitBreakers:
+    """按上游主机熔断
+
+    最近 CIRCUIT_WINDOW_SECONDS 秒内请求数达到 CIRCUIT_MIN_REQUESTS 且失败率
+    超过 CIRCUIT_ERROR_RATE，或响应耗时的指数滑动平均超过 CIRCUIT_SLOW_SECONDS 时熔断，
+    之后 CIRCUIT_OPEN_SECONDS 秒内对该主机的请求直接抛 CircuitOpenError，不再等超时。
+    到期后进入半开：只放一个探测请求（SET NX 抢占），成功则恢复，失败则继续熔断。
+    状态保存在 Redis，所有进程共享；未接入 Redis 时只在本进程内生效。
+    """
+
+    def __init__(self, store=None):
+        self.store = store or LocalCircuitStore()
+
+    def attach(self, redis_manager):
+        self.store = redis_manager
+
+    def before(self, host):
+        """请求前调用，返回 (是否为半开探测, 当前耗时滑动平均)；熔断中抛 CircuitOpenError"""
+        try:
+            circuit = self.store.get_circuit(host)
+        except Exception as e:
+            # 熔断状态读不到时照常放行，不能因为Redis问题挡住所有请求
+            logger.warning(f'⚠️  读取熔断状态失败: {e}')
+            return False, None
+        latency = float(circuit['latency']) if circuit.get('latency') else None
+        if circuit.get('state') != 'open':
+            return False, latency
+        if time.time() < float(circuit.get('until', 0)):
+            raise CircuitOpenError(f'{host} 已熔断，跳过请求')
+        try:
+            acquired = self.store.acquire_circuit_probe(host, Config.CIRCUIT_PROBE_TIMEOUT)
+        except Exception as e:
+            logger.warning(f'⚠️  抢占熔断探测失败: {e}')
+            acquired = True
+        if not acquired:
+            raise CircuitOpenError(f'{host} 已熔断，正在探测是否恢复')
+        logger.info(f'🔎 {host} 熔断到期，发送探测请求')
+        return True, latency
+
+    def after(self, host, success, seconds, probe=False, latency=None):
+        """请求结束后调用，记录结果并判断是否熔断或恢复"""
+        alpha = Config.CIRCUIT_LATENCY_ALPHA
+        latency = seconds if latency is None else alpha * seconds + (1 - alpha) * latency
+        UPSTREAM_LATENCY.labels(host).set(latency)
+        try:
+            if probe:
+                if success:
+                    self.store.close_circuit(host, self._window())
+                    CIRCUIT_OPEN.labels(host).set(0)
+                    logger.info(f'✅ {host} 已恢复，关闭熔断')
+                else:
+                    self._open(host, '探测请求失败')
+                return
+
+            ok, failed = self.store.record_circuit_call(host, self._window(), success, latency,
+                                                        Config.CIRCUIT_WINDOW_SECONDS * 2)
+            total = ok + failed
+            if total < Config.CIRCUIT_MIN_REQUESTS:
+                return
+            if failed / total >= Config.CIRCUIT_ERROR_RATE:
+                self._open(host, f'最近{total}次请求失败{failed}次')
+            elif latency > Config.CIRCUIT_SLOW_SECONDS:
+                self._open(host, f'平均响应耗时{latency:.1f}s')
+        except Exception as e:
+            logger.warning(f'⚠️  记录熔断状态失败: {e}')
+
+    @staticmethod
+    def _window():
+        """滚动窗口覆盖的时间桶编号，最后一个是当前桶"""
+        current = int(time.time() // Config.CIRCUIT_BUCKET_SECONDS)
+        count = max(1, Config.CIRCUIT_WINDOW_SECONDS // Config.CIRCUIT_BUCKET_SECONDS)
+        return list(range(current - count + 1, current + 1))
+
+    def _open(self, host, reason):
+        self.store.open_circuit(host, time.time() + Config.CIRCUIT_OPEN_SECONDS, self._window())
+        CIRCUIT_OPEN.labels(host).set(1)
+        logger.warning(f'🔌 {host} 熔断 {Config.CIRCUIT_OPEN_SECONDS}s：{reason}')
+
+
+breakers = CircuitBreakers()
+
+
+def get(url, **kwargs):
+    """requests.get 的薄封装，按上游主机统计失败次数并熔断"""
+    host = urlparse(url).hostname or 'unknown'
+    if not Config.CIRCUIT_BREAKER_ENABLED:
+        return _get(url, host, **kwargs)
+
+    try:
+        probe, latency = breakers.before(host)
+    except CircuitOpenError:
+        HTTP_ERRORS.labels(host, 'circuit_open').inc()
+        raise
+    started = time.monotonic()
+    try:
+        response = _get(url, host, **kwargs)
+    except requests.RequestException:
+        breakers.after(host, False, time.monotonic() - started, probe, latency)
+        raise
+    success = response.status_code < 500 and response.status_code not in FAILURE_STATUS
+    breakers.after(host, success, time.monotonic() - started, probe, latency)
+    return response
+
+
+def _get(url, host, **kwargs):
+    try:
+        response = requests.get(url, **kwargs)
+    except requests.RequestException as e:
+        HTTP_ERRORS.labels(host, type(e).__name__).inc()
+        raise
+    if response.status_code >= 400:
+        HTTP_ERRORS.labels(host, str(response.status_code)).inc()
+    return response
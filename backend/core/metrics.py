@@ -0,0 +1,270 @@
+import resource
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class Registry:
+    """进程内指标注册表，按 Prometheus 文本格式输出"""
+
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        if registry is not None:
+            registry.register(self)
+
+    def labels(self, *values):
+        values = tuple(str(v) for v in values)
+        if len(values) != len(self.labelnames):
+            raise ValueError(f'{self.name} 需要标签 {self.labelnames}')
+        with self._lock:
+            child = self._children.get(values)
+            if child is None:
+                child = self._children[values] = self._new_child()
+            return child
+
+    def clear(self):
+        with self._lock:
+            self._children = {}
+
+    def _default(self):
+        """没有标签的指标直接在自身上操作"""
+        return self.labels()
+
+    def samples(self):
+        with self._lock:
+            children = list(self._children.items())
+        for values, child in children:
+            yield f'{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}'
+
+
+class _Value:
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    def set(self, value):
+        with self._lock:
+            self.value = value
+
+
+class Counter(_Metric):
+    type = 'counter'
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1):
+        self._default().inc(amount)
+
+
+class Gauge(_Metric):
+    type = 'gauge'
+
+    def _new_child(self):
+        return _Value()
+
+    def set(self, value):
+        self._default().set(value)
+
+    def inc(self, amount=1):
+        self._default().inc(amount)
+
+    def dec(self, amount=1):
+        self._default().dec(amount)
+
+
+class _HistogramValue:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self.sum += value
+            self.count += 1
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.counts[i] += 1
+                    break
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+
+class Histogram(_Metric):
+    type = 'histogram'
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, registry=REGISTRY):
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value):
+        self._default().observe(value)
+
+    def time(self):
+        return self._default().time()
+
+    def samples(self):
+        with self._lock:
+            children = list(self._children.items())
+        for values, child in children:
+            with child._lock:
+                counts, total, count = list(child.counts), child.sum, child.count
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, values, ('le', _format_value(bound)))
+                yield f'{self.name}_bucket{labels} {cumulative}'
+            labels = _format_labels(self.labelnames, values)
+            yield f'{self.name}_sum{labels} {_format_value(float(total))}'
+            yield f'{self.name}_count{labels} {count}'
+
+
+# 队列与任务
+QUEUE_DEPTH = Gauge('bubbletv_download_queue_depth', '下载队列中等待的任务数')
+TASKS_BY_STATUS = Gauge('bubbletv_tasks', '各状态的任务数', ['status'])
+TASKS_PROCESSED = Counter('bubbletv_tasks_processed_total', '工作线程处理完的任务数', ['result'])
+TASK_DURATION = Histogram('bubbletv_task_duration_seconds', '单个任务从出队到结束的耗时')
+
+# 各阶段耗时，由 TaskTimings 在阶段结束时记录
+STAGE_DURATION = Histogram('bubbletv_stage_duration_seconds', '任务各阶段耗时', ['stage'])
+
+# 下载
+DOWNLOAD_BYTES = Counter('bubbletv_download_bytes_total', '各平台下载的字节数', ['platform'])
+DOWNLOAD_THROUGHPUT = Histogram(
+    'bubbletv_download_throughput_bytes_per_second', '单个文件的平均下载速度', ['platform'],
+    buckets=(64 * 1024, 256 * 1024, 1024 ** 2, 2 * 1024 ** 2, 5 * 1024 ** 2, 10 * 1024 ** 2, 25 * 1024 ** 2, 50 * 1024 ** 2, 100 * 1024 ** 2)
+)
+MIRROR_SWITCHES = Counter('bubbletv_mirror_switches_total', '下载中途因过慢或出错换到其他镜像的次数', ['platform'])
+
+# FFmpeg
+FFMPEG_CPU_SECONDS = Counter('bubbletv_ffmpeg_cpu_seconds_total', '已结束的FFmpeg子进程消耗的CPU时间（用户态+内核态）')
+
+# Redis
+REDIS_COMMAND_DURATION = Histogram(
+    'bubbletv_redis_command_duration_seconds', 'Redis命令往返耗时', ['command'],
+    buckets=(0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1)
+)
+
+# 上游HTTP
+HTTP_ERRORS = Counter('bubbletv_http_errors_total', '请求上游失败的次数', ['host', 'reason'])
+CIRCUIT_OPEN = Gauge('bubbletv_circuit_open', '上游主机是否处于熔断状态（1/0）', ['host'])
+UPSTREAM_LATENCY = Gauge('bubbletv_upstream_latency_ewma_seconds', '上游主机响应耗时的指数滑动平均', ['host'])
+
+# 视频地址解析，只记录跑完的方法，被取消的不计
+RESOLVER_ATTEMPTS = Counter('bubbletv_resolver_attempts_total', '各解析方法的结果', ['platform', 'strategy', 'result'])
+
+# 平台Cookie，由 CookieHealthChecker 定时更新
+COOKIE_VALID = Gauge('bubbletv_cookie_valid', '平台Cookie最近一次校验是否有效（1/0）', ['platform'])
+COOKIE_EXPIRES_IN = Gauge('bubbletv_cookie_expires_in_seconds', '平台Cookie距离过期的秒数', ['platform'])
+
+
+def record_download(platform, nbytes, seconds):
+    DOWNLOAD_BYTES.labels(platform).inc(nbytes)
+    if nbytes and seconds > 0:
+        DOWNLOAD_THROUGHPUT.labels(platform).observe(nbytes / seconds)
+
+
+_child_cpu_lock = threading.Lock()
+_child_cpu_seen = 0.0
+
+
+def collect_child_cpu():
+    """子进程被回收后调用，把新增的子进程CPU时间计入FFmpeg指标
+
+    RUSAGE_CHILDREN 是整个进程所有已回收子进程的累计值，这里只累加与上次相比的增量，
+    多个转码线程同时调用也不会重复计算。
+    """
+    global _child_cpu_seen
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    total = usage.ru_utime + usage.ru_stime
+    with _child_cpu_lock:
+        delta = total - _child_cpu_seen
+        _child_cpu_seen = total
+    if delta > 0:
+        FFMPEG_CPU_SECONDS.inc(delta)
+
+
+def start_http_server(port, host='0.0.0.0', registry=REGISTRY):
+    """在后台线程里单独提供 /metrics，供没有Web接口的后台任务进程使用"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = registry.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+    return server
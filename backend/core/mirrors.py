@@ -0,0 +1,112 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from urllib.parse import urlparse
+from config.config import Config
+from . import http_client
+
+logger = logging.getLogger(__name__)
+
+# 主机 → (探测耗时, 过期时间)；同一CDN节点上的不同视频表现相近，短时间内不必重复探测
+_timings = {}
+_timings_lock = threading.Lock()
+
+
+def _host(url):
+    return urlparse(url).netloc
+
+
+def _remember(url, seconds, ttl, keep_penalty=False):
+    """keep_penalty 时不覆盖未过期的惩罚：探测发出后主机才被放弃，探测结果不能把它洗掉"""
+    host = _host(url)
+    now = time.monotonic()
+    with _timings_lock:
+        entry = _timings.get(host)
+        if keep_penalty and entry and entry[0] == float('inf') and entry[1] > now:
+            return
+        _timings[host] = (seconds, now + ttl)
+
+
+def penalize(url):
+    """下载中途放弃的镜像：之后 MIRROR_PENALTY_SECONDS 秒内排在最后"""
+    _remember(url, float('inf'), Config.MIRROR_PENALTY_SECONDS)
+
+
+def _known(urls):
+    now = time.monotonic()
+    with _timings_lock:
+        entries = {url: _timings.get(_host(url)) for url in urls}
+    return {url: entry[0] for url, entry in entries.items() if entry and entry[1] > now}
+
+
+def candidates(*groups):
+    """合并主地址和备用地址，去掉空值和重复，保持原顺序"""
+    urls = []
+    for group in groups:
+        if isinstance(group, str):
+            group = [group]
+        for url in group or ():
+            if url and url not in urls:
+                urls.append(url)
+    return urls
+
+
+def _probe(url, headers, size, timeout):
+    """请求文件开头 size 字节，返回耗时（秒）；失败返回None"""
+    request_headers = dict(headers or {})
+    request_headers['Range'] = f'bytes=0-{size - 1}'
+    started = time.monotonic()
+    try:
+        response = http_client.get(url, headers=request_headers, stream=True, timeout=timeout)
+        try:
+            if response.status_code not in (200, 206):
+                return None
+            received = 0
+            for chunk in response.iter_content(chunk_size=size):
+                received += len(chunk)
+                if received >= size:
+                    break
+        finally:
+            response.close()
+    except Exception as e:
+        logger.debug(f'镜像探测失败 {url[:80]}: {e}')
+        return None
+    return time.monotonic() - started
+
+
+def rank(urls, headers=None):
+    """并发探测各镜像，按取到开头一小段数据的耗时从快到慢排序
+
+    在 MIRROR_PROBE_TIMEOUT 秒内没有结果或失败的镜像排在最后（保持原顺序），
+    不删除：下载时主镜像出问题还可以换到它们。只有一个地址时不探测；
+    只探测没有记录或记录已过期的主机，其余用上次的结果，被放弃的主机在惩罚期内一直排在最后。
+    """
+    urls = candidates(urls)
+    if len(urls) < 2 or not Config.MIRROR_PROBE_ENABLED:
+        return urls
+
+    timings = _known(urls)
+    unknown = [url for url in urls if url not in timings]
+    if unknown:
+        timings.update(_probe_all(unknown, headers))
+    return sorted(urls, key=lambda url: timings.get(url, float('inf')))
+
+
+def _probe_all(urls, headers):
+    executor = ThreadPoolExecutor(max_workers=len(urls), thread_name_prefix='mirror-probe')
+    futures = {url: executor.submit(_probe, url, headers, Config.MIRROR_PROBE_BYTES, Config.MIRROR_PROBE_TIMEOUT)
+               for url in urls}
+    done, _ = wait(futures.values(), timeout=Config.MIRROR_PROBE_TIMEOUT)
+    # 慢的探测不等，留给线程自己结束
+    executor.shutdown(wait=False, cancel_futures=True)
+
+    timings = {}
+    for url, future in futures.items():
+        seconds = future.result() if future in done else None
+        timings[url] = float('inf') if seconds is None else seconds
+        _remember(url, timings[url], Config.MIRROR_PROBE_CACHE_SECONDS, keep_penalty=True)
+    available = [t for t in timings.values() if t != float('inf')]
+    if available:
+        logger.debug(f'镜像探测: {len(available)}/{len(urls)} 可用，最快 {min(available) * 1000:.0f}ms')
+    return timings
@@ -1,18 +1,50 @@
 import redis
 import json
+import time
 from datetime import datetime
 from config.config import Config
+from core.metrics import REDIS_COMMAND_DURATION
+
+
+class InstrumentedPipeline(redis.client.Pipeline):
+    """整个pipeline按一次往返计时"""
+
+    def execute(self, raise_on_error=True):
+        start = time.perf_counter()
+        try:
+            return super().execute(raise_on_error)
+        finally:
+            REDIS_COMMAND_DURATION.labels('PIPELINE').observe(time.perf_counter() - start)
+
+
+class InstrumentedRedis(redis.Redis):
+    """记录每条命令往返耗时的Redis客户端"""
+
+    def execute_command(self, *args, **options):
+        start = time.perf_counter()
+        try:
+            return super().execute_command(*args, **options)
+        finally:
+            REDIS_COMMAND_DURATION.labels(str(args[0]).upper()).observe(time.perf_counter() - start)
+
+    def pipeline(self, transaction=True, shard_hint=None):
+        return InstrumentedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
 
 class RedisManager:
     def __init__(self, use_test_db=False):
         db = Config.TEST_REDIS_DB if use_test_db else Config.REDIS_DB
-        self.redis_client = redis.Redis(
+        self.redis_client = InstrumentedRedis(
             host=Config.REDIS_HOST,
             port=Config.REDIS_PORT,
             db=db,
             password=Config.REDIS_PASSWORD,
             decode_responses=True
         )
+        # 本进程内每个任务最近一次进度更新的时间，供心跳判断任务是否卡死
+        self.task_activity = {}
+        # 任务状态索引 task_status（任务ID -> 状态）是否已从现有任务补全过
+        self._status_index_ready = False
     
     def set_user(self, user_id, user_data):
         key = f'user:{user_id}'
@@ -26,6 +58,8 @@ class RedisManager:
     def set_task(self, task_id, task_data):
         key = f'task:{task_id}'
         self.redis_client.hset(key, mapping=task_data)
+        if 'status' in task_data:
+            self.redis_client.hset('task_status', task_id, task_data['status'])
         return True
     
     def get_task(self, task_id):
@@ -36,7 +70,9 @@ class RedisManager:
     
     def update_task_status(self, task_id, status, progress=None, save_path=None, error_message=None, clear_error=False):
         key = f'task:{task_id}'
+        self.task_activity[task_id] = time.time()
         self.redis_client.hset(key, 'status', status)
+        self.redis_client.hset('task_status', task_id, status)
         self.redis_client.hset(key, 'updated_at', datetime.now().isoformat())
         if progress is not None:
             self.redis_client.hset(key, 'progress', str(progress))
@@ -49,6 +85,7 @@ class RedisManager:
     
     def update_task_download_speed(self, task_id, speed):
         key = f'task:{task_id}'
+        self.task_activity[task_id] = time.time()
         self.redis_client.hset(key, 'download_speed', speed)
     
     def set_video(self, video_id, video_data):
@@ -103,12 +140,48 @@ class RedisManager:
         progress = self.get_config('migration_progress')
         return int(progress) if progress else 0
     
+    def get_bandwidth_config(self):
+        value = self.get_config('bandwidth')
+        return json.loads(value) if value else None
+    
+    def set_bandwidth_config(self, bandwidth_config):
+        return self.set_config('bandwidth', json.dumps(bandwidth_config))
+    
+    def report_active_downloads(self, process_id, count, ttl):
+        """登记本进程正在下载的数量，返回所有存活进程的下载总数；过期未更新的进程不计"""
+        now = time.time()
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.hset('bandwidth_active', process_id, json.dumps({'count': count, 'until': now + ttl}))
+        pipe.hgetall('bandwidth_active')
+        entries = pipe.execute()[1]
+        total = 0
+        stale = []
+        for field, value in entries.items():
+            entry = json.loads(value)
+            if entry['until'] < now:
+                stale.append(field)
+            else:
+                total += entry['count']
+        if stale:
+            self.redis_client.hdel('bandwidth_active', *stale)
+        return total
+    
     def set_cookie(self, platform, cookie_data):
         key = f'cookie:{platform}'
+        version_key = f'cookie_version:{platform}'
+        ttl = Config.COOKIE_EXPIRY_DAYS * 24 * 60 * 60
         self.redis_client.hset(key, mapping=cookie_data)
-        self.redis_client.expire(key, Config.COOKIE_EXPIRY_DAYS * 24 * 60 * 60)
+        self.redis_client.expire(key, ttl)
+        # 版本号变化后各进程缓存的Cookie重新构建；版本号不设过期，
+        # 否则过期归零后重新登录又从1开始，缓存着旧版本1的进程会继续用旧Cookie
+        self.redis_client.incr(version_key)
+        # 换了Cookie，上次的校验结果作废
+        self.redis_client.delete(f'cookie_health:{platform}')
         return True
     
+    def get_cookie_version(self, platform):
+        return int(self.redis_client.get(f'cookie_version:{platform}') or 0)
+    
     def get_cookie(self, platform):
         key = f'cookie:{platform}'
         return self.redis_client.hgetall(key)
@@ -117,6 +190,63 @@ class RedisManager:
         key = f'cookie:{platform}'
         return self.redis_client.exists(key)
     
+    def set_cookie_health(self, platform, health, ttl):
+        self.redis_client.set(f'cookie_health:{platform}', json.dumps(health), ex=ttl)
+    
+    def get_cookie_health(self, platform):
+        health = self.redis_client.get(f'cookie_health:{platform}')
+        return json.loads(health) if health else None
+    
+    def record_resolver_result(self, platform, strategy, success, seconds):
+        """累计某个解析方法的尝试次数、成功次数和耗时"""
+        key = f'resolver_stats:{platform}'
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.hincrby(key, f'{strategy}:attempts', 1)
+        if success:
+            pipe.hincrby(key, f'{strategy}:successes', 1)
+        pipe.hincrbyfloat(key, f'{strategy}:seconds', seconds)
+        pipe.execute()
+    
+    def get_resolver_stats(self, platform):
+        """返回 {方法: {'attempts', 'successes', 'seconds'}}"""
+        stats = {}
+        for field, value in self.redis_client.hgetall(f'resolver_stats:{platform}').items():
+            strategy, _, name = field.rpartition(':')
+            stats.setdefault(strategy, {'attempts': 0, 'successes': 0, 'seconds': 0.0})[name] = float(value)
+        return stats
+    
+    def get_circuit(self, host):
+        return self.redis_client.hgetall(f'circuit:{host}')
+    
+    def record_circuit_call(self, host, buckets, success, latency, ttl):
+        """计入当前时间桶（buckets最后一个）并返回窗口内的 (成功数, 失败数)，一次往返完成"""
+        pipe = self.redis_client.pipeline(transaction=False)
+        bucket_key = f'circuit_calls:{host}:{buckets[-1]}'
+        pipe.hincrby(bucket_key, 'ok' if success else 'failed', 1)
+        pipe.expire(bucket_key, ttl)
+        pipe.hset(f'circuit:{host}', 'latency', latency)
+        for bucket in buckets:
+            pipe.hmget(f'circuit_calls:{host}:{bucket}', 'ok', 'failed')
+        counts = pipe.execute()[3:]
+        return sum(int(ok or 0) for ok, _ in counts), sum(int(failed or 0) for _, failed in counts)
+    
+    def open_circuit(self, host, until, buckets):
+        """熔断并清空窗口计数，恢复后重新统计"""
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.hset(f'circuit:{host}', mapping={'state': 'open', 'until': until})
+        pipe.delete(f'circuit_probe:{host}', *[f'circuit_calls:{host}:{bucket}' for bucket in buckets])
+        pipe.execute()
+    
+    def close_circuit(self, host, buckets):
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.hset(f'circuit:{host}', 'state', 'closed')
+        pipe.delete(f'circuit_probe:{host}', *[f'circuit_calls:{host}:{bucket}' for bucket in buckets])
+        pipe.execute()
+    
+    def acquire_circuit_probe(self, host, ttl):
+        """半开状态下只有抢到的进程发探测请求"""
+        return bool(self.redis_client.set(f'circuit_probe:{host}', 1, nx=True, ex=ttl))
+    
     def add_task_to_queue(self, task_data):
         task_json = json.dumps(task_data)
         self.redis_client.lpush('download_queue', task_json)
@@ -128,6 +258,18 @@ class RedisManager:
             return json.loads(task_json)
         return None
     
+    def get_queue_length(self):
+        return self.redis_client.llen('download_queue')
+    
+    def add_active_transcode(self, task_id):
+        self.redis_client.sadd('active_transcodes', task_id)
+    
+    def remove_active_transcode(self, task_id):
+        self.redis_client.srem('active_transcodes', task_id)
+    
+    def get_active_transcode_count(self):
+        return self.redis_client.scard('active_transcodes')
+    
     def get_all_tasks(self):
         pattern = 'task:*'
         keys = self.redis_client.keys(pattern)
@@ -145,8 +287,26 @@ class RedisManager:
     
     def delete_task(self, task_id):
         key = f'task:{task_id}'
+        self.redis_client.hdel('task_status', task_id)
         return self.redis_client.delete(key)
     
+    def count_tasks_by_status(self):
+        """各状态的任务数，读状态索引一次，不扫描全部任务
+
+        索引随 set_task/update_task_status/delete_task 维护；本进程第一次调用时
+        把加索引之前创建的任务补进去。
+        """
+        if not self._status_index_ready:
+            for key in self.redis_client.scan_iter('task:*'):
+                status = self.redis_client.hget(key, 'status')
+                if status:
+                    self.redis_client.hsetnx('task_status', key.split(':', 1)[1], status)
+            self._status_index_ready = True
+        counts = {}
+        for status in self.redis_client.hvals('task_status'):
+            counts[status] = counts.get(status, 0) + 1
+        return counts
+    
     def add_task_log(self, task_id, message):
         """添加任务日志"""
         key = f'task_log:{task_id}'
@@ -157,6 +317,16 @@ class RedisManager:
         self.redis_client.ltrim(key, 0, 99)
         return True
     
+    def add_task_logs(self, batch):
+        """批量写入多个任务的日志，batch为 {task_id: [按时间先后排列的日志]}，一次往返完成"""
+        pipe = self.redis_client.pipeline(transaction=False)
+        for task_id, entries in batch.items():
+            key = f'task_log:{task_id}'
+            pipe.lpush(key, *entries)
+            pipe.ltrim(key, 0, 99)
+        pipe.execute()
+        return True
+    
     def get_task_logs(self, task_id):
         """获取任务的所有日志"""
         key = f'task_log:{task_id}'
@@ -168,5 +338,102 @@ class RedisManager:
         key = f'task_log:{task_id}'
         return self.redis_client.delete(key)
     
+    def save_task_timings(self, task_id, timings, history_size):
+        """把任务的阶段耗时写入任务hash，并追加到最近任务耗时列表"""
+        key = f'task:{task_id}'
+        data = json.dumps(timings)
+        pipe = self.redis_client.pipeline()
+        # 已删除的任务不再写回，避免留下只有timings字段的残缺hash
+        if self.redis_client.exists(key):
+            pipe.hset(key, 'timings', data)
+        pipe.lpush('recent_timings', data)
+        pipe.ltrim('recent_timings', 0, history_size - 1)
+        pipe.execute()
+        return True
+    
+    def get_recent_timings(self):
+        """获取最近完成任务的阶段耗时，最新的在前"""
+        return [json.loads(item) for item in self.redis_client.lrange('recent_timings', 0, -1)]
+    
+    def get_task_activity(self, task_id):
+        """获取本进程内任务最近一次进度更新的时间戳"""
+        return self.task_activity.get(task_id)
+    
+    def acquire_task_lease(self, task_id, owner, ttl):
+        """为正在执行的任务创建带TTL的租约，并登记到执行中集合"""
+        pipe = self.redis_client.pipeline()
+        pipe.set(f'task_lease:{task_id}', owner, ex=ttl)
+        pipe.sadd('inflight_tasks', task_id)
+        pipe.execute()
+        return True
+    
+    def renew_task_lease(self, task_id, owner, ttl):
+        """续约，只有租约仍属于当前持有者时才会成功"""
+        key = f'task_lease:{task_id}'
+        if self.redis_client.get(key) != owner:
+            return False
+        return bool(self.redis_client.expire(key, ttl))
+    
+    def get_task_lease(self, task_id):
+        return self.redis_client.get(f'task_lease:{task_id}')
+    
+    def release_task_lease(self, task_id):
+        pipe = self.redis_client.pipeline()
+        pipe.delete(f'task_lease:{task_id}')
+        pipe.srem('inflight_tasks', task_id)
+        pipe.srem('active_transcodes', task_id)
+        pipe.execute()
+        self.task_activity.pop(task_id, None)
+        return True
+    
+    def get_inflight_tasks(self):
+        return self.redis_client.smembers('inflight_tasks')
+    
+    def set_task_process(self, task_id, pid, host):
+        """记录任务当前的FFmpeg子进程（可以是多个），便于回收僵尸任务时清理"""
+        key = f'task:{task_id}'
+        pids = pid if isinstance(pid, (list, tuple, set)) else [pid]
+        self.redis_client.hset(key, mapping={'ffmpeg_pid': ','.join(str(p) for p in pids), 'ffmpeg_host': host})
+    
+    def clear_task_process(self, task_id):
+        key = f'task:{task_id}'
+        self.redis_client.hdel(key, 'ffmpeg_pid', 'ffmpeg_host')
+    
+    def increment_task_retry(self, task_id):
+        key = f'task:{task_id}'
+        return self.redis_client.hincrby(key, 'retry_count', 1)
+    
+    def reset_task_retry(self, task_id):
+        key = f'task:{task_id}'
+        self.redis_client.hdel(key, 'retry_count')
+    
+    def schedule_task_retry(self, task_data, ready_at):
+        """将任务放入延迟队列，到期后再进入下载队列"""
+        self.redis_client.zadd('delayed_queue', {json.dumps(task_data): ready_at})
+        return True
+    
+    def pop_due_retries(self, now):
+        """取出所有已到期的延迟任务"""
+        due = []
+        for task_json in self.redis_client.zrangebyscore('delayed_queue', 0, now):
+            # zrem成功才算取到，避免多个回收进程重复入队
+            if self.redis_client.zrem('delayed_queue', task_json):
+                due.append(json.loads(task_json))
+        return due
+    
+    def set_task_control(self, task_id, action):
+        """记录并广播任务的暂停/取消信号"""
+        self.redis_client.set(f'task_control:{task_id}', action, ex=24 * 60 * 60)
+        self.redis_client.publish('task_control', json.dumps({'task_id': task_id, 'action': action}))
+        return True
+    
+    def get_task_control(self, task_id):
+        return self.redis_client.get(f'task_control:{task_id}')
+    
+    def clear_task_control(self, task_id):
+        self.redis_client.delete(f'task_control:{task_id}')
+        self.redis_client.publish('task_control', json.dumps({'task_id': task_id, 'action': None}))
+        return True
+    
     def close(self):
         self.redis_client.close()
\ No newline at end of file
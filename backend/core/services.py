@@ -0,0 +1,142 @@
+import threading
+
+
+class Services:
+    """进程内共享的服务单例
+
+    每个服务在第一次访问时才创建，依赖的模块也在那时才导入：Web进程启动时
+    不必加载 yt-dlp、selenium，只提供接口的进程永远不会加载
+    下载器。Web进程和后台任务进程都通过同一个容器拿到同一份实例。
+    """
+
+    def __init__(self):
+        self._instances = {}
+        self._lock = threading.RLock()
+
+    def _get(self, name, factory):
+        instance = self._instances.get(name)
+        if instance is None:
+            # 可重入锁：工厂里还会访问其他服务
+            with self._lock:
+                instance = self._instances.get(name)
+                if instance is None:
+                    instance = factory()
+                    self._instances[name] = instance
+        return instance
+
+    def provide(self, **instances):
+        """直接放入现成的实例（基准测试换成自己的Redis），需在第一次访问前调用"""
+        with self._lock:
+            self._instances.update(instances)
+
+    def loaded(self):
+        """已经创建的服务名，基准测试用来确认没有提前加载"""
+        return sorted(self._instances)
+
+    @property
+    def redis_manager(self):
+        def create():
+            from core import http_client
+            from core.redis_manager import RedisManager
+            manager = RedisManager()
+            # 熔断状态改存Redis，所有进程共享
+            http_client.breakers.attach(manager)
+            return manager
+        return self._get('redis_manager', create)
+
+    @property
+    def task_control(self):
+        def create():
+            from core.task_control import TaskControl
+            return TaskControl(self.redis_manager)
+        return self._get('task_control', create)
+
+    @property
+    def task_log_sink(self):
+        def create():
+            from core.task_logger import TaskLogSink
+            return TaskLogSink(self.redis_manager)
+        return self._get('task_log_sink', create)
+
+    @property
+    def task_timings(self):
+        def create():
+            from core.task_timings import TaskTimings
+            return TaskTimings(self.redis_manager)
+        return self._get('task_timings', create)
+
+    @property
+    def storage_manager(self):
+        def create():
+            from core.storage_manager import StorageManager
+            return StorageManager(self.redis_manager)
+        return self._get('storage_manager', create)
+
+    @property
+    def video_parser(self):
+        def create():
+            from core.video_downloader import VideoParser
+            return VideoParser(browser_pool=self.browser_pool, redis_manager=self.redis_manager,
+                               ytdlp_pool=self.ytdlp_pool)
+        return self._get('video_parser', create)
+
+    @property
+    def ytdlp_pool(self):
+        def create():
+            from core.ytdlp_pool import YtDlpPool
+            return YtDlpPool(self.cookie_jars)
+        return self._get('ytdlp_pool', create)
+
+    @property
+    def video_transcoder(self):
+        def create():
+            from core.video_transcoder import VideoTranscoder
+            return VideoTranscoder(self.redis_manager, self.task_control, self.task_log_sink, self.task_timings)
+        return self._get('video_transcoder', create)
+
+    @property
+    def video_downloader(self):
+        def create():
+            from core.video_downloader import VideoDownloader
+            return VideoDownloader(self.redis_manager, self.task_control, self.task_log_sink, self.task_timings,
+                                   parser=self.video_parser, transcoder=self.video_transcoder,
+                                   cookie_jars=self.cookie_jars, bandwidth=self.bandwidth)
+        return self._get('video_downloader', create)
+
+    @property
+    def bandwidth(self):
+        def create():
+            from core.bandwidth import BandwidthGovernor
+            return BandwidthGovernor(self.redis_manager)
+        return self._get('bandwidth', create)
+
+    @property
+    def cookie_jars(self):
+        def create():
+            from core.cookie_jar import CookieJarCache
+            return CookieJarCache(self.redis_manager)
+        return self._get('cookie_jars', create)
+
+    @property
+    def platform_auth(self):
+        def create():
+            from platforms.platform_auth import PlatformAuth
+            return PlatformAuth(self.redis_manager, self.browser_pool)
+        return self._get('platform_auth', create)
+
+    @property
+    def cookie_health(self):
+        def create():
+            from platforms.cookie_health import CookieHealthChecker
+            return CookieHealthChecker(self.redis_manager, self.platform_auth)
+        return self._get('cookie_health', create)
+
+    @property
+    def browser_pool(self):
+        def create():
+            from platforms.browser_pool import BrowserPool
+            return BrowserPool()
+        return self._get('browser_pool', create)
+
+
+services = Services()
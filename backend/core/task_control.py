@@ -0,0 +1,133 @@
+import json
+import logging
+import threading
+import time
+
+# 控制信号通过 Redis pub/sub 广播到所有工作进程，本地缓存后下载循环只需查一次字典
+CONTROL_CHANNEL = 'task_control'
+CONTROL_ACTIONS = ('pause', 'cancel')
+ACTION_NAMES = {'pause': '暂停', 'cancel': '取消', 'stall': '因长时间无进度中断'}
+
+logger = logging.getLogger(__name__)
+
+
+class TaskInterrupted(Exception):
+    """任务被用户暂停或取消"""
+
+    def __init__(self, task_id, action):
+        self.task_id = task_id
+        self.action = action
+        super().__init__(f'任务已{ACTION_NAMES.get(action, "中断")}')
+
+
+class CancellationToken:
+    """单个任务的取消令牌，check() 只做一次本地字典查找"""
+
+    def __init__(self, control, task_id):
+        self.control = control
+        self.task_id = task_id
+
+    @property
+    def action(self):
+        return self.control.signals.get(self.task_id)
+
+    def is_set(self):
+        return self.task_id in self.control.signals
+
+    def check(self):
+        action = self.control.signals.get(self.task_id)
+        if action:
+            raise TaskInterrupted(self.task_id, action)
+
+
+class TaskControl:
+    """暂停/取消信号的收发
+
+    收到信号后除了记录在本地，还会立即中断登记在该任务上的资源：
+    FFmpeg 进程收到 SIGTERM，阻塞中的 HTTP 响应被关闭，
+    这样工作线程不必等到下一块数据到达就能释放。
+    """
+
+    def __init__(self, redis_manager):
+        self.redis = redis_manager
+        self.signals = {}
+        self.resources = {}
+        self._lock = threading.Lock()
+        self._listener = None
+
+    def start(self):
+        """启动订阅线程，每个进程调用一次"""
+        if self._listener is None:
+            self._listener = threading.Thread(target=self._listen, daemon=True)
+            self._listener.start()
+        return self
+
+    def send(self, task_id, action):
+        self.redis.set_task_control(task_id, action)
+        self._apply(task_id, action)
+
+    def interrupt(self, task_id, action):
+        """只在本进程内中断任务，不广播也不写Redis；用于心跳发现任务卡住（action='stall'）"""
+        self._apply(task_id, action)
+    
+    def clear(self, task_id):
+        """恢复或重试任务前清除旧信号"""
+        self.redis.clear_task_control(task_id)
+        self._apply(task_id, None)
+
+    def token(self, task_id):
+        """开始处理任务时创建令牌，顺带同步排队期间收到的信号"""
+        action = self.redis.get_task_control(task_id)
+        if action:
+            self.signals[task_id] = action
+        return CancellationToken(self, task_id)
+
+    def forget(self, task_id):
+        """任务处理结束后清理本地状态"""
+        with self._lock:
+            self.signals.pop(task_id, None)
+            self.resources.pop(task_id, None)
+
+    def register(self, task_id, resource):
+        """登记需要在中断时终止的进程或HTTP响应"""
+        with self._lock:
+            self.resources.setdefault(task_id, []).append(resource)
+        if task_id in self.signals:
+            self._interrupt(resource)
+
+    def unregister(self, task_id, resource):
+        with self._lock:
+            resources = self.resources.get(task_id, [])
+            if resource in resources:
+                resources.remove(resource)
+
+    def _apply(self, task_id, action):
+        if not action:
+            self.signals.pop(task_id, None)
+            return
+        self.signals[task_id] = action
+        with self._lock:
+            resources = list(self.resources.get(task_id, []))
+        for resource in resources:
+            self._interrupt(resource)
+
+    def _interrupt(self, resource):
+        try:
+            if hasattr(resource, 'terminate'):
+                resource.terminate()
+            else:
+                resource.close()
+        except Exception as e:
+            logger.warning(f'⚠️  中断任务资源失败: {e}')
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self.redis.redis_client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(CONTROL_CHANNEL)
+                for message in pubsub.listen():
+                    data = json.loads(message['data'])
+                    self._apply(data['task_id'], data.get('action'))
+            except Exception as e:
+                logger.warning(f'⚠️  任务控制订阅中断，稍后重连: {e}')
+                time.sleep(1)
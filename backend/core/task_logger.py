@@ -0,0 +1,106 @@
+import json
+import logging
+import sys
+import threading
+import time
+from datetime import datetime
+from config.config import Config
+
+logger = logging.getLogger('bubbletv.task')
+
+
+class JsonFormatter(logging.Formatter):
+    """每条日志输出为一行JSON，方便日志系统采集"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        task_id = getattr(record, 'task_id', None)
+        if task_id:
+            entry['task_id'] = task_id
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+_logging_configured = False
+
+
+def setup_logging():
+    """配置根日志器：按 Config.LOG_LEVEL 过滤，输出到stdout"""
+    global _logging_configured
+    if _logging_configured:
+        return
+    handler = logging.StreamHandler(sys.stdout)
+    if Config.LOG_FORMAT == 'json':
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+    root = logging.getLogger()
+    root.addHandler(handler)
+    root.setLevel(Config.LOG_LEVEL.upper())
+    _logging_configured = True
+
+
+class TaskLogSink:
+    """任务日志缓冲区
+
+    日志先按任务暂存在内存里，单个任务攒满 TASK_LOG_BATCH_SIZE 条或每隔
+    TASK_LOG_FLUSH_INTERVAL 秒通过一次pipeline写入Redis，代替每条日志一次LPUSH+LTRIM。
+    低于 LOG_LEVEL 的日志既不写Redis也不输出。
+    """
+
+    def __init__(self, redis_manager):
+        self.redis = redis_manager
+        self.level = logging.getLevelName(Config.LOG_LEVEL.upper())
+        self._buffers = {}
+        self._lock = threading.Lock()
+        self._flusher = None
+
+    def log(self, task_id, message, level=logging.INFO):
+        if level < self.level:
+            return
+        logger.log(level, message, extra={'task_id': task_id})
+        if not task_id:
+            return
+
+        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        with self._lock:
+            buffer = self._buffers.setdefault(task_id, [])
+            buffer.append(f'[{timestamp}] {message}')
+            full = len(buffer) >= Config.TASK_LOG_BATCH_SIZE
+        self._ensure_flusher()
+        if full:
+            self.flush(task_id)
+
+    def flush(self, task_id=None):
+        """把缓冲的日志写入Redis；不传task_id时写入全部任务"""
+        with self._lock:
+            if task_id is None:
+                batch, self._buffers = self._buffers, {}
+            elif task_id in self._buffers:
+                batch = {task_id: self._buffers.pop(task_id)}
+            else:
+                return
+        if not batch:
+            return
+        try:
+            self.redis.add_task_logs(batch)
+        except Exception as e:
+            logger.warning(f'写入任务日志失败，丢弃 {sum(len(v) for v in batch.values())} 条: {e}')
+
+    def _ensure_flusher(self):
+        if self._flusher is None:
+            with self._lock:
+                if self._flusher is None:
+                    self._flusher = threading.Thread(target=self._run, daemon=True)
+                    self._flusher.start()
+
+    def _run(self):
+        while True:
+            time.sleep(Config.TASK_LOG_FLUSH_INTERVAL)
+            self.flush()
@@ -0,0 +1,170 @@
+import logging
+import os
+import signal
+import socket
+import threading
+import time
+from config.config import Config
+
+logger = logging.getLogger(__name__)
+
+# 这些状态的任务已不再占用工作线程，租约过期也无需回收
+INACTIVE_STATUSES = ('pending', 'completed', 'failed', 'cancelled', 'paused')
+
+
+def get_worker_id():
+    """当前工作线程的唯一标识：主机名:进程号:线程号"""
+    return f'{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}'
+
+
+class TaskHeartbeat:
+    """任务租约心跳
+
+    工作线程开始处理任务时获取租约，后台线程按间隔续约。
+    工作进程崩溃时续约随之停止；任务长时间没有进度（例如FFmpeg卡死）时
+    先在本进程内中断任务（终止FFmpeg、关闭下载连接），再停止续约，
+    让租约过期后由 TaskReaper 按退避重试，重试时不会与原线程同时写同一个文件。
+    """
+
+    def __init__(self, redis_manager, task_id, owner=None, task_control=None):
+        self.redis = redis_manager
+        self.task_id = task_id
+        self.owner = owner or get_worker_id()
+        self.task_control = task_control
+        self.stalled = False
+        self.started_at = None
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.started_at = time.time()
+        self.redis.acquire_task_lease(self.task_id, self.owner, Config.TASK_LEASE_TTL)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+        # 只释放属于自己的租约，已被回收的任务不做处理；卡住的任务留着租约等它过期后由回收器重试
+        if not self.stalled and self.redis.get_task_lease(self.task_id) == self.owner:
+            self.redis.release_task_lease(self.task_id)
+
+    def holds_lease(self):
+        """任务是否仍由本线程负责；卡住被中断或已被回收后，工作线程不能再写任务状态"""
+        return not self.stalled and self.redis.get_task_lease(self.task_id) == self.owner
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.stop()
+        return False
+
+    def _run(self):
+        while not self._stop_event.wait(Config.TASK_HEARTBEAT_INTERVAL):
+            last_activity = self.redis.get_task_activity(self.task_id) or self.started_at
+            if time.time() - last_activity > Config.TASK_STALL_TIMEOUT:
+                logger.warning(f'⚠️  任务 {self.task_id} 超过 {Config.TASK_STALL_TIMEOUT} 秒无进度，中断并停止续约')
+                self.stalled = True
+                if self.task_control:
+                    self.task_control.interrupt(self.task_id, 'stall')
+                return
+            try:
+                if not self.redis.renew_task_lease(self.task_id, self.owner, Config.TASK_LEASE_TTL):
+                    logger.warning(f'⚠️  任务 {self.task_id} 的租约已失效，停止续约')
+                    return
+            except Exception as e:
+                logger.warning(f'续约任务 {self.task_id} 失败: {e}')
+
+
+class TaskReaper:
+    """回收租约过期的僵尸任务
+
+    清理残留的FFmpeg子进程，然后按指数退避重新入队，超过重试次数则标记失败。
+    """
+
+    def __init__(self, redis_manager):
+        self.redis = redis_manager
+        self.hostname = socket.gethostname()
+
+    def reap_once(self):
+        reaped = []
+        for task_id in self.redis.get_inflight_tasks():
+            if self.redis.get_task_lease(task_id):
+                continue
+
+            self.redis.release_task_lease(task_id)
+            task = self.redis.get_task(task_id)
+            if not task or task.get('status') in INACTIVE_STATUSES:
+                continue
+
+            self._kill_orphan_process(task_id, task)
+            self._retry_or_fail(task_id, task)
+            reaped.append(task_id)
+
+        self.promote_due_retries()
+        return reaped
+
+    def promote_due_retries(self):
+        """把退避时间已到的任务放回下载队列"""
+        promoted = 0
+        for task_data in self.redis.pop_due_retries(time.time()):
+            task = self.redis.get_task(task_data.get('id'))
+            # 等待期间被取消或删除的任务不再入队
+            if task and task.get('status') == 'pending':
+                self.redis.add_task_to_queue(task)
+                promoted += 1
+        return promoted
+
+    def _kill_orphan_process(self, task_id, task):
+        pid = task.get('ffmpeg_pid')
+        if not pid or task.get('ffmpeg_host') != self.hostname:
+            return
+
+        # 分段转码时会同时记录多个进程
+        for pid in (int(p) for p in pid.split(',') if p):
+            if not self._is_ffmpeg_process(pid):
+                continue
+            try:
+                os.kill(pid, signal.SIGKILL)
+                logger.info(f'🔪 已终止任务 {task_id} 残留的FFmpeg进程 {pid}')
+            except OSError:
+                pass
+        self.redis.clear_task_process(task_id)
+
+    def _is_ffmpeg_process(self, pid):
+        """尽量避免误杀被复用的进程号；没有/proc的系统只能相信记录"""
+        cmdline_path = f'/proc/{pid}/cmdline'
+        if not os.path.isdir('/proc'):
+            return True
+        try:
+            with open(cmdline_path, 'rb') as f:
+                return b'ffmpeg' in f.read()
+        except OSError:
+            return False
+
+    def _retry_or_fail(self, task_id, task):
+        retries = self.redis.increment_task_retry(task_id)
+        stage = '转码' if task.get('status') == 'transcoding' else '下载'
+
+        if retries > Config.TASK_MAX_RETRIES:
+            error_msg = f'{stage}超时：工作进程无响应，已重试{Config.TASK_MAX_RETRIES}次仍未完成'
+            self.redis.update_task_status(task_id, 'failed', error_message=error_msg)
+            logger.warning(f'❌ 任务 {task_id} 回收后标记为失败')
+            return
+
+        delay = min(Config.TASK_RETRY_BACKOFF_BASE * 2 ** (retries - 1), Config.TASK_RETRY_BACKOFF_MAX)
+        error_msg = f'{stage}中断：工作进程无响应，{delay}秒后进行第{retries}次重试'
+        self.redis.update_task_status(task_id, 'pending', progress=0, error_message=error_msg)
+        self.redis.schedule_task_retry(task, time.time() + delay)
+        logger.info(f'♻️  任务 {task_id} 已回收，{delay}秒后重试')
+
+    def run_forever(self):
+        while True:
+            try:
+                self.reap_once()
+            except Exception as e:
+                logger.exception(f'回收僵尸任务出错: {e}')
+            time.sleep(Config.REAPER_INTERVAL)
@@ -0,0 +1,102 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+from config.config import Config
+from core import metrics
+
+# 任务各阶段，按执行顺序排列
+STAGES = ('parse', 'download_audio', 'download_video', 'merge', 'stream_transcode', 'transcode')
+
+
+class TaskTimings:
+    """按任务记录各阶段耗时和处理字节数
+
+    阶段结束时同时计入 /metrics 的阶段直方图；任务结束时把分解结果以JSON写入
+    任务hash的 timings 字段，并追加到最近任务列表，供分位数汇总使用。
+    """
+
+    def __init__(self, redis_manager):
+        self.redis = redis_manager
+        self._tasks = {}
+        self._lock = threading.Lock()
+
+    def _record(self, task_id, stage):
+        with self._lock:
+            stages = self._tasks.setdefault(task_id, {})
+            return stages.setdefault(stage, {'seconds': 0.0, 'bytes': 0})
+
+    @contextmanager
+    def stage(self, task_id, stage):
+        """with timings.stage(task_id, 'download_video') as record: record['bytes'] += n"""
+        record = self._record(task_id, stage) if task_id else {'seconds': 0.0, 'bytes': 0}
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            elapsed = time.perf_counter() - start
+            record['seconds'] += elapsed
+            metrics.STAGE_DURATION.labels(stage).observe(elapsed)
+
+    def add_bytes(self, task_id, stage, nbytes):
+        if task_id and nbytes:
+            self._record(task_id, stage)['bytes'] += nbytes
+
+    def get(self, task_id):
+        """当前任务的阶段分解：耗时、字节数和有效吞吐"""
+        with self._lock:
+            stages = {name: dict(record) for name, record in self._tasks.get(task_id, {}).items()}
+        breakdown = {}
+        for name in sorted(stages, key=lambda s: STAGES.index(s) if s in STAGES else len(STAGES)):
+            record = stages[name]
+            seconds = round(record['seconds'], 3)
+            breakdown[name] = {
+                'seconds': seconds,
+                'bytes': record['bytes'],
+                'bytes_per_second': int(record['bytes'] / seconds) if record['bytes'] and seconds > 0 else None
+            }
+        return {
+            'stages': breakdown,
+            'total_seconds': round(sum(s['seconds'] for s in breakdown.values()), 3)
+        }
+
+    def save(self, task_id):
+        """任务结束后写入Redis并清除本地记录；没有任何阶段的任务不写"""
+        if task_id not in self._tasks:
+            return None
+        timings = self.get(task_id)
+        with self._lock:
+            self._tasks.pop(task_id, None)
+        self.redis.save_task_timings(task_id, timings, Config.TIMINGS_HISTORY_SIZE)
+        return timings
+
+    def summary(self):
+        """最近任务各阶段耗时和吞吐的 p50/p90/p99"""
+        recent = self.redis.get_recent_timings()
+        seconds = {}
+        throughput = {}
+        for timings in recent:
+            for name, record in timings.get('stages', {}).items():
+                seconds.setdefault(name, []).append(record['seconds'])
+                if record.get('bytes_per_second'):
+                    throughput.setdefault(name, []).append(record['bytes_per_second'])
+            seconds.setdefault('total', []).append(timings.get('total_seconds', 0))
+
+        summary = {}
+        for name, values in seconds.items():
+            summary[name] = {
+                'count': len(values),
+                'seconds': _percentiles(values),
+                'bytes_per_second': _percentiles(throughput[name]) if name in throughput else None
+            }
+        return {'tasks': len(recent), 'stages': summary}
+
+
+def _percentiles(values, points=(50, 90, 99)):
+    """最近邻秩法计算分位数"""
+    ordered = sorted(values)
+    result = {}
+    for p in points:
+        rank = max(1, -(-p * len(ordered) // 100))  # 向上取整
+        result[f'p{p}'] = ordered[rank - 1]
+    return result
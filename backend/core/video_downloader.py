@@ -1,16 +1,70 @@
-import requests
 import re
+import io
+import errno
+import functools
 import time
 import os
 import http.cookiejar
-from bs4 import BeautifulSoup
+import logging
 from urllib.parse import urlparse
-import yt_dlp
+from config.config import Config
 from .video_scraper import VideoScraper
 from .video_transcoder import VideoTranscoder
+from .bandwidth import BandwidthGovernor
+from .cookie_jar import CookieJarCache
+from .task_control import TaskInterrupted, CancellationToken
+from .task_logger import TaskLogSink
+from .task_timings import TaskTimings
+from . import html_extract, http_client, metrics, mirrors
+
+logger = logging.getLogger(__name__)
+
+# 边下载边转码前读取文件开头这么多字节判断容器结构
+STREAM_HEAD_BYTES = 64 * 1024
+
+
+def _sequential_container(head):
+    """文件能否从管道顺序读取：FLV，或 moov 在 mdat 之前的MP4（B站DASH的分片MP4也是这样）
+
+    moov 在末尾的MP4要先跳到文件尾读索引，只能从文件读取；看不出结构时也按不能处理。
+    """
+    if head[:3] == b'FLV':
+        return True
+    pos = 0
+    while pos + 8 <= len(head):
+        size = int.from_bytes(head[pos:pos + 4], 'big')
+        box = bytes(head[pos + 4:pos + 8])
+        if box == b'moov':
+            return True
+        if box == b'mdat':
+            return False
+        if size == 1 and pos + 16 <= len(head):
+            size = int.from_bytes(head[pos + 8:pos + 16], 'big')
+        if size < 8:
+            return False
+        pos += size
+    return False
+
+
+def _iter_body(response, buffer):
+    """逐块返回响应体
+
+    未压缩的响应直接 readinto 到调用方复用的缓冲区，返回的 memoryview 在取下一块前有效；
+    带 Content-Encoding 的响应需要解压，仍用 iter_content。
+    """
+    raw = getattr(response, 'raw', None)
+    if response.headers.get('content-encoding') or not isinstance(raw, io.IOBase):
+        yield from response.iter_content(chunk_size=len(buffer))
+        return
+    while True:
+        size = raw.readinto(buffer)
+        if not size:
+            return
+        yield buffer[:size]
+
 
 class VideoParser:
-    def __init__(self):
+    def __init__(self, browser_pool=None, redis_manager=None, ytdlp_pool=None):
         self.platform_patterns = {
             'bilibili': [
                 r'b23\.tv/([a-zA-Z0-9]+)',
@@ -27,7 +81,7 @@ class VideoParser:
                 r'toutiao\.com/video/([0-9]+)'
             ]
         }
-        self.scraper = VideoScraper()
+        self.scraper = VideoScraper(browser_pool, redis_manager, ytdlp_pool)
     
     def detect_platform(self, url):
         for platform, patterns in self.platform_patterns.items():
@@ -94,14 +148,8 @@ class VideoParser:
         headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
         }
-        response = requests.get(url, headers=headers, timeout=10)
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        title = soup.find('title')
-        if title:
-            title = title.string.strip()
-        else:
-            title = '未知标题'
+        response = http_client.get(url, headers=headers, timeout=10)
+        title = html_extract.page_title(response.text) or '未知标题'
         
         return {
             'title': title,
@@ -114,14 +162,8 @@ class VideoParser:
         headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
         }
-        response = requests.get(url, headers=headers, timeout=10)
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        title = soup.find('title')
-        if title:
-            title = title.string.strip()
-        else:
-            title = '未知标题'
+        response = http_client.get(url, headers=headers, timeout=10)
+        title = html_extract.page_title(response.text) or '未知标题'
         
         return {
             'title': title,
@@ -134,14 +176,8 @@ class VideoParser:
         headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
         }
-        response = requests.get(url, headers=headers, timeout=10)
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        title = soup.find('title')
-        if title:
-            title = title.string.strip()
-        else:
-            title = '未知标题'
+        response = http_client.get(url, headers=headers, timeout=10)
+        title = html_extract.page_title(response.text) or '未知标题'
         
         return {
             'title': title,
@@ -152,11 +188,20 @@ class VideoParser:
 
 
 class VideoDownloader:
-    def __init__(self, redis_manager):
+    def __init__(self, redis_manager, task_control=None, log_sink=None, timings=None,
+                 parser=None, transcoder=None, cookie_jars=None, bandwidth=None):
         self.redis = redis_manager
-        self.parser = VideoParser()
-        self.scraper = VideoScraper()
-        self.transcoder = VideoTranscoder(redis_manager)
+        self.task_control = task_control
+        self.log_sink = log_sink or TaskLogSink(redis_manager)
+        self.timings = timings or TaskTimings(redis_manager)
+        # 解析器和转码器可由调用方传入共享实例，避免每个进程各建一份
+        self.parser = parser or VideoParser()
+        self.scraper = self.parser.scraper
+        self.ytdlp = self.scraper.ytdlp
+        self.transcoder = transcoder or VideoTranscoder(redis_manager, task_control, self.log_sink, self.timings)
+        self.cookie_jars = cookie_jars or CookieJarCache(redis_manager)
+        # 所有下载线程共用的限速器
+        self.bandwidth = bandwidth or BandwidthGovernor(redis_manager)
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (iPhone; CPU iPhone OS 16_6 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/16.6 Mobile/15E148 Safari/604.1',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
@@ -166,13 +211,9 @@ class VideoDownloader:
             'Upgrade-Insecure-Requests': '1'
         }
     
-    def _log(self, task_id, message):
+    def _log(self, task_id, message, level=logging.INFO):
         """记录任务日志"""
-        if task_id:
-            self.redis.add_task_log(task_id, message)
-            print(f"[{task_id[:8]}] {message}")
-        else:
-            print(f"[LOG] {message}")
+        self.log_sink.log(task_id, message, level)
     
     def _format_speed(self, speed_bytes):
         if speed_bytes < 1024:
@@ -184,173 +225,116 @@ class VideoDownloader:
         else:
             return f'{speed_bytes / (1024 * 1024 * 1024):.2f} GB/s'
     
-    def _download_douyin_with_ytdlp(self, url, task_id, output_path, cookie_data=None):
+    def _download_douyin_with_ytdlp(self, url, task_id, output_path, cookies=None):
         try:
-            print("=" * 60)
-            print(f"📥 开始yt-dlp下载抖音视频")
-            print("=" * 60)
+            logger.debug(f"📥 开始yt-dlp下载抖音视频")
             
             # 阶段1: 准备下载
-            print(f"📁 阶段1: 准备下载参数")
+            logger.debug(f"📁 阶段1: 准备下载参数")
             try:
                 safe_filename = self._get_safe_filename('douyin_video')
                 temp_file = os.path.join(os.path.dirname(output_path), f"{safe_filename}.mp4")
-                print(f"✅ 临时文件路径: {temp_file}")
+                logger.debug(f"✅ 临时文件路径: {temp_file}")
             except Exception as e:
-                print(f"❌ 阶段1失败: 准备参数错误")
-                print(f"   错误详情: {str(e)}")
+                logger.error(f"❌ 阶段1失败: 准备参数错误")
+                logger.error(f"   错误详情: {str(e)}")
                 raise Exception(f'准备下载参数失败: {str(e)}')
             
-            # 阶段2: 配置yt-dlp
-            print(f"⚙️  阶段2: 配置yt-dlp参数")
-            try:
-                ydl_opts = {
-                    'format': 'best[ext=mp4]/best',
-                    'outtmpl': temp_file,
-                    'quiet': False,
-                    'no_warnings': False,
-                    'progress_hooks': [lambda d: self._ytdlp_progress_hook(d, task_id)],
-                    'user_agent': 'Mozilla/5.0 (iPhone; CPU iPhone OS 16_6 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/16.6 Mobile/15E148 Safari/604.1',
-                    'nocheckcertificate': True,
-                    'ignoreerrors': False,
-                    'extract_flat': False,
-                }
-                
-                # 如果有Cookie，添加到yt-dlp配置
-                if cookie_data and 'cookie' in cookie_data:
-                    print(f"✅ 使用Cookie进行下载")
-                    # 将Cookie字符串转换为Netscape格式并保存到临时文件
-                    import tempfile
-                    cookie_file = tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False)
-                    
-                    # 写入Netscape格式头部
-                    cookie_file.write("# Netscape HTTP Cookie File\n")
-                    cookie_file.write("# This is a generated file! Do not edit.\n\n")
-                    
-                    # 解析Cookie字符串并转换为Netscape格式
-                    cookies = cookie_data['cookie'].split(';')
-                    for cookie in cookies:
-                        cookie = cookie.strip()
-                        if '=' in cookie:
-                            name, value = cookie.split('=', 1)
-                            # Netscape格式: domain \t flag \t path \t secure \t expiration \t name \t value
-                            # domain设置为.douyin.com，flag为TRUE表示子域名也有效
-                            cookie_file.write(f".douyin.com\tTRUE\t/\tFALSE\t9999999999\t{name.strip()}\t{value.strip()}\n")
-                    
-                    cookie_file.close()
-                    ydl_opts['cookiefile'] = cookie_file.name
-                    print(f"✅ Cookie已保存到Netscape格式文件: {cookie_file.name}")
-                else:
-                    print(f"⚠️  未提供Cookie，尝试无Cookie下载")
-                
-                print(f"✅ yt-dlp配置完成")
-            except Exception as e:
-                print(f"❌ 阶段2失败: 配置yt-dlp错误")
-                print(f"   错误详情: {str(e)}")
-                raise Exception(f'配置yt-dlp失败: {str(e)}')
+            if cookies:
+                logger.debug(f"✅ 使用Cookie进行下载")
+            else:
+                logger.warning(f"⚠️  未提供Cookie，尝试无Cookie下载")
             
-            # 阶段3: 执行下载
-            print(f"📥 阶段3: 执行yt-dlp下载")
+            # 阶段2: 执行下载
+            # 实例来自共享池，Cookie由池按版本装入；解析阶段刚提取过的信息直接复用，不再请求一次
+            logger.debug(f"📥 阶段2: 执行yt-dlp下载")
+            logger.debug(f"🚀 开始下载: {url}")
             try:
-                import yt_dlp
-                print(f"✅ yt-dlp导入成功")
-                
-                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                    print(f"🚀 开始下载: {url}")
-                    try:
-                        ydl.download([url])
-                        print(f"✅ yt-dlp下载完成")
-                    except Exception as download_error:
-                        print(f"❌ 阶段3失败: yt-dlp下载错误")
-                        print(f"   错误详情: {str(download_error)}")
-                        print(f"   错误类型: {type(download_error).__name__}")
-                        import traceback
-                        traceback.print_exc()
-                        raise Exception(f'yt-dlp下载失败: {str(download_error)}')
+                with self.timings.stage(task_id, 'download_video'), self.bandwidth.track(task_id):
+                    # yt-dlp 自己读取数据，在进度回调里按收到的字节限速
+                    received = {}
+                    self.ytdlp.download(url, 'douyin', temp_file,
+                                        progress_hook=lambda d: self._ytdlp_progress_hook(d, task_id, received))
+                logger.debug(f"✅ yt-dlp下载完成")
             except ImportError as ie:
-                print(f"❌ 阶段3失败: yt-dlp未安装")
-                print(f"   错误详情: {str(ie)}")
+                logger.error(f"❌ 阶段2失败: yt-dlp未安装")
+                logger.error(f"   错误详情: {str(ie)}")
                 raise Exception(f'yt-dlp未安装，无法下载抖音视频')
-            except Exception as e:
-                print(f"❌ 阶段3失败: 下载过程错误")
-                print(f"   错误详情: {str(e)}")
-                print(f"   错误类型: {type(e).__name__}")
-                import traceback
-                traceback.print_exc()
-                raise
+            except Exception as download_error:
+                # 进度回调抛出的中断会被yt-dlp包装成DownloadError
+                if self.task_control and task_id in self.task_control.signals:
+                    raise TaskInterrupted(task_id, self.task_control.signals[task_id])
+                logger.error(f"❌ 阶段2失败: yt-dlp下载错误")
+                logger.error(f"   错误详情: {str(download_error)}")
+                logger.exception(f"   错误类型: {type(download_error).__name__}")
+                raise Exception(f'yt-dlp下载失败: {str(download_error)}')
             
-            # 阶段4: 检查下载结果
-            print(f"🔍 阶段4: 检查下载结果")
+            # 阶段3: 检查下载结果
+            logger.debug(f"🔍 阶段3: 检查下载结果")
             try:
                 if os.path.exists(temp_file):
                     file_size = os.path.getsize(temp_file)
-                    print(f"✅ 文件已创建: {temp_file}")
-                    print(f"   文件大小: {file_size} bytes ({file_size / 1024 / 1024:.2f} MB)")
+                    logger.debug(f"✅ 文件已创建: {temp_file}")
+                    logger.debug(f"   文件大小: {file_size} bytes ({file_size / 1024 / 1024:.2f} MB)")
                     
                     if file_size > 0:
-                        print(f"✅ 文件大小正常，准备转码")
+                        logger.debug(f"✅ 文件大小正常，准备转码")
                     else:
-                        print(f"❌ 文件大小为0，下载失败")
+                        logger.error(f"❌ 文件大小为0，下载失败")
                         # 添加原始URL到错误信息
                         error_msg = f'下载失败: 下载的文件大小为0，可能是网页未正确解析出视频下载地址\n\n原始URL: {url}'
                         self.redis.update_task_status(task_id, 'failed', error_message=error_msg)
                         return False, error_msg
                 else:
-                    print(f"❌ 文件未创建: {temp_file}")
+                    logger.error(f"❌ 文件未创建: {temp_file}")
                     # 添加原始URL到错误信息
                     error_msg = f'下载失败: 视频文件未创建，可能是网页未解析出视频下载地址或下载过程中断\n\n原始URL: {url}'
                     self.redis.update_task_status(task_id, 'failed', error_message=error_msg)
                     return False, error_msg
             except Exception as e:
-                print(f"❌ 阶段4失败: 检查文件错误")
-                print(f"   错误详情: {str(e)}")
+                logger.error(f"❌ 阶段3失败: 检查文件错误")
+                logger.error(f"   错误详情: {str(e)}")
                 raise Exception(f'检查下载结果失败: {str(e)}')
             
-            # 阶段5: 转码为mov格式
-            print(f"🎬 阶段5: 转码为mov格式")
+            # 阶段4: 转码为mov格式
+            logger.debug(f"🎬 阶段4: 转码为mov格式")
             try:
                 self.redis.update_task_status(task_id, 'transcoding', progress=0)
-                print(f"✅ 任务状态已更新: transcoding")
+                logger.debug(f"✅ 任务状态已更新: transcoding")
                 
                 success, message = self.transcoder.transcode_video(temp_file, output_path, task_id)
                 
                 if success:
-                    print(f"✅ 转码成功: {output_path}")
+                    logger.debug(f"✅ 转码成功: {output_path}")
                     os.remove(temp_file)
-                    print(f"✅ 临时文件已删除: {temp_file}")
+                    logger.debug(f"✅ 临时文件已删除: {temp_file}")
                     self.redis.update_task_status(task_id, 'completed', progress=100, save_path=output_path)
-                    print(f"✅ 任务状态已更新: completed")
-                    print("=" * 60)
-                    print(f"✅ 下载任务完成")
-                    print("=" * 60)
+                    logger.debug(f"✅ 任务状态已更新: completed")
+                    logger.debug(f"✅ 下载任务完成")
                     return True, '下载成功'
                 else:
-                    print(f"❌ 阶段5失败: 转码失败")
-                    print(f"   错误详情: {message}")
+                    logger.error(f"❌ 阶段4失败: 转码失败")
+                    logger.error(f"   错误详情: {message}")
                     # 添加视频URL到错误信息
                     error_msg = f'转码失败: {message}\n\n解析的视频URL: {video_url}'
                     self.redis.update_task_status(task_id, 'failed', error_message=error_msg)
                     return False, error_msg
             except Exception as e:
-                print(f"❌ 阶段5失败: 转码过程错误")
-                print(f"   错误详情: {str(e)}")
-                print(f"   错误类型: {type(e).__name__}")
-                import traceback
-                traceback.print_exc()
+                logger.error(f"❌ 阶段4失败: 转码过程错误")
+                logger.error(f"   错误详情: {str(e)}")
+                logger.exception(f"   错误类型: {type(e).__name__}")
                 # 添加视频URL到错误信息
                 error_msg = f'转码失败: {str(e)}\n\n解析的视频URL: {video_url}'
                 self.redis.update_task_status(task_id, 'failed', error_message=error_msg)
                 return False, error_msg
                 
+        except TaskInterrupted as e:
+            return self._handle_interrupted(task_id, e)
         except Exception as e:
-            print("=" * 60)
-            print(f"❌ 下载任务失败")
-            print(f"   错误阶段: 未知")
-            print(f"   错误详情: {str(e)}")
-            print(f"   错误类型: {type(e).__name__}")
-            import traceback
-            traceback.print_exc()
-            print("=" * 60)
+            logger.error(f"❌ 下载任务失败")
+            logger.error(f"   错误阶段: 未知")
+            logger.error(f"   错误详情: {str(e)}")
+            logger.exception(f"   错误类型: {type(e).__name__}")
             # 添加视频URL到错误信息
             error_msg = f'下载失败: {str(e)}\n\n解析的视频URL: {video_url}'
             self.redis.update_task_status(task_id, 'failed', error_message=error_msg)
@@ -358,50 +342,31 @@ class VideoDownloader:
     
     def _download_douyin_manual(self, url, task_id, output_path):
         """手动下载抖音视频（备用方案）"""
+        video_url = 'N/A'
+        token = self.task_control.token(task_id) if self.task_control else None
         try:
-            print(f'Downloading douyin video with manual method: {url}')
+            logger.debug(f'Downloading douyin video with manual method: {url}')
             
-            video_info = self.parser.parse_video_info(url)
+            with self.timings.stage(task_id, 'parse'):
+                video_info = self.parser.parse_video_info(url)
             video_url = video_info.get('video_url')
             
             if not video_url:
                 raise Exception('无法获取视频下载链接')
             
-            print(f'Video URL: {video_url[:100]}...')
+            logger.debug(f'Video URL: {video_url[:100]}...')
             
             headers = self.headers.copy()
             headers['Referer'] = 'https://www.douyin.com'
             headers['Origin'] = 'https://www.douyin.com'
             
-            response = requests.get(video_url, headers=headers, stream=True, timeout=600)  # 10分钟超时
-            response.raise_for_status()
-            
-            total_size = int(response.headers.get('content-length', 0))
-            downloaded_size = 0
-            start_time = time.time()
-            last_update_time = start_time
-            
             safe_filename = self._get_safe_filename(video_info.get('title', 'video'))
             temp_file = os.path.join(os.path.dirname(output_path), f"{safe_filename}.mp4")
             
-            print(f'Saving to: {temp_file}')
-            
-            with open(temp_file, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
-                        downloaded_size += len(chunk)
-                        current_time = time.time()
-                        if current_time - last_update_time >= 1:
-                            elapsed_time = current_time - start_time
-                            if elapsed_time > 0:
-                                speed = downloaded_size / elapsed_time
-                                speed_str = self._format_speed(speed)
-                                self.redis.update_task_download_speed(task_id, speed_str)
-                            last_update_time = current_time
-                        if total_size > 0:
-                            progress = int(downloaded_size / total_size * 100)
-                            self.redis.update_task_status(task_id, 'downloading', progress=progress)
+            logger.debug(f'Saving to: {temp_file}')
+            
+            with self.timings.stage(task_id, 'download_video') as stage:
+                stage['bytes'] += self._download_stream(video_info.get('video_urls') or video_url, headers, temp_file, task_id, token, platform='douyin')
             
             if os.path.exists(temp_file):
                 self.redis.update_task_status(task_id, 'transcoding', progress=0)
@@ -412,6 +377,8 @@ class VideoDownloader:
                     self.redis.update_task_status(task_id, 'completed', progress=100, save_path=output_path)
                     return True, '下载成功'
                 else:
+                    if token:
+                        token.check()
                     # 添加视频URL到错误信息
                     error_msg = f'转码失败: {message}\n\n解析的视频URL: {video_url}'
                     self.redis.update_task_status(task_id, 'failed', error_message=error_msg)
@@ -422,15 +389,307 @@ class VideoDownloader:
                 self.redis.update_task_status(task_id, 'failed', error_message=error_msg)
                 return False, error_msg
                 
+        except TaskInterrupted as e:
+            return self._handle_interrupted(task_id, e)
         except Exception as e:
-            print(f'Error downloading douyin video: {e}')
-            import traceback
-            traceback.print_exc()
+            logger.exception(f'Error downloading douyin video: {e}')
             # 添加视频URL到错误信息
             error_msg = f'下载失败: {str(e)}\n\n解析的视频URL: {video_url}'
             self.redis.update_task_status(task_id, 'failed', error_message=error_msg)
             return False, error_msg
     
+    def _download_stream(self, url, headers, file_path, task_id, token=None, progress_start=0, progress_span=100, platform='unknown'):
+        """流式下载到文件，支持暂停后断点续传，镜像过慢或出错时切换
+        
+        数据先写入 <file_path>.part，完成后再改名；任务暂停时保留 .part，
+        下次执行时用 Range 请求从已下载的位置继续。url 可以是同一文件的多个镜像：
+        先探测选最快的，传输中速度持续低于 MIRROR_MIN_SPEED 或连接出错时，
+        从已下载的位置换到下一个镜像继续。返回本次实际传输的字节数。
+        """
+        part_path = f'{file_path}.part'
+        urls = mirrors.rank(url, headers)
+        start_time = time.time()
+        state = {'transferred': 0, 'start_time': start_time, 'last_update_time': start_time,
+                 'progress_start': progress_start, 'progress_span': progress_span}
+        
+        try:
+            with self.bandwidth.track(task_id):
+                for index, mirror in enumerate(urls):
+                    has_next = index + 1 < len(urls)
+                    try:
+                        if self._download_from_mirror(mirror, headers, part_path, task_id, token, state, has_next):
+                            break
+                        self._log(task_id, f"🐢 下载速度过慢，切换镜像 ({index + 2}/{len(urls)})", logging.WARNING)
+                    except TaskInterrupted:
+                        raise
+                    except Exception as e:
+                        if token and token.is_set():
+                            raise TaskInterrupted(task_id, token.action)
+                        if not has_next:
+                            raise
+                        self._log(task_id, f"⚠️  镜像下载出错，切换镜像 ({index + 2}/{len(urls)}): {e}", logging.WARNING)
+                    mirrors.penalize(mirror)
+                    metrics.MIRROR_SWITCHES.labels(platform).inc()
+        except TaskInterrupted as e:
+            if e.action == 'cancel' and os.path.exists(part_path):
+                os.remove(part_path)
+            raise
+        finally:
+            metrics.DOWNLOAD_BYTES.labels(platform).inc(state['transferred'])
+        
+        os.replace(part_path, file_path)
+        transferred = state['transferred']
+        elapsed = time.time() - start_time
+        if transferred and elapsed > 0:
+            metrics.DOWNLOAD_THROUGHPUT.labels(platform).observe(transferred / elapsed)
+        return transferred
+    
+    def _download_from_mirror(self, url, headers, part_path, task_id, token, state, can_switch):
+        """从一个镜像接着 .part 已有的内容下载；完成返回True，过慢且还有其他镜像时返回False"""
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        # 还有备用镜像时缩短读超时，卡住的连接尽快换掉；最后一个镜像保持10分钟
+        timeout = (Config.MIRROR_CONNECT_TIMEOUT, Config.MIRROR_STALL_TIMEOUT) if can_switch else 600
+        
+        request_headers = headers.copy()
+        if offset:
+            request_headers['Range'] = f'bytes={offset}-'
+        response = http_client.get(url, headers=request_headers, stream=True, timeout=timeout)
+        
+        if offset and response.status_code == 416:
+            # 已下载部分与服务器文件不一致，从头开始
+            response.close()
+            offset = 0
+            response = http_client.get(url, headers=headers, stream=True, timeout=timeout)
+        
+        if self.task_control and task_id:
+            self.task_control.register(task_id, response)
+        try:
+            response.raise_for_status()
+            
+            if offset and response.status_code != 206:
+                self._log(task_id, "⚠️  服务器不支持断点续传，从头下载", logging.WARNING)
+                offset = 0
+            elif offset:
+                self._log(task_id, f"⏯️  从 {offset} 字节处继续下载")
+            
+            total_size = int(response.headers.get('content-length', 0))
+            if total_size > 0:
+                total_size += offset
+            state['position'] = offset
+            
+            encoded = bool(response.headers.get('content-encoding'))
+            # 预分配后文件长度即为总大小，只能定位写入不能追加；中途结束时截掉未写的部分，续传位置仍按文件大小算
+            with open(part_path, 'r+b' if offset else 'wb') as f:
+                f.seek(offset)
+                preallocated = not encoded and self._preallocate(f, offset, total_size)
+                try:
+                    if not self._transfer(response, f.write, task_id, token, state, total_size, can_switch):
+                        return False
+                finally:
+                    if preallocated and f.tell() < total_size:
+                        f.truncate()
+            # 响应被控制线程关闭时迭代可能直接结束，这里再确认一次
+            if token:
+                token.check()
+        finally:
+            if self.task_control and task_id:
+                self.task_control.unregister(task_id, response)
+            response.close()
+        
+        if total_size > 0 and not response.headers.get('content-encoding') and state['position'] < total_size:
+            raise Exception(f'下载不完整: {state["position"]}/{total_size} bytes')
+        return True
+    
+    def _transfer(self, response, write, task_id, token, state, total_size, can_switch):
+        """把响应体逐块交给 write，同时限速、上报速度和进度、按窗口检查镜像速度
+        
+        state['position'] 随写出的字节前进；镜像持续过慢且还有其他镜像时返回False，读完返回True。
+        """
+        window_start = time.time()
+        window_bytes = 0
+        window_throttled = 0.0
+        mirror_start = window_start
+        
+        # 大块读取到复用的缓冲区：每MiB一次Python层循环，而不是每8KiB一次
+        buffer = memoryview(bytearray(self.bandwidth.chunk_size(task_id, Config.DOWNLOAD_CHUNK_SIZE)))
+        for chunk in _iter_body(response, buffer):
+            if token:
+                token.check()
+            if not chunk:
+                continue
+            write(chunk)
+            state['position'] += len(chunk)
+            state['transferred'] += len(chunk)
+            window_bytes += len(chunk)
+            window_throttled += self.bandwidth.consume(task_id, len(chunk), token)
+            current_time = time.time()
+            if current_time - state['last_update_time'] >= 1 and not state.get('quiet'):
+                elapsed_time = current_time - state['start_time']
+                if elapsed_time > 0:
+                    speed_str = self._format_speed(state['transferred'] / elapsed_time)
+                    self.redis.update_task_download_speed(task_id, speed_str)
+                if total_size > 0 and state['progress_span']:
+                    progress = state['progress_start'] + int(state['position'] / total_size * state['progress_span'])
+                    self.redis.update_task_status(task_id, 'downloading', progress=progress)
+                state['last_update_time'] = current_time
+            if current_time - window_start >= Config.MIRROR_SPEED_WINDOW:
+                # 刚建立的连接速度还没上来，过了 MIRROR_SWITCH_GRACE 才判断；限速睡眠的时间不算镜像慢
+                receiving = current_time - window_start - window_throttled
+                speed = window_bytes / max(receiving, 1e-6)
+                if (can_switch and speed < Config.MIRROR_MIN_SPEED
+                        and current_time - mirror_start >= Config.MIRROR_SWITCH_GRACE):
+                    return False
+                window_start = current_time
+                window_bytes = 0
+                window_throttled = 0.0
+        return True
+    
+    def _stream_transcode(self, video_info, headers, mov_path, task_id, token, platform):
+        """边下载边转码（STREAM_TRANSCODE）：响应体经命名管道直接送入FFmpeg，不写中间的mp4
+        
+        成功返回True；不适用（需要随机读取、长视频要分段转码）或失败时返回False，
+        由调用方改走先下载再转码。暂停后没有可复用的部分，继续时从头开始。
+        """
+        if not Config.STREAM_TRANSCODE or not hasattr(os, 'mkfifo'):
+            return False
+        duration = video_info.get('duration') or 0
+        # B站DASH的AVC视频配的是AAC音频，可以直接封装
+        copy = Config.REMUX_COMPATIBLE and video_info.get('video_codec') == 'avc' and bool(video_info.get('audio_url'))
+        if not copy and duration >= Config.SEGMENTED_TRANSCODE_MIN_DURATION:
+            # 长视频分段并行转码更快，分段需要完整的文件
+            return False
+        
+        headers = headers.copy()
+        # 换镜像时按已送入的字节数续传，响应不能压缩
+        headers['Accept-Encoding'] = 'identity'
+        groups = [video_info.get('video_urls') or video_info['video_url']]
+        if video_info.get('audio_url'):
+            groups.append(video_info.get('audio_urls') or video_info['audio_url'])
+        streams = [mirrors.rank(urls, headers) for urls in groups]
+        for urls in streams:
+            if not self._sequential(urls[0], headers, task_id):
+                self._log(task_id, "ℹ️  文件需要随机读取（如moov在末尾的MP4），先下载再转码")
+                return False
+        
+        start_time = time.time()
+        feeds = []
+        for index, urls in enumerate(streams):
+            # 时长已知时由FFmpeg按转码时间上报进度，否则按视频下载字节数；音频不上报
+            state = {'transferred': 0, 'position': 0, 'start_time': start_time, 'last_update_time': start_time,
+                     'progress_start': 0, 'progress_span': 0 if duration else 99, 'quiet': index > 0}
+            feeds.append(functools.partial(self._feed_stream, urls, headers, task_id, token, state, platform))
+        
+        self._log(task_id, "🚰 边下载边转码：数据经管道直接送入FFmpeg")
+        success, message = self.transcoder.transcode_stream(feeds, mov_path, task_id, video_info, copy=copy)
+        if success:
+            return True
+        if token:
+            token.check()
+        self._log(task_id, f"⚠️  边下载边转码失败，改为先下载再转码: {message}", logging.WARNING)
+        return False
+    
+    def _sequential(self, url, headers, task_id):
+        """取文件开头一小段，判断能否从管道顺序读取；取不到时按不能处理"""
+        request_headers = headers.copy()
+        request_headers['Range'] = f'bytes=0-{STREAM_HEAD_BYTES - 1}'
+        try:
+            response = http_client.get(url, headers=request_headers, stream=True,
+                                       timeout=(Config.MIRROR_CONNECT_TIMEOUT, Config.MIRROR_STALL_TIMEOUT))
+            try:
+                response.raise_for_status()
+                head = b''
+                for chunk in response.iter_content(chunk_size=STREAM_HEAD_BYTES):
+                    head += chunk
+                    if len(head) >= STREAM_HEAD_BYTES:
+                        break
+            finally:
+                response.close()
+        except Exception as e:
+            self._log(task_id, f"⚠️  读取文件头失败: {e}", logging.DEBUG)
+            return False
+        return _sequential_container(head)
+    
+    def _feed_stream(self, urls, headers, task_id, token, state, platform, write):
+        """把一路流按顺序交给 write；镜像出错或过慢时从已送出的位置换到下一个镜像继续"""
+        
+        def pipe_write(data):
+            try:
+                write(data)
+            except Exception:
+                # FFmpeg那一侧的问题，换镜像没有用
+                state['pipe_error'] = True
+                raise
+        
+        try:
+            with self.bandwidth.track(task_id):
+                for index, mirror in enumerate(urls):
+                    has_next = index + 1 < len(urls)
+                    try:
+                        if self._pipe_from_mirror(mirror, headers, pipe_write, task_id, token, state, has_next):
+                            return
+                        self._log(task_id, f"🐢 下载速度过慢，切换镜像 ({index + 2}/{len(urls)})", logging.WARNING)
+                    except TaskInterrupted:
+                        raise
+                    except Exception as e:
+                        if token and token.is_set():
+                            raise TaskInterrupted(task_id, token.action)
+                        if not has_next or state.get('pipe_error'):
+                            raise
+                        self._log(task_id, f"⚠️  镜像下载出错，切换镜像 ({index + 2}/{len(urls)}): {e}", logging.WARNING)
+                    mirrors.penalize(mirror)
+                    metrics.MIRROR_SWITCHES.labels(platform).inc()
+        finally:
+            metrics.DOWNLOAD_BYTES.labels(platform).inc(state['transferred'])
+    
+    def _pipe_from_mirror(self, url, headers, write, task_id, token, state, can_switch):
+        """从一个镜像接着已送出的位置读取并交给 write；完成返回True，过慢且还有其他镜像时返回False"""
+        offset = state['position']
+        timeout = (Config.MIRROR_CONNECT_TIMEOUT, Config.MIRROR_STALL_TIMEOUT) if can_switch else 600
+        
+        request_headers = headers.copy()
+        if offset:
+            request_headers['Range'] = f'bytes={offset}-'
+        response = http_client.get(url, headers=request_headers, stream=True, timeout=timeout)
+        
+        if self.task_control and task_id:
+            self.task_control.register(task_id, response)
+        try:
+            response.raise_for_status()
+            if offset and response.status_code != 206:
+                # 已送入FFmpeg的数据收不回来，只能从这个位置接着送
+                raise Exception('镜像不支持断点续传')
+            if offset:
+                self._log(task_id, f"⏯️  从 {offset} 字节处继续")
+            
+            total_size = int(response.headers.get('content-length', 0))
+            if total_size > 0:
+                total_size += offset
+            if not self._transfer(response, write, task_id, token, state, total_size, can_switch):
+                return False
+            if token:
+                token.check()
+        finally:
+            if self.task_control and task_id:
+                self.task_control.unregister(task_id, response)
+            response.close()
+        
+        if total_size > 0 and state['position'] < total_size:
+            raise Exception(f'下载不完整: {state["position"]}/{total_size} bytes')
+        return True
+    
+    def _preallocate(self, f, offset, total_size):
+        """按 Content-Length 一次分配好磁盘空间，减少碎片；空间不足时下载前就失败"""
+        if not Config.DOWNLOAD_PREALLOCATE or total_size <= offset or not hasattr(os, 'posix_fallocate'):
+            return False
+        try:
+            os.posix_fallocate(f.fileno(), offset, total_size - offset)
+        except OSError as e:
+            if e.errno == errno.ENOSPC:
+                raise Exception(f'磁盘空间不足: 还需要 {total_size - offset} 字节')
+            # 文件系统不支持预分配，照常写入
+            return False
+        return True
+    
     def _get_safe_filename(self, title):
         import re
         import hashlib
@@ -447,7 +706,22 @@ class VideoDownloader:
         
         return title
     
-    def _ytdlp_progress_hook(self, d, task_id):
+    def _ytdlp_progress_hook(self, d, task_id, received=None):
+        """yt-dlp 的进度回调；received 记录各文件已计入限速的字节数
+
+        回调在下载线程里同步执行，按新收到的字节从全局和单任务令牌桶取令牌、超额时在这里睡眠，
+        yt-dlp 的读取随之放慢，和其他下载共用全局额度，运行中修改的限速也立即生效。
+        """
+        token = CancellationToken(self.task_control, task_id) if self.task_control else None
+        if token:
+            token.check()
+        if d['status'] == 'downloading' and received is not None:
+            name = d.get('filename')
+            downloaded = d.get('downloaded_bytes') or 0
+            # 第一次回调只记下起点，续传时已有的部分不计入
+            if name in received and downloaded > received[name]:
+                self.bandwidth.consume(task_id, downloaded - received[name], token)
+            received[name] = downloaded
         if d['status'] == 'downloading':
             if 'total_bytes' in d and 'downloaded_bytes' in d:
                 progress = int(d['downloaded_bytes'] / d['total_bytes'] * 100)
@@ -457,7 +731,10 @@ class VideoDownloader:
                     speed_str = self._format_speed(d['speed'])
                     self.redis.update_task_download_speed(task_id, speed_str)
         elif d['status'] == 'finished':
-            print(f'Download finished for task {task_id}')
+            logger.debug(f'Download finished for task {task_id}')
+            nbytes = d.get('total_bytes') or d.get('downloaded_bytes') or 0
+            metrics.record_download('douyin', nbytes, d.get('elapsed') or 0)
+            self.timings.add_bytes(task_id, 'download_video', nbytes)
     
     def _parse_cookie_string(self, cookie_str):
         """解析Cookie字符串为yt-dlp可用的格式"""
@@ -467,16 +744,28 @@ class VideoDownloader:
         # yt-dlp可以直接接受Cookie字符串
         return cookie_str
     
+    def _handle_interrupted(self, task_id, interrupted):
+        """任务被暂停或取消：状态已由接口更新，这里只记录日志"""
+        if interrupted.action == 'pause':
+            self._log(task_id, "⏸️  任务已暂停，已下载的部分会在继续时复用")
+        elif interrupted.action == 'stall':
+            self._log(task_id, "⏱️  任务长时间无进度，已中断，等待回收后重试", logging.WARNING)
+        else:
+            self._log(task_id, "⏹️  任务已取消")
+        return False, str(interrupted)
+    
     def download_video(self, url, task_id, storage_path):
+        video_url = 'N/A'
+        token = self.task_control.token(task_id) if self.task_control else None
         try:
             self._log(task_id, "========== 开始下载任务 ==========")
-            self._log(task_id, f"URL: {url}")
-            self._log(task_id, f"存储路径: {storage_path}")
+            self._log(task_id, f"URL: {url}", logging.DEBUG)
+            self._log(task_id, f"存储路径: {storage_path}", logging.DEBUG)
             
             import os
             
             # 阶段1: 检测平台
-            self._log(task_id, "阶段1: 检测视频平台")
+            self._log(task_id, "阶段1: 检测视频平台", logging.DEBUG)
             try:
                 if 'douyin.com' in url or 'v.douyin.com' in url:
                     platform = 'douyin'
@@ -488,7 +777,7 @@ class VideoDownloader:
                     platform = 'unknown'
                 self._log(task_id, f"✅ 平台检测完成: {platform}")
             except Exception as e:
-                self._log(task_id, f"❌ 阶段1失败: 平台检测错误 - {str(e)}")
+                self._log(task_id, f"❌ 阶段1失败: 平台检测错误 - {str(e)}", logging.ERROR)
                 raise Exception(f'平台检测失败: {str(e)}')
             
             # 抖音平台直接使用yt-dlp下载，不经过parser
@@ -496,76 +785,77 @@ class VideoDownloader:
                 self._log(task_id, "📱 检测到抖音平台，使用yt-dlp直接下载")
                 
                 # 阶段2: 创建输出目录
-                self._log(task_id, "阶段2: 创建输出目录")
+                self._log(task_id, "阶段2: 创建输出目录", logging.DEBUG)
                 try:
                     safe_title = self._get_safe_filename('douyin_video')
                     video_dir = os.path.join(storage_path, platform, safe_title)
                     os.makedirs(video_dir, exist_ok=True)
                     self._log(task_id, f"✅ 目录创建成功: {video_dir}")
                 except Exception as e:
-                    self._log(task_id, f"❌ 阶段2失败: 目录创建错误 - {str(e)}")
+                    self._log(task_id, f"❌ 阶段2失败: 目录创建错误 - {str(e)}", logging.ERROR)
                     raise Exception(f'目录创建失败: {str(e)}')
                 
                 mov_path = os.path.join(video_dir, f"{safe_title}.mov")
-                self._log(task_id, f"📄 输出路径: {mov_path}")
+                self._log(task_id, f"📄 输出路径: {mov_path}", logging.DEBUG)
                 
                 # 阶段3: 更新任务状态
-                self._log(task_id, "阶段3: 更新任务状态")
+                self._log(task_id, "阶段3: 更新任务状态", logging.DEBUG)
                 try:
                     self.redis.update_task_status(task_id, 'downloading', progress=0)
                     self._log(task_id, "✅ 任务状态已更新: downloading")
                 except Exception as e:
-                    self._log(task_id, f"❌ 阶段3失败: 更新状态错误 - {str(e)}")
+                    self._log(task_id, f"❌ 阶段3失败: 更新状态错误 - {str(e)}", logging.ERROR)
                     raise Exception(f'更新状态失败: {str(e)}')
                 
                 # 阶段4: 获取Cookie
-                self._log(task_id, "阶段4: 获取抖音Cookie")
+                self._log(task_id, "阶段4: 获取抖音Cookie", logging.DEBUG)
                 try:
-                    cookie_data = self.redis.get_cookie('douyin')
-                    if cookie_data and 'cookie' in cookie_data:
-                        self._log(task_id, f"✅ Cookie已获取 (长度: {len(cookie_data['cookie'])})")
+                    cookies = self.cookie_jars.get('douyin')
+                    if cookies:
+                        self._log(task_id, f"✅ Cookie已获取 (长度: {len(cookies.header)})")
                     else:
-                        self._log(task_id, "⚠️  未找到Cookie，将尝试无Cookie下载")
+                        self._log(task_id, "⚠️  未找到Cookie，将尝试无Cookie下载", logging.WARNING)
                 except Exception as e:
-                    self._log(task_id, f"❌ 阶段4失败: 获取Cookie错误 - {str(e)}")
-                    self._log(task_id, "   ⚠️  将继续尝试无Cookie下载")
-                    cookie_data = None
+                    self._log(task_id, f"❌ 阶段4失败: 获取Cookie错误 - {str(e)}", logging.ERROR)
+                    self._log(task_id, "   ⚠️  将继续尝试无Cookie下载", logging.WARNING)
+                    cookies = None
                 
                 # 阶段5: 调用抖音下载
-                self._log(task_id, "阶段5: 调用抖音下载")
+                self._log(task_id, "阶段5: 调用抖音下载", logging.DEBUG)
                 
                 # 使用video_scraper解析抖音视频信息
                 try:
                     headers = self.headers.copy()
-                    if cookie_data and 'cookie' in cookie_data:
-                        headers['Cookie'] = cookie_data['cookie']
+                    if cookies:
+                        headers['Cookie'] = cookies.header
                         self._log(task_id, "✅ 使用Cookie进行解析")
                     
-                    video_info = self.scraper.scrape_video(url, cookie_data)
+                    with self.timings.stage(task_id, 'parse'):
+                        video_info = self.scraper.scrape_video(url, cookies.data if cookies else None)
                     
                     if not video_info or 'video_url' not in video_info or not video_info['video_url']:
-                        self._log(task_id, "❌ 无法获取抖音视频下载链接")
+                        self._log(task_id, "❌ 无法获取抖音视频下载链接", logging.ERROR)
                         raise Exception('无法获取抖音视频下载链接')
                     
                     video_url = video_info['video_url']
                     self._log(task_id, f"✅ 成功获取视频下载链接: {video_url[:100]}...")
                     
+                    if self._stream_transcode(video_info, headers, mov_path, task_id, token, platform):
+                        self.redis.update_task_status(task_id, 'completed', progress=100, save_path=mov_path)
+                        self._log(task_id, f"✅ 下载任务完成: {mov_path}")
+                        return True, '下载成功'
+                    
                     # 直接下载视频文件
                     self._log(task_id, "📥 开始下载视频文件...")
                     temp_file = os.path.join(video_dir, f"{safe_title}.mp4")
-                    response = requests.get(video_url, headers=headers, timeout=600, stream=True)  # 10分钟超时
-                    response.raise_for_status()
-                    
-                    # 保存视频文件
-                    with open(temp_file, 'wb') as f:
-                        for chunk in response.iter_content(chunk_size=8192):
-                            f.write(chunk)
+                    with self.timings.stage(task_id, 'download_video') as stage:
+                        stage['bytes'] += self._download_stream(video_info.get('video_urls') or video_url, headers, temp_file, task_id, token, platform='douyin')
                     
                     file_size = os.path.getsize(temp_file)
                     self._log(task_id, f"✅ 视频下载完成，文件大小: {file_size} bytes ({file_size / 1024 / 1024:.2f} MB)")
                     
                     # 转码为mov格式
-                    self._log(task_id, "阶段6: 转码为mov格式")
+                    self._log(task_id, "阶段6: 转码为mov格式", logging.DEBUG)
                     self.redis.update_task_status(task_id, 'transcoding', progress=0)
                     self._log(task_id, "✅ 任务状态已更新: transcoding")
                     success, message = self.transcoder.transcode_video(temp_file, mov_path, task_id)
@@ -576,15 +866,18 @@ class VideoDownloader:
                         self._log(task_id, f"✅ 下载任务完成: {mov_path}")
                         return True, '下载成功'
                     else:
-                        self._log(task_id, f"❌ 阶段6失败: 转码失败 - {message}")
+                        if token:
+                            token.check()
+                        self._log(task_id, f"❌ 阶段6失败: 转码失败 - {message}", logging.ERROR)
                         error_msg = f'转码失败: {message}\n\n解析的视频URL: {video_url}'
                         self.redis.update_task_status(task_id, 'failed', error_message=error_msg)
                         return False, error_msg
                         
+                except TaskInterrupted:
+                    raise
                 except Exception as e:
-                    self._log(task_id, f"❌ 阶段5失败: 抖音下载错误 - {str(e)}")
-                    import traceback
-                    traceback.print_exc()
+                    self._log(task_id, f"❌ 阶段5失败: 抖音下载错误 - {str(e)}", logging.ERROR)
+                    logger.exception(f'任务 {task_id} 抖音下载出错')
                     video_url = video_info.get('video_url', 'N/A') if 'video_info' in locals() else 'N/A'
                     error_msg = f'抖音下载失败: {str(e)}\n\n解析的视频URL: {video_url}'
                     self.redis.update_task_status(task_id, 'failed', error_message=error_msg)
@@ -592,36 +885,35 @@ class VideoDownloader:
             
             # 其他平台使用原有的parser逻辑
             # 阶段2: 解析视频信息
-            print(f"🔍 阶段2: 解析视频信息")
+            logger.debug(f"🔍 阶段2: 解析视频信息")
             try:
-                video_info = self.parser.parse_video_info(url)
-                print(f"✅ 视频信息解析成功")
-                print(f"   标题: {video_info.get('title', 'N/A')}")
-                print(f"   平台: {video_info.get('platform', 'N/A')}")
+                with self.timings.stage(task_id, 'parse'):
+                    video_info = self.parser.parse_video_info(url)
+                logger.debug(f"✅ 视频信息解析成功")
+                logger.debug(f"   标题: {video_info.get('title', 'N/A')}")
+                logger.debug(f"   平台: {video_info.get('platform', 'N/A')}")
             except Exception as e:
-                print(f"❌ 阶段2失败: 视频信息解析错误")
-                print(f"   错误详情: {str(e)}")
-                print(f"   错误类型: {type(e).__name__}")
-                import traceback
-                traceback.print_exc()
+                logger.error(f"❌ 阶段2失败: 视频信息解析错误")
+                logger.error(f"   错误详情: {str(e)}")
+                logger.exception(f"   错误类型: {type(e).__name__}")
                 raise Exception(f'视频信息解析失败: {str(e)}')
             
             # 阶段3: 更新任务状态
-            print(f"📊 阶段3: 更新任务状态")
+            logger.debug(f"📊 阶段3: 更新任务状态")
             try:
                 self.redis.update_task_status(
                     task_id, 
                     'downloading',
                     progress=0
                 )
-                print(f"✅ 任务状态已更新: downloading")
+                logger.debug(f"✅ 任务状态已更新: downloading")
             except Exception as e:
-                print(f"❌ 阶段3失败: 更新状态错误")
-                print(f"   错误详情: {str(e)}")
+                logger.error(f"❌ 阶段3失败: 更新状态错误")
+                logger.error(f"   错误详情: {str(e)}")
                 raise Exception(f'更新状态失败: {str(e)}')
             
             platform = video_info['platform']
-            cookie_data = self.redis.get_cookie(platform)
+            cookies = self.cookie_jars.get(platform)
             
             title = video_info['title']
             video_url = video_info['video_url']
@@ -640,7 +932,7 @@ class VideoDownloader:
             mov_path = os.path.join(video_dir, mov_filename)
             
             if platform == 'douyin':
-                return self._download_douyin_with_ytdlp(url, task_id, mov_path)
+                return self._download_douyin_with_ytdlp(url, task_id, mov_path, cookies)
             
             video_filename = f"{safe_title}.mp4"
             video_path = os.path.join(video_dir, video_filename)
@@ -655,99 +947,53 @@ class VideoDownloader:
             headers['Sec-Fetch-Dest'] = 'empty'
             headers['Sec-Fetch-Mode'] = 'cors'
             headers['Sec-Fetch-Site'] = 'same-site'
-            if cookie_data:
-                if platform == 'bilibili' and 'SESSDATA' in cookie_data:
-                    headers['Cookie'] = f'SESSDATA={cookie_data["SESSDATA"]}'
-                elif platform in ['douyin', 'toutiao'] and 'cookie' in cookie_data:
-                    headers['Cookie'] = cookie_data['cookie']
+            if cookies:
+                headers['Cookie'] = cookies.header
+            
+            if self._stream_transcode(video_info, headers, mov_path, task_id, token, platform):
+                self.redis.update_task_status(task_id, 'completed', progress=100, save_path=mov_path)
+                return True, '下载成功'
             
             if audio_url:
                 audio_filename = f"{safe_title}_audio.m4a"
                 audio_path = os.path.join(video_dir, audio_filename)
                 
-                response_audio = requests.get(audio_url, headers=headers, stream=True, timeout=600)  # 10分钟超时
-                response_audio.raise_for_status()
-                
-                total_audio_size = int(response_audio.headers.get('content-length', 0))
-                downloaded_audio_size = 0
-                
-                with open(audio_path, 'wb') as f:
-                    for chunk in response_audio.iter_content(chunk_size=8192):
-                        if chunk:
-                            f.write(chunk)
-                            downloaded_audio_size += len(chunk)
-                
-                response = requests.get(video_url, headers=headers, stream=True, timeout=600)  # 10分钟超时
-                response.raise_for_status()
-                
-                total_size = int(response.headers.get('content-length', 0))
-                downloaded_size = 0
-                start_time = time.time()
-                last_update_time = start_time
-                
-                with open(video_path, 'wb') as f:
-                    for chunk in response.iter_content(chunk_size=8192):
-                        if chunk:
-                            f.write(chunk)
-                            downloaded_size += len(chunk)
-                            current_time = time.time()
-                            if current_time - last_update_time >= 1:
-                                elapsed_time = current_time - start_time
-                                if elapsed_time > 0:
-                                    speed = downloaded_size / elapsed_time
-                                    speed_str = self._format_speed(speed)
-                                    self.redis.update_task_download_speed(task_id, speed_str)
-                                last_update_time = current_time
-                            if total_size > 0:
-                                progress = int(downloaded_size / total_size * 50)
-                                self.redis.update_task_status(task_id, 'downloading', progress=progress)
-                
-                import subprocess
-                merged_filename = f"{safe_title}_merged.mp4"
-                merged_path = os.path.join(video_dir, merged_filename)
-                
-                cmd = [
-                    'ffmpeg',
-                    '-i', video_path,
-                    '-i', audio_path,
-                    '-c:v', 'copy',
-                    '-c:a', 'aac',
-                    '-y',
-                    merged_path
-                ]
+                try:
+                    with self.timings.stage(task_id, 'download_audio') as stage:
+                        stage['bytes'] += self._download_stream(video_info.get('audio_urls') or audio_url, headers, audio_path, task_id, token, progress_start=0, progress_span=10, platform=platform)
+                    with self.timings.stage(task_id, 'download_video') as stage:
+                        stage['bytes'] += self._download_stream(video_info.get('video_urls') or video_url, headers, video_path, task_id, token, progress_start=10, progress_span=40, platform=platform)
+                except TaskInterrupted as e:
+                    if e.action == 'cancel' and os.path.exists(audio_path):
+                        os.remove(audio_path)
+                    raise
                 
-                process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-                process.wait()
+                # DASH 的视频、音频分开下载，复制两路流封装，不重新编码；
+                # H.264 + AAC 直接封装成最终的 mov，其他编码先封装成一个 mp4 再转码
+                inputs = [video_path, audio_path]
+                probe = self.transcoder.probe_inputs(inputs)
+                final = Config.REMUX_COMPATIBLE and self.transcoder.copy_compatible(probe)
+                merged_path = mov_path if final else os.path.join(video_dir, f"{safe_title}_merged.mp4")
+                self.redis.update_task_status(task_id, 'transcoding', progress=0)
+                if final:
+                    self._log(task_id, f"⚡ 编码为 {probe.get('video_codec')}/{probe.get('audio_codec')}，直接封装为mov，不再转码")
+                success, message = self.transcoder.remux(inputs, merged_path, task_id, probe)
+                if not success:
+                    if token:
+                        token.check()
+                    error_msg = f'音视频合并失败: {message}\n\n解析的视频URL: {video_url}'
+                    self.redis.update_task_status(task_id, 'failed', error_message=error_msg)
+                    return False, error_msg
                 
-                if os.path.exists(merged_path):
-                    os.remove(video_path)
-                    os.remove(audio_path)
-                    os.rename(merged_path, video_path)
+                os.remove(video_path)
+                os.remove(audio_path)
+                if final:
+                    self.redis.update_task_status(task_id, 'completed', progress=100, save_path=mov_path)
+                    return True, '下载成功'
+                os.replace(merged_path, video_path)
             else:
-                response = requests.get(video_url, headers=headers, stream=True, timeout=600)  # 10分钟超时
-                response.raise_for_status()
-                
-                total_size = int(response.headers.get('content-length', 0))
-                downloaded_size = 0
-                start_time = time.time()
-                last_update_time = start_time
-                
-                with open(video_path, 'wb') as f:
-                    for chunk in response.iter_content(chunk_size=8192):
-                        if chunk:
-                            f.write(chunk)
-                            downloaded_size += len(chunk)
-                            current_time = time.time()
-                            if current_time - last_update_time >= 1:
-                                elapsed_time = current_time - start_time
-                                if elapsed_time > 0:
-                                    speed = downloaded_size / elapsed_time
-                                    speed_str = self._format_speed(speed)
-                                    self.redis.update_task_download_speed(task_id, speed_str)
-                                last_update_time = current_time
-                            if total_size > 0:
-                                progress = int(downloaded_size / total_size * 100)
-                                self.redis.update_task_status(task_id, 'downloading', progress=progress)
+                with self.timings.stage(task_id, 'download_video') as stage:
+                    stage['bytes'] += self._download_stream(video_info.get('video_urls') or video_url, headers, video_path, task_id, token, platform=platform)
             
             if os.path.exists(video_path):
                 self.redis.update_task_status(task_id, 'transcoding', progress=0)
@@ -758,6 +1004,8 @@ class VideoDownloader:
                     self.redis.update_task_status(task_id, 'completed', progress=100, save_path=mov_path)
                     return True, '下载成功'
                 else:
+                    if token:
+                        token.check()
                     # 添加视频URL到错误信息
                     error_msg = f'转码失败: {message}\n\n解析的视频URL: {video_url}'
                     self.redis.update_task_status(task_id, 'failed', error_message=error_msg)
@@ -768,6 +1016,8 @@ class VideoDownloader:
                 self.redis.update_task_status(task_id, 'failed', error_message=error_msg)
                 return False, error_msg
             
+        except TaskInterrupted as e:
+            return self._handle_interrupted(task_id, e)
         except Exception as e:
             # 添加视频URL到错误信息
             error_msg = f'下载失败: {str(e)}\n\n解析的视频URL: {video_url}'
@@ -1,17 +1,94 @@
-import requests
 import re
 import json
 from urllib.parse import urlparse, parse_qs
 import time
 import random
+import logging
+from config.config import Config
+from . import html_extract, http_client
+from .bilibili_formats import FormatSelector
+from .douyin_resolver import DouyinResolver
+from .ytdlp_pool import YtDlpPool
+
+logger = logging.getLogger(__name__)
+
+# 页面状态里的取值路径，* 匹配任意键（抖音 RENDER_DATA 顶层是数字键）
+DOUYIN_VIDEO_URL_PATHS = html_extract.compile_paths(
+    '*.aweme.detail.video.playAddr.0.src',
+    'loaderData.*.videoInfoRes.item_list.0.video.play_addr.url_list.0',
+    'app.videoDetail.video.playAddr.urlList.0.url',
+    'app.videoDetail.video.downloadAddr.urlList.0.url',
+    'aweme.detail.video.play_addr.url_list.0.url',
+    'aweme_detail.video.play_addr.url_list.0.url',
+)
+DOUYIN_TITLE_PATHS = html_extract.compile_paths(
+    '*.aweme.detail.desc',
+    'loaderData.*.videoInfoRes.item_list.0.desc',
+    'app.videoDetail.desc',
+)
+DOUYIN_ITEM_ID_PATHS = html_extract.compile_paths(
+    '*.aweme.detail.awemeId',
+    'loaderData.*.videoInfoRes.item_list.0.aweme_id',
+    'app.videoDetail.awemeId',
+)
+BILIBILI_TITLE_PATHS = html_extract.compile_paths('videoData.title')
+
+# 页面状态里找不到时的兜底匹配
+_DOUYIN_TITLE_FALLBACK_RES = [re.compile(p) for p in (r'"desc":"([^"]+)"', r'"title":"([^"]+)"')]
+_DOUYIN_ITEM_ID_RES = [re.compile(p) for p in (r'"aweme_id":"(\d+)"', r'"item_ids":\["(\d+)"\]', r'"itemId":"(\d+)"')]
+_BILIBILI_TITLE_FALLBACK_RES = [re.compile(p) for p in (r'"title":"([^"]+)"', r'h1[^>]*>([^<]+)</h1>')]
+_TOUTIAO_TITLE_FALLBACK_RES = [re.compile(p) for p in (r'"title":"([^"]+)"', r'"article_title":"([^"]+)"')]
+_TOUTIAO_ITEM_ID_RES = [re.compile(p) for p in (r'"item_id":"(\d+)"', r'"article_id":"(\d+)"', r'"group_id":"(\d+)"')]
+_URL_RE = re.compile(r'https?://[^\s"\'<>]+')
+_INVALID_VIDEO_URL_RE = re.compile(r'/video/\d+$|/share/video/|www\.douyin\.com/video/|iesdouyin\.com/share/')
+_VALID_VIDEO_URL_RE = re.compile(r'\.mp4|\.m3u8|video.*\.douyinvod\.com|v.*\.douyinvod\.com|api.*\.amemv\.com')
+
+
+def _first_match(patterns, text):
+    for pattern in patterns:
+        match = pattern.search(text)
+        if match:
+            return match.group(1)
+    return None
+
+
+def _is_text(value):
+    return isinstance(value, (str, int)) and str(value) != ''
+
+
+def _is_http_url(value):
+    return isinstance(value, str) and value.startswith(('http', '//'))
+
+
+def _video_url_rank(url):
+    """全文兜底匹配时的优先级，越小越优先；不像视频地址时返回None"""
+    if '.mp4' in url:
+        for rank, host in enumerate(('douyinvod.com', 'amemv.com', 'byteimg.com')):
+            if host in url:
+                return rank
+        return 3
+    if '.m3u8' in url or 'douyinvod' in url:
+        return 4
+    return None
+
+
+def _douyin_video_ready(driver):
+    """播放器的video元素出现并带上地址时视为渲染完成"""
+    return driver.execute_script(
+        "var v = document.querySelector('video');"
+        "return !!v && !!(v.currentSrc || v.src || v.querySelector('source[src]'));"
+    )
 
-try:
-    import yt_dlp
-except ImportError:
-    yt_dlp = None
 
 class VideoScraper:
-    def __init__(self):
+    def __init__(self, browser_pool=None, redis_manager=None, ytdlp_pool=None):
+        # 浏览器池可选：有的抖音页面视频地址由JS渲染，HTML里提取不到
+        self.browser_pool = browser_pool
+        # 解析和下载共用一个 yt-dlp 实例池，解析得到的信息下载时直接复用
+        self.ytdlp = ytdlp_pool or YtDlpPool()
+        # 传入Redis时各提取方法的成功率在进程间共享
+        self.douyin_resolver = DouyinResolver(self, redis_manager)
+        self.bilibili_formats = FormatSelector()
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (iPhone; CPU iPhone OS 16_6 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/16.6 Mobile/15E148 Safari/604.1',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
@@ -48,7 +125,7 @@ class VideoScraper:
             if cookie_data and 'SESSDATA' in cookie_data:
                 headers['Cookie'] = f'SESSDATA={cookie_data["SESSDATA"]}'
             
-            response = requests.get(url, headers=headers, timeout=15, allow_redirects=True)
+            response = http_client.get(url, headers=headers, timeout=15, allow_redirects=True)
             response.encoding = 'utf-8'
             
             title = self._extract_bilibili_title(response.text)
@@ -61,7 +138,7 @@ class VideoScraper:
                 return self._scrape_bilibili_bangumi(url, video_id, headers, title)
             
             api_url = f'https://api.bilibili.com/x/web-interface/view?bvid={video_id}'
-            api_response = requests.get(api_url, headers=headers, timeout=15)
+            api_response = http_client.get(api_url, headers=headers, timeout=15)
             api_data = api_response.json()
             
             if api_data.get('code') != 0:
@@ -79,8 +156,9 @@ class VideoScraper:
             if not cid:
                 raise ValueError('无法获取Bilibili视频CID')
             
-            play_url_api = f'https://api.bilibili.com/x/player/playurl?bvid={video_id}&cid={cid}&qn=80&fnval=16&fourk=1'
-            play_response = requests.get(play_url_api, headers=headers, timeout=15)
+            qn, fnval = self.bilibili_formats.play_params()
+            play_url_api = f'https://api.bilibili.com/x/player/playurl?bvid={video_id}&cid={cid}&qn={qn}&fnval={fnval}&fourk=1'
+            play_response = http_client.get(play_url_api, headers=headers, timeout=15)
             play_data = play_response.json()
             
             if play_data.get('code') != 0:
@@ -92,36 +170,15 @@ class VideoScraper:
                 else:
                     raise ValueError(f'Bilibili播放URL获取失败: {error_msg}')
             
-            play_info = play_data.get('data', {})
-            durl = play_info.get('durl', [])
-            
-            video_url = None
-            audio_url = None
-            
-            if durl:
-                video_url = durl[0].get('url')
-            
-            if not video_url:
-                dash_data = play_info.get('dash', {})
-                if dash_data:
-                    video_list = dash_data.get('video', [])
-                    audio_list = dash_data.get('audio', [])
-                    
-                    if video_list:
-                        video_url = video_list[0].get('baseUrl')
-                    
-                    if audio_list:
-                        audio_url = audio_list[0].get('baseUrl')
-            
-            if not video_url:
+            streams = self._select_bilibili_streams(play_data.get('data', {}), headers)
+            if not streams:
                 raise ValueError('无法获取Bilibili视频下载链接，可能需要登录或视频受版权保护')
             
             return {
                 'title': title,
                 'platform': 'bilibili',
                 'url': url,
-                'video_url': video_url,
-                'audio_url': audio_url,
+                **streams,
                 'video_id': video_id,
                 'cid': cid,
                 'video_type': '短视频'
@@ -138,8 +195,9 @@ class VideoScraper:
             
             ep_id_num = ep_match.group(1)
             
-            api_url = f'https://api.bilibili.com/pgc/player/web/v2/playurl?ep_id={ep_id_num}&qn=80&fnval=16&fourk=1'
-            play_response = requests.get(api_url, headers=headers, timeout=15)
+            qn, fnval = self.bilibili_formats.play_params()
+            api_url = f'https://api.bilibili.com/pgc/player/web/v2/playurl?ep_id={ep_id_num}&qn={qn}&fnval={fnval}&fourk=1'
+            play_response = http_client.get(api_url, headers=headers, timeout=15)
             play_data = play_response.json()
             
             if play_data.get('code') != 0:
@@ -159,35 +217,15 @@ class VideoScraper:
             if not video_info:
                 raise ValueError('番剧视频信息为空')
             
-            durl = video_info.get('durl', [])
-            
-            video_url = None
-            audio_url = None
-            
-            if durl:
-                video_url = durl[0].get('url')
-            
-            if not video_url:
-                dash_data = video_info.get('dash', {})
-                if dash_data:
-                    video_list = dash_data.get('video', [])
-                    audio_list = dash_data.get('audio', [])
-                    
-                    if video_list:
-                        video_url = video_list[0].get('baseUrl')
-                    
-                    if audio_list:
-                        audio_url = audio_list[0].get('baseUrl')
-            
-            if not video_url:
+            streams = self._select_bilibili_streams(video_info, headers)
+            if not streams:
                 raise ValueError('无法获取Bilibili番剧下载链接，可能需要大会员或番剧受版权保护')
             
             return {
                 'title': title,
                 'platform': 'bilibili',
                 'url': url,
-                'video_url': video_url,
-                'audio_url': audio_url,
+                **streams,
                 'video_id': ep_id,
                 'video_type': '番剧'
             }
@@ -195,21 +233,25 @@ class VideoScraper:
         except Exception as e:
             raise Exception(f'Bilibili番剧爬取失败: {str(e)}')
     
+    def _select_bilibili_streams(self, play_info, headers):
+        """按格式策略选流，video_url / audio_url 为探测后最快的镜像，其余镜像留给下载时切换"""
+        probe_headers = headers.copy()
+        probe_headers['Referer'] = 'https://www.bilibili.com'
+        streams = self.bilibili_formats.select(play_info, probe_headers)
+        if not streams:
+            return None
+        streams['video_url'] = streams['video_urls'][0]
+        streams['audio_url'] = streams['audio_urls'][0] if streams['audio_urls'] else None
+        logger.debug(f"B站选流: {streams['video_codec']} {streams['height']}p "
+                     f"{len(streams['video_urls'])}个视频镜像 {len(streams['audio_urls'])}个音频镜像")
+        return streams
+    
     def _extract_bilibili_title(self, html):
-        title_patterns = [
-            r'<title>([^<]+)</title>',
-            r'"title":"([^"]+)"',
-            r'h1[^>]*>([^<]+)</h1>'
-        ]
-        
-        for pattern in title_patterns:
-            match = re.search(pattern, html)
-            if match:
-                title = match.group(1).strip()
-                title = title.replace('_哔哩哔哩_bilibili', '').replace('- 哔哩哔哩', '')
-                return title
-        
-        return '未知标题'
+        title = html_extract.page_title(html) or html_extract.scan(html).find(BILIBILI_TITLE_PATHS, accept=_is_text)
+        title = title or _first_match(_BILIBILI_TITLE_FALLBACK_RES, html)
+        if not title:
+            return '未知标题'
+        return title.replace('_哔哩哔哩_bilibili', '').replace('- 哔哩哔哩', '').strip()
     
     def _extract_bilibili_id(self, url):
         bv_match = re.search(r'BV([a-zA-Z0-9]+)', url)
@@ -229,7 +271,7 @@ class VideoScraper:
     def _resolve_bilibili_bangumi_url(self, ep_id):
         try:
             api_url = f'https://api.bilibili.com/pgc/player/web/v2/playurl?ep_id={ep_id}'
-            response = requests.get(api_url, headers=self.headers, timeout=10)
+            response = http_client.get(api_url, headers=self.headers, timeout=10)
             data = response.json()
             
             if data.get('code') == 0:
@@ -242,7 +284,7 @@ class VideoScraper:
     
     def _resolve_bilibili_short_url(self, short_code):
         try:
-            response = requests.get(f'https://b23.tv/{short_code}', headers=self.headers, timeout=10, allow_redirects=False)
+            response = http_client.get(f'https://b23.tv/{short_code}', headers=self.headers, timeout=10, allow_redirects=False)
             location = response.headers.get('Location', '')
             bv_match = re.search(r'BV([a-zA-Z0-9]+)', location)
             if bv_match:
@@ -253,154 +295,71 @@ class VideoScraper:
     
     def _resolve_douyin_short_url(self, short_code):
         try:
-            print(f'Resolving short URL: https://v.douyin.com/{short_code}')
-            response = requests.get(f'https://v.douyin.com/{short_code}', headers=self.headers, timeout=10, allow_redirects=True)
+            logger.debug(f'Resolving short URL: https://v.douyin.com/{short_code}')
+            response = http_client.get(f'https://v.douyin.com/{short_code}', headers=self.headers, timeout=10, allow_redirects=True)
             final_url = response.url
-            print(f'Redirected to: {final_url}')
+            logger.debug(f'Redirected to: {final_url}')
             
             match = re.search(r'/video/(\d+)', final_url)
             if match:
-                print(f'Found video ID in final URL: {match.group(1)}')
+                logger.debug(f'Found video ID in final URL: {match.group(1)}')
                 return match.group(1)
             
             match = re.search(r'/(\d+)/', final_url)
             if match:
-                print(f'Found video ID in final URL: {match.group(1)}')
+                logger.debug(f'Found video ID in final URL: {match.group(1)}')
                 return match.group(1)
             
-            print('No video ID found in final URL')
+            logger.debug('No video ID found in final URL')
             return None
         except Exception as e:
-            print(f'Error resolving short URL: {e}')
+            logger.warning(f'Error resolving short URL: {e}')
             return None
     
     def _scrape_douyin(self, url, cookie_data=None):
         try:
-            print(f'Using yt-dlp for douyin video scraping: {url}')
-            
             headers = self.headers.copy()
             if cookie_data and 'cookie' in cookie_data:
                 headers['Cookie'] = cookie_data['cookie']
-            
-            ydl_opts = {
-                'format': 'best',
-                'quiet': True,
-                'no_warnings': False,
-                'extract_flat': False,
-                'user_agent': 'Mozilla/5.0 (iPhone; CPU iPhone OS 16_6 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/16.6 Mobile/15E148 Safari/604.1',
-                'cookiefile': None,
-                'nocheckcertificate': True,
-                'ignoreerrors': True,
-            }
-            
-            try:
-                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                    info = ydl.extract_info(url, download=False)
-                    
-                    if info:
-                        title = info.get('title', '未知标题')
-                        video_url = info.get('url')
-                        
-                        if not video_url:
-                            raise ValueError('无法获取视频下载链接')
-                        
-                        return {
-                            'title': title,
-                            'platform': 'douyin',
-                            'url': url,
-                            'video_url': video_url,
-                            'video_id': info.get('id', ''),
-                            'video_type': '短视频'
-                        }
-                    else:
-                        raise ValueError('无法获取视频信息')
-                        
-            except Exception as ytdlp_error:
-                print(f'yt-dlp error: {ytdlp_error}')
-                
-                # 如果yt-dlp不可用，直接跳过到回退方法
-                if yt_dlp is None:
-                    print('yt-dlp not available, falling back to manual scraping method...')
-                else:
-                    print('Falling back to manual scraping method...')
-                return self._scrape_douyin_fallback(url, headers)
-            
+            # 各种提取方法并发竞速，见 DouyinResolver
+            return self.douyin_resolver.resolve(url, headers)
         except Exception as e:
             raise Exception(f'抖音视频爬取失败: {str(e)}')
     
-    def _scrape_douyin_fallback(self, url, headers):
-        title = '未知标题'
+    def _douyin_ytdlp_info(self, url, headers):
+        # Cookie 由实例池按平台装入，headers 只用于其他提取方法
+        info = self.ytdlp.extract_info(url, 'douyin')
+        if not info.get('url'):
+            raise ValueError('无法获取视频下载链接')
+        return {
+            'title': info.get('title', '未知标题'),
+            'video_url': info.get('url'),
+            'video_id': info.get('id', '')
+        }
+    
+    def _render_douyin_video_url(self, url):
         try:
-            response = requests.get(url, headers=headers, timeout=15, allow_redirects=True)
-            response.encoding = 'utf-8'
-            
-            print(f'Response URL: {response.url}')
-            print(f'Response status: {response.status_code}')
-            
-            title = self._extract_douyin_title(response.text)
-            
-            item_ids = self._extract_douyin_item_ids(response.text)
-            print(f'Found item IDs: {item_ids}')
-            
-            # 如果从HTML中提取失败，尝试从URL中提取
-            if not item_ids:
-                print('No item IDs found in HTML, trying to extract from URL...')
-                video_id = self._extract_douyin_video_id(url)
-                if video_id:
-                    item_ids = [video_id]
-                    print(f'Extracted item ID from URL: {video_id}')
-                else:
-                    raise ValueError(f'无法从HTML或URL中获取视频ID (网页标题: {title})')
-            
-            item_id = item_ids[0]
-            print(f'Using item ID: {item_id}')
-            
-            video_url = self._extract_douyin_video_url_from_html(response.text)
-            if not video_url:
-                print('No video URL found in HTML, trying API method...')
-                video_url = self._get_douyin_video_url_from_api(item_id, headers)
-            
-            if not video_url:
-                raise ValueError(f'无法获取抖音视频下载链接 (网页标题: {title})')
-            
-            return {
-                'title': title,
-                'platform': 'douyin',
-                'url': url,
-                'video_url': video_url,
-                'video_id': item_id,
-                'video_type': '短视频'
-            }
-            
+            html = self.browser_pool.render('douyin', url, ready=_douyin_video_ready)
         except Exception as e:
-            error_msg = str(e)
-            if title and '网页标题' not in error_msg:
-                error_msg = f'{error_msg} (网页标题: {title})'
-            raise Exception(f'抖音视频回退爬取失败: {error_msg}')
+            logger.warning(f'浏览器渲染抖音页面失败: {e}')
+            return None
+        return self._extract_douyin_video_url_from_html(html)
     
-    def _extract_douyin_title(self, html):
-        title_patterns = [
-            r'<title>([^<]+)</title>',
-            r'"desc":"([^"]+)"',
-            r'"title":"([^"]+)"'
-        ]
-        
-        for pattern in title_patterns:
-            match = re.search(pattern, html)
-            if match:
-                title = match.group(1).strip()
-                title = title.replace('- 抖音', '').replace('抖音', '')
-                return title
-        
-        return '未知标题'
+    def _extract_douyin_title(self, html, page=None):
+        page = page or html_extract.scan(html)
+        title = page.title or page.find(DOUYIN_TITLE_PATHS, accept=_is_text)
+        title = title or _first_match(_DOUYIN_TITLE_FALLBACK_RES, page.html)
+        if not title:
+            return '未知标题'
+        return title.replace('- 抖音', '').replace('抖音', '').strip()
     
     def _extract_douyin_real_video_url(self, item_id, headers):
         try:
-            print(f'Fetching real video URL for item_id: {item_id}')
+            logger.debug(f'Fetching real video URL for item_id: {item_id}')
             
             api_url = f'https://www.douyin.com/aweme/v1/web/aweme/detail/?aweme_id={item_id}'
             
-            print(f'API URL: {api_url}')
+            logger.debug(f'API URL: {api_url}')
             
             api_headers = headers.copy()
             api_headers.update({
@@ -411,14 +370,14 @@ class VideoScraper:
                 'X-SS-Request-Id': 'test'
             })
             
-            api_response = requests.get(api_url, headers=api_headers, timeout=15)
+            api_response = http_client.get(api_url, headers=api_headers, timeout=15)
             api_response.raise_for_status()
             
-            print(f'API Response status: {api_response.status_code}')
+            logger.debug(f'API Response status: {api_response.status_code}')
             
             try:
                 api_data = api_response.json()
-                print(f'API Data keys: {api_data.keys() if isinstance(api_data, dict) else "Not a dict"}')
+                logger.debug(f'API Data keys: {api_data.keys() if isinstance(api_data, dict) else "Not a dict"}')
                 
                 if 'aweme_detail' in api_data:
                     aweme = api_data['aweme_detail']
@@ -428,13 +387,13 @@ class VideoScraper:
                             urls = video['play_addr']['url_list']
                             if urls and len(urls) > 0:
                                 real_url = urls[0]['url']
-                                print(f'Found real video URL: {real_url[:100]}...')
+                                logger.debug(f'Found real video URL: {real_url[:100]}...')
                                 return real_url
                         if 'download_addr' in video:
                             urls = video['download_addr']['url_list']
                             if urls and len(urls) > 0:
                                 real_url = urls[0]['url']
-                                print(f'Found download URL: {real_url[:100]}...')
+                                logger.debug(f'Found download URL: {real_url[:100]}...')
                                 return real_url
                 
                 if 'aweme_list' in api_data and api_data['aweme_list']:
@@ -445,400 +404,211 @@ class VideoScraper:
                             urls = video['play_addr']['url_list']
                             if urls and len(urls) > 0:
                                 real_url = urls[0]['url']
-                                print(f'Found real video URL: {real_url[:100]}...')
+                                logger.debug(f'Found real video URL: {real_url[:100]}...')
                                 return real_url
                 
-                print('No video URL found in API response')
+                logger.debug('No video URL found in API response')
                 return None
                 
             except ValueError as e:
-                print(f'JSON parsing error: {e}')
+                logger.warning(f'JSON parsing error: {e}')
                 return None
                 
         except Exception as e:
-            print(f'Error fetching real video URL: {e}')
+            logger.warning(f'Error fetching real video URL: {e}')
             return None
     
     def _extract_douyin_video_id(self, url):
-        print(f'Extracting video ID from URL: {url}')
+        logger.debug(f'Extracting video ID from URL: {url}')
         match = re.search(r'/video/(\d+)', url)
         if match:
-            print(f'Found video ID from /video/ pattern: {match.group(1)}')
+            logger.debug(f'Found video ID from /video/ pattern: {match.group(1)}')
             return match.group(1)
         
         match = re.search(r'/(\d+)/', url)
         if match:
-            print(f'Found video ID from /(\d+)/ pattern: {match.group(1)}')
+            logger.debug(f'Found video ID from /(\d+)/ pattern: {match.group(1)}')
             return match.group(1)
         
         match = re.search(r'v\.douyin\.com/([a-zA-Z0-9]+)', url)
         if match:
             short_code = match.group(1)
-            print(f'Found short code: {short_code}, resolving...')
+            logger.debug(f'Found short code: {short_code}, resolving...')
             resolved_id = self._resolve_douyin_short_url(short_code)
-            print(f'Resolved video ID: {resolved_id}')
+            logger.debug(f'Resolved video ID: {resolved_id}')
             return resolved_id
         
-        print('No video ID found')
+        logger.debug('No video ID found')
         return None
     
-    def _extract_douyin_item_ids(self, html):
-        patterns = [
-            r'"aweme_id":"(\d+)"',
-            r'"item_ids":\["(\d+)"\]',
-            r'"itemId":"(\d+)"'
-        ]
+    def _extract_douyin_item_ids(self, html, page=None):
+        page = page or html_extract.scan(html)
+        item_id = page.find(DOUYIN_ITEM_ID_PATHS, accept=_is_text)
+        if item_id:
+            return [str(item_id)]
         
-        for pattern in patterns:
-            matches = re.findall(pattern, html)
+        for pattern in _DOUYIN_ITEM_ID_RES:
+            matches = pattern.findall(page.html)
             if matches:
                 return matches
         
         return []
     
     def _extract_douyin_video_url(self, api_data):
+        urls = self._extract_douyin_video_urls(api_data)
+        return urls[0] if urls else None
+    
+    def _extract_douyin_video_urls(self, api_data):
+        """API数据中 url_list 的全部地址，各条指向不同CDN，下载时可以互相替换"""
         try:
+            video = None
             if isinstance(api_data, dict):
-                if 'item_list' in api_data:
-                    items = api_data['item_list']
-                    if items and len(items) > 0:
-                        item = items[0]
-                        if 'video' in item:
-                            video = item['video']
-                            if 'play_addr' in video:
-                                urls = video['play_addr']['url_list']
-                                if urls and len(urls) > 0:
-                                    return urls[0]['url']
-                            if 'download_addr' in video:
-                                urls = video['download_addr']['url_list']
-                                if urls and len(urls) > 0:
-                                    return urls[0]['url']
-                
-                if 'aweme_details' in api_data:
-                    details = api_data['aweme_details']
-                    if details and len(details) > 0:
-                        detail = details[0]
-                        if 'video' in detail:
-                            video = detail['video']
-                            if 'play_addr' in video:
-                                urls = video['play_addr']['url_list']
-                                if urls and len(urls) > 0:
-                                    return urls[0]['url']
-            
-            return None
+                if api_data.get('item_list'):
+                    video = api_data['item_list'][0].get('video')
+                elif api_data.get('aweme_details'):
+                    video = api_data['aweme_details'][0].get('video')
+            if not video:
+                return []
+            for key in ('play_addr', 'download_addr'):
+                url_list = (video.get(key) or {}).get('url_list') or []
+                urls = [u['url'] if isinstance(u, dict) else u for u in url_list]
+                urls = [u for u in urls if u]
+                if urls:
+                    return urls
+            return []
         except Exception as e:
-            return None
+            return []
     
-    def _extract_douyin_video_url_from_html(self, html):
+    def _extract_douyin_video_url_from_html(self, html, page=None):
         try:
-            print(f'Extracting video URL from HTML, length: {len(html)}')
-            
-            # 首先尝试从HTML中提取渲染数据 (SSR)
-            ssr_patterns = [
-                r'<script[^>]*>window\._SSR_HYDRATED_DATA\s*=\s*({.*?})</script>',
-                r'<script[^>]*>window\.__INITIAL_STATE__\s*=\s*({.*?})</script>',
-                r'<script[^>]*>window\.__data\s*=\s*({.*?})</script>',
-            ]
-            
-            for pattern in ssr_patterns:
-                match = re.search(pattern, html, re.DOTALL)
-                if match:
-                    print(f'Found SSR data in HTML')
-                    try:
-                        import json
-                        data = json.loads(match.group(1))
-                        print(f'SSR data keys: {list(data.keys())[:5] if isinstance(data, dict) else "N/A"}')
-                        
-                        # 尝试从SSR数据中提取视频URL
-                        video_url = self._extract_from_ssr_data(data)
-                        if video_url:
-                            print(f'Found video URL from SSR data: {video_url[:100]}...')
-                            return video_url
-                    except Exception as e:
-                        print(f'Error parsing SSR data: {e}')
+            page = page or html_extract.scan(html)
+            logger.debug(f'Extracting video URL from HTML, length: {len(page.html)}')
+            
+            # 首先从页面状态 (RENDER_DATA / SSR) 中按路径提取
+            video_url = self._extract_from_ssr_data(page)
+            if video_url:
+                logger.debug(f'Found video URL from SSR data: {video_url[:100]}...')
+                return video_url
             
             # 尝试从JSON-LD中提取
-            jsonld_pattern = r'<script type="application/ld\+json">({.*?})</script>'
-            jsonld_matches = re.findall(jsonld_pattern, html, re.DOTALL)
-            for jsonld_str in jsonld_matches:
-                try:
-                    import json
-                    data = json.loads(jsonld_str)
-                    if 'contentUrl' in data:
-                        url = data['contentUrl']
-                        if self._is_valid_video_url(url):
-                            print(f'Found video URL from JSON-LD: {url[:100]}...')
-                            return url
-                except Exception as e:
-                    print(f'Error parsing JSON-LD: {e}')
+            for url in page.json_ld_values('contentUrl'):
+                if self._is_valid_video_url(url):
+                    logger.debug(f'Found video URL from JSON-LD: {url[:100]}...')
+                    return url
             
             # 尝试从meta标签中提取
-            meta_patterns = [
-                r'<meta[^>]*property="og:video"[^>]*content="([^"]+)"',
-                r'<meta[^>]*property="og:video:url"[^>]*content="([^"]+)"',
-                r'<meta[^>]*name="twitter:player:stream"[^>]*content="([^"]+)"',
-            ]
-            for pattern in meta_patterns:
-                match = re.search(pattern, html)
-                if match:
-                    url = match.group(1)
-                    if self._is_valid_video_url(url):
-                        print(f'Found video URL from meta tag: {url[:100]}...')
-                        return url
-            
-            # 尝试匹配视频URL模式 (优先匹配视频流URL)
-            video_patterns = [
-                # 优先匹配douyinvod视频流
-                r'https://[^"\s<>]*douyinvod\.com[^"\s<>]*\.mp4[^"\s<>]*',
-                r'https://[^"\s<>]*amemv\.com[^"\s<>]*\.mp4[^"\s<>]*',
-                r'https://[^"\s<>]*byteimg\.com[^"\s<>]*\.mp4[^"\s<>]*',
-                # 通用mp4
-                r'https?://[^"\s<>]+\.mp4[^"\s<>]*',
-                # play_addr模式
-                r'"play_addr":\{[^}]*"url_list":\[[^]]*"url":"([^"]+)"',
-                r'"download_addr":\{[^}]*"url_list":\[[^]]*"url":"([^"]+)"',
-            ]
-            
-            for i, pattern in enumerate(video_patterns):
-                matches = re.findall(pattern, html)
-                if matches:
-                    print(f'Found match with pattern {i}')
-                    for url in matches:
-                        url = url.replace('\\u0026', '&').replace('\\u003D', '=').replace('\\', '').replace('"', '')
-                        if url.startswith('http'):
-                            if 'monitor' in url or 'collect' in url or 'batch' in url:
-                                print(f'Skipping monitor API URL: {url[:100]}...')
-                                continue
-                            # 检查是否是真实的视频URL
-                            if self._is_valid_video_url(url):
-                                print(f'Extracted video URL: {url[:100]}...')
-                                return url
-                            else:
-                                print(f'Skipping invalid URL: {url[:100]}...')
-            
-            # 最后尝试查找所有URL
-            all_urls = re.findall(r'https?://[^\s"\'<>]+', html)
-            print(f'Found {len(all_urls)} total URLs in HTML')
-            for url in all_urls:
+            for key in ('og:video', 'og:video:url', 'twitter:player:stream'):
+                url = page.meta.get(key)
+                if self._is_valid_video_url(url):
+                    logger.debug(f'Found video URL from meta tag: {url[:100]}...')
+                    return url
+            
+            # 最后在全文中查找视频流地址，一次找出所有URL后按优先级挑选
+            candidates = []
+            for url in _URL_RE.findall(page.html):
+                url = url.replace('\\u0026', '&').replace('\\u003D', '=').replace('\\', '')
                 if 'monitor' in url or 'collect' in url or 'batch' in url:
                     continue
-                if '.mp4' in url or '.m3u8' in url or 'douyinvod' in url:
-                    url = url.replace('\\u0026', '&').replace('\\u003D', '=').replace('\\', '')
-                    if self._is_valid_video_url(url):
-                        print(f'Found video URL: {url[:100]}...')
-                        return url
-            
-            print('No video URL found in HTML')
+                rank = _video_url_rank(url)
+                if rank is not None and self._is_valid_video_url(url):
+                    candidates.append((rank, len(candidates), url))
+            logger.debug(f'Found {len(candidates)} candidate video URLs in HTML')
+            if candidates:
+                url = min(candidates)[2]
+                logger.debug(f'Extracted video URL: {url[:100]}...')
+                return url
+            
+            logger.debug('No video URL found in HTML')
             return None
         except Exception as e:
-            print(f'Error extracting video URL from HTML: {e}')
-            import traceback
-            traceback.print_exc()
+            logger.warning(f'Error extracting video URL from HTML: {e}')
             return None
     
-    def _extract_from_ssr_data(self, data):
-        """从SSR数据中提取视频URL"""
-        try:
-            if isinstance(data, dict):
-                # 尝试不同的路径
-                paths = [
-                    ['app', 'videoDetail', 'video', 'playAddr', 'urlList', 0, 'url'],
-                    ['app', 'videoDetail', 'video', 'downloadAddr', 'urlList', 0, 'url'],
-                    ['aweme', 'detail', 'video', 'play_addr', 'url_list', 0, 'url'],
-                    ['aweme_detail', 'video', 'play_addr', 'url_list', 0, 'url'],
-                ]
-                
-                for path in paths:
-                    current = data
-                    for key in path:
-                        if isinstance(current, dict) and key in current:
-                            current = current[key]
-                        elif isinstance(current, list) and isinstance(key, int) and key < len(current):
-                            current = current[key]
-                        else:
-                            current = None
-                            break
-                    
-                    if current and isinstance(current, str) and current.startswith('http'):
-                        return current
-            
-            return None
-        except Exception as e:
-            print(f'Error extracting from SSR data: {e}')
-            return None
+    def _extract_from_ssr_data(self, page):
+        """从页面状态中提取视频URL"""
+        url = page.find(DOUYIN_VIDEO_URL_PATHS, accept=_is_http_url)
+        if url and url.startswith('//'):
+            url = 'https:' + url
+        return url
     
     def _is_valid_video_url(self, url):
         """检查URL是否是有效的视频URL"""
         if not url or not isinstance(url, str):
             return False
-        
-        # 排除网页URL
-        invalid_patterns = [
-            r'/video/\d+$',  # 抖音视频页面
-            r'/share/video/',  # 分享页面
-            r'www\.douyin\.com/video/',  # 抖音网页
-            r'iesdouyin\.com/share/',  # 分享页面
-        ]
-        
-        for pattern in invalid_patterns:
-            if re.search(pattern, url):
-                return False
-        
-        # 必须是有效的视频流URL
-        valid_patterns = [
-            r'\.mp4',
-            r'\.m3u8',
-            r'video.*\.douyinvod\.com',
-            r'v.*\.douyinvod\.com',
-            r'api.*\.amemv\.com',
-        ]
-        
-        for pattern in valid_patterns:
-            if re.search(pattern, url):
-                return True
-        
-        return False
+        # 排除网页URL，必须是视频流URL
+        return not _INVALID_VIDEO_URL_RE.search(url) and bool(_VALID_VIDEO_URL_RE.search(url))
     
-    def _get_douyin_video_url_from_api(self, item_id, headers):
-        """通过抖音API获取视频URL"""
+    def _fetch_douyin_api(self, api_url, headers):
+        """请求一个抖音API端点，返回视频URL列表（各CDN镜像）或None"""
+        logger.debug(f'Trying API: {api_url}')
         try:
-            print(f'Trying to get video URL from API for item_id: {item_id}')
-            
-            # 尝试多个API端点
-            api_urls = [
-                f'https://www.douyin.com/aweme/v1/web/aweme/detail/?aweme_id={item_id}',
-                f'https://www.iesdouyin.com/web/api/v2/aweme/iteminfo/?item_ids={item_id}',
-            ]
-            
-            for api_url in api_urls:
-                print(f'Trying API: {api_url}')
-                try:
-                    api_headers = headers.copy()
-                    api_headers.update({
-                        'Accept': 'application/json, text/plain, */*',
-                        'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
-                        'Referer': 'https://www.douyin.com/',
-                        'Sec-Fetch-Dest': 'empty',
-                        'Sec-Fetch-Mode': 'cors',
-                        'Sec-Fetch-Site': 'same-origin',
-                        'X-Requested-With': 'XMLHttpRequest',
-                    })
-                    
-                    # 添加session来保持cookies
-                    session = requests.Session()
-                    api_response = session.get(api_url, headers=api_headers, timeout=10)
-                    print(f'API response status: {api_response.status_code}')
-                    print(f'API response content length: {len(api_response.text)}')
-                    print(f'API response content preview: {api_response.text[:200]}...')
-                    
-                    if api_response.status_code == 200:
-                        # 检查内容是否为空
-                        if not api_response.text or api_response.text.strip() == '':
-                            print('API response is empty')
-                            continue
-                        
-                        # 检查是否是JSON格式
-                        content_type = api_response.headers.get('Content-Type', '')
-                        print(f'Content-Type: {content_type}')
-                        
-                        if 'json' not in content_type.lower():
-                            print(f'API did not return JSON, got: {content_type}')
-                            # 可能是HTML错误页面或重定向
-                            if '<html' in api_response.text.lower():
-                                print('API returned HTML instead of JSON')
-                            continue
-                        
-                        try:
-                            api_data = api_response.json()
-                            print(f'API data type: {type(api_data)}')
-                            print(f'API data keys: {list(api_data.keys()) if isinstance(api_data, dict) else "N/A"}')
-                            
-                            if isinstance(api_data, dict):
-                                # 尝试提取视频URL
-                                video_url = self._extract_douyin_video_url(api_data)
-                                if video_url:
-                                    print(f'Found video URL from API: {video_url[:100]}...')
-                                    return video_url
-                        except Exception as e:
-                            print(f'Error parsing API response: {e}')
-                            continue
-                            
-                except Exception as e:
-                    print(f'Error with API {api_url}: {e}')
-                    continue
+            api_headers = headers.copy()
+            api_headers.update({
+                'Accept': 'application/json, text/plain, */*',
+                'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
+                'Referer': 'https://www.douyin.com/',
+                'Sec-Fetch-Dest': 'empty',
+                'Sec-Fetch-Mode': 'cors',
+                'Sec-Fetch-Site': 'same-origin',
+                'X-Requested-With': 'XMLHttpRequest',
+            })
             
-            print('All API methods failed')
+            api_response = http_client.get(api_url, headers=api_headers, timeout=10)
+            logger.debug(f'API response status: {api_response.status_code}')
+            logger.debug(f'API response content length: {len(api_response.text)}')
             
-            # 尝试第三方解析服务
-            print('Trying third-party parsing service...')
-            video_url = self._get_douyin_video_from_third_party(item_id)
-            if video_url:
-                print(f'Found video URL from third-party: {video_url[:100]}...')
-                return video_url
+            if api_response.status_code != 200:
+                return None
             
-            return None
+            # 检查内容是否为空
+            if not api_response.text or api_response.text.strip() == '':
+                logger.debug('API response is empty')
+                return None
+            
+            # 检查是否是JSON格式
+            content_type = api_response.headers.get('Content-Type', '')
+            if 'json' not in content_type.lower():
+                logger.debug(f'API did not return JSON, got: {content_type}')
+                return None
             
+            api_data = api_response.json()
+            if isinstance(api_data, dict):
+                video_urls = self._extract_douyin_video_urls(api_data)
+                if video_urls:
+                    logger.debug(f'Found {len(video_urls)} video URLs from API: {video_urls[0][:100]}...')
+                    return video_urls
         except Exception as e:
-            print(f'Error in _get_douyin_video_url_from_api: {e}')
-            return None
+            logger.warning(f'Error with API {api_url}: {e}')
+        return None
     
-    def _get_douyin_video_from_third_party(self, item_id):
-        """使用第三方抖音视频解析服务"""
+    def _fetch_douyin_third_party(self, parser_url):
+        """请求一个第三方解析服务，返回视频URL或None"""
+        logger.debug(f'Trying third-party parser: {parser_url}')
         try:
-            # 尝试多个第三方解析服务
-            parser_urls = [
-                f'https://api.douyin.wtf/api?url=https://www.douyin.com/video/{item_id}',
-                f'https://douyin.wtf/api?url=https://www.douyin.com/video/{item_id}',
-                f'https://www.iesdouyin.com/web/api/v2/aweme/iteminfo/?item_ids={item_id}',
-                f'https://api.peark.com/api/douyin/video?url=https://www.douyin.com/video/{item_id}',
-                f'https://api.52dyc.cn/douyin/api?url=https://www.douyin.com/video/{item_id}',
-            ]
-            
-            for parser_url in parser_urls:
-                print(f'Trying third-party parser: {parser_url}')
-                try:
-                    response = requests.get(parser_url, timeout=10)
-                    print(f'Third-party response status: {response.status_code}')
-                    print(f'Third-party response content length: {len(response.text)}')
-                    print(f'Third-party response preview: {response.text[:200]}...')
-                    
-                    if response.status_code == 200:
-                        try:
-                            data = response.json()
-                            print(f'Third-party data type: {type(data)}')
-                            print(f'Third-party data keys: {list(data.keys()) if isinstance(data, dict) else "N/A"}')
-                            
-                            # 尝试多种可能的字段名
-                            possible_keys = ['url', 'video_url', 'data', 'video', 'play_url', 'play_addr']
-                            for key in possible_keys:
-                                if key in data:
-                                    video_url = data[key]
-                                    if isinstance(video_url, str) and video_url.startswith('http'):
-                                        if self._is_valid_video_url(video_url):
-                                            print(f'Found video URL from third-party (key={key}): {video_url[:100]}...')
-                                            return video_url
-                                    elif isinstance(video_url, dict) and 'url' in video_url:
-                                        if self._is_valid_video_url(video_url['url']):
-                                            print(f'Found video URL from third-party (nested): {video_url["url"][:100]}...')
-                                            return video_url['url']
-                                    
-                        except Exception as e:
-                            print(f'Error parsing third-party response: {e}')
-                            import traceback
-                            traceback.print_exc()
-                            continue
-                except Exception as e:
-                    print(f'Error with third-party parser: {e}')
-                    continue
+            response = http_client.get(parser_url, timeout=10)
+            logger.debug(f'Third-party response status: {response.status_code}')
             
-            print('All third-party parsers failed')
-            return None
+            if response.status_code != 200:
+                return None
+            
+            data = response.json()
             
+            # 尝试多种可能的字段名
+            possible_keys = ['url', 'video_url', 'data', 'video', 'play_url', 'play_addr']
+            for key in possible_keys:
+                if key in data:
+                    video_url = data[key]
+                    if isinstance(video_url, str) and video_url.startswith('http'):
+                        if self._is_valid_video_url(video_url):
+                            logger.debug(f'Found video URL from third-party (key={key}): {video_url[:100]}...')
+                            return video_url
+                    elif isinstance(video_url, dict) and 'url' in video_url:
+                        if self._is_valid_video_url(video_url['url']):
+                            logger.debug(f'Found video URL from third-party (nested): {video_url["url"][:100]}...')
+                            return video_url['url']
         except Exception as e:
-            print(f'Error in _get_douyin_video_from_third_party: {e}')
-            import traceback
-            traceback.print_exc()
-            return None
+            logger.warning(f'Error with third-party parser {parser_url}: {e}')
+        return None
     
     def _scrape_toutiao(self, url, cookie_data=None):
         try:
@@ -846,7 +616,7 @@ class VideoScraper:
             if cookie_data and 'cookie' in cookie_data:
                 headers['Cookie'] = cookie_data['cookie']
             
-            response = requests.get(url, headers=headers, timeout=15, allow_redirects=True)
+            response = http_client.get(url, headers=headers, timeout=15, allow_redirects=True)
             response.encoding = 'utf-8'
             
             title = self._extract_toutiao_title(response.text)
@@ -860,7 +630,7 @@ class VideoScraper:
                 raise ValueError('无法获取今日头条视频信息')
             
             api_url = f'https://www.toutiao.com/video/article/v2/article_info/?item_id={item_id}'
-            api_response = requests.get(api_url, headers=headers, timeout=15)
+            api_response = http_client.get(api_url, headers=headers, timeout=15)
             
             if api_response.status_code != 200:
                 raise ValueError('今日头条API请求失败')
@@ -887,20 +657,11 @@ class VideoScraper:
             raise Exception(f'今日头条视频爬取失败: {str(e)}')
     
     def _extract_toutiao_title(self, html):
-        title_patterns = [
-            r'<title>([^<]+)</title>',
-            r'"title":"([^"]+)"',
-            r'"article_title":"([^"]+)"'
-        ]
-        
-        for pattern in title_patterns:
-            match = re.search(pattern, html)
-            if match:
-                title = match.group(1).strip()
-                title = title.replace('- 今日头条', '').replace('今日头条', '')
-                return title
-        
-        return '未知标题'
+        title = html_extract.page_title(html)
+        title = title or _first_match(_TOUTIAO_TITLE_FALLBACK_RES, html)
+        if not title:
+            return '未知标题'
+        return title.replace('- 今日头条', '').replace('今日头条', '').strip()
     
     def _extract_toutiao_video_id(self, url):
         match = re.search(r'/video/(\d+)', url)
@@ -914,18 +675,7 @@ class VideoScraper:
         return None
     
     def _extract_toutiao_item_id(self, html):
-        patterns = [
-            r'"item_id":"(\d+)"',
-            r'"article_id":"(\d+)"',
-            r'"group_id":"(\d+)"'
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, html)
-            if match:
-                return match.group(1)
-        
-        return None
+        return _first_match(_TOUTIAO_ITEM_ID_RES, html)
     
     def _extract_toutiao_video_url(self, api_data):
         try:
@@ -1,21 +1,125 @@
 import subprocess
 import os
+import errno
+import fcntl
+import functools
+import json
+import select
+import logging
+import glob
+import shutil
+import socket
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from core.redis_manager import RedisManager
+from core.encoding_policy import EncodingPolicy
+from core.task_logger import TaskLogSink
+from core.task_timings import TaskTimings
+from core import metrics
 from config.config import Config
 
+logger = logging.getLogger(__name__)
+
+
+def _open_fifo(path, process):
+    """以写方式打开命名管道
+
+    FFmpeg 按顺序打开各路输入，还没打开到这一路时不阻塞等待，FFmpeg 已退出时报错。
+    """
+    while True:
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_NONBLOCK)
+            break
+        except OSError as e:
+            if e.errno != errno.ENXIO:
+                raise
+        if process.poll() is not None:
+            raise Exception('FFmpeg 未读取输入就已退出')
+        time.sleep(0.05)
+    # 管道缓冲加大到一个下载块，一次写入；超过系统上限时保持默认
+    if hasattr(fcntl, 'F_SETPIPE_SZ'):
+        try:
+            fcntl.fcntl(fd, fcntl.F_SETPIPE_SZ, Config.DOWNLOAD_CHUNK_SIZE)
+        except OSError:
+            pass
+    return fd
+
+
+def _write_fifo(fd, data):
+    """写入非阻塞管道；FFmpeg 超过 STREAM_STALL_TIMEOUT 秒不读取时报错"""
+    view = memoryview(data)
+    while view:
+        _, writable, _ = select.select([], [fd], [], Config.STREAM_STALL_TIMEOUT)
+        if not writable:
+            raise Exception(f'FFmpeg 超过{Config.STREAM_STALL_TIMEOUT}秒未读取输入')
+        try:
+            view = view[os.write(fd, view):]
+        except BlockingIOError:
+            continue
+
+
+class SegmentProgress:
+    """分段转码的整体进度：各编码步骤已编码秒数之和占总工作量的比例，最高记到95%
+
+    百分比不变时也每隔 TRANSCODE_PROGRESS_INTERVAL 秒刷新一次任务状态，
+    长时间编码一段或切分、拼接时不会被心跳当作卡死。
+    """
+
+    def __init__(self, redis_manager, task_id, total_seconds):
+        self.redis = redis_manager
+        self.task_id = task_id
+        self.total_seconds = total_seconds
+        self.encoded = {}
+        self.reported = 0
+        self.written = None
+        self.written_at = 0
+        self._lock = threading.Lock()
+
+    def step(self, index):
+        """第 index 个编码步骤的进度回调，以已编码的秒数调用"""
+        return functools.partial(self.update, index)
+
+    def update(self, index, seconds):
+        with self._lock:
+            self.encoded[index] = seconds
+            if self.total_seconds > 0:
+                done = min(sum(self.encoded.values()) / self.total_seconds, 1)
+                self.reported = max(self.reported, int(done * 95))
+        self._write()
+
+    def keepalive(self, seconds=None):
+        """不计入进度的步骤（切分、拼接）的进度回调，只刷新任务状态"""
+        self._write()
+
+    def _write(self):
+        if not self.task_id:
+            return
+        with self._lock:
+            now = time.monotonic()
+            if self.written == self.reported and now - self.written_at < Config.TRANSCODE_PROGRESS_INTERVAL:
+                return
+            self.written, self.written_at = self.reported, now
+            progress = self.written
+        self.redis.update_task_status(self.task_id, 'transcoding', progress=progress)
+
+
 class VideoTranscoder:
-    def __init__(self, redis_manager):
+    def __init__(self, redis_manager, task_control=None, log_sink=None, timings=None):
         self.redis = redis_manager
+        self.task_control = task_control
+        self.log_sink = log_sink or TaskLogSink(redis_manager)
+        self.timings = timings or TaskTimings(redis_manager)
         self.ffmpeg_path = Config.FFMPEG_PATH
+        self.ffprobe_path = Config.FFPROBE_PATH
         self.output_format = Config.OUTPUT_FORMAT
+        self.encoding_policy = EncodingPolicy()
     
-    def _log(self, task_id, message):
+    def _log(self, task_id, message, level=logging.INFO):
         """记录任务日志"""
-        if task_id:
-            self.redis.add_task_log(task_id, message)
-            print(f"[{task_id[:8]}] {message}")
-        else:
-            print(f"[LOG] {message}")
+        self.log_sink.log(task_id, message, level)
     
     def check_ffmpeg_installed(self):
         try:
@@ -30,16 +134,22 @@ class VideoTranscoder:
             return False
     
     def transcode_video(self, input_file, output_file, task_id=None):
+        with self.timings.stage(task_id, 'transcode') as stage:
+            if os.path.exists(input_file):
+                stage['bytes'] += os.path.getsize(input_file)
+            return self._transcode_video(input_file, output_file, task_id)
+    
+    def _transcode_video(self, input_file, output_file, task_id):
         self._log(task_id, "========== 开始视频转码 ==========")
-        self._log(task_id, f"输入文件: {input_file}")
-        self._log(task_id, f"输出文件: {output_file}")
+        self._log(task_id, f"输入文件: {input_file}", logging.DEBUG)
+        self._log(task_id, f"输出文件: {output_file}", logging.DEBUG)
         
         if not self.check_ffmpeg_installed():
-            self._log(task_id, "❌ FFmpeg未安装")
+            self._log(task_id, "❌ FFmpeg未安装", logging.ERROR)
             raise Exception('FFmpeg未安装，无法进行视频转码')
         
         if not os.path.exists(input_file):
-            self._log(task_id, f"❌ 输入文件不存在: {input_file}")
+            self._log(task_id, f"❌ 输入文件不存在: {input_file}", logging.ERROR)
             raise Exception(f'输入文件不存在: {input_file}')
         
         output_dir = os.path.dirname(output_file)
@@ -48,73 +158,463 @@ class VideoTranscoder:
             self._log(task_id, f"✅ 创建输出目录: {output_dir}")
         
         try:
-            # 获取视频时长
-            self._log(task_id, "📊 获取视频时长...")
-            duration = self._get_video_duration(input_file)
+            # 获取视频时长和分辨率
+            self._log(task_id, "📊 获取视频信息...", logging.DEBUG)
+            probe = self._probe_video(input_file)
+            duration = probe.get('duration', 0)
             if duration <= 0:
                 duration = 3600  # 默认1小时
-                self._log(task_id, "⚠️  无法获取视频时长，使用默认值3600秒")
+                self._log(task_id, "⚠️  无法获取视频时长，使用默认值3600秒", logging.WARNING)
             else:
                 self._log(task_id, f"✅ 视频时长: {duration}秒 ({duration/60:.2f}分钟)")
             
+            encoding = self._select_encoding(probe, task_id)
+            self._log(task_id, f"⚙️  编码参数: preset={encoding['preset']} crf={encoding['crf']} threads={encoding['threads']}")
+            
+            if probe.get('duration', 0) >= Config.SEGMENTED_TRANSCODE_MIN_DURATION:
+                return self._transcode_segmented(input_file, output_file, task_id, probe, encoding)
+            
+            timeout = self._transcode_timeout(duration)
             self._log(task_id, "🎬 开始FFmpeg转码...")
             cmd = [
                 self.ffmpeg_path,
+                '-nostats',
+                '-progress', 'pipe:1',  # 机器可读的进度输出到stdout
                 '-i', input_file,
-                '-c:v', 'libx264',
-                '-preset', 'medium',
-                '-crf', '23',
-                '-c:a', 'aac',
-                '-b:a', '128k',
-                '-movflags', '+faststart',
-                '-f', 'mov',
+            ] + self._encode_args(encoding) + [
                 '-y',  # 覆盖输出文件
                 output_file
             ]
+            return self._run_transcode(cmd, task_id, duration, timeout, output_file)
+                
+        except Exception as e:
+            self._log(task_id, f"❌ 转码异常: {str(e)}", logging.ERROR)
+            return False, f'转码异常: {str(e)}'
+    
+    def transcode_stream(self, feeds, output_file, task_id=None, info=None, copy=False):
+        """边下载边转码：每一路输入（视频、音频）经一个命名管道直接送入FFmpeg，不落地中间文件
+        
+        feeds 中每个函数以 feed(write) 调用，把数据依次交给 write；两路时第一路取视频、第二路取音频。
+        info 是解析阶段已知的 duration、width、height，用于选编码参数和计算进度；
+        时长未知时进度由调用方按下载字节数上报。copy 为True时不重新编码，只封装。
+        """
+        info = info or {}
+        with self.timings.stage(task_id, 'stream_transcode') as stage:
+            sent = [0] * len(feeds)
+            try:
+                return self._transcode_stream(feeds, output_file, task_id, info, sent, copy)
+            finally:
+                stage['bytes'] += sum(sent)
+    
+    def _transcode_stream(self, feeds, output_file, task_id, info, sent, copy):
+        self._log(task_id, "========== 开始边下载边转码 ==========")
+        self._log(task_id, f"输出文件: {output_file}", logging.DEBUG)
+        
+        if not self.check_ffmpeg_installed():
+            self._log(task_id, "❌ FFmpeg未安装", logging.ERROR)
+            raise Exception('FFmpeg未安装，无法进行视频转码')
+        
+        output_dir = os.path.dirname(output_file)
+        os.makedirs(output_dir, exist_ok=True)
+        work_dir = tempfile.mkdtemp(prefix='.pipes_', dir=output_dir)
+        try:
+            duration = info.get('duration') or 0
+            if copy:
+                output_args = self._copy_args(output_file)
+                timeout = self._transcode_timeout(duration, Config.REMUX_TIMEOUT_FACTOR)
+            else:
+                probe = {'duration': duration, 'width': info.get('width') or 0, 'height': info.get('height') or 0}
+                encoding = self._select_encoding(probe, task_id)
+                self._log(task_id, f"⚙️  编码参数: preset={encoding['preset']} crf={encoding['crf']} threads={encoding['threads']}")
+                output_args = self._encode_args(encoding)
+                timeout = self._transcode_timeout(duration)
             
-            self._log(task_id, f"📋 FFmpeg命令: {' '.join(cmd)}")
-            
-            process = subprocess.Popen(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                universal_newlines=True,
-                bufsize=1  # 行缓冲
-            )
+            cmd = [self.ffmpeg_path, '-nostats', '-progress', 'pipe:1']
+            feeders = []
+            for index, feed in enumerate(feeds):
+                path = os.path.join(work_dir, f'input_{index}')
+                os.mkfifo(path)
+                cmd += ['-i', path]
+                feeders.append(functools.partial(self._feed_fifo, feed, path, sent, index))
+            if len(feeds) > 1:
+                cmd += ['-map', '0:v:0', '-map', '1:a:0']
+            cmd += output_args + ['-y', output_file]
             
+            label = '封装' if copy else '转码'
+            self._log(task_id, f"🎬 开始FFmpeg{label}，{len(feeds)}路输入经管道送入...")
+            return self._run_transcode(cmd, task_id, duration, timeout, output_file, feeders, label)
+        except Exception as e:
+            self._log(task_id, f"❌ 转码异常: {str(e)}", logging.ERROR)
+            return False, f'转码异常: {str(e)}'
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    
+    def _feed_fifo(self, feed, path, sent, index, process):
+        fd = _open_fifo(path, process)
+        
+        def write(data):
+            _write_fifo(fd, data)
+            sent[index] += len(data)
+        
+        try:
+            feed(write)
+        finally:
+            # 关闭写端后FFmpeg读到文件结束
+            os.close(fd)
+    
+    def remux(self, inputs, output_file, task_id=None, probe=None):
+        """不重新编码，把各路输入（DASH 的视频、音频）封装成一个文件
+        
+        两路输入时取第一路的视频和第二路的音频；一次写出，moov 直接放在文件开头（faststart）。
+        封装格式按 output_file 的扩展名（mov / mp4）。probe 为 probe_inputs 的结果，没有时现读。
+        """
+        with self.timings.stage(task_id, 'merge') as stage:
+            stage['bytes'] += sum(os.path.getsize(path) for path in inputs if os.path.exists(path))
+            try:
+                probe = probe or self.probe_inputs(inputs)
+                duration = probe.get('duration', 0)
+                cmd = [self.ffmpeg_path, '-nostats', '-progress', 'pipe:1']
+                for path in inputs:
+                    cmd += ['-i', path]
+                if len(inputs) > 1:
+                    cmd += ['-map', '0:v:0', '-map', '1:a:0']
+                cmd += self._copy_args(output_file) + ['-y', output_file]
+                self._log(task_id, f"📦 封装{len(inputs)}路输入，不重新编码...")
+                return self._run_transcode(cmd, task_id, duration,
+                                           self._transcode_timeout(duration, Config.REMUX_TIMEOUT_FACTOR),
+                                           output_file, label='封装')
+            except Exception as e:
+                self._log(task_id, f"❌ 封装异常: {str(e)}", logging.ERROR)
+                return False, f'封装异常: {str(e)}'
+    
+    def probe_inputs(self, inputs):
+        """读取各路输入的容器头，合并成一份：时长取最长，视频、音频信息取第一个有的"""
+        merged = {'duration': 0}
+        for path in inputs:
+            info = self._probe_video(path)
+            merged['duration'] = max(merged['duration'], info.pop('duration', 0))
+            for key, value in info.items():
+                merged.setdefault(key, value)
+        return merged
+    
+    def copy_compatible(self, probe):
+        """H.264 视频 + AAC 音频（或没有音频）可以直接封装成 mov，与转码的输出编码相同"""
+        return probe.get('video_codec') == 'h264' and probe.get('audio_codec') in ('aac', None)
+    
+    def _copy_args(self, output_file):
+        fmt = os.path.splitext(output_file)[1].lstrip('.') or 'mp4'
+        return ['-c', 'copy', '-movflags', '+faststart', '-f', fmt]
+    
+    def _encode_args(self, encoding):
+        """H.264 + AAC 编码为 faststart 的 mov"""
+        return [
+            '-c:v', 'libx264',
+            '-preset', encoding['preset'],
+            '-crf', str(encoding['crf']),
+            '-threads', str(encoding['threads']),
+            '-c:a', 'aac',
+            '-b:a', '128k',
+            '-movflags', '+faststart',
+            '-f', 'mov',
+        ]
+    
+    def _run_transcode(self, cmd, task_id, duration, timeout, output_file, feeders=(), label='转码'):
+        """运行带 -progress pipe:1 的FFmpeg命令：上报进度、登记进程、超时结束；label 用于日志和返回的消息
+        
+        feeders 是向FFmpeg送入输入的函数，各在一个线程里以 feeder(process) 调用；
+        先等它们全部送完再开始计转码超时，下载耗时不算进去。任一路出错时结束FFmpeg。
+        """
+        self._log(task_id, f"📋 FFmpeg命令: {' '.join(cmd)}", logging.DEBUG)
+        
+        process = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            universal_newlines=True,
+            bufsize=1  # 行缓冲
+        )
+        
+        if task_id:
+            self.redis.add_active_transcode(task_id)
+            # 记录子进程，工作进程异常退出时回收器可以清理它
+            self.redis.set_task_process(task_id, process.pid, socket.gethostname())
+            # 任务被暂停或取消时FFmpeg会收到SIGTERM
+            if self.task_control:
+                self.task_control.register(task_id, process)
+        
+        # stdout只有进度，stderr只保留最后若干行；两个管道各由一个线程读到底，FFmpeg不会因管道写满而阻塞
+        stderr_tail = deque(maxlen=Config.FFMPEG_STDERR_TAIL_LINES)
+        readers = [
+            threading.Thread(target=self._read_progress, args=(process.stdout, task_id, duration), daemon=True),
+            threading.Thread(target=self._drain_stderr, args=(process.stderr, stderr_tail), daemon=True)
+        ]
+        feed_errors = []
+        feeding = [threading.Thread(target=self._run_feeder, args=(feeder, process, feed_errors), daemon=True)
+                   for feeder in feeders]
+        for thread in readers + feeding:
+            thread.start()
+        
+        # 等待进程完成，设置超时
+        try:
+            for thread in feeding:
+                thread.join()
+            return_code = process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+            self._log(task_id, f"❌ {label}超时：超过{timeout // 60}分钟未完成", logging.ERROR)
+            return False, f'{label}超时：超过{timeout // 60}分钟未完成'
+        finally:
+            for reader in readers:
+                reader.join(timeout=5)
+            metrics.collect_child_cpu()
             if task_id:
-                self._monitor_progress(process, task_id, duration)
-            
-            # 等待进程完成，设置超时
+                self.redis.clear_task_process(task_id)
+                self.redis.remove_active_transcode(task_id)
+                if self.task_control:
+                    self.task_control.unregister(task_id, process)
+        
+        if task_id and self.task_control and task_id in self.task_control.signals:
+            if os.path.exists(output_file):
+                os.remove(output_file)
+            self._log(task_id, f"⏹️  {label}已中断")
+            return False, f'{label}已中断'
+        
+        if feed_errors:
+            # 输入不完整时FFmpeg可能照样生成了一个截断的文件
+            if os.path.exists(output_file):
+                os.remove(output_file)
+            self._log(task_id, f"❌ 输入中断: {feed_errors[0]}", logging.ERROR)
+            return False, f'输入中断: {feed_errors[0]}'
+        
+        stderr = '\n'.join(stderr_tail)
+        if return_code == 0:
+            self._log(task_id, f"✅ {label}成功")
+            return True, f'{label}成功'
+        else:
+            self._log(task_id, f"❌ {label}失败，返回码: {return_code}", logging.ERROR)
+            self._log(task_id, f"📋 FFmpeg错误输出: {stderr[:500]}")
+            return False, f'{label}失败: {stderr}'
+    
+    def _run_feeder(self, feeder, process, errors):
+        try:
+            feeder(process)
+        except Exception as e:
+            errors.append(e)
             try:
-                return_code = process.wait(timeout=1800)  # 30分钟超时
-                stdout, stderr = process.stdout.read(), process.stderr.read()
-            except subprocess.TimeoutExpired:
                 process.kill()
-                stdout, stderr = process.stdout.read(), process.stderr.read()
-                self._log(task_id, "❌ 转码超时：超过30分钟未完成")
-                return False, '转码超时：超过30分钟未完成'
+            except OSError:
+                pass
+    
+    def _transcode_timeout(self, duration, factor=None):
+        """转码超时随视频时长增长"""
+        return int(max(Config.TRANSCODE_MIN_TIMEOUT, duration * (factor or Config.TRANSCODE_TIMEOUT_FACTOR)))
+    
+    def _transcode_segmented(self, input_file, output_file, task_id, probe, encoding):
+        """长视频分段并行转码
+        
+        先按关键帧无损切分视频流，再用多个FFmpeg进程并行编码各段，音频单独编码一次，
+        最后用concat无损拼接。切分和各段编码按各自时长设超时，整段音频编码和拼接按整片时长设超时。
+        各步骤运行时都读取 -progress 输出，按已编码时长汇总整体进度。
+        """
+        work_dir = tempfile.mkdtemp(prefix='.segments_', dir=os.path.dirname(output_file))
+        running = {}
+        lock = threading.Lock()
+        workers = Config.TRANSCODE_SEGMENT_WORKERS or max(1, encoding['threads'] // 2)
+        segment_threads = max(1, encoding['threads'] // workers)
+        segment_timeout = self._transcode_timeout(Config.TRANSCODE_SEGMENT_SECONDS)
+        full_timeout = self._transcode_timeout(probe['duration'])
+        # 视频各段和整段音频都计入总工作量
+        progress = SegmentProgress(self.redis, task_id, probe['duration'] * (2 if probe.get('audio_codec') else 1))
+        
+        if task_id:
+            self.redis.add_active_transcode(task_id)
+        try:
+            self._log(task_id, f"✂️  分段转码: 每段约{Config.TRANSCODE_SEGMENT_SECONDS}秒，{workers}路并行，每路{segment_threads}线程")
+            self._run_ffmpeg_step([
+                self.ffmpeg_path,
+                '-i', input_file,
+                '-map', '0:v:0',
+                '-c', 'copy',
+                '-f', 'segment',
+                '-segment_time', str(Config.TRANSCODE_SEGMENT_SECONDS),
+                '-reset_timestamps', '1',
+                '-y',
+                os.path.join(work_dir, 'src_%04d.mp4')
+            ], task_id, running, lock, self._transcode_timeout(probe['duration'] / 10), progress.keepalive)
             
-            if return_code == 0:
-                self._log(task_id, "✅ 转码成功")
-                return True, '转码成功'
-            else:
-                self._log(task_id, f"❌ 转码失败，返回码: {return_code}")
-                self._log(task_id, f"📋 FFmpeg错误输出: {stderr[:500]}")
-                return False, f'转码失败: {stderr}'
-                
+            sources = sorted(glob.glob(os.path.join(work_dir, 'src_*.mp4')))
+            if not sources:
+                raise Exception('视频切分失败：没有生成任何分段')
+            self._log(task_id, f"✅ 切分完成，共 {len(sources)} 段")
+            
+            jobs = []
+            encoded = []
+            for source in sources:
+                target = source.replace('src_', 'enc_')
+                encoded.append(target)
+                jobs.append(([
+                    self.ffmpeg_path,
+                    '-i', source,
+                    '-c:v', 'libx264',
+                    '-preset', encoding['preset'],
+                    '-crf', str(encoding['crf']),
+                    '-threads', str(segment_threads),
+                    '-an',
+                    '-y',
+                    target
+                ], segment_timeout))
+            
+            audio_path = None
+            if probe.get('audio_codec'):
+                audio_path = os.path.join(work_dir, 'audio.m4a')
+                # 音频整段编码一次，避免每段AAC起始填充造成拼接处的杂音
+                jobs.append(([
+                    self.ffmpeg_path,
+                    '-i', input_file,
+                    '-map', '0:a:0',
+                    '-c:a', 'aac',
+                    '-b:a', '128k',
+                    '-y',
+                    audio_path
+                ], full_timeout))
+            
+            executor = ThreadPoolExecutor(max_workers=workers)
+            try:
+                futures = [
+                    executor.submit(self._run_ffmpeg_step, cmd, task_id, running, lock, timeout,
+                                    progress.step(step))
+                    for step, (cmd, timeout) in enumerate(jobs)
+                ]
+                for done, future in enumerate(as_completed(futures), start=1):
+                    future.result()
+                    self._log(task_id, f"📊 分段转码进度: {done}/{len(futures)}", logging.DEBUG)
+            except Exception:
+                # 一段失败就停止其余的段
+                self._terminate_running(running, lock)
+                raise
+            finally:
+                executor.shutdown(wait=True, cancel_futures=True)
+            
+            concat_list = os.path.join(work_dir, 'concat.txt')
+            with open(concat_list, 'w') as f:
+                for target in encoded:
+                    f.write(f"file '{target}'\n")
+            
+            concat_cmd = [self.ffmpeg_path, '-f', 'concat', '-safe', '0', '-i', concat_list]
+            if audio_path:
+                concat_cmd += ['-i', audio_path, '-map', '0:v', '-map', '1:a']
+            concat_cmd += ['-c', 'copy', '-movflags', '+faststart', '-f', 'mov', '-y', output_file]
+            self._log(task_id, "🔗 拼接分段...")
+            self._run_ffmpeg_step(concat_cmd, task_id, running, lock,
+                                  self._transcode_timeout(probe['duration'], Config.REMUX_TIMEOUT_FACTOR),
+                                  progress.keepalive)
+            
+            self._log(task_id, "✅ 转码成功")
+            return True, '转码成功'
         except Exception as e:
-            self._log(task_id, f"❌ 转码异常: {str(e)}")
-            return False, f'转码异常: {str(e)}'
+            if os.path.exists(output_file):
+                os.remove(output_file)
+            if task_id and self.task_control and task_id in self.task_control.signals:
+                self._log(task_id, "⏹️  转码已中断")
+                return False, '转码已中断'
+            self._log(task_id, f"❌ 分段转码失败: {str(e)}", logging.ERROR)
+            return False, f'分段转码失败: {str(e)}'
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+            if task_id:
+                self.redis.clear_task_process(task_id)
+                self.redis.remove_active_transcode(task_id)
     
-    def _get_video_duration(self, input_file):
-        """获取视频时长（秒）"""
+    def _run_ffmpeg_step(self, cmd, task_id, running, lock, timeout, on_progress=None):
+        """运行一个FFmpeg子步骤，登记进程以便中断和回收
+        
+        on_progress 在每个 -progress 进度块结束时以已编码的秒数调用。
+        """
+        if task_id and self.task_control and task_id in self.task_control.signals:
+            raise Exception('任务已中断')
+        
+        process = subprocess.Popen(cmd[:1] + ['-progress', 'pipe:1', '-nostats'] + cmd[1:],
+                                   stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        with lock:
+            running[process.pid] = process
+            if task_id:
+                self.redis.set_task_process(task_id, list(running), socket.gethostname())
+        if task_id and self.task_control:
+            self.task_control.register(task_id, process)
+        stderr_tail = deque(maxlen=Config.FFMPEG_STDERR_TAIL_LINES)
+        readers = [
+            threading.Thread(target=self._read_step_progress, args=(process.stdout, on_progress), daemon=True),
+            threading.Thread(target=self._drain_stderr, args=(process.stderr, stderr_tail), daemon=True)
+        ]
+        for reader in readers:
+            reader.start()
+        try:
+            process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+            raise Exception(f'FFmpeg超时：超过{timeout // 60}分钟未完成')
+        finally:
+            for reader in readers:
+                reader.join(timeout=5)
+            if task_id and self.task_control:
+                self.task_control.unregister(task_id, process)
+            with lock:
+                running.pop(process.pid, None)
+            metrics.collect_child_cpu()
+        
+        if process.returncode != 0:
+            stderr = '\n'.join(stderr_tail)
+            raise Exception(f'FFmpeg返回码 {process.returncode}: {stderr[-500:]}')
+    
+    def _read_step_progress(self, stream, on_progress):
+        """读空子步骤的 -progress 输出，每个进度块结束时回调已编码秒数"""
+        out_time_us = 0
+        for line in stream:
+            key, _, value = line.strip().partition('=')
+            if key in ('out_time_us', 'out_time_ms'):
+                if value.isdigit():
+                    out_time_us = int(value)
+            elif key == 'progress' and on_progress:
+                on_progress(out_time_us / 1e6)
+    
+    def _terminate_running(self, running, lock):
+        with lock:
+            processes = list(running.values())
+        for process in processes:
+            try:
+                process.terminate()
+            except OSError:
+                pass
+    
+    def _select_encoding(self, probe, task_id=None):
+        """按视频分辨率、时长和当前积压选择编码参数"""
+        try:
+            queue_depth = int(self.redis.get_queue_length())
+            # 加上即将开始的这一个
+            active_transcodes = int(self.redis.get_active_transcode_count()) + 1
+        except Exception as e:
+            self._log(task_id, f"⚠️  获取队列长度失败，按空闲处理: {e}", logging.WARNING)
+            queue_depth, active_transcodes = 0, 1
+        return self.encoding_policy.select(
+            probe.get('width', 0),
+            probe.get('height', 0),
+            probe.get('duration', 0),
+            queue_depth=queue_depth,
+            active_transcodes=active_transcodes
+        )
+    
+    def _probe_video(self, input_file):
+        """用ffprobe读取容器头信息（时长、分辨率、编码），不解码视频"""
         try:
             cmd = [
-                self.ffmpeg_path,
-                '-i', input_file,
-                '-f', 'null',
-                '-'
+                self.ffprobe_path,
+                '-v', 'error',
+                '-print_format', 'json',
+                '-show_format',
+                '-show_streams',
+                input_file
             ]
             result = subprocess.run(
                 cmd,
@@ -123,89 +623,52 @@ class VideoTranscoder:
                 text=True,
                 timeout=30
             )
+            data = json.loads(result.stdout or '{}')
             
-            # 从FFmpeg输出中解析时长
-            import re
-            duration_match = re.search(r'Duration: (\d{2}):(\d{2}):(\d{2}\.\d{2})', result.stderr)
-            if duration_match:
-                hours = int(duration_match.group(1))
-                minutes = int(duration_match.group(2))
-                seconds = float(duration_match.group(3))
-                return hours * 3600 + minutes * 60 + seconds
-            
-            return 0
+            info = {'duration': float(data.get('format', {}).get('duration') or 0)}
+            for stream in data.get('streams', []):
+                if stream.get('codec_type') == 'video' and 'video_codec' not in info:
+                    info['video_codec'] = stream.get('codec_name')
+                    info['width'] = int(stream.get('width') or 0)
+                    info['height'] = int(stream.get('height') or 0)
+                elif stream.get('codec_type') == 'audio' and 'audio_codec' not in info:
+                    info['audio_codec'] = stream.get('codec_name')
+            return info
         except Exception as e:
-            print(f'获取视频时长失败: {e}')
-            return 0
+            logger.warning(f'⚠️  获取视频信息失败: {e}')
+            return {}
     
-    def _monitor_progress(self, process, task_id, duration):
-        import re
-        import threading
-        import time
-        progress_pattern = re.compile(r'time=(\d+):(\d+):(\d+)')
-        
-        def read_stderr():
-            last_progress = 0
-            line_count = 0
-            self._log(task_id, "📡 开始监控FFmpeg输出...")
-            
-            while True:
-                line = process.stderr.readline()
-                if not line:
-                    self._log(task_id, "📡 FFmpeg输出结束")
-                    break
-                
-                line_count += 1
-                
-                # 每100行记录一次，避免日志过多
-                if line_count % 100 == 0:
-                    self._log(task_id, f"📡 已读取 {line_count} 行FFmpeg输出")
-                
-                match = progress_pattern.search(line)
-                if match:
-                    try:
-                        hours = int(match.group(1))
-                        minutes = int(match.group(2))
-                        seconds = int(match.group(3))
-                        
-                        # 转换为总秒数
-                        time_current = hours * 3600 + minutes * 60 + seconds
-                        
-                        # 使用实际视频时长
-                        time_total = duration
-                        
-                        # 防止除零错误
-                        if time_total > 0:
-                            progress = int((time_current / time_total) * 100)
-                        else:
-                            progress = 0
-                        
-                        # 限制进度在0-100之间
-                        progress = max(0, min(100, progress))
-                        
-                        # 只记录有变化的进度
-                        if progress != last_progress:
-                            self.redis.update_task_status(task_id, 'transcoding', progress=progress)
-                            self._log(task_id, f"📊 转码进度: {progress}% (时间: {time_current}/{time_total}秒)")
-                            last_progress = progress
-                    except Exception as e:
-                        self._log(task_id, f"Error parsing progress: {e}")
-                        pass
-                
-                # 检查进程是否还在运行
-                if process.poll() is not None:
-                    self._log(task_id, f"📡 FFmpeg进程已结束，退出码: {process.returncode}")
-                    break
-                
-                # 短暂休眠避免CPU占用过高
-                time.sleep(0.1)
-            
-            self._log(task_id, f"📡 监控线程结束，共读取 {line_count} 行")
+    def _get_video_duration(self, input_file):
+        """获取视频时长（秒）"""
+        return self._probe_video(input_file).get('duration', 0)
+    
+    def _read_progress(self, stream, task_id, duration):
+        """解析 -progress 输出（key=value，每个进度块以 progress=continue/end 结尾）
         
-        # 启动监控线程
-        monitor_thread = threading.Thread(target=read_stderr, daemon=True)
-        monitor_thread.start()
-        self._log(task_id, "✅ 监控线程已启动")
+        阻塞式逐行读取，不做任何休眠；只在百分比变化时写Redis，每10%记一条日志。
+        """
+        last_progress = -1
+        out_time_us = 0
+        for line in stream:
+            key, _, value = line.strip().partition('=')
+            if key in ('out_time_us', 'out_time_ms'):
+                # 老版本FFmpeg的out_time_ms实际单位也是微秒
+                if value.isdigit():
+                    out_time_us = int(value)
+            elif key == 'progress':
+                if not task_id or duration <= 0:
+                    continue
+                progress = 100 if value == 'end' else max(0, min(100, int(out_time_us / 1e6 / duration * 100)))
+                if progress != last_progress:
+                    self.redis.update_task_status(task_id, 'transcoding', progress=progress)
+                    if progress // 10 != last_progress // 10:
+                        self._log(task_id, f"📊 转码进度: {progress}% (时间: {out_time_us // 1000000}/{int(duration)}秒)", logging.DEBUG)
+                    last_progress = progress
+    
+    def _drain_stderr(self, stream, tail):
+        """持续读空stderr，只保留最后几行用于报错"""
+        for line in stream:
+            tail.append(line.rstrip())
     
     def batch_transcode(self, input_files, output_dir, task_id=None):
         success_count = 0
@@ -244,33 +707,10 @@ class VideoTranscoder:
         }
     
     def get_video_info(self, video_file):
-        cmd = [
-            self.ffmpeg_path,
-            '-i', video_file,
-            '-f', 'null'
-        ]
-        
-        try:
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                timeout=10
-            )
-            
-            duration_match = re.search(r'Duration: (\d+):(\d+):(\d+\.\d+)', result.stderr)
-            if duration_match:
-                hours = int(duration_match.group(1))
-                minutes = int(duration_match.group(2))
-                seconds = float(duration_match.group(3))
-                total_seconds = hours * 3600 + minutes * 60 + seconds
-                
-                return {
-                    'duration': total_seconds,
-                    'format': 'unknown'
-                }
-            
+        info = self._probe_video(video_file)
+        if not info.get('duration'):
             return None
-            
-        except Exception as e:
-            return None
\ No newline at end of file
+        return {
+            'duration': info['duration'],
+            'format': info.get('video_codec', 'unknown')
+        }
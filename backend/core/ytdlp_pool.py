@@ -0,0 +1,135 @@
+import copy
+import logging
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from config.config import Config
+
+logger = logging.getLogger(__name__)
+
+BASE_OPTIONS = {
+    'format': 'best[ext=mp4]/best',
+    'quiet': True,
+    'no_warnings': False,
+    'noprogress': True,
+    'user_agent': 'Mozilla/5.0 (iPhone; CPU iPhone OS 16_6 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/16.6 Mobile/15E148 Safari/604.1',
+    'nocheckcertificate': True,
+    'ignoreerrors': False,
+    'extract_flat': False,
+}
+
+
+def _load_yt_dlp():
+    """yt-dlp 导入要一百多毫秒，第一次用到时才导入；未安装时返回 None"""
+    try:
+        import yt_dlp
+    except ImportError:
+        return None
+    return yt_dlp
+
+
+class YtDlpPool:
+    """复用 YoutubeDL 实例，并短时缓存 extract_info 的结果
+
+    构造一个 YoutubeDL 要几十到上百毫秒（初始化提取器、建立opener、装入Cookie），
+    这里按 (平台, Cookie版本) 保留空闲实例，用时借出、用完归还；YoutubeDL 不是线程安全的，
+    同一实例同一时刻只给一个线程用。Cookie 更新后版本号变化，旧实例自然不再被借出。
+
+    extract_info(download=False) 的结果按 (平台, Cookie版本, URL) 缓存 YTDLP_INFO_TTL 秒，
+    解析阶段拿到的信息在下载阶段直接交给 process_ie_result，不再重新提取一次。
+    """
+
+    def __init__(self, cookie_jars=None):
+        self.cookie_jars = cookie_jars
+        self._idle = {}
+        self._info = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _cookies(self, platform):
+        if not self.cookie_jars:
+            return None
+        try:
+            return self.cookie_jars.get(platform)
+        except Exception as e:
+            logger.warning(f'⚠️  获取 {platform} Cookie 失败，yt-dlp 不带Cookie: {e}')
+            return None
+
+    @contextmanager
+    def instance(self, platform):
+        """借出一个带当前Cookie的 YoutubeDL"""
+        yt_dlp = _load_yt_dlp()
+        if yt_dlp is None:
+            raise ImportError('yt-dlp未安装')
+        cookies = self._cookies(platform)
+        key = (platform, cookies.version if cookies else 0)
+        with self._lock:
+            idle = self._idle.get(key)
+            ydl = idle.pop() if idle else None
+        if ydl is None:
+            ydl = yt_dlp.YoutubeDL(dict(BASE_OPTIONS))
+            # 直接放入预先构建的cookiejar，不用cookiefile：yt-dlp退出时会把cookiefile写回
+            if cookies:
+                cookies.apply_to(ydl.cookiejar)
+        yield ydl
+        # 出错时异常从 yield 处抛出，走不到这里：状态不可靠的实例不归还
+        self._release(key, ydl)
+
+    def _release(self, key, ydl):
+        with self._lock:
+            # 同平台的旧版本Cookie实例一并丢弃
+            for stale in [k for k in self._idle if k[0] == key[0] and k != key]:
+                del self._idle[stale]
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < Config.YTDLP_POOL_SIZE:
+                idle.append(ydl)
+
+    def extract_info(self, url, platform):
+        """提取视频信息（不下载），短时间内同一URL直接返回缓存"""
+        cookies = self._cookies(platform)
+        key = (platform, cookies.version if cookies else 0, url)
+        now = time.monotonic()
+        with self._lock:
+            cached = self._info.get(key)
+            if cached and cached[0] > now:
+                self._info.move_to_end(key)
+                return copy.deepcopy(cached[1])
+
+        with self.instance(platform) as ydl:
+            info = ydl.extract_info(url, download=False)
+            if not info:
+                raise ValueError('无法获取视频信息')
+            # 与 --load-info-json 一样只保留可序列化的部分，之后可直接用于下载
+            info = ydl.sanitize_info(info)
+
+        with self._lock:
+            self._info[key] = (time.monotonic() + Config.YTDLP_INFO_TTL, info)
+            self._info.move_to_end(key)
+            while len(self._info) > Config.YTDLP_INFO_CACHE_SIZE:
+                self._info.popitem(last=False)
+        return copy.deepcopy(info)
+
+    def download(self, url, platform, outtmpl, progress_hook=None):
+        """下载到 outtmpl；缓存里有解析阶段的信息时跳过提取"""
+        info = self.extract_info(url, platform)
+        with self.instance(platform) as ydl, _task_options(ydl, outtmpl, progress_hook):
+            ydl.process_ie_result(info, download=True)
+        return info
+
+
+@contextmanager
+def _task_options(ydl, outtmpl, progress_hook):
+    """借出的实例临时换上本任务的输出路径和进度回调，归还前恢复"""
+    saved_outtmpl = dict(ydl.params.get('outtmpl') or {})
+    ydl.params['outtmpl'] = {'default': outtmpl}
+    ydl._parse_outtmpl()
+    if progress_hook:
+        ydl.add_progress_hook(progress_hook)
+    try:
+        yield ydl
+    finally:
+        ydl.params['outtmpl'] = saved_outtmpl
+        ydl._parse_outtmpl()
+        if progress_hook and progress_hook in ydl._progress_hooks:
+            ydl._progress_hooks.remove(progress_hook)
@@ -0,0 +1,26 @@
+# gunicorn 配置：gunicorn -c backend/gunicorn.conf.py
+# 只提供接口，下载队列由 worker.py 单独处理
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config.config import Config
+
+chdir = os.path.dirname(os.path.abspath(__file__))
+wsgi_app = 'wsgi:application'
+bind = f'{Config.HOST}:{Config.PORT}'
+
+# gthread：每个进程多个线程，仪表盘轮询和长请求不会互相阻塞
+worker_class = 'gthread'
+workers = Config.WEB_WORKERS
+threads = Config.WEB_THREADS
+
+# 选择目录、打开文件等接口可能较慢
+timeout = 120
+graceful_timeout = 30
+keepalive = 5
+
+accesslog = '-'
+errorlog = '-'
+loglevel = Config.LOG_LEVEL.lower()
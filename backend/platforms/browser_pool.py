@@ -0,0 +1,185 @@
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from config.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+def launch_chrome(profile_dir):
+    """启动无头Chrome；selenium 只在这里导入"""
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+
+    chrome_options = Options()
+    if Config.BROWSER_HEADLESS:
+        chrome_options.add_argument('--headless')
+    chrome_options.add_argument('--no-sandbox')
+    chrome_options.add_argument('--disable-dev-shm-usage')
+    chrome_options.add_argument(f'--user-data-dir={profile_dir}')
+    # DOMContentLoaded 后就返回，是否就绪由调用方的等待条件决定
+    chrome_options.page_load_strategy = 'eager'
+    return webdriver.Chrome(options=chrome_options)
+
+
+def page_ready(driver):
+    return driver.execute_script('return document.readyState') == 'complete'
+
+
+def wait_until(driver, condition, timeout=None):
+    """轮询等待条件成立，代替固定的 time.sleep"""
+    from selenium.webdriver.support.ui import WebDriverWait
+    return WebDriverWait(driver, timeout or Config.BROWSER_READY_TIMEOUT, poll_frequency=0.1).until(condition)
+
+
+class _PooledBrowser:
+    def __init__(self):
+        self.driver = None
+        self.temp_profile = None
+        self.uses = 0
+        self.last_used = 0
+        self.lock = threading.Lock()
+
+
+class BrowserPool:
+    """按平台复用的无头浏览器
+
+    每个平台一个浏览器，使用各自的资料目录（BROWSER_PROFILE_DIR/<平台>），
+    登录状态跨次保留。同一平台的使用串行进行；空闲超过 BROWSER_IDLE_TIMEOUT
+    或用满 BROWSER_MAX_USES 次后关闭，下次用到时重新启动。
+    """
+
+    def __init__(self, max_browsers=None, idle_timeout=None, max_uses=None, profile_dir=None,
+                 driver_factory=launch_chrome):
+        self.max_browsers = max_browsers or Config.BROWSER_POOL_SIZE
+        self.idle_timeout = idle_timeout or Config.BROWSER_IDLE_TIMEOUT
+        self.max_uses = max_uses or Config.BROWSER_MAX_USES
+        self.profile_dir = profile_dir or Config.BROWSER_PROFILE_DIR
+        self.driver_factory = driver_factory
+        self._browsers = {}
+        self._lock = threading.Lock()
+        self._reaper = None
+
+    @contextmanager
+    def browser(self, platform):
+        """借用该平台的浏览器；使用中抛出异常时浏览器直接丢弃"""
+        with self._lock:
+            pooled = self._browsers.setdefault(platform, _PooledBrowser())
+        with pooled.lock:
+            if pooled.driver is not None and not self._usable(pooled):
+                self._quit(pooled)
+            if pooled.driver is None:
+                self._make_room(platform)
+                self._launch(platform, pooled)
+            healthy = False
+            try:
+                yield pooled.driver
+                healthy = True
+            finally:
+                pooled.uses += 1
+                pooled.last_used = time.monotonic()
+                if not healthy or pooled.uses >= self.max_uses:
+                    self._quit(pooled)
+        self._ensure_reaper()
+
+    def render(self, platform, url, ready=None, timeout=None):
+        """打开页面，等到 ready(driver) 成立后返回渲染后的HTML"""
+        with self.browser(platform) as driver:
+            driver.get(url)
+            wait_until(driver, ready or page_ready, timeout)
+            return driver.page_source
+
+    def close_idle(self):
+        now = time.monotonic()
+        for pooled in list(self._browsers.values()):
+            # 正在使用的跳过，下次归还时再判断
+            if not pooled.lock.acquire(blocking=False):
+                continue
+            try:
+                if pooled.driver is not None and now - pooled.last_used >= self.idle_timeout:
+                    self._quit(pooled)
+            finally:
+                pooled.lock.release()
+
+    def close(self):
+        for pooled in list(self._browsers.values()):
+            with pooled.lock:
+                self._quit(pooled)
+
+    def _usable(self, pooled):
+        if time.monotonic() - pooled.last_used >= self.idle_timeout:
+            return False
+        try:
+            # 浏览器进程崩溃或被关掉时这里会抛异常
+            pooled.driver.current_url
+            return True
+        except Exception:
+            return False
+
+    def _make_room(self, platform):
+        """超过上限时关闭最久没用的空闲浏览器"""
+        while True:
+            idle = [
+                (pooled.last_used, name) for name, pooled in list(self._browsers.items())
+                if name != platform and pooled.driver is not None
+            ]
+            if len(idle) < self.max_browsers:
+                return
+            closed = False
+            for _, name in sorted(idle):
+                pooled = self._browsers[name]
+                if pooled.lock.acquire(blocking=False):
+                    try:
+                        self._quit(pooled)
+                        closed = True
+                    finally:
+                        pooled.lock.release()
+                    break
+            if not closed:
+                # 其余浏览器都在使用中，暂时超出上限
+                return
+
+    def _launch(self, platform, pooled):
+        profile = os.path.join(self.profile_dir, platform)
+        os.makedirs(profile, exist_ok=True)
+        started = time.monotonic()
+        try:
+            pooled.driver = self.driver_factory(profile)
+        except Exception as e:
+            # 资料目录被另一个进程的浏览器占用（如Web进程和后台任务进程），改用临时目录
+            if 'already in use' not in str(e):
+                raise
+            pooled.temp_profile = tempfile.mkdtemp(prefix=f'bubbletv-{platform}-')
+            logger.warning(f'⚠️  {platform} 浏览器资料目录被占用，使用临时目录 {pooled.temp_profile}')
+            pooled.driver = self.driver_factory(pooled.temp_profile)
+        pooled.uses = 0
+        pooled.last_used = time.monotonic()
+        logger.info(f'🌐 启动 {platform} 浏览器，耗时 {pooled.last_used - started:.2f}s')
+
+    def _quit(self, pooled):
+        if pooled.driver is not None:
+            try:
+                pooled.driver.quit()
+            except Exception as e:
+                logger.warning(f'关闭浏览器失败: {e}')
+            pooled.driver = None
+        if pooled.temp_profile:
+            shutil.rmtree(pooled.temp_profile, ignore_errors=True)
+            pooled.temp_profile = None
+
+    def _ensure_reaper(self):
+        if self._reaper is None:
+            with self._lock:
+                if self._reaper is None:
+                    self._reaper = threading.Thread(target=self._run, daemon=True)
+                    self._reaper.start()
+
+    def _run(self):
+        while True:
+            time.sleep(min(self.idle_timeout, 60))
+            self.close_idle()
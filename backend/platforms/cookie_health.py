@@ -0,0 +1,162 @@
+import logging
+import time
+from datetime import datetime
+from urllib.parse import unquote
+
+from config.config import Config
+from core import http_client, metrics
+from platforms.platform_auth import PlatformAuth
+
+logger = logging.getLogger(__name__)
+
+BILIBILI_NAV_URL = 'https://api.bilibili.com/x/web-interface/nav'
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+
+
+def parse_sessdata_expiry(sessdata):
+    """SESSDATA 形如 token%2C1700000000%2Cxxx，第二段是过期时间戳"""
+    parts = unquote(sessdata or '').split(',')
+    if len(parts) >= 2 and parts[1].isdigit():
+        return int(parts[1])
+    return None
+
+
+def cookie_value(cookie_data, name):
+    """取一个Cookie的值
+
+    手动登录保存的是整串 cookie，浏览器登录保存的是逐个字段，两种都支持。
+    """
+    value = cookie_data.get(name)
+    if value is None:
+        for item in (cookie_data.get('cookie') or '').split(';'):
+            item_name, _, item_value = item.strip().partition('=')
+            if item_name == name:
+                return item_value
+    return value
+
+
+def parse_sid_guard_expiry(cookie_data):
+    """抖音/头条的 sid_guard 形如 token|签发时间戳|有效秒数|Expires，过期时间=签发+有效期"""
+    value = cookie_value(cookie_data, 'sid_guard')
+    parts = unquote(value or '').split('|')
+    if len(parts) >= 3 and parts[1].isdigit() and parts[2].isdigit():
+        return int(parts[1]) + int(parts[2])
+    return None
+
+
+class CookieHealthChecker:
+    """定时校验各平台Cookie是否仍被平台接受
+
+    结果写入 cookie_health:<平台>，下载任务开始前直接读取，不再等下载到一半才
+    发现Cookie过期。B站调用登录态接口 nav 校验；抖音、头条没有稳定的轻量接口，
+    按 sid_guard 里的有效期判断。临近过期时告警，并尝试用浏览器池里已登录的
+    资料目录刷新Cookie。
+    """
+
+    PLATFORMS = ('bilibili', 'douyin', 'toutiao')
+
+    def __init__(self, redis_manager, platform_auth=None):
+        self.redis = redis_manager
+        self.platform_auth = platform_auth
+        self.scheduler = None
+
+    def start(self):
+        """用 APScheduler 定时校验，启动时立即跑一次"""
+        from apscheduler.schedulers.background import BackgroundScheduler
+
+        self.scheduler = BackgroundScheduler(daemon=True)
+        self.scheduler.add_job(self.check_all, 'interval', seconds=Config.COOKIE_CHECK_INTERVAL,
+                               next_run_time=datetime.now(), max_instances=1, coalesce=True)
+        self.scheduler.start()
+        return self.scheduler
+
+    def stop(self):
+        if self.scheduler:
+            self.scheduler.shutdown(wait=False)
+
+    def check_all(self):
+        for platform in self.PLATFORMS:
+            try:
+                self.check(platform)
+            except Exception as e:
+                logger.warning(f'⚠️  校验 {platform} Cookie 出错: {e}')
+
+    def check(self, platform, refresh=True):
+        """校验一个平台的Cookie，返回并保存 {'valid', 'reason', 'expires_at', 'checked_at'}"""
+        cookie_data = self.redis.get_cookie(platform)
+        if not cookie_data:
+            health = {'valid': None, 'reason': '未登录', 'expires_at': None}
+        elif platform == 'bilibili':
+            health = self._check_bilibili(cookie_data)
+        else:
+            health = self._check_expiry(parse_sid_guard_expiry(cookie_data))
+
+        expires_in = health['expires_at'] - time.time() if health['expires_at'] else None
+        expiring = expires_in is not None and expires_in < Config.COOKIE_REFRESH_BEFORE_DAYS * 86400
+        if refresh and cookie_data and (health['valid'] is False or expiring):
+            if health['valid'] is False:
+                logger.error(f'❌ {platform} Cookie 已失效: {health["reason"]}，请重新登录')
+            else:
+                logger.warning(f'⚠️  {platform} Cookie 将在 {expires_in / 86400:.1f} 天后过期')
+            if self._refresh(platform):
+                return self.check(platform, refresh=False)
+
+        health['checked_at'] = int(time.time())
+        self.redis.set_cookie_health(platform, health, Config.COOKIE_HEALTH_TTL)
+        if health['valid'] is not None:
+            metrics.COOKIE_VALID.labels(platform).set(1 if health['valid'] else 0)
+        if expires_in is not None:
+            metrics.COOKIE_EXPIRES_IN.labels(platform).set(max(0, expires_in))
+        return health
+
+    def ensure_usable(self, platform):
+        """任务开始前调用：必须登录的平台Cookie已知失效时返回 (False, 原因)
+
+        只读上次校验的结果，不发请求；还没校验过的按可用处理。
+        """
+        if platform not in Config.COOKIE_REQUIRED_PLATFORMS:
+            return True, ''
+        if not self.redis.is_cookie_valid(platform):
+            return False, f'{platform} 需要登录，请先在设置中登录'
+        health = self.redis.get_cookie_health(platform)
+        if health and health.get('valid') is False:
+            return False, f'{platform} Cookie已失效（{health.get("reason")}），请重新登录'
+        return True, ''
+
+    def _check_bilibili(self, cookie_data):
+        sessdata = cookie_data.get('SESSDATA')
+        if not sessdata:
+            return {'valid': False, 'reason': '缺少SESSDATA', 'expires_at': None}
+        expires_at = parse_sessdata_expiry(sessdata)
+        headers = {'User-Agent': USER_AGENT, 'Cookie': f'SESSDATA={sessdata}'}
+        try:
+            response = http_client.get(BILIBILI_NAV_URL, headers=headers, timeout=10)
+            data = response.json()
+        except Exception as e:
+            # 网络问题不代表Cookie失效，保持未知，留给下次校验
+            return {'valid': None, 'reason': f'校验请求失败: {e}', 'expires_at': expires_at}
+        if data.get('code') == 0 and (data.get('data') or {}).get('isLogin'):
+            return {'valid': True, 'reason': '', 'expires_at': expires_at}
+        return {'valid': False, 'reason': data.get('message') or '账号未登录', 'expires_at': expires_at}
+
+    def _check_expiry(self, expires_at):
+        if expires_at is None:
+            return {'valid': None, 'reason': 'Cookie中没有有效期信息', 'expires_at': None}
+        if expires_at <= time.time():
+            return {'valid': False, 'reason': 'Cookie已过期', 'expires_at': expires_at}
+        return {'valid': True, 'reason': '', 'expires_at': expires_at}
+
+    def _refresh(self, platform):
+        """用浏览器资料目录重新登录，只有登录Cookie的值变了才算刷新成功"""
+        if not (Config.COOKIE_AUTO_REFRESH and self.platform_auth):
+            return False
+        login_cookie = PlatformAuth.LOGIN_PAGES[platform][1]
+        before = cookie_value(self.redis.get_cookie(platform) or {}, login_cookie)
+        success, message = getattr(self.platform_auth, f'login_{platform}')('', '')
+        if success and cookie_value(self.redis.get_cookie(platform) or {}, login_cookie) == before:
+            success, message = False, f'浏览器里的 {login_cookie} 没有变化'
+        if success:
+            logger.info(f'🔄 {platform} Cookie 已从浏览器刷新')
+        else:
+            logger.warning(f'⚠️  {platform} Cookie 刷新失败: {message}')
+        return success
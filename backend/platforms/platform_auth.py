@@ -1,52 +1,47 @@
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-import time
 import json
 import pickle
 import os
 from core.redis_manager import RedisManager
-from config.config import Config
+from platforms.browser_pool import BrowserPool, page_ready, wait_until
 
 class PlatformAuth:
-    def __init__(self, redis_manager):
+    # 平台: (登录页, 登录后才有的Cookie, 显示名称)
+    LOGIN_PAGES = {
+        'bilibili': ('https://passport.bilibili.com/login', 'SESSDATA', 'Bilibili'),
+        'douyin': ('https://www.douyin.com/passport/web/login', 'sessionid', '抖音'),
+        'toutiao': ('https://sso.toutiao.com/auth/', 'sessionid', '今日头条'),
+    }
+    
+    def __init__(self, redis_manager, browser_pool=None):
         self.redis = redis_manager
-        self.driver = None
+        self.browser_pool = browser_pool or BrowserPool()
     
-    def login_bilibili(self, username, password):
+    def _browser_login(self, platform):
+        login_url, login_cookie, name = self.LOGIN_PAGES[platform]
         try:
-            chrome_options = Options()
-            if Config.BROWSER_HEADLESS:
-                chrome_options.add_argument('--headless')
-            
-            chrome_options.add_argument('--no-sandbox')
-            chrome_options.add_argument('--disable-dev-shm-usage')
-            
-            self.driver = webdriver.Chrome(options=chrome_options)
-            
-            self.driver.get('https://passport.bilibili.com/login')
-            
-            time.sleep(5)
-            
-            cookies = self.driver.get_cookies()
+            with self.browser_pool.browser(platform) as driver:
+                driver.get(login_url)
+                # 资料目录里已登录时登录Cookie会立即出现，否则等页面加载完成
+                wait_until(driver, lambda d: d.get_cookie(login_cookie) or page_ready(d))
+                cookies = driver.get_cookies()
             
             cookie_data = {}
             for cookie in cookies:
                 cookie_data[cookie['name']] = cookie['value']
             
-            self.redis.set_cookie('bilibili', cookie_data)
+            # 页面加载完也没有登录Cookie说明资料目录未登录，不能把游客Cookie当成登录结果保存
+            if not cookie_data.get(login_cookie):
+                return False, f'{name}未登录：没有获取到 {login_cookie}'
             
-            self.driver.quit()
+            self.redis.set_cookie(platform, cookie_data)
             
-            return True, 'Bilibili登录成功'
+            return True, f'{name}登录成功'
             
         except Exception as e:
-            if self.driver:
-                self.driver.quit()
-            return False, f'Bilibili登录失败: {str(e)}'
+            return False, f'{name}登录失败: {str(e)}'
+    
+    def login_bilibili(self, username, password):
+        return self._browser_login('bilibili')
     
     def login_bilibili_manual(self, sessdata):
         try:
@@ -62,36 +57,7 @@ class PlatformAuth:
             return False, f'Bilibili Cookie保存失败: {str(e)}'
     
     def login_douyin(self, username, password):
-        try:
-            chrome_options = Options()
-            if Config.BROWSER_HEADLESS:
-                chrome_options.add_argument('--headless')
-            
-            chrome_options.add_argument('--no-sandbox')
-            chrome_options.add_argument('--disable-dev-shm-usage')
-            
-            self.driver = webdriver.Chrome(options=chrome_options)
-            
-            self.driver.get('https://www.douyin.com/passport/web/login')
-            
-            time.sleep(5)
-            
-            cookies = self.driver.get_cookies()
-            
-            cookie_data = {}
-            for cookie in cookies:
-                cookie_data[cookie['name']] = cookie['value']
-            
-            self.redis.set_cookie('douyin', cookie_data)
-            
-            self.driver.quit()
-            
-            return True, '抖音登录成功'
-            
-        except Exception as e:
-            if self.driver:
-                self.driver.quit()
-            return False, f'抖音登录失败: {str(e)}'
+        return self._browser_login('douyin')
     
     def login_douyin_manual(self, cookie_string):
         try:
@@ -107,36 +73,7 @@ class PlatformAuth:
             return False, f'抖音 Cookie保存失败: {str(e)}'
     
     def login_toutiao(self, username, password):
-        try:
-            chrome_options = Options()
-            if Config.BROWSER_HEADLESS:
-                chrome_options.add_argument('--headless')
-            
-            chrome_options.add_argument('--no-sandbox')
-            chrome_options.add_argument('--disable-dev-shm-usage')
-            
-            self.driver = webdriver.Chrome(options=chrome_options)
-            
-            self.driver.get('https://sso.toutiao.com/auth/')
-            
-            time.sleep(5)
-            
-            cookies = self.driver.get_cookies()
-            
-            cookie_data = {}
-            for cookie in cookies:
-                cookie_data[cookie['name']] = cookie['value']
-            
-            self.redis.set_cookie('toutiao', cookie_data)
-            
-            self.driver.quit()
-            
-            return True, '今日头条登录成功'
-            
-        except Exception as e:
-            if self.driver:
-                self.driver.quit()
-            return False, f'今日头条登录失败: {str(e)}'
+        return self._browser_login('toutiao')
     
     def login_toutiao_manual(self, cookie_string):
         try:
@@ -154,6 +91,9 @@ class PlatformAuth:
     def check_cookie_validity(self, platform):
         if not self.redis.is_cookie_valid(platform):
             return False, 'Cookie不存在或已过期'
+        health = self.redis.get_cookie_health(platform)
+        if health and health.get('valid') is False:
+            return False, f'Cookie已失效: {health.get("reason")}'
         return True, 'Cookie有效'
     
     def get_platform_login_status(self):
@@ -162,9 +102,14 @@ class PlatformAuth:
         
         for platform in platforms:
             is_valid = self.redis.is_cookie_valid(platform)
+            # 定时校验发现平台已不接受的Cookie按已失效显示
+            health = self.redis.get_cookie_health(platform) if is_valid else None
+            expired = bool(health) and health.get('valid') is False
             status[platform] = {
-                'logged_in': is_valid,
-                'status': '已登录' if is_valid else '未登录'
+                'logged_in': is_valid and not expired,
+                'status': '已失效' if expired else ('已登录' if is_valid else '未登录'),
+                'expires_at': health.get('expires_at') if health else None,
+                'checked_at': health.get('checked_at') if health else None
             }
         
         return status
\ No newline at end of file
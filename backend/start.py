@@ -35,8 +35,10 @@ def kill_process_on_port(port):
         print(f'关闭进程时出错: {e}')
 
 def main():
-    HOST = '192.168.31.226'
-    PORT = 5001
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from config.config import Config
+    HOST = Config.HOST
+    PORT = Config.PORT
     
     print('🚀 启动自动下载视频应用...')
     print('=' * 60)
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""后台任务进程：处理下载队列、回收僵尸任务
+
+与Web进程分开运行，Web进程数量增加时下载线程不会跟着翻倍：
+
+    python backend/worker.py
+"""
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+import uuid
+
+from config.config import Config
+from core.services import services
+from core.task_logger import setup_logging
+from core.task_reaper import TaskHeartbeat, TaskReaper
+from core import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def _may_finish(task_id, heartbeat=None):
+    """本线程能否写任务的最终状态
+
+    已交给回收器（卡住被中断或租约被接管）的任务由回收器重试；
+    暂停、取消或已删除的任务状态由接口设置，都不能再覆盖。
+    """
+    if heartbeat and not heartbeat.holds_lease():
+        return False
+    task = services.redis_manager.get_task(task_id)
+    return bool(task) and task.get('status') not in ('paused', 'cancelled')
+
+
+def process_task(task_data, heartbeat=None):
+    task_id = task_data.get('id')
+    storage_path = services.storage_manager.get_storage_path()
+    
+    # 需要登录的平台Cookie已知失效时直接失败，不再白白下载
+    usable, reason = services.cookie_health.ensure_usable(task_data.get('platform'))
+    if not usable:
+        services.redis_manager.update_task_status(task_id, 'failed', error_message=reason)
+        return
+    
+    success, message = services.video_downloader.download_video(
+        task_data.get('url'),
+        task_id,
+        storage_path
+    )
+    
+    if not _may_finish(task_id, heartbeat):
+        return
+    
+    if success:
+        task = services.redis_manager.get_task(task_id)
+        video_path = task.get('save_path')
+        
+        if not video_path or not os.path.exists(video_path):
+            services.redis_manager.update_task_status(task_id, 'failed')
+            return
+        
+        # download_video 已经生成最终的 mov；标题等信息用创建任务时解析的，不再重新解析和转码
+        video_data = {
+            'id': str(uuid.uuid4()),
+            'task_id': task_id,
+            'title': task_data.get('title') or task.get('title', ''),
+            'url': task_data.get('url'),
+            'platform': task_data.get('platform') or task.get('platform', ''),
+            'video_type': task_data.get('video_type') or task.get('video_type', ''),
+            'save_path': video_path,
+            'created_at': time.strftime('%Y-%m-%d %H:%M:%S')
+        }
+        
+        services.redis_manager.set_video(video_data['id'], video_data)
+        services.redis_manager.update_task_status(task_id, 'completed', progress=100, save_path=video_path)
+    else:
+        services.redis_manager.update_task_status(task_id, 'failed')
+
+
+def process_download_queue():
+    while True:
+        task_data = services.redis_manager.get_next_task()
+        if task_data:
+            task_id = task_data.get('id')
+            # 排队期间已被暂停、取消或删除的任务直接跳过
+            task = services.redis_manager.get_task(task_id)
+            if not task or task.get('status') in ('paused', 'cancelled'):
+                continue
+            started = time.time()
+            try:
+                # 持有租约期间心跳续约，工作线程消失或卡死时由回收器接管
+                with TaskHeartbeat(services.redis_manager, task_id, task_control=services.task_control) as heartbeat:
+                    try:
+                        process_task(task_data, heartbeat)
+                    except Exception as e:
+                        logger.exception(f'❌ 处理任务 {task_id} 出错: {e}')
+                        if _may_finish(task_id, heartbeat):
+                            services.redis_manager.update_task_status(task_id, 'failed', error_message=f'任务处理异常: {str(e)}')
+            except Exception as e:
+                logger.exception(f'❌ 获取任务 {task_id} 的租约出错: {e}')
+                services.redis_manager.update_task_status(task_id, 'failed', error_message=f'任务处理异常: {str(e)}')
+            finally:
+                services.task_control.forget(task_id)
+                services.task_log_sink.flush(task_id)
+                services.task_timings.save(task_id)
+                task = services.redis_manager.get_task(task_id) or {}
+                metrics.TASKS_PROCESSED.labels(task.get('status', 'deleted')).inc()
+                metrics.TASK_DURATION.observe(time.time() - started)
+        else:
+            time.sleep(1)
+
+
+def reap_stuck_tasks():
+    TaskReaper(services.redis_manager).run_forever()
+
+
+def start_background_workers(download_threads=1):
+    """启动下载线程、僵尸任务回收线程和Cookie定时校验
+
+    生产环境由本进程调用，开发模式下由 app.py 在同一进程里调用。
+    """
+    services.task_control.start()
+    threads = [
+        threading.Thread(target=process_download_queue, name=f'download-{i}', daemon=True)
+        for i in range(download_threads)
+    ]
+    threads.append(threading.Thread(target=reap_stuck_tasks, name='reaper', daemon=True))
+    for thread in threads:
+        thread.start()
+    services.cookie_health.start()
+    return threads
+
+
+def main():
+    setup_logging()
+    stop_event = threading.Event()
+
+    def handle_signal(signum, frame):
+        stop_event.set()
+
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+
+    start_background_workers(Config.MAX_DOWNLOAD_THREADS)
+    # 下载、转码相关的指标都在本进程里累加，单独开端口供抓取
+    if Config.WORKER_METRICS_PORT:
+        metrics.start_http_server(Config.WORKER_METRICS_PORT)
+    logger.info(f'⚙️  后台任务进程已启动：{Config.MAX_DOWNLOAD_THREADS} 个下载线程')
+
+    stop_event.wait()
+    # 进行中的任务不等待完成：租约过期后由回收器重新入队
+    services.task_log_sink.flush()
+    services.cookie_health.stop()
+    if 'browser_pool' in services.loaded():
+        services.browser_pool.close()
+    logger.info('👋 后台任务进程已停止')
+    sys.exit(0)
+
+
+if __name__ == '__main__':
+    main()
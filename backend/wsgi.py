@@ -0,0 +1,7 @@
+"""WSGI入口：gunicorn -c gunicorn.conf.py（在 backend 目录下）"""
+from app import create_app
+from core.task_logger import setup_logging
+
+setup_logging()
+
+application = create_app()
@@ -0,0 +1,90 @@
+"""冷启动基准：每次在全新的解释器里计时导入和首个请求
+
+    python -m benchmarks.bench_cold_start --runs 10 --output cold_start.json
+
+场景：
+- web_create_app：导入 app 并调用 create_app()，即 gunicorn 每个 worker 的启动开销
+- web_first_request：再用测试客户端请求首页
+- worker_import：导入后台任务进程
+- worker_full_services：后台任务进程把下载器等服务全部创建出来，相当于改为按需加载之前的开销
+
+同时记录每个场景结束时已加载的重模块，以及 create_app() 的 -X importtime 前几名，
+新增的顶层导入一眼就能看出来。
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+
+from benchmarks.common import BACKEND_DIR, summarize, write_report
+
+HEAVY_MODULES = ('yt_dlp', 'selenium', 'requests', 'redis', 'core.video_downloader')
+
+SCENARIOS = {
+    'web_create_app': 'import app\napp.create_app()',
+    'web_first_request': 'import app\napp.create_app().test_client().get("/")',
+    'worker_import': 'import worker',
+    'worker_full_services': (
+        'import worker\n'
+        'worker.services.video_downloader\n'
+        'worker.services.platform_auth'
+    ),
+}
+
+CHILD_TEMPLATE = '''
+import json, sys, time
+started = time.perf_counter()
+{code}
+elapsed = time.perf_counter() - started
+print(json.dumps({{'seconds': elapsed, 'loaded': [m for m in {heavy!r} if m in sys.modules]}}))
+'''
+
+
+def run_child(code):
+    script = CHILD_TEMPLATE.format(code=code, heavy=HEAVY_MODULES)
+    result = subprocess.run([sys.executable, '-c', script], cwd=BACKEND_DIR, capture_output=True,
+                            text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def import_profile(code, top):
+    """-X importtime 的累计耗时排名，只看入口模块的直接导入"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=BACKEND_DIR,
+                            capture_output=True, text=True, check=True)
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, raw_name = line[len('import time:'):].split('|')
+        name = raw_name.strip()
+        # 每深一层缩进两个空格，入口模块（app）下一层的缩进是三个空格
+        if raw_name == '   ' + name:
+            modules.append((name, int(cumulative)))
+    modules.sort(key=lambda item: item[1], reverse=True)
+    return [{'module': name, 'cumulative_ms': round(us / 1000, 1)} for name, us in modules[:top]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='冷启动基准')
+    parser.add_argument('--runs', type=int, default=10, help='每个场景启动几次新解释器')
+    parser.add_argument('--top', type=int, default=10, help='导入耗时排名显示前几名')
+    parser.add_argument('--output', help='JSON报告路径，默认只打印')
+    args = parser.parse_args()
+
+    # 先跑一次让 .pyc 缓存就绪，测的是常规重启而不是首次部署
+    run_child(SCENARIOS['worker_full_services'])
+
+    results = {}
+    for name, code in SCENARIOS.items():
+        samples = [run_child(code) for _ in range(args.runs)]
+        results[name] = {
+            'seconds': summarize([sample['seconds'] for sample in samples]),
+            'heavy_modules_loaded': samples[-1]['loaded']
+        }
+    results['create_app_import_profile'] = import_profile(SCENARIOS['web_create_app'], args.top)
+    write_report('cold_start', vars(args), results, args.output)
+
+
+if __name__ == '__main__':
+    main()
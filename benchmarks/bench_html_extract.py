@@ -0,0 +1,162 @@
+"""页面解析CPU基准：在保存的页面上测量标题、视频ID、视频地址的提取耗时
+
+    python -m benchmarks.bench_html_extract --runs 50 --output html_extract.json
+    python -m benchmarks.bench_html_extract --fixtures ~/saved_pages
+
+--fixtures 指向浏览器“另存为”的页面目录，文件名以平台开头（douyin_*.html、
+bilibili_*.html、toutiao_*.html）。不指定时使用按真实页面结构生成的页面：几百KB的
+内联JS在前，页面状态在后，与线上页面的体量和布局一致。
+
+每个页面记录进程CPU时间（time.process_time）的分位数，在改动前后各跑一次对比。
+"""
+
+import argparse
+import glob
+import json
+import os
+import random
+import time
+from urllib.parse import quote
+
+from benchmarks.common import summarize, write_report
+
+VIDEO_ID = '7301234567890123456'
+BVID = 'BV1xx411c7mD'
+
+html_extract = None
+
+
+def _script_noise(rng, size):
+    """模拟打包后的JS：大量短字符串、对象字面量和无关URL"""
+    parts = []
+    length = 0
+    while length < size:
+        n = rng.randrange(1 << 30)
+        chunk = (f'function a{n}(e,t){{var r={{"title":"组件{n}","url":"https://lf-cdn.example.com/obj/{n}.js",'
+                 f'"id":"{n}"}};return e&&t?r[e]:null}};')
+        parts.append(chunk)
+        length += len(chunk)
+    return ''.join(parts)
+
+
+def _head(title, rng):
+    metas = ''.join(f'<meta name="m{i}" content="{rng.random()}">' for i in range(30))
+    return f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>{title}</title>{metas}</head><body>'
+
+
+def douyin_render_data_page(rng, noise=400_000):
+    state = {'app': {'user': {'isLogin': False}}, str(rng.randrange(100)): {'aweme': {'detail': {
+        'awemeId': VIDEO_ID,
+        'desc': '基准测试视频',
+        'video': {
+            'playAddr': [{'src': f'//v26-web.douyinvod.com/{VIDEO_ID}/video/tos/cn/tos-cn-ve-15/abc.mp4?a=6383&br=1024'}],
+            'bitRateList': [{'playAddr': [{'src': f'//v3-web.douyinvod.com/{i}.mp4'}]} for i in range(10)],
+        },
+        'comments': [{'text': f'评论{i}', 'user': {'nickname': f'用户{i}'}} for i in range(500)],
+    }}}}
+    scripts = ''.join(f'<script>{_script_noise(rng, noise // 4)}</script>' for _ in range(4))
+    render = f'<script id="RENDER_DATA" type="application/json">{quote(json.dumps(state, ensure_ascii=False))}</script>'
+    return _head('基准测试视频 - 抖音', rng) + scripts + render + '</body></html>'
+
+
+def douyin_router_data_page(rng, noise=200_000):
+    state = {'loaderData': {'video_(id)/page': {'videoInfoRes': {'item_list': [{
+        'aweme_id': VIDEO_ID,
+        'desc': '分享页视频',
+        'video': {'play_addr': {'url_list': [f'https://aweme.snssdk.com/aweme/v1/playwm/?video_id={VIDEO_ID}']}},
+    }]}}}}
+    scripts = ''.join(f'<script>{_script_noise(rng, noise // 2)}</script>' for _ in range(2))
+    router = f'<script>window._ROUTER_DATA = {json.dumps(state, ensure_ascii=False)}</script>'
+    return _head('分享页视频 - 抖音', rng) + scripts + router + '</body></html>'
+
+
+def bilibili_page(rng, noise=300_000):
+    state = {'bvid': BVID, 'videoData': {'title': '基准测试视频', 'bvid': BVID, 'cid': 123456,
+                                         'pages': [{'cid': 123456 + i, 'part': f'P{i}'} for i in range(50)]}}
+    scripts = ''.join(f'<script>{_script_noise(rng, noise // 3)}</script>' for _ in range(3))
+    initial = (f'<script>window.__INITIAL_STATE__={json.dumps(state, ensure_ascii=False)};'
+               '(function(){var s;(s=document.currentScript||document.scripts[document.scripts.length-1]).parentNode.removeChild(s);}());</script>')
+    return _head('基准测试视频_哔哩哔哩_bilibili', rng) + initial + scripts + '</body></html>'
+
+
+def toutiao_page(rng, noise=200_000):
+    scripts = ''.join(f'<script>{_script_noise(rng, noise // 2)}</script>' for _ in range(2))
+    data = f'<script>window.__data={{"item_id":"{VIDEO_ID}","title":"头条视频"}}</script>'
+    return _head('头条视频 - 今日头条', rng) + scripts + data + '</body></html>'
+
+
+GENERATED = {
+    'douyin_render_data': douyin_render_data_page,
+    'douyin_router_data': douyin_router_data_page,
+    'bilibili_video': bilibili_page,
+    'toutiao_video': toutiao_page,
+}
+
+
+def load_fixtures(directory=None, seed=0):
+    if not directory:
+        return {name: build(random.Random(seed)) for name, build in GENERATED.items()}
+    fixtures = {}
+    for path in sorted(glob.glob(os.path.join(os.path.expanduser(directory), '*.html'))):
+        with open(path, encoding='utf-8', errors='replace') as f:
+            fixtures[os.path.splitext(os.path.basename(path))[0]] = f.read()
+    return fixtures
+
+
+def extractors(scraper, name):
+    """按文件名前缀确定平台，返回该平台一次解析要做的全部页面提取"""
+    if name.startswith('douyin'):
+        def extract(html):
+            # 与 DouyinResolver 一样整页只扫描一次；改动前的版本没有 html_extract，各方法分别解析
+            args = (html, html_extract.scan(html)) if html_extract else (html,)
+            return (scraper._extract_douyin_title(*args), scraper._extract_douyin_item_ids(*args),
+                    scraper._extract_douyin_video_url_from_html(*args))
+        return extract
+    if name.startswith('bilibili'):
+        return lambda html: (scraper._extract_bilibili_title(html),)
+    if name.startswith('toutiao'):
+        return lambda html: (scraper._extract_toutiao_title(html), scraper._extract_toutiao_item_id(html))
+    return None
+
+
+def measure(extract, html, runs):
+    result = extract(html)
+    samples = []
+    for _ in range(runs):
+        started = time.process_time()
+        extract(html)
+        samples.append(time.process_time() - started)
+    return result, samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description='页面解析CPU基准')
+    parser.add_argument('--runs', type=int, default=50, help='每个页面重复解析的次数')
+    parser.add_argument('--fixtures', help='保存的页面目录，默认使用生成的页面')
+    parser.add_argument('--output', help='JSON报告路径，默认只打印')
+    args = parser.parse_args()
+
+    global html_extract
+    from core.video_scraper import VideoScraper
+    try:
+        from core import html_extract
+    except ImportError:
+        html_extract = None
+    scraper = VideoScraper()
+
+    results = {}
+    for name, html in load_fixtures(args.fixtures).items():
+        extract = extractors(scraper, name)
+        if extract is None:
+            continue
+        extracted, samples = measure(extract, html, args.runs)
+        results[name] = {
+            'bytes': len(html.encode('utf-8')),
+            'extracted': [value if isinstance(value, (str, type(None))) else str(value) for value in extracted],
+            'cpu_ms': summarize(samples, unit_scale=1000),
+        }
+    write_report('html_extract', vars(args), results, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,208 @@
+"""RedisManager 热点操作的规模测试
+
+    python -m benchmarks.bench_redis_manager --sizes 1000 10000 100000 --output redis.json
+
+按不同数据规模写入合成的任务、视频和日志，测量列表、搜索、状态更新和日志操作的
+耗时，以及每次操作发出的Redis命令数和往返次数。命令数随规模增长的操作会被标记
+为 O(N)，一眼就能看出回退。
+"""
+
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import summarize, write_report
+from benchmarks.redis_backend import BenchRedis
+
+SEED_BATCH = 1000
+LOGGED_TASKS = 1000  # 只给前这么多个任务写日志，日志量不随规模线性膨胀
+LOGS_PER_TASK = 50
+
+
+class CommandCounter:
+    """统计客户端发出的命令数和网络往返次数（pipeline算一次往返）"""
+
+    def __init__(self, client):
+        self.commands = 0
+        self.roundtrips = 0
+        self._lock = threading.Lock()
+        original_execute = client.execute_command
+        original_pipeline = client.pipeline
+        counter = self
+
+        def execute_command(*args, **options):
+            counter._add(1, 1)
+            return original_execute(*args, **options)
+
+        def pipeline(*args, **kwargs):
+            pipe = original_pipeline(*args, **kwargs)
+            pipe_execute = pipe.execute
+
+            def execute(*a, **kw):
+                counter._add(len(pipe.command_stack), 1)
+                return pipe_execute(*a, **kw)
+
+            pipe.execute = execute
+            return pipe
+
+        client.execute_command = execute_command
+        client.pipeline = pipeline
+
+    def _add(self, commands, roundtrips):
+        with self._lock:
+            self.commands += commands
+            self.roundtrips += roundtrips
+
+    def snapshot(self):
+        with self._lock:
+            return self.commands, self.roundtrips
+
+
+def seed(redis_manager, size):
+    client = redis_manager.redis_client
+    client.flushdb()
+    for start in range(0, size, SEED_BATCH):
+        pipe = client.pipeline(transaction=False)
+        for i in range(start, min(start + SEED_BATCH, size)):
+            pipe.hset(f'task:bench-{i}', mapping={
+                'id': f'bench-{i}', 'url': f'https://www.bilibili.com/video/BV{i:010d}',
+                'title': f'合成任务{i}', 'platform': 'bilibili', 'status': 'completed', 'progress': 100,
+                'created_at': '2024-01-01 00:00:00'
+            })
+            pipe.hset(f'video:bench-{i}', mapping={
+                'id': f'bench-{i}', 'task_id': f'bench-{i}', 'title': f'合成视频{i}',
+                'platform': 'bilibili', 'save_path': f'/videos/bilibili/合成视频{i}/合成视频{i}.mov'
+            })
+        pipe.execute()
+    for i in range(min(size, LOGGED_TASKS)):
+        entries = [f'[2024-01-01 00:00:00] 合成日志 {j}' for j in range(LOGS_PER_TASK)]
+        redis_manager.add_task_logs({f'bench-{i}': entries})
+
+
+def measure(counter, operation, repeat):
+    latencies = []
+    commands_before, roundtrips_before = counter.snapshot()
+    for i in range(repeat):
+        start = time.perf_counter()
+        operation(i)
+        latencies.append(time.perf_counter() - start)
+    commands_after, roundtrips_after = counter.snapshot()
+    return {
+        'latency_ms': summarize(latencies, unit_scale=1000),
+        'commands_per_op': round((commands_after - commands_before) / repeat, 2),
+        'roundtrips_per_op': round((roundtrips_after - roundtrips_before) / repeat, 2)
+    }
+
+
+def measure_concurrent_progress(counter, redis_manager, downloads, updates_per_download):
+    """模拟多个下载同时上报进度和速度"""
+    commands_before, roundtrips_before = counter.snapshot()
+    latencies = []
+    lock = threading.Lock()
+
+    def report(n):
+        task_id = f'bench-{n}'
+        local = []
+        for progress in range(updates_per_download):
+            start = time.perf_counter()
+            redis_manager.update_task_status(task_id, 'downloading', progress=progress)
+            redis_manager.update_task_download_speed(task_id, '5.00 MB/s')
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=downloads) as executor:
+        list(executor.map(report, range(downloads)))
+    elapsed = time.perf_counter() - start
+    commands_after, roundtrips_after = counter.snapshot()
+    total = downloads * updates_per_download
+    return {
+        'concurrent_downloads': downloads,
+        'updates_per_second': round(total / elapsed, 1),
+        'latency_ms': summarize(latencies, unit_scale=1000),
+        'commands_per_op': round((commands_after - commands_before) / total, 2),
+        'roundtrips_per_op': round((roundtrips_after - roundtrips_before) / total, 2)
+    }
+
+
+def run_size(redis_manager, counter, size, args):
+    started = time.perf_counter()
+    seed(redis_manager, size)
+    seed_seconds = round(time.perf_counter() - started, 2)
+
+    from app import create_app
+    from core.services import services
+    # 接口用的共享服务换成基准用的Redis连接
+    services.provide(redis_manager=redis_manager)
+    client = create_app().test_client()
+
+    # 全量扫描类操作耗时随规模增长，大规模时少测几次
+    scan_repeat = max(1, min(args.repeat, 50000 // size))
+    logged = min(size, LOGGED_TASKS)
+    operations = {
+        'get_all_tasks': (lambda i: redis_manager.get_all_tasks(), scan_repeat),
+        'get_all_videos': (lambda i: redis_manager.get_all_videos(), scan_repeat),
+        'search_videos (GET /api/videos/search)': (lambda i: client.get('/api/videos/search?q=合成视频7'), scan_repeat),
+        'list_tasks (GET /api/tasks)': (lambda i: client.get('/api/tasks'), scan_repeat),
+        'get_task': (lambda i: redis_manager.get_task(f'bench-{i % size}'), args.ops),
+        'update_task_status': (lambda i: redis_manager.update_task_status(f'bench-{i % size}', 'downloading', progress=i % 100), args.ops),
+        'update_task_download_speed': (lambda i: redis_manager.update_task_download_speed(f'bench-{i % size}', '1.00 MB/s'), args.ops),
+        'add_task_log': (lambda i: redis_manager.add_task_log(f'bench-{i % logged}', '基准日志'), args.ops),
+        'add_task_logs (batch of 20)': (lambda i: redis_manager.add_task_logs({f'bench-{i % logged}': ['基准日志'] * 20}), max(1, args.ops // 20)),
+        'get_task_logs': (lambda i: redis_manager.get_task_logs(f'bench-{i % logged}'), args.ops),
+    }
+    results = {'seed_seconds': seed_seconds}
+    for name, (operation, repeat) in operations.items():
+        results[name] = measure(counter, operation, repeat)
+    results['concurrent_progress'] = measure_concurrent_progress(
+        counter, redis_manager, min(args.concurrency, size), args.updates_per_download)
+    return results
+
+
+def flag_linear(results, sizes):
+    """每次操作命令数随规模增长的操作，即对Redis是 O(N) 的"""
+    smallest, largest = str(sizes[0]), str(sizes[-1])
+    flagged = []
+    if smallest == largest:
+        return flagged
+    for name, small in results[smallest].items():
+        large = results[largest].get(name)
+        if not isinstance(small, dict) or 'commands_per_op' not in small:
+            continue
+        if large['commands_per_op'] > small['commands_per_op'] * 2:
+            flagged.append({
+                'operation': name,
+                f'commands_per_op@{smallest}': small['commands_per_op'],
+                f'commands_per_op@{largest}': large['commands_per_op']
+            })
+    return flagged
+
+
+def main():
+    parser = argparse.ArgumentParser(description='RedisManager 规模基准')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--repeat', type=int, default=20, help='全量扫描类操作的最多重复次数')
+    parser.add_argument('--ops', type=int, default=2000, help='单条记录操作的次数')
+    parser.add_argument('--concurrency', type=int, default=100, help='同时上报进度的下载数')
+    parser.add_argument('--updates-per-download', type=int, default=50)
+    parser.add_argument('--redis', default='auto', choices=['auto', 'fakeredis', 'local', 'spawn'])
+    parser.add_argument('--output', help='JSON报告路径，默认只打印')
+    args = parser.parse_args()
+
+    sizes = sorted(args.sizes)
+    bench_redis = BenchRedis(args.redis)
+    results = {}
+    with bench_redis as redis_manager:
+        counter = CommandCounter(redis_manager.redis_client)
+        for size in sizes:
+            results[str(size)] = run_size(redis_manager, counter, size, args)
+
+    params = vars(args).copy()
+    params['redis_backend'] = bench_redis.kind
+    write_report('redis_manager', params, {'sizes': results, 'o_n_operations': flag_linear(results, sizes)}, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""基准测试公共工具：导入路径、统计和JSON报告"""
+
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND_DIR = os.path.join(ROOT_DIR, 'backend')
+
+# 与 app.py 一样以 backend 为根导入 core/config
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+
+def percentile(values, p):
+    """最近邻秩法分位数"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, -(-p * len(ordered) // 100))
+    return ordered[rank - 1]
+
+
+def summarize(values, unit_scale=1.0, digits=3):
+    """耗时列表汇总为 p50/p90/p99/mean"""
+    if not values:
+        return None
+    scaled = [v * unit_scale for v in values]
+    return {
+        'count': len(scaled),
+        'p50': round(percentile(scaled, 50), digits),
+        'p90': round(percentile(scaled, 90), digits),
+        'p99': round(percentile(scaled, 99), digits),
+        'mean': round(sum(scaled) / len(scaled), digits)
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def write_report(name, params, results, output=None):
+    """输出JSON报告；output 为空时打印到标准输出"""
+    report = {
+        'benchmark': name,
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'params': params,
+        'results': results
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    print(text)
+    return report
@@ -0,0 +1,210 @@
+"""本地模拟的平台接口和CDN
+
+- Bilibili: 视频页面、/x/web-interface/view、/x/player/playurl（DASH音视频分离）
+- 抖音: 视频页面（og:video 指向CDN）
+- CDN: /cdn/<文件名>，支持Range，可限速和增加首包延迟
+
+所有外部域名都由 routed() 改写到本服务器，原始域名放在 X-Bench-Host 头里。
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+from urllib.parse import urlparse, parse_qs, urlunparse
+
+CHUNK_SIZE = 64 * 1024
+
+
+class FakePlatformServer:
+    def __init__(self, media_dir, bandwidth=0, latency=0.0, host='127.0.0.1', port=0):
+        """bandwidth: 每个连接的限速（字节/秒，0为不限）；latency: 每个请求的首包延迟（秒）"""
+        self.media_dir = media_dir
+        self.bandwidth = bandwidth
+        self.latency = latency
+        self.videos = {}
+        self.requests = 0
+        self._httpd = ThreadingHTTPServer((host, port), self._handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def add_video(self, video_id, title, video_file, audio_file=None):
+        """登记一个视频；audio_file 为空时 playurl 返回单文件 durl"""
+        self.videos[video_id] = {'title': title, 'video': video_file, 'audio': audio_file}
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    def cdn_url(self, filename):
+        return f'{self.base_url}/cdn/{filename}'
+
+    @contextmanager
+    def routed(self):
+        """把经由 requests.get 发出的外部请求改写到本服务器"""
+        import requests
+        original_get = requests.get
+        local = urlparse(self.base_url)
+
+        def get(url, **kwargs):
+            parsed = urlparse(url)
+            if parsed.netloc != local.netloc:
+                headers = dict(kwargs.pop('headers', None) or {})
+                headers['X-Bench-Host'] = parsed.hostname or ''
+                kwargs['headers'] = headers
+                url = urlunparse(parsed._replace(scheme=local.scheme, netloc=local.netloc))
+            return original_get(url, **kwargs)
+
+        with patch.object(requests, 'get', get):
+            yield self
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                server.requests += 1
+                if server.latency:
+                    time.sleep(server.latency)
+                parsed = urlparse(self.path)
+                query = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+                host = self.headers.get('X-Bench-Host', '')
+                try:
+                    if parsed.path.startswith('/cdn/'):
+                        return self._serve_file(os.path.basename(parsed.path))
+                    if parsed.path == '/x/web-interface/view':
+                        return self._view(query.get('bvid'))
+                    if parsed.path == '/x/player/playurl':
+                        return self._playurl(query.get('bvid'))
+                    match = re.match(r'^/video/([A-Za-z0-9]+)', parsed.path)
+                    if match and 'douyin' in host:
+                        return self._douyin_page(match.group(1))
+                    if match:
+                        return self._bilibili_page(match.group(1))
+                    self._send(404, b'not found', 'text/plain')
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def _send(self, status, body, content_type, headers=None):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _json(self, data):
+                self._send(200, json.dumps(data, ensure_ascii=False).encode('utf-8'), 'application/json')
+
+            def _video(self, video_id):
+                return server.videos.get(video_id)
+
+            def _bilibili_page(self, bvid):
+                video = self._video(bvid)
+                title = video['title'] if video else '视频不存在'
+                html = f'<html><head><title>{title}_哔哩哔哩_bilibili</title></head><body></body></html>'
+                self._send(200, html.encode('utf-8'), 'text/html; charset=utf-8')
+
+            def _view(self, bvid):
+                video = self._video(bvid)
+                if not video:
+                    return self._json({'code': -404, 'message': '啥都木有'})
+                self._json({'code': 0, 'data': {'bvid': bvid, 'title': video['title'], 'cid': 1000}})
+
+            def _playurl(self, bvid):
+                video = self._video(bvid)
+                if not video:
+                    return self._json({'code': -404, 'message': '啥都木有'})
+                if not video['audio']:
+                    return self._json({'code': 0, 'data': {'durl': [{'url': server.cdn_url(video['video'])}]}})
+                self._json({'code': 0, 'data': {'dash': {
+                    'video': [{'id': 80, 'baseUrl': server.cdn_url(video['video']), 'codecs': 'avc1.640032'}],
+                    'audio': [{'id': 30280, 'baseUrl': server.cdn_url(video['audio']), 'codecs': 'mp4a.40.2'}]
+                }}})
+
+            def _douyin_page(self, item_id):
+                video = self._video(item_id)
+                if not video:
+                    return self._send(404, b'not found', 'text/plain')
+                html = (
+                    f'<html><head><title>{video["title"]} - 抖音</title>'
+                    f'<meta property="og:video" content="{server.cdn_url(video["video"])}">'
+                    f'</head><body><script>{{"aweme_id":"{item_id}"}}</script></body></html>'
+                )
+                self._send(200, html.encode('utf-8'), 'text/html; charset=utf-8')
+
+            def _serve_file(self, filename):
+                path = os.path.join(server.media_dir, filename)
+                if not os.path.isfile(path):
+                    return self._send(404, b'not found', 'text/plain')
+                size = os.path.getsize(path)
+                start, end = 0, size - 1
+                status = 200
+                range_header = self.headers.get('Range')
+                if range_header:
+                    match = re.match(r'bytes=(\d+)-(\d*)', range_header)
+                    start = int(match.group(1))
+                    if match.group(2):
+                        end = min(int(match.group(2)), size - 1)
+                    if start >= size:
+                        self.send_response(416)
+                        self.send_header('Content-Range', f'bytes */{size}')
+                        self.send_header('Content-Length', '0')
+                        self.end_headers()
+                        return
+                    status = 206
+
+                self.send_response(status)
+                self.send_header('Content-Type', 'video/mp4')
+                self.send_header('Accept-Ranges', 'bytes')
+                self.send_header('Content-Length', str(end - start + 1))
+                if status == 206:
+                    self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+                self.end_headers()
+
+                remaining = end - start + 1
+                started = time.perf_counter()
+                sent = 0
+                with open(path, 'rb') as f:
+                    f.seek(start)
+                    while remaining > 0:
+                        chunk = f.read(min(CHUNK_SIZE, remaining))
+                        if not chunk:
+                            break
+                        self.wfile.write(chunk)
+                        remaining -= len(chunk)
+                        sent += len(chunk)
+                        if server.bandwidth:
+                            # 按累计发送量限速，避免每块单独睡眠带来的误差累积
+                            delay = sent / server.bandwidth - (time.perf_counter() - started)
+                            if delay > 0:
+                                time.sleep(delay)
+
+        return Handler
@@ -0,0 +1,49 @@
+"""用 FFmpeg lavfi 生成测试视频，结果按参数缓存，重复运行不再重新编码"""
+
+import os
+import shutil
+import subprocess
+
+
+def ffmpeg_available(ffmpeg='ffmpeg'):
+    return shutil.which(ffmpeg) is not None
+
+
+def generate_video(output_dir, seconds, width=1280, height=720, fps=30, ffmpeg='ffmpeg'):
+    """生成带音轨的H.264/AAC测试视频，返回 (合并文件, 纯视频, 纯音频) 的文件名"""
+    os.makedirs(output_dir, exist_ok=True)
+    name = f'lavfi_{width}x{height}_{fps}fps_{seconds}s'
+    muxed = f'{name}.mp4'
+    video_only = f'{name}.video.m4s'
+    audio_only = f'{name}.audio.m4s'
+
+    if not os.path.exists(os.path.join(output_dir, muxed)):
+        subprocess.run([
+            ffmpeg, '-y', '-loglevel', 'error',
+            '-f', 'lavfi', '-i', f'testsrc2=size={width}x{height}:rate={fps}',
+            '-f', 'lavfi', '-i', 'sine=frequency=440:sample_rate=48000',
+            '-t', str(seconds),
+            '-c:v', 'libx264', '-preset', 'veryfast', '-pix_fmt', 'yuv420p',
+            '-c:a', 'aac', '-b:a', '128k',
+            os.path.join(output_dir, muxed)
+        ], check=True)
+    # 拆出DASH风格的音视频分离文件，模拟Bilibili的playurl返回
+    if not os.path.exists(os.path.join(output_dir, video_only)):
+        subprocess.run([ffmpeg, '-y', '-loglevel', 'error', '-i', os.path.join(output_dir, muxed),
+                        '-an', '-c', 'copy', '-f', 'mp4', os.path.join(output_dir, video_only)], check=True)
+    if not os.path.exists(os.path.join(output_dir, audio_only)):
+        subprocess.run([ffmpeg, '-y', '-loglevel', 'error', '-i', os.path.join(output_dir, muxed),
+                        '-vn', '-c', 'copy', '-f', 'mp4', os.path.join(output_dir, audio_only)], check=True)
+    return muxed, video_only, audio_only
+
+
+def generate_blob(output_dir, size_mb):
+    """没有FFmpeg时用随机数据测纯下载吞吐"""
+    os.makedirs(output_dir, exist_ok=True)
+    name = f'blob_{size_mb}mb.bin'
+    path = os.path.join(output_dir, name)
+    if not os.path.exists(path) or os.path.getsize(path) != size_mb * 1024 * 1024:
+        with open(path, 'wb') as f:
+            for _ in range(size_mb):
+                f.write(os.urandom(1024 * 1024))
+    return name
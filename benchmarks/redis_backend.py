@@ -0,0 +1,86 @@
+"""基准测试用的Redis：优先用 fakeredis，其次本机 redis-server
+
+使用 TEST_REDIS_DB 或临时启动的实例，不会碰到生产数据。
+"""
+
+import shutil
+import socket
+import subprocess
+import time
+
+from config.config import Config
+from core.redis_manager import RedisManager, InstrumentedRedis
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+class BenchRedis:
+    def __init__(self, backend='auto'):
+        """backend: auto / fakeredis / local（Config里的Redis的测试库）/ spawn（临时启动redis-server）"""
+        self.backend = backend
+        self.process = None
+        self.manager = None
+        self.kind = None
+
+    def start(self):
+        manager = RedisManager(use_test_db=True)
+        client = None
+
+        if self.backend in ('auto', 'fakeredis'):
+            try:
+                import fakeredis
+                client = fakeredis.FakeRedis(decode_responses=True)
+                self.kind = 'fakeredis'
+            except ImportError:
+                if self.backend == 'fakeredis':
+                    raise
+        if client is None and self.backend in ('auto', 'local'):
+            try:
+                manager.redis_client.ping()
+                client = manager.redis_client
+                self.kind = f'local db{Config.TEST_REDIS_DB}'
+            except Exception:
+                if self.backend == 'local':
+                    raise
+        if client is None and self.backend in ('auto', 'spawn') and shutil.which('redis-server'):
+            port = _free_port()
+            self.process = subprocess.Popen(
+                ['redis-server', '--port', str(port), '--save', '', '--appendonly', 'no'],
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+            client = InstrumentedRedis(host='127.0.0.1', port=port, decode_responses=True)
+            for _ in range(50):
+                try:
+                    client.ping()
+                    break
+                except Exception:
+                    time.sleep(0.1)
+            self.kind = f'redis-server :{port}'
+        if client is None:
+            raise RuntimeError('没有可用的Redis：请安装 fakeredis、启动本机Redis或安装 redis-server')
+
+        client.flushdb()
+        manager.redis_client = client
+        self.manager = manager
+        return manager
+
+    def stop(self):
+        if self.manager:
+            try:
+                self.manager.redis_client.flushdb()
+            except Exception:
+                pass
+        if self.process:
+            self.process.terminate()
+            self.process.wait()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
@@ -0,0 +1,188 @@
+"""端到端基准：本地模拟CDN/平台接口 + lavfi测试视频
+
+    python -m benchmarks.run_e2e --bandwidth 20 --latency 0.05 --output e2e.json
+
+输出JSON，包含下载MB/s、转码fps、每分钟完成任务数和各API的p50/p99延迟，
+提交前后各跑一次对比即可发现性能回退。
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+import uuid
+
+from benchmarks.common import summarize, write_report
+from benchmarks.fake_server import FakePlatformServer
+from benchmarks.media import ffmpeg_available, generate_video, generate_blob
+from benchmarks.redis_backend import BenchRedis
+
+from config.config import Config
+from core.task_timings import TaskTimings
+from core.video_downloader import VideoDownloader
+from core.video_transcoder import VideoTranscoder
+
+
+def bench_download(downloader, server, filename, work_dir, runs):
+    size = os.path.getsize(os.path.join(server.media_dir, filename))
+    rates = []
+    cpu = []
+    for i in range(runs):
+        target = os.path.join(work_dir, f'download_{i}.bin')
+        start = time.perf_counter()
+        # 模拟CDN在同一进程的其他线程里，只统计下载线程自己的CPU时间
+        cpu_start = time.thread_time()
+        downloader._download_stream(server.cdn_url(filename), {}, target, f'bench-download-{i}', platform='bench')
+        cpu.append((time.thread_time() - cpu_start) * 1000 / (size / 1024 / 1024))
+        elapsed = time.perf_counter() - start
+        rates.append(size / elapsed / 1024 / 1024)
+        os.remove(target)
+    return {'file_mb': round(size / 1024 / 1024, 2), 'mb_per_second': summarize(rates, digits=2),
+            'cpu_ms_per_mb': summarize(cpu, digits=2)}
+
+
+def bench_transcode(transcoder, source, seconds, fps, work_dir, runs):
+    results = []
+    for i in range(runs):
+        output = os.path.join(work_dir, f'transcode_{i}.mov')
+        start = time.perf_counter()
+        success, message = transcoder.transcode_video(source, output, None)
+        elapsed = time.perf_counter() - start
+        if not success:
+            return {'error': message}
+        results.append(seconds * fps / elapsed)
+        os.remove(output)
+    return {'video_seconds': seconds, 'fps': summarize(results, digits=1)}
+
+
+def bench_tasks(redis_manager, downloader, timings, server, count, storage_dir):
+    """完整走 download_video：解析 -> 音视频下载 -> 合并 -> 转码"""
+    started = time.perf_counter()
+    completed = 0
+    failures = []
+    for i in range(count):
+        task_id = f'bench-{uuid.uuid4()}'
+        url = f'https://www.bilibili.com/video/BVbench{i % len(server.videos)}'
+        redis_manager.set_task(task_id, {'id': task_id, 'url': url, 'status': 'pending', 'progress': 0})
+        success, message = downloader.download_video(url, task_id, storage_dir)
+        timings.save(task_id)
+        if success:
+            completed += 1
+        else:
+            failures.append(message.split('\n')[0])
+    elapsed = time.perf_counter() - started
+    return {
+        'tasks': count,
+        'completed': completed,
+        'tasks_per_minute': round(completed / elapsed * 60, 2),
+        'failures': failures[:5],
+        'stage_breakdown': timings.summary()['stages']
+    }
+
+
+def bench_api(redis_manager, requests_per_endpoint, seed_tasks, server):
+    from app import create_app
+    from core.services import services
+    # 接口用的共享服务换成基准用的Redis连接
+    services.provide(redis_manager=redis_manager)
+    client = create_app().test_client()
+
+    task_ids = []
+    for i in range(seed_tasks):
+        task_id = f'bench-api-{i}'
+        redis_manager.set_task(task_id, {'id': task_id, 'url': 'https://www.bilibili.com/video/BVbench0',
+                                         'title': f'任务{i}', 'status': 'completed', 'progress': 100})
+        task_ids.append(task_id)
+
+    endpoints = {
+        'GET /api/tasks': lambda i: client.get('/api/tasks'),
+        'GET /api/tasks/<id>': lambda i: client.get(f'/api/tasks/{task_ids[i % len(task_ids)]}'),
+        'GET /api/tasks/<id>/logs': lambda i: client.get(f'/api/tasks/{task_ids[i % len(task_ids)]}/logs'),
+        'GET /api/timings/summary': lambda i: client.get('/api/timings/summary'),
+        'GET /metrics': lambda i: client.get('/metrics'),
+        'POST /api/tasks': lambda i: client.post('/api/tasks', json={'url': 'https://www.bilibili.com/video/BVbench0'}),
+    }
+    results = {}
+    for name, call in endpoints.items():
+        latencies = []
+        errors = 0
+        for i in range(requests_per_endpoint):
+            start = time.perf_counter()
+            response = call(i)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+        results[name] = {'latency_ms': summarize(latencies, unit_scale=1000), 'errors': errors}
+    # 清掉 POST 产生的排队任务
+    redis_manager.redis_client.delete('download_queue')
+    return {'seed_tasks': seed_tasks, 'endpoints': results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='端到端性能基准')
+    parser.add_argument('--bandwidth', type=float, default=0, help='模拟CDN单连接带宽 MB/s，0为不限速')
+    parser.add_argument('--latency', type=float, default=0.0, help='模拟接口/CDN首包延迟（秒）')
+    parser.add_argument('--video-seconds', type=int, default=30, help='测试视频时长')
+    parser.add_argument('--width', type=int, default=1280)
+    parser.add_argument('--height', type=int, default=720)
+    parser.add_argument('--fps', type=int, default=30)
+    parser.add_argument('--download-mb', type=int, default=64, help='没有FFmpeg时纯下载测试文件大小')
+    parser.add_argument('--runs', type=int, default=3, help='下载/转码测试重复次数')
+    parser.add_argument('--tasks', type=int, default=5, help='端到端任务数')
+    parser.add_argument('--api-requests', type=int, default=200, help='每个接口请求次数')
+    parser.add_argument('--api-seed-tasks', type=int, default=1000, help='接口测试前写入的任务数')
+    parser.add_argument('--redis', default='auto', choices=['auto', 'fakeredis', 'local', 'spawn'])
+    parser.add_argument('--media-dir', default=os.path.join(tempfile.gettempdir(), 'bubbletv-bench-media'),
+                        help='测试视频缓存目录')
+    parser.add_argument('--skip', action='append', default=[], choices=['download', 'transcode', 'tasks', 'api'])
+    parser.add_argument('--output', help='JSON报告路径，默认只打印')
+    args = parser.parse_args()
+
+    has_ffmpeg = ffmpeg_available(Config.FFMPEG_PATH)
+    work_dir = tempfile.mkdtemp(prefix='bubbletv-bench-')
+    results = {}
+
+    bench_redis = BenchRedis(args.redis)
+    with bench_redis as redis_manager:
+        timings = TaskTimings(redis_manager)
+        downloader = VideoDownloader(redis_manager, timings=timings)
+        transcoder = VideoTranscoder(redis_manager, timings=timings)
+
+        server = FakePlatformServer(args.media_dir, bandwidth=args.bandwidth * 1024 * 1024, latency=args.latency)
+        with server, server.routed():
+            if has_ffmpeg:
+                muxed, video_only, audio_only = generate_video(
+                    args.media_dir, args.video_seconds, args.width, args.height, args.fps, Config.FFMPEG_PATH)
+                for i in range(3):
+                    server.add_video(f'BVbench{i}', f'基准测试视频{i}', video_only, audio_only)
+                download_file = muxed
+            else:
+                download_file = generate_blob(args.media_dir, args.download_mb)
+                server.add_video('BVbench0', '基准测试视频0', download_file)
+
+            if 'download' not in args.skip:
+                results['download'] = bench_download(downloader, server, download_file, work_dir, args.runs)
+            if 'transcode' not in args.skip:
+                results['transcode'] = (
+                    bench_transcode(transcoder, os.path.join(args.media_dir, muxed), args.video_seconds,
+                                    args.fps, work_dir, args.runs)
+                    if has_ffmpeg else {'skipped': 'ffmpeg not found'}
+                )
+            if 'tasks' not in args.skip:
+                results['tasks'] = (
+                    bench_tasks(redis_manager, downloader, timings, server, args.tasks, work_dir)
+                    if has_ffmpeg else {'skipped': 'ffmpeg not found'}
+                )
+            if 'api' not in args.skip:
+                results['api'] = bench_api(redis_manager, args.api_requests, args.api_seed_tasks, server)
+
+    params = vars(args).copy()
+    params['redis_backend'] = bench_redis.kind
+    params['ffmpeg'] = has_ffmpeg
+    shutil.rmtree(work_dir, ignore_errors=True)
+    write_report('e2e', params, results, args.output)
+
+
+if __name__ == '__main__':
+    main()
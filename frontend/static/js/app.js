@@ -356,6 +356,7 @@ function getStatusBadge(status) {
         'transcoding': '<span class="badge bg-warning">转码中</span>',
         'completed': '<span class="badge bg-success">已完成</span>',
         'failed': '<span class="badge bg-danger">下载失败</span>',
+        'paused': '<span class="badge bg-secondary">已暂停</span>',
         'cancelled': '<span class="badge bg-secondary">已取消</span>'
     };
     return badges[status] || '';
@@ -383,6 +384,18 @@ function getActionButtons(task) {
                 <i class="fa fa-times"></i> 取消
             </button>
         `;
+    } else if (task.status === 'paused') {
+        return `
+            <button class="btn btn-sm btn-info" onclick="showTaskLogs('${task.id}')">
+                <i class="fa fa-list-alt"></i> 日志
+            </button>
+            <button class="btn btn-sm btn-primary" onclick="resumeTask('${task.id}')">
+                <i class="fa fa-play"></i> 继续
+            </button>
+            <button class="btn btn-sm btn-danger" onclick="cancelTask('${task.id}')">
+                <i class="fa fa-times"></i> 取消
+            </button>
+        `;
     } else if (task.status === 'completed') {
         return `
             <button class="btn btn-sm btn-info" onclick="showTaskLogs('${task.id}')">
@@ -425,6 +438,20 @@ function pauseTask(taskId) {
     });
 }
 
+function resumeTask(taskId) {
+    fetch(`/api/tasks/${taskId}/resume`, {
+        method: 'POST'
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            loadTasks();
+        } else {
+            showMessage('操作失败', '操作失败：' + data.message);
+        }
+    });
+}
+
 function cancelTask(taskId) {
     fetch(`/api/tasks/${taskId}/cancel`, {
         method: 'POST'
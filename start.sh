@@ -36,6 +36,19 @@ mkdir -p logs
 mkdir -p frontend/static/js
 mkdir -p frontend/templates
 
-# 启动Flask应用
-echo "启动Flask应用...with port 5001"
-python3 backend/app.py
\ No newline at end of file
+# 开发模式：单进程Flask服务器，同时处理下载（./start.sh dev）
+if [[ "$1" == "dev" ]]; then
+    echo "以开发模式启动Flask应用..."
+    python3 backend/app.py
+    exit $?
+fi
+
+# 生产模式：后台任务进程 + gunicorn
+# 监听地址和进程数可通过 BUBBLETV_HOST / BUBBLETV_PORT / BUBBLETV_WEB_WORKERS / BUBBLETV_DOWNLOAD_THREADS 设置
+echo "启动后台任务进程..."
+python3 backend/worker.py &
+WORKER_PID=$!
+trap 'kill $WORKER_PID 2>/dev/null' EXIT
+
+echo "启动Web服务 (${BUBBLETV_HOST:-0.0.0.0}:${BUBBLETV_PORT:-5001})..."
+gunicorn -c backend/gunicorn.conf.py
\ No newline at end of file
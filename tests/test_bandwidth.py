@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试下载限速
+"""
+
+import unittest
+import sys
+import os
+import threading
+import time
+from unittest.mock import Mock, patch
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.core import bandwidth
+from backend.core.bandwidth import BandwidthGovernor, TokenBucket, active_limits, validate_config
+from backend.core.task_control import TaskControl, TaskInterrupted
+from backend.core.video_downloader import VideoDownloader
+
+MB = 1024 * 1024
+
+
+def _at(hour, minute=0):
+    return time.struct_time((2026, 1, 1, hour, minute, 0, 3, 1, 0))
+
+
+class TestTokenBucket(unittest.TestCase):
+    """测试令牌桶"""
+
+    def test_burst_then_wait(self):
+        """积攒的额度用完后按速率等待，透支部分顺延"""
+        with patch.object(bandwidth.Config, 'BANDWIDTH_BURST_SECONDS', 1):
+            bucket = TokenBucket(1000)
+            bucket.tokens = bucket.capacity
+            self.assertEqual(bucket.reserve(1000), 0)
+            self.assertAlmostEqual(bucket.reserve(500), 0.5, places=2)
+            self.assertAlmostEqual(bucket.reserve(500), 1.0, places=2)
+            bucket.set_rate(0)
+            self.assertEqual(bucket.reserve(10 * MB), 0)
+
+
+class TestSchedule(unittest.TestCase):
+    """测试配置校验和按时段生效"""
+
+    def setUp(self):
+        self.config = validate_config({
+            'global_limit': 0, 'task_limit': 0,
+            'schedule': [{'start': '08:00', 'end': '23:00', 'global_limit': 2 * MB},
+                         {'start': '23:30', 'end': '01:00', 'task_limit': MB}],
+        })
+
+    def test_windows(self):
+        """白天限速，夜间不限，跨午夜的时段也能匹配"""
+        self.assertEqual(active_limits(self.config, _at(12)), (2 * MB, 0))
+        self.assertEqual(active_limits(self.config, _at(23, 10)), (0, 0))
+        self.assertEqual(active_limits(self.config, _at(0, 30)), (0, MB))
+        self.assertEqual(active_limits(self.config, _at(3)), (0, 0))
+
+    def test_invalid_config(self):
+        """不合法的配置抛 ValueError，部分更新沿用原值"""
+        for data in ({'global_limit': -1}, {'task_limit': 'fast'}, {'schedule': [{'start': '25:00', 'end': '01:00'}]},
+                     {'schedule': [{'start': '08:00'}]}, {'schedule': 'night'}):
+            with self.assertRaises(ValueError):
+                validate_config(data)
+        updated = validate_config({'task_limit': 512}, self.config)
+        self.assertEqual(updated['task_limit'], 512)
+        self.assertEqual(updated['schedule'], self.config['schedule'])
+
+
+class TestBandwidthGovernor(unittest.TestCase):
+    """测试全局额度分配和限速睡眠"""
+
+    def setUp(self):
+        self.redis_manager = Mock()
+        self.redis_manager.get_bandwidth_config.return_value = {'global_limit': 4 * MB, 'task_limit': MB}
+        self.redis_manager.report_active_downloads.return_value = 4
+        self.governor = BandwidthGovernor(self.redis_manager)
+
+    def test_global_share_across_processes(self):
+        """全局额度按所有进程的下载数量分配，单任务额度独立生效"""
+        with self.governor.track('task_a'):
+            self.assertEqual(self.governor.share, MB)
+            self.assertEqual(self.governor.global_bucket.rate, MB)
+            self.redis_manager.report_active_downloads.assert_called_with(self.governor.process_id, 1, 15)
+        self.redis_manager.report_active_downloads.assert_called_with(self.governor.process_id, 0, 15)
+
+    def test_unlimited_without_redis_config(self):
+        """Redis中没有配置时用默认值，默认不限速"""
+        self.redis_manager.get_bandwidth_config.return_value = None
+        with self.governor.track('task_a'):
+            self.assertEqual(self.governor.consume('task_a', 100 * MB), 0)
+
+    def test_consume_sleeps_and_checks_token(self):
+        """超出额度时睡眠，睡眠中收到暂停信号立即中断"""
+        self.redis_manager.get_bandwidth_config.return_value = {'global_limit': 0, 'task_limit': 1000}
+        control = TaskControl(Mock(get_task_control=Mock(return_value=None)))
+        token = control.token('task_a')
+        with self.governor.track('task_a'), patch.object(bandwidth.time, 'sleep') as mock_sleep:
+            self.assertAlmostEqual(self.governor.consume('task_a', 1500, token), 1.5, places=2)
+            self.assertEqual(mock_sleep.call_count, 6)
+            mock_sleep.side_effect = lambda seconds: control.send('task_a', 'pause')
+            with self.assertRaises(TaskInterrupted):
+                self.governor.consume('task_a', 1000, token)
+
+    def test_streams_of_one_task_share_task_limit(self):
+        """同一任务同时下载的多路共用单任务额度，最后一路结束才释放"""
+        self.redis_manager.get_bandwidth_config.return_value = {'global_limit': 0, 'task_limit': 1000}
+        started = threading.Barrier(2)
+        waits = []
+
+        def stream():
+            with self.governor.track('task_a'):
+                started.wait()
+                waits.append(self.governor.consume('task_a', 1500))
+                started.wait()
+
+        with patch.object(bandwidth.time, 'sleep'), patch.object(bandwidth.Config, 'BANDWIDTH_BURST_SECONDS', 1):
+            threads = [threading.Thread(target=stream) for _ in range(2)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join(timeout=5)
+
+        # 1000字节/秒的额度被两路共用：后取的排在先取的后面，各用各的桶时都只等1.5秒
+        self.assertEqual([round(w, 1) for w in sorted(waits)], [1.5, 3.0])
+        self.assertEqual(self.governor._tasks, {})
+
+    def test_set_config_merges_and_saves(self):
+        """修改配置时合并到现有配置并保存"""
+        saved = self.governor.set_config({'schedule': [{'start': '22:00', 'end': '07:00', 'global_limit': 0}]})
+        self.assertEqual(saved['global_limit'], 4 * MB)
+        self.redis_manager.set_bandwidth_config.assert_called_once_with(saved)
+        with self.assertRaises(ValueError):
+            self.governor.set_config({'global_limit': -5})
+
+
+class TestYtDlpThrottle(unittest.TestCase):
+    """测试 yt-dlp 下载通过进度回调限速"""
+
+    def test_progress_hook_consumes_new_bytes(self):
+        """按每个文件新收到的字节取令牌，续传起点不计入"""
+        governor = Mock()
+        downloader = VideoDownloader(Mock(), bandwidth=governor)
+        received = {}
+        for downloaded in (5 * MB, 6 * MB, 8 * MB):
+            downloader._ytdlp_progress_hook({'status': 'downloading', 'filename': 'a.mp4',
+                                             'downloaded_bytes': downloaded, 'total_bytes': 10 * MB},
+                                            'task_a', received)
+        downloader._ytdlp_progress_hook({'status': 'downloading', 'filename': 'b.m4a', 'downloaded_bytes': MB},
+                                        'task_a', received)
+        amounts = [c.args[1] for c in governor.consume.call_args_list]
+        self.assertEqual(amounts, [MB, 2 * MB])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试B站格式选择和镜像探测
+"""
+
+import unittest
+import sys
+import os
+import time
+from unittest.mock import Mock, patch
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.core import bilibili_formats, mirrors
+from backend.core.bilibili_formats import FormatSelector
+
+
+def _video(height, codecid, bandwidth, name, backup=()):
+    return {'id': 80, 'height': height, 'width': height * 16 // 9, 'codecid': codecid, 'bandwidth': bandwidth,
+            'baseUrl': f'https://upos-a.bilivideo.com/{name}.m4s', 'backupUrl': list(backup)}
+
+
+DASH = {'dash': {
+    'video': [
+        _video(1080, 12, 1_500_000, 'hevc1080'),
+        _video(1080, 7, 3_000_000, 'avc1080', backup=['https://upos-b.bilivideo.com/avc1080.m4s']),
+        _video(720, 7, 1_800_000, 'avc720'),
+        _video(2160, 7, 12_000_000, 'avc2160'),
+        _video(1080, 13, 1_200_000, 'av11080'),
+    ],
+    'audio': [
+        {'id': 30216, 'bandwidth': 67_000, 'base_url': 'https://upos-a.bilivideo.com/a64.m4s'},
+        {'id': 30280, 'bandwidth': 320_000, 'base_url': 'https://upos-a.bilivideo.com/a320.m4s'},
+    ],
+}}
+
+
+class TestFormatSelector(unittest.TestCase):
+    """测试按策略排序DASH表示"""
+
+    def setUp(self):
+        self.selector = FormatSelector()
+        self.patcher = patch.multiple(bilibili_formats.Config, BILIBILI_CODECS=['avc', 'hevc', 'av1'],
+                                      BILIBILI_PREFER_CODEC=True, BILIBILI_MAX_HEIGHT=1080, BILIBILI_MAX_BITRATE=0,
+                                      BILIBILI_MAX_AUDIO_BITRATE=0, MIRROR_PROBE_ENABLED=False)
+        self.patcher.start()
+        self.addCleanup(self.patcher.stop)
+
+    def _best(self):
+        return self.selector.rank_video(DASH['dash']['video'])[0]['baseUrl'].rsplit('/', 1)[1]
+
+    def test_prefers_avc_within_height(self):
+        """默认选分辨率限制内的AVC，4K不选"""
+        self.assertEqual(self._best(), 'avc1080.m4s')
+        streams = self.selector.select(DASH)
+        self.assertEqual(streams['video_codec'], 'avc')
+        self.assertEqual(streams['video_urls'], ['https://upos-a.bilivideo.com/avc1080.m4s',
+                                                 'https://upos-b.bilivideo.com/avc1080.m4s'])
+        self.assertEqual(streams['audio_urls'], ['https://upos-a.bilivideo.com/a320.m4s'])
+
+    def test_bitrate_and_codec_limits(self):
+        """码率限制和编码偏好"""
+        with patch.object(bilibili_formats.Config, 'BILIBILI_MAX_BITRATE', 2_000_000):
+            self.assertEqual(self._best(), 'avc720.m4s')
+            with patch.object(bilibili_formats.Config, 'BILIBILI_PREFER_CODEC', False):
+                self.assertEqual(self._best(), 'hevc1080.m4s')
+        with patch.object(bilibili_formats.Config, 'BILIBILI_CODECS', ['av1']):
+            self.assertEqual(self._best(), 'av11080.m4s')
+        with patch.object(bilibili_formats.Config, 'BILIBILI_MAX_HEIGHT', 360):
+            # 全部超出限制时选码率最低的
+            self.assertEqual(self._best(), 'av11080.m4s')
+
+    def test_play_params(self):
+        """按最高分辨率和编码决定 qn、fnval"""
+        self.assertEqual(self.selector.play_params(), (80, 16 | 2048))
+        with patch.multiple(bilibili_formats.Config, BILIBILI_MAX_HEIGHT=0, BILIBILI_CODECS=['avc']):
+            self.assertEqual(self.selector.play_params(), (120, 16 | 128))
+        with patch.object(bilibili_formats.Config, 'BILIBILI_MAX_HEIGHT', 720):
+            self.assertEqual(self.selector.play_params()[0], 64)
+
+    def test_durl_fallback(self):
+        """没有DASH时用durl及其备用地址"""
+        streams = self.selector.select({'durl': [{'url': 'https://a/v.flv', 'backup_url': ['https://b/v.flv']}],
+                                        'timelength': 90500})
+        self.assertEqual(streams['video_urls'], ['https://a/v.flv', 'https://b/v.flv'])
+        self.assertEqual(streams['audio_urls'], [])
+        self.assertEqual(streams['duration'], 90.5)
+        self.assertIsNone(self.selector.select({}))
+
+
+class TestMirrorProbe(unittest.TestCase):
+    """测试镜像探测排序"""
+
+    def setUp(self):
+        self.patcher = patch.multiple(mirrors.Config, MIRROR_PROBE_ENABLED=True, MIRROR_PROBE_BYTES=4,
+                                      MIRROR_PROBE_TIMEOUT=1, MIRROR_PROBE_CACHE_SECONDS=60)
+        self.patcher.start()
+        self.addCleanup(self.patcher.stop)
+        mirrors._timings.clear()
+        self.addCleanup(mirrors._timings.clear)
+
+    def test_fastest_first_failed_last(self):
+        """按耗时排序，失败和超时的排在最后"""
+        delays = {'https://slow/v': 0.2, 'https://fast/v': 0.0, 'https://down/v': None, 'https://hang/v': 3}
+
+        def fake_get(url, headers=None, **kwargs):
+            self.assertEqual(headers['Range'], 'bytes=0-3')
+            delay = delays[url]
+            if delay is None:
+                raise ConnectionError('refused')
+            time.sleep(delay)
+            return Mock(status_code=206, iter_content=Mock(return_value=iter([b'data'])))
+
+        with patch.object(mirrors.http_client, 'get', side_effect=fake_get):
+            ranked = mirrors.rank(['https://down/v', 'https://hang/v', 'https://slow/v', 'https://fast/v'], {})
+        self.assertEqual(ranked, ['https://fast/v', 'https://slow/v', 'https://down/v', 'https://hang/v'])
+
+    def test_probe_results_reused_per_host(self):
+        """同一主机的探测结果短时间内复用，被放弃的主机排在最后"""
+        response = Mock(status_code=206, iter_content=Mock(side_effect=lambda chunk_size: iter([b'data'])))
+        with patch.object(mirrors.http_client, 'get', return_value=response) as mock_get:
+            mirrors.rank(['https://a/v1', 'https://b/v1'])
+            self.assertEqual(mock_get.call_count, 2)
+            mirrors.penalize('https://a/other')
+            self.assertEqual(mirrors.rank(['https://a/v2', 'https://b/v2']), ['https://b/v2', 'https://a/v2'])
+            self.assertEqual(mock_get.call_count, 2)
+
+    def test_penalty_survives_probe_of_new_host(self):
+        """出现新主机时只探测新主机，惩罚期内被放弃的主机仍排在最后"""
+        response = Mock(status_code=206, iter_content=Mock(side_effect=lambda chunk_size: iter([b'data'])))
+        with patch.object(mirrors.http_client, 'get', return_value=response) as mock_get:
+            mirrors.rank(['https://a/v1', 'https://b/v1'])
+            mirrors.penalize('https://a/v1')
+            ranked = mirrors.rank(['https://a/v2', 'https://b/v2', 'https://c/v2'])
+            self.assertEqual(ranked[-1], 'https://a/v2')
+            self.assertEqual(mock_get.call_args[0][0], 'https://c/v2')
+            self.assertEqual(mock_get.call_count, 3)
+        self.assertEqual(mirrors._timings['a'][0], float('inf'))
+
+    def test_probe_does_not_overwrite_penalty(self):
+        """探测期间主机被放弃时，探测结果不覆盖惩罚"""
+        def fake_get(url, headers=None, **kwargs):
+            mirrors.penalize(url)
+            return Mock(status_code=206, iter_content=Mock(return_value=iter([b'data'])))
+
+        with patch.object(mirrors.http_client, 'get', side_effect=fake_get):
+            mirrors.rank(['https://a/v', 'https://b/v'])
+        self.assertEqual(mirrors._timings['a'][0], float('inf'))
+
+    def test_single_url_not_probed(self):
+        """只有一个地址时不探测"""
+        with patch.object(mirrors.http_client, 'get') as mock_get:
+            self.assertEqual(mirrors.rank(['https://a/v', 'https://a/v']), ['https://a/v'])
+            mock_get.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
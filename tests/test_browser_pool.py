@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试无头浏览器池的复用、回收和平台登录
+"""
+
+import unittest
+import sys
+import os
+import tempfile
+import itertools
+import shutil
+from unittest.mock import Mock, patch
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.platforms.browser_pool import BrowserPool
+from backend.platforms.platform_auth import PlatformAuth
+from backend.core.video_scraper import VideoScraper
+
+
+class TestBrowserPool(unittest.TestCase):
+    """测试浏览器池"""
+
+    def setUp(self):
+        self.profile_dir = tempfile.mkdtemp()
+        self.factory = Mock(side_effect=lambda profile: Mock(name=f'driver:{profile}'))
+        self.pool = BrowserPool(max_browsers=2, idle_timeout=300, max_uses=3,
+                                profile_dir=self.profile_dir, driver_factory=self.factory)
+        # 测试里不启动后台回收线程
+        self.pool._ensure_reaper = Mock()
+
+    def tearDown(self):
+        shutil.rmtree(self.profile_dir, ignore_errors=True)
+
+    def test_browser_is_reused(self):
+        """同一平台连续使用只启动一次浏览器，资料目录按平台区分"""
+        with self.pool.browser('douyin') as first:
+            pass
+        with self.pool.browser('douyin') as second:
+            pass
+        self.assertIs(first, second)
+        self.factory.assert_called_once_with(os.path.join(self.profile_dir, 'douyin'))
+
+    def test_recycled_after_max_uses(self):
+        """用满次数后关闭，下次重新启动"""
+        drivers = []
+        for _ in range(4):
+            with self.pool.browser('douyin') as driver:
+                drivers.append(driver)
+        self.assertIs(drivers[0], drivers[2])
+        drivers[0].quit.assert_called_once()
+        self.assertIsNot(drivers[3], drivers[0])
+
+    def test_recycled_after_idle_timeout(self):
+        """空闲超时的浏览器不再复用"""
+        with patch('backend.platforms.browser_pool.time.monotonic', return_value=1000):
+            with self.pool.browser('douyin') as first:
+                pass
+        with patch('backend.platforms.browser_pool.time.monotonic', return_value=1400):
+            with self.pool.browser('douyin') as second:
+                pass
+        first.quit.assert_called_once()
+        self.assertIsNot(first, second)
+
+    def test_discarded_on_error(self):
+        """使用中出错的浏览器直接丢弃"""
+        with self.assertRaises(RuntimeError):
+            with self.pool.browser('douyin') as driver:
+                raise RuntimeError('页面崩溃')
+        driver.quit.assert_called_once()
+        self.assertIsNone(self.pool._browsers['douyin'].driver)
+
+    def test_evicts_least_recently_used(self):
+        """超过上限时关闭最久没用的浏览器"""
+        with patch('backend.platforms.browser_pool.time.monotonic', side_effect=itertools.count(10)):
+            with self.pool.browser('bilibili') as bilibili:
+                pass
+            with self.pool.browser('douyin') as douyin:
+                pass
+            with self.pool.browser('toutiao'):
+                pass
+        bilibili.quit.assert_called_once()
+        douyin.quit.assert_not_called()
+
+    def test_close_idle(self):
+        """后台回收只关闭空闲超时的浏览器"""
+        with patch('backend.platforms.browser_pool.time.monotonic', return_value=1000):
+            with self.pool.browser('douyin') as driver:
+                pass
+            self.pool.close_idle()
+            driver.quit.assert_not_called()
+        with patch('backend.platforms.browser_pool.time.monotonic', return_value=1300):
+            self.pool.close_idle()
+        driver.quit.assert_called_once()
+
+    def test_render_waits_for_condition(self):
+        """渲染等待条件成立后返回页面源码，不固定sleep"""
+        driver = Mock(page_source='<video src="https://v.douyinvod.com/a.mp4"></video>')
+        self.pool.driver_factory = Mock(return_value=driver)
+        ready = Mock(side_effect=[False, True])
+        html = self.pool.render('douyin', 'https://www.douyin.com/video/1', ready=ready)
+        driver.get.assert_called_once_with('https://www.douyin.com/video/1')
+        self.assertEqual(ready.call_count, 2)
+        self.assertIn('douyinvod', html)
+
+
+class TestPlatformAuthLogin(unittest.TestCase):
+    """测试通过浏览器池登录"""
+
+    def test_login_uses_pool_and_saves_cookies(self):
+        """已登录的资料目录立即拿到Cookie并保存"""
+        driver = Mock()
+        driver.get_cookie.return_value = {'name': 'SESSDATA', 'value': 'abc'}
+        driver.get_cookies.return_value = [{'name': 'SESSDATA', 'value': 'abc'}, {'name': 'bili_jct', 'value': 'x'}]
+        pool = BrowserPool(driver_factory=Mock(return_value=driver), profile_dir=tempfile.mkdtemp())
+        pool._ensure_reaper = Mock()
+        redis_manager = Mock()
+
+        success, message = PlatformAuth(redis_manager, pool).login_bilibili('', '')
+
+        self.assertTrue(success)
+        driver.get.assert_called_once_with('https://passport.bilibili.com/login')
+        redis_manager.set_cookie.assert_called_once_with('bilibili', {'SESSDATA': 'abc', 'bili_jct': 'x'})
+        driver.quit.assert_not_called()
+        shutil.rmtree(pool.profile_dir, ignore_errors=True)
+
+    def test_login_without_login_cookie_fails(self):
+        """资料目录未登录时只有游客Cookie，不保存也不算登录成功"""
+        driver = Mock()
+        driver.get_cookie.return_value = None
+        driver.execute_script.return_value = 'complete'
+        driver.get_cookies.return_value = [{'name': 'buvid3', 'value': 'guest'}]
+        pool = BrowserPool(driver_factory=Mock(return_value=driver), profile_dir=tempfile.mkdtemp())
+        pool._ensure_reaper = Mock()
+        redis_manager = Mock()
+
+        success, message = PlatformAuth(redis_manager, pool).login_bilibili('', '')
+
+        self.assertFalse(success)
+        self.assertIn('SESSDATA', message)
+        redis_manager.set_cookie.assert_not_called()
+        shutil.rmtree(pool.profile_dir, ignore_errors=True)
+
+    def test_login_failure(self):
+        """浏览器启动失败返回失败信息"""
+        pool = BrowserPool(driver_factory=Mock(side_effect=Exception('chrome not found')),
+                           profile_dir=tempfile.mkdtemp())
+        success, message = PlatformAuth(Mock(), pool).login_douyin('', '')
+        self.assertFalse(success)
+        self.assertIn('chrome not found', message)
+        shutil.rmtree(pool.profile_dir, ignore_errors=True)
+
+
+class TestDouyinRender(unittest.TestCase):
+    """测试抖音页面经浏览器渲染后提取视频地址"""
+
+    def test_render_extracts_video_url(self):
+        """渲染后的DOM里有video地址"""
+        pool = Mock()
+        pool.render.return_value = '<video src="https://v26.douyinvod.com/abc/video.mp4?a=1"></video>'
+        scraper = VideoScraper(browser_pool=pool)
+        video_url = scraper._render_douyin_video_url('https://www.douyin.com/video/123')
+        self.assertEqual(video_url, 'https://v26.douyinvod.com/abc/video.mp4?a=1')
+        self.assertEqual(pool.render.call_args[0][0], 'douyin')
+
+    def test_render_failure_returns_none(self):
+        """渲染失败时返回None，继续走API方法"""
+        pool = Mock()
+        pool.render.side_effect = Exception('timeout')
+        scraper = VideoScraper(browser_pool=pool)
+        self.assertIsNone(scraper._render_douyin_video_url('https://www.douyin.com/video/123'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试上游主机熔断
+"""
+
+import unittest
+import sys
+import os
+import requests
+from unittest.mock import Mock, patch
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.core import http_client
+from backend.core.http_client import CircuitBreakers, CircuitOpenError
+
+URL = 'https://api.douyin.wtf/api?url=x'
+
+
+def _response(status_code):
+    return Mock(status_code=status_code)
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    """测试熔断、跳过和半开探测"""
+
+    def setUp(self):
+        self.breakers = CircuitBreakers()
+        self.patches = [
+            patch.object(http_client, 'breakers', self.breakers),
+            patch.multiple(http_client.Config, CIRCUIT_BREAKER_ENABLED=True, CIRCUIT_MIN_REQUESTS=3,
+                           CIRCUIT_ERROR_RATE=0.5, CIRCUIT_OPEN_SECONDS=30, CIRCUIT_SLOW_SECONDS=10),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in reversed(self.patches):
+            p.stop()
+
+    def _trip(self):
+        with patch.object(http_client.requests, 'get', side_effect=requests.Timeout('timeout')):
+            for _ in range(3):
+                with self.assertRaises(requests.Timeout):
+                    http_client.get(URL, timeout=10)
+
+    def test_opens_after_errors_and_skips(self):
+        """失败率超过阈值后直接跳过，不再发请求"""
+        self._trip()
+        with patch.object(http_client.requests, 'get') as mock_get:
+            with self.assertRaises(CircuitOpenError):
+                http_client.get(URL, timeout=10)
+            mock_get.assert_not_called()
+
+    def test_other_hosts_unaffected(self):
+        """熔断按主机区分"""
+        self._trip()
+        with patch.object(http_client.requests, 'get', return_value=_response(200)):
+            self.assertEqual(http_client.get('https://api.bilibili.com/x', timeout=10).status_code, 200)
+
+    def test_client_errors_do_not_trip(self):
+        """404等请求本身的问题不算上游故障，429算"""
+        with patch.object(http_client.requests, 'get', return_value=_response(404)):
+            for _ in range(5):
+                http_client.get(URL)
+        with patch.object(http_client.requests, 'get', return_value=_response(429)):
+            for _ in range(5):
+                http_client.get(URL)
+        with self.assertRaises(CircuitOpenError):
+            http_client.get(URL)
+
+    def test_half_open_probe(self):
+        """到期后只放一个探测请求，成功后恢复"""
+        self._trip()
+        with patch.object(http_client.time, 'time', return_value=http_client.time.time() + 31):
+            probe, _ = self.breakers.before('api.douyin.wtf')
+            self.assertTrue(probe)
+            # 探测进行中其他请求仍被拒绝
+            with self.assertRaises(CircuitOpenError):
+                self.breakers.before('api.douyin.wtf')
+            self.breakers.after('api.douyin.wtf', True, 0.2, probe=True)
+        self.assertFalse(self.breakers.before('api.douyin.wtf')[0])
+
+    def test_failed_probe_reopens(self):
+        """探测失败继续熔断"""
+        self._trip()
+        later = http_client.time.time() + 31
+        with patch.object(http_client.time, 'time', return_value=later):
+            self.breakers.before('api.douyin.wtf')
+            self.breakers.after('api.douyin.wtf', False, 10, probe=True)
+            with self.assertRaises(CircuitOpenError):
+                self.breakers.before('api.douyin.wtf')
+
+    def test_slow_host_opens(self):
+        """响应耗时滑动平均过高时熔断"""
+        for _ in range(3):
+            self.breakers.after('slow.example', True, 20)
+        with self.assertRaises(CircuitOpenError):
+            self.breakers.before('slow.example')
+
+    def test_store_errors_fail_open(self):
+        """Redis不可用时照常放行"""
+        store = Mock()
+        store.get_circuit.side_effect = Exception('connection refused')
+        store.record_circuit_call.side_effect = Exception('connection refused')
+        self.breakers.attach(store)
+        with patch.object(http_client.requests, 'get', return_value=_response(200)):
+            self.assertEqual(http_client.get(URL).status_code, 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
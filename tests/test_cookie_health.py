@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试平台Cookie健康检查
+"""
+
+import unittest
+import sys
+import os
+import time
+from unittest.mock import Mock, patch
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.platforms import cookie_health
+from backend.platforms.cookie_health import CookieHealthChecker, parse_sessdata_expiry, parse_sid_guard_expiry
+
+
+class TestCookieExpiryParsing(unittest.TestCase):
+    """测试从Cookie中解析过期时间"""
+
+    def test_sessdata_expiry(self):
+        """SESSDATA第二段是过期时间戳"""
+        self.assertEqual(parse_sessdata_expiry('abc%2C1893456000%2Cdef'), 1893456000)
+        self.assertIsNone(parse_sessdata_expiry('plain-token'))
+
+    def test_sid_guard_expiry(self):
+        """整串cookie和逐字段两种保存方式都能解析"""
+        cookie = 'ttwid=1; sid_guard=tok%7C1700000000%7C5184000%7CSun; sessionid=x'
+        self.assertEqual(parse_sid_guard_expiry({'cookie': cookie}), 1700000000 + 5184000)
+        self.assertEqual(parse_sid_guard_expiry({'sid_guard': 'tok|100|50|Sun'}), 150)
+        self.assertIsNone(parse_sid_guard_expiry({'cookie': 'sessionid=x'}))
+
+
+class TestCookieHealthChecker(unittest.TestCase):
+    """测试定时校验与任务前检查"""
+
+    def setUp(self):
+        self.redis_manager = Mock()
+        self.redis_manager.get_cookie_health.return_value = None
+        self.platform_auth = Mock()
+        self.checker = CookieHealthChecker(self.redis_manager, self.platform_auth)
+        self.far_future = int(time.time()) + 30 * 86400
+
+    def _nav_response(self, is_login):
+        response = Mock()
+        response.json.return_value = {'code': 0 if is_login else -101, 'message': '账号未登录',
+                                      'data': {'isLogin': is_login}}
+        return response
+
+    def test_bilibili_valid(self):
+        """nav接口返回已登录时记录有效和过期时间"""
+        self.redis_manager.get_cookie.return_value = {'SESSDATA': f'abc%2C{self.far_future}%2Cdef'}
+        with patch.object(cookie_health.http_client, 'get', return_value=self._nav_response(True)) as mock_get:
+            health = self.checker.check('bilibili')
+        self.assertTrue(health['valid'])
+        self.assertEqual(health['expires_at'], self.far_future)
+        self.assertIn('SESSDATA=', mock_get.call_args[1]['headers']['Cookie'])
+        self.redis_manager.set_cookie_health.assert_called_once_with('bilibili', health, cookie_health.Config.COOKIE_HEALTH_TTL)
+        self.platform_auth.login_bilibili.assert_not_called()
+
+    def test_bilibili_rejected_triggers_refresh(self):
+        """平台不再接受Cookie时尝试刷新，刷新后重新校验"""
+        expired, refreshed = {'SESSDATA': 'expired'}, {'SESSDATA': 'fresh'}
+        self.redis_manager.get_cookie.side_effect = [expired, expired, refreshed, refreshed]
+        self.platform_auth.login_bilibili.return_value = (True, 'Bilibili登录成功')
+        responses = [self._nav_response(False), self._nav_response(True)]
+        with patch.object(cookie_health.http_client, 'get', side_effect=responses):
+            health = self.checker.check('bilibili')
+        self.platform_auth.login_bilibili.assert_called_once()
+        self.assertTrue(health['valid'])
+
+    def test_refresh_without_new_login_cookie_fails(self):
+        """浏览器登录后登录Cookie没有变化时不算刷新成功，不再重新校验"""
+        self.redis_manager.get_cookie.return_value = {'SESSDATA': 'expired'}
+        self.platform_auth.login_bilibili.return_value = (True, 'Bilibili登录成功')
+        with patch.object(cookie_health.http_client, 'get', return_value=self._nav_response(False)) as mock_get:
+            health = self.checker.check('bilibili')
+        self.assertFalse(health['valid'])
+        self.assertEqual(mock_get.call_count, 1)
+
+    def test_network_error_is_unknown(self):
+        """校验请求失败不判定为失效"""
+        self.redis_manager.get_cookie.return_value = {'SESSDATA': 'abc'}
+        with patch.object(cookie_health.http_client, 'get', side_effect=Exception('timeout')):
+            health = self.checker.check('bilibili')
+        self.assertIsNone(health['valid'])
+        self.platform_auth.login_bilibili.assert_not_called()
+
+    def test_douyin_expiring_soon_refreshes(self):
+        """临近过期时尝试刷新"""
+        issued = int(time.time()) - 86400
+        self.redis_manager.get_cookie.return_value = {'cookie': f'sid_guard=tok%7C{issued}%7C{2 * 86400}%7CSun'}
+        self.platform_auth.login_douyin.return_value = (False, '浏览器不可用')
+        health = self.checker.check('douyin')
+        self.assertTrue(health['valid'])
+        self.platform_auth.login_douyin.assert_called_once()
+
+    def test_ensure_usable(self):
+        """必须登录的平台Cookie已知失效时任务直接失败"""
+        with patch.object(cookie_health.Config, 'COOKIE_REQUIRED_PLATFORMS', ['douyin']):
+            self.redis_manager.is_cookie_valid.return_value = 1
+            self.redis_manager.get_cookie_health.return_value = {'valid': False, 'reason': 'Cookie已过期'}
+            usable, reason = self.checker.ensure_usable('douyin')
+            self.assertFalse(usable)
+            self.assertIn('Cookie已过期', reason)
+
+            self.redis_manager.get_cookie_health.return_value = None
+            self.assertTrue(self.checker.ensure_usable('douyin')[0])
+
+            self.redis_manager.is_cookie_valid.return_value = 0
+            self.assertFalse(self.checker.ensure_usable('douyin')[0])
+
+        # 不要求登录的平台不检查
+        self.assertTrue(self.checker.ensure_usable('bilibili')[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试按平台和版本缓存的Cookie
+"""
+
+import unittest
+import sys
+import os
+import http.cookiejar
+from unittest.mock import Mock
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.core.cookie_jar import CookieJarCache, PlatformCookies, parse_cookie_data
+
+
+class TestPlatformCookies(unittest.TestCase):
+    """测试Cookie的解析与构建"""
+
+    def test_parse_cookie_string(self):
+        """整串cookie和逐个字段都统一成字典"""
+        self.assertEqual(parse_cookie_data({'cookie': 'a=1; b=x=y;  ; c='}), {'a': '1', 'b': 'x=y', 'c': ''})
+        self.assertEqual(parse_cookie_data({'SESSDATA': 'abc'}), {'SESSDATA': 'abc'})
+        self.assertEqual(parse_cookie_data(None), {})
+
+    def test_header_and_jar(self):
+        """请求头和cookiejar都按平台域名构建"""
+        cookies = PlatformCookies('douyin', 3, {'cookie': 'sessionid=s1; ttwid=t1'})
+        self.assertEqual(cookies.header, 'sessionid=s1; ttwid=t1')
+        jar_cookies = {c.name: c for c in cookies.jar}
+        self.assertEqual(jar_cookies['sessionid'].value, 's1')
+        self.assertEqual(jar_cookies['sessionid'].domain, '.douyin.com')
+
+        target = http.cookiejar.CookieJar()
+        cookies.apply_to(target)
+        self.assertEqual(len(list(target)), 2)
+
+    def test_empty(self):
+        """没有Cookie时为假"""
+        self.assertFalse(PlatformCookies('bilibili', 0, {}))
+
+
+class TestCookieJarCache(unittest.TestCase):
+    """测试按版本缓存"""
+
+    def setUp(self):
+        self.redis_manager = Mock()
+        self.redis_manager.get_cookie_version.return_value = 1
+        self.redis_manager.get_cookie.return_value = {'SESSDATA': 'abc'}
+        self.cache = CookieJarCache(self.redis_manager)
+
+    def test_reused_while_version_unchanged(self):
+        """版本不变时不重新读取Cookie"""
+        first = self.cache.get('bilibili')
+        second = self.cache.get('bilibili')
+        self.assertIs(first, second)
+        self.redis_manager.get_cookie.assert_called_once_with('bilibili')
+        self.assertEqual(first.header, 'SESSDATA=abc')
+
+    def test_rebuilt_after_set_cookie(self):
+        """set_cookie 递增版本后重新构建"""
+        first = self.cache.get('bilibili')
+        self.redis_manager.get_cookie_version.return_value = 2
+        self.redis_manager.get_cookie.return_value = {'SESSDATA': 'new'}
+        second = self.cache.get('bilibili')
+        self.assertIsNot(first, second)
+        self.assertEqual(second.header, 'SESSDATA=new')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试抖音视频地址的对冲竞速解析
+"""
+
+import unittest
+import sys
+import os
+import threading
+import time
+from unittest.mock import Mock, patch
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.core import douyin_resolver
+from backend.core.douyin_resolver import DouyinResolver
+
+URL = 'https://www.douyin.com/video/7300000000000000000'
+
+
+def _scraper():
+    scraper = Mock(browser_pool=None)
+    scraper._extract_douyin_video_id.return_value = '7300000000000000000'
+    scraper._extract_douyin_title.return_value = '测试视频'
+    return scraper
+
+
+class TestDouyinResolver(unittest.TestCase):
+    """测试竞速、取消和统计"""
+
+    def setUp(self):
+        self.scraper = _scraper()
+        self.resolver = DouyinResolver(self.scraper)
+        self.config = patch.multiple(douyin_resolver.Config, DOUYIN_HEDGE_DELAY=0.05, DOUYIN_RESOLVE_TIMEOUT=5)
+        self.config.start()
+
+    def tearDown(self):
+        self.config.stop()
+
+    def _set_strategies(self, *strategies):
+        self.resolver.strategies = list(strategies)
+
+    def test_first_success_wins(self):
+        """慢的方法还在跑时，对冲启动的快方法先拿到地址"""
+        release = threading.Event()
+
+        def slow(ctx):
+            release.wait(2)
+            return {'video_url': 'https://slow.example/a.mp4'}
+
+        fast = Mock(return_value={'video_url': 'https://v.douyinvod.com/a.mp4', 'title': '快'})
+        never = Mock()
+        self._set_strategies(('slow', slow), ('fast', fast), ('never', never))
+        # 排序固定为定义顺序
+        self.resolver.ordered_strategies = lambda: list(self.resolver.strategies)
+
+        info = self.resolver.resolve(URL, {})
+        release.set()
+
+        self.assertEqual(info['video_url'], 'https://v.douyinvod.com/a.mp4')
+        self.assertEqual(info['title'], '快')
+        self.assertEqual(info['video_id'], '')
+        never.assert_not_called()
+
+    def test_failure_launches_next_immediately(self):
+        """方法失败后不等对冲延迟，立即启动下一个"""
+        douyin_resolver.Config.DOUYIN_HEDGE_DELAY = 10
+        failing = Mock(side_effect=ValueError('接口返回空'))
+        working = Mock(return_value={'video_url': 'https://v.douyinvod.com/b.mp4'})
+        self._set_strategies(('failing', failing), ('working', working))
+
+        started = time.monotonic()
+        info = self.resolver.resolve(URL, {})
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertEqual(info['video_url'], 'https://v.douyinvod.com/b.mp4')
+
+    def test_all_fail(self):
+        """全部失败时汇总每个方法的错误"""
+        self._set_strategies(('a', Mock(side_effect=ValueError('超时'))), ('b', Mock(return_value={'video_url': None})))
+        with self.assertRaises(Exception) as cm:
+            self.resolver.resolve(URL, {})
+        self.assertIn('a: 超时', str(cm.exception))
+        self.assertIn('b: 未找到视频地址', str(cm.exception))
+
+    def test_stats_reorder_strategies(self):
+        """统计上更快更稳的方法排到前面"""
+        self._set_strategies(('first', Mock()), ('second', Mock()))
+        self.assertEqual([name for name, _ in self.resolver.ordered_strategies()], ['first', 'second'])
+
+        self.resolver._local_stats = {
+            'first': {'attempts': 20, 'successes': 2, 'seconds': 100.0},
+            'second': {'attempts': 20, 'successes': 19, 'seconds': 10.0},
+        }
+        self.assertEqual([name for name, _ in self.resolver.ordered_strategies()], ['second', 'first'])
+
+    def test_results_recorded_in_redis(self):
+        """跑完的方法写入Redis统计，胜出后未启动的不记录"""
+        redis_manager = Mock()
+        redis_manager.get_resolver_stats.return_value = {}
+        resolver = DouyinResolver(self.scraper, redis_manager)
+        resolver.strategies = [('failing', Mock(return_value=None)),
+                               ('working', Mock(return_value={'video_url': 'https://v.douyinvod.com/c.mp4'})),
+                               ('unused', Mock())]
+
+        resolver.resolve(URL, {})
+
+        recorded = [(c[0][1], c[0][2]) for c in redis_manager.record_resolver_result.call_args_list]
+        self.assertEqual(recorded, [('failing', False), ('working', True)])
+        redis_manager.get_resolver_stats.assert_called_once_with('douyin')
+
+    def test_losing_strategies_recorded_as_failures(self):
+        """胜出时仍在跑的方法记为失败，耗时算到胜出时刻"""
+        redis_manager = Mock()
+        redis_manager.get_resolver_stats.return_value = {}
+        resolver = DouyinResolver(self.scraper, redis_manager)
+        release = threading.Event()
+        self.addCleanup(release.set)
+
+        def slow(ctx):
+            release.wait(2)
+
+        resolver.strategies = [('slow', slow),
+                               ('fast', Mock(return_value={'video_url': 'https://v.douyinvod.com/d.mp4'}))]
+        resolver.ordered_strategies = lambda: list(resolver.strategies)
+
+        resolver.resolve(URL, {})
+
+        recorded = {c[0][1]: (c[0][2], c[0][3]) for c in redis_manager.record_resolver_result.call_args_list}
+        self.assertEqual(recorded['fast'][0], True)
+        success, seconds = recorded['slow']
+        self.assertFalse(success)
+        self.assertGreaterEqual(seconds, douyin_resolver.Config.DOUYIN_HEDGE_DELAY)
+        self.assertLess(seconds, 1)
+
+    def test_timeout_records_pending_strategies(self):
+        """超时时仍在跑的方法记为失败，耗时不超过截止时刻"""
+        douyin_resolver.Config.DOUYIN_RESOLVE_TIMEOUT = 0.1
+        release = threading.Event()
+        self.addCleanup(release.set)
+        self._set_strategies(('hang', lambda ctx: release.wait(2)))
+        with patch.object(self.resolver, '_record') as record:
+            with self.assertRaises(Exception):
+                self.resolver.resolve(URL, {})
+        name, success, seconds = record.call_args[0]
+        self.assertEqual((name, success), ('hang', False))
+        self.assertLessEqual(seconds, 0.1 + 1e-6)
+
+    def test_item_strategies_share_page(self):
+        """多个API方法共用一次页面请求和视频ID"""
+        self.scraper._extract_douyin_video_id.return_value = None
+        self.scraper._extract_douyin_item_ids.return_value = ['123']
+        self.scraper._fetch_douyin_api.return_value = None
+        self.scraper._fetch_douyin_third_party.return_value = None
+        self.scraper._douyin_ytdlp_info.side_effect = ValueError('yt-dlp未安装')
+        self.scraper._extract_douyin_video_url_from_html.return_value = None
+        resolver = DouyinResolver(self.scraper)
+
+        response = Mock(text='<html><title>测试视频</title></html>')
+        with patch.object(douyin_resolver.http_client, 'get', return_value=response) as mock_get:
+            with self.assertRaises(Exception) as cm:
+                resolver.resolve('https://v.douyin.com/abc/', {})
+
+        mock_get.assert_called_once()
+        self.assertIn('测试视频', str(cm.exception))
+        api_urls = [c[0][0] for c in self.scraper._fetch_douyin_api.call_args_list]
+        self.assertTrue(all('123' in api_url for api_url in api_urls))
+
+
+if __name__ == '__main__':
+    unittest.main()
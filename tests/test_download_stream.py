@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试流式下载：大块读取、镜像切换、边下载边转码与DASH合并
+"""
+
+import unittest
+import sys
+import os
+import io
+import tempfile
+from unittest.mock import Mock, patch
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+from backend.core import mirrors, video_downloader
+from backend.core.task_control import TaskControl, TaskInterrupted
+from backend.core.video_downloader import VideoDownloader
+
+
+class FakeResponse:
+    """模拟requests的流式响应"""
+
+    def __init__(self, chunks, status_code=200, headers=None):
+        self.chunks = chunks
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.closed = False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size=8192):
+        for chunk in self.chunks:
+            yield chunk
+
+    def close(self):
+        self.closed = True
+
+
+
+class RawResponse(FakeResponse):
+    """带原始字节流的响应，下载时走 readinto 路径"""
+
+    def __init__(self, data, on_read=None, **kwargs):
+        super().__init__([], **kwargs)
+        self.raw = io.BytesIO(data)
+        self.reads = []
+        on_read = on_read or (lambda n: None)
+        readinto = self.raw.readinto
+
+        def tracked(buffer):
+            self.reads.append(len(buffer))
+            on_read(len(self.reads))
+            return readinto(buffer)
+        self.raw.readinto = tracked
+
+    def iter_content(self, chunk_size=8192):
+        raise AssertionError('未压缩的响应应该用 readinto')
+
+
+class TestBufferedTransfer(unittest.TestCase):
+    """测试大块读取到复用缓冲区和文件预分配"""
+
+    def setUp(self):
+        self.redis_manager = Mock()
+        self.redis_manager.get_task_control.return_value = None
+        self.control = TaskControl(self.redis_manager)
+        self.downloader = VideoDownloader(self.redis_manager, self.control)
+        self.tmpdir = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.tmpdir, 'video.mp4')
+
+    def test_large_chunks_read_into_buffer(self):
+        """未压缩的响应按配置的块大小 readinto 到复用缓冲区"""
+        data = os.urandom(300 * 1024)
+        response = RawResponse(data, headers={'content-length': str(len(data))})
+        with patch('backend.core.http_client.requests.get', return_value=response), \
+                patch('backend.core.video_downloader.Config.DOWNLOAD_CHUNK_SIZE', 128 * 1024):
+            transferred = self.downloader._download_stream('http://cdn/video', {}, self.file_path, 'test_task_001')
+        self.assertEqual(transferred, len(data))
+        self.assertEqual(response.reads, [128 * 1024] * 4)
+        with open(self.file_path, 'rb') as f:
+            self.assertEqual(f.read(), data)
+
+    def test_preallocated_file_truncated_on_pause(self):
+        """预分配后暂停，.part 截到实际写入的长度，续传位置正确"""
+        token = self.control.token('test_task_001')
+
+        def on_read(count):
+            if count == 2:
+                self.control.send('test_task_001', 'pause')
+
+        data = b'x' * (256 * 1024)
+        response = RawResponse(data, on_read=on_read, headers={'content-length': str(len(data))})
+        with patch('backend.core.http_client.requests.get', return_value=response), \
+                patch('backend.core.video_downloader.Config.DOWNLOAD_CHUNK_SIZE', 64 * 1024):
+            with self.assertRaises(TaskInterrupted):
+                self.downloader._download_stream('http://cdn/video', {}, self.file_path, 'test_task_001', token)
+        self.assertEqual(os.path.getsize(self.file_path + '.part'), 64 * 1024)
+
+
+class TestMirrorFailover(unittest.TestCase):
+    """测试下载中途切换镜像"""
+
+    def setUp(self):
+        self.redis_manager = Mock()
+        self.redis_manager.get_task_control.return_value = None
+        self.downloader = VideoDownloader(self.redis_manager, TaskControl(self.redis_manager))
+        self.tmpdir = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.tmpdir, 'video.mp4')
+        self.patcher = patch.multiple(video_downloader.Config, MIRROR_PROBE_ENABLED=False, MIRROR_SPEED_WINDOW=0,
+                                      MIRROR_SWITCH_GRACE=0, MIRROR_MIN_SPEED=0)
+        self.patcher.start()
+        self.addCleanup(self.patcher.stop)
+        self.addCleanup(mirrors._timings.clear)
+
+    def _responses(self, first_chunks):
+        def broken():
+            yield b'a' * 10
+            raise requests.ConnectionError('connection reset')
+        return {
+            'http://cdn-a/video': FakeResponse(first_chunks if first_chunks is not None else broken(),
+                                               headers={'content-length': '20'}),
+            'http://cdn-b/video': FakeResponse([b'b' * 10], status_code=206, headers={'content-length': '10'}),
+        }
+
+    def _download(self, responses):
+        calls = []
+
+        def fake_get(url, headers=None, **kwargs):
+            calls.append((url, headers.get('Range'), kwargs['timeout']))
+            return responses[url]
+
+        with patch('backend.core.http_client.requests.get', side_effect=fake_get):
+            transferred = self.downloader._download_stream(['http://cdn-a/video', 'http://cdn-b/video'], {},
+                                                           self.file_path, 'test_task_001')
+        with open(self.file_path, 'rb') as f:
+            return transferred, f.read(), calls
+
+    def test_error_switches_and_resumes(self):
+        """连接中断后从已下载的位置换到下一个镜像"""
+        transferred, data, calls = self._download(self._responses(None))
+        self.assertEqual(data, b'a' * 10 + b'b' * 10)
+        self.assertEqual(transferred, 20)
+        self.assertEqual([c[:2] for c in calls], [('http://cdn-a/video', None), ('http://cdn-b/video', 'bytes=10-')])
+        # 还有备用镜像时用短的读超时，最后一个镜像不缩短
+        self.assertEqual(calls[0][2], (10, 20))
+        self.assertEqual(calls[1][2], 600)
+
+    def test_slow_mirror_abandoned(self):
+        """速度低于阈值时切换，被放弃的主机之后排在最后"""
+        with patch.object(video_downloader.Config, 'MIRROR_MIN_SPEED', float('inf')):
+            transferred, data, calls = self._download(self._responses([b'a' * 10, b'a' * 10]))
+        self.assertEqual(data, b'a' * 10 + b'b' * 10)
+        self.assertEqual(calls[1][1], 'bytes=10-')
+        self.assertIn('cdn-a', mirrors._timings)
+        self.assertEqual(mirrors._timings['cdn-a'][0], float('inf'))
+
+    def test_last_mirror_error_raises(self):
+        """所有镜像都失败时抛出最后一个错误"""
+        responses = self._responses(None)
+        responses['http://cdn-b/video'] = self._responses(None)['http://cdn-a/video']
+        with self.assertRaises(requests.ConnectionError):
+            self._download(responses)
+        self.assertTrue(os.path.exists(self.file_path + '.part'))
+
+
+class TestStreamFeed(unittest.TestCase):
+    """测试边下载边转码时向FFmpeg送入数据"""
+
+    def setUp(self):
+        self.redis_manager = Mock()
+        self.redis_manager.get_task_control.return_value = None
+        self.downloader = VideoDownloader(self.redis_manager, TaskControl(self.redis_manager))
+        self.patcher = patch.multiple(video_downloader.Config, MIRROR_PROBE_ENABLED=False, STREAM_TRANSCODE=True)
+        self.patcher.start()
+        self.addCleanup(self.patcher.stop)
+        self.addCleanup(mirrors._timings.clear)
+        self.state = {'transferred': 0, 'position': 0, 'start_time': 0, 'last_update_time': 0,
+                      'progress_start': 0, 'progress_span': 0, 'quiet': True}
+
+    def test_container_layout(self):
+        """moov 在 mdat 之前的MP4和FLV可以顺序读取"""
+        ftyp = (24).to_bytes(4, 'big') + b'ftypisom' + b'\0' * 12
+        self.assertTrue(video_downloader._sequential_container(ftyp + (8).to_bytes(4, 'big') + b'moov'))
+        self.assertFalse(video_downloader._sequential_container(ftyp + (8).to_bytes(4, 'big') + b'mdat'))
+        self.assertTrue(video_downloader._sequential_container(b'FLV\x01\x05'))
+        self.assertFalse(video_downloader._sequential_container(b'<html>'))
+
+    def test_feed_resumes_on_next_mirror(self):
+        """镜像中断后从已送出的位置换到下一个镜像"""
+        def broken():
+            yield b'a' * 10
+            raise requests.ConnectionError('connection reset')
+        responses = {'http://cdn-a/video': FakeResponse(broken(), headers={'content-length': '20'}),
+                     'http://cdn-b/video': FakeResponse([b'b' * 10], status_code=206, headers={'content-length': '10'})}
+        ranges = []
+
+        def fake_get(url, headers=None, **kwargs):
+            ranges.append(headers.get('Range'))
+            return responses[url]
+
+        written = []
+        with patch('backend.core.http_client.requests.get', side_effect=fake_get):
+            self.downloader._feed_stream(['http://cdn-a/video', 'http://cdn-b/video'], {}, 'test_task_001',
+                                         None, self.state, 'bilibili', lambda data: written.append(bytes(data)))
+        self.assertEqual(b''.join(written), b'a' * 10 + b'b' * 10)
+        self.assertEqual(ranges, [None, 'bytes=10-'])
+
+    def test_pipe_error_not_retried(self):
+        """FFmpeg不再读取时不换镜像，直接报错"""
+        def closed_pipe(data):
+            raise BrokenPipeError('broken pipe')
+
+        with patch('backend.core.http_client.requests.get', return_value=FakeResponse([b'a' * 10])) as mock_get:
+            with self.assertRaises(BrokenPipeError):
+                self.downloader._feed_stream(['http://cdn-a/video', 'http://cdn-b/video'], {}, 'test_task_001',
+                                             None, self.state, 'bilibili', closed_pipe)
+        self.assertEqual(mock_get.call_count, 1)
+
+    def test_falls_back_when_seek_required(self):
+        """moov 在末尾的MP4不走管道"""
+        head = (24).to_bytes(4, 'big') + b'ftypisom' + b'\0' * 12 + (16).to_bytes(4, 'big') + b'mdat'
+        self.downloader.transcoder = Mock()
+        with patch('backend.core.http_client.requests.get', return_value=FakeResponse([head], status_code=206)):
+            result = self.downloader._stream_transcode({'video_url': 'http://cdn-a/video', 'duration': 60}, {},
+                                                       '/tmp/out.mov', 'test_task_001', None, 'bilibili')
+        self.assertFalse(result)
+        self.downloader.transcoder.transcode_stream.assert_not_called()
+
+    def test_avc_dash_streamed_without_encoding(self):
+        """B站DASH的AVC视频配AAC音频时经管道直接封装，长视频也不必先下载"""
+        head = (24).to_bytes(4, 'big') + b'ftypiso5' + b'\0' * 12 + (8).to_bytes(4, 'big') + b'moov'
+        self.downloader.transcoder = Mock()
+        self.downloader.transcoder.transcode_stream.return_value = (True, '封装成功')
+        video_info = {'video_url': 'http://cdn-a/video', 'audio_url': 'http://cdn-a/audio', 'video_codec': 'avc',
+                      'duration': 7200}
+        with patch('backend.core.http_client.requests.get', return_value=FakeResponse([head], status_code=206)):
+            result = self.downloader._stream_transcode(video_info, {}, '/tmp/out.mov', 'test_task_001', None, 'bilibili')
+        self.assertTrue(result)
+        feeds = self.downloader.transcoder.transcode_stream.call_args[0][0]
+        self.assertEqual(len(feeds), 2)
+        self.assertTrue(self.downloader.transcoder.transcode_stream.call_args[1]['copy'])
+
+
+class TestDashMerge(unittest.TestCase):
+    """测试B站DASH音视频合并"""
+
+    def setUp(self):
+        self.redis_manager = Mock()
+        self.redis_manager.get_task_control.return_value = None
+        self.transcoder = Mock()
+        self.transcoder.remux.side_effect = self._fake_remux
+        self.transcoder.transcode_video.return_value = (True, '转码成功')
+        parser = Mock()
+        parser.parse_video_info.return_value = {
+            'title': 'demo', 'platform': 'bilibili', 'video_type': '视频',
+            'video_url': 'http://cdn/video.m4s', 'audio_url': 'http://cdn/audio.m4s'}
+        self.downloader = VideoDownloader(self.redis_manager, TaskControl(self.redis_manager), parser=parser,
+                                          transcoder=self.transcoder, cookie_jars=Mock(get=Mock(return_value=None)))
+        self.tmpdir = tempfile.mkdtemp()
+        self.video_dir = os.path.join(self.tmpdir, 'bilibili', 'demo')
+
+    def _fake_remux(self, inputs, output_file, task_id=None, probe=None):
+        open(output_file, 'wb').close()
+        return True, '封装成功'
+
+    def _download(self):
+        def fake_download(url, headers, file_path, *args, **kwargs):
+            with open(file_path, 'wb') as f:
+                f.write(b'x')
+            return 1
+
+        with patch.object(self.downloader, '_download_stream', side_effect=fake_download):
+            return self.downloader.download_video('https://www.bilibili.com/video/BV1xx411c7mD', 'test_task_001',
+                                                  self.tmpdir)
+
+    def test_compatible_streams_remuxed_into_final_mov(self):
+        """H.264 + AAC 直接封装成 mov，不再转码"""
+        self.transcoder.copy_compatible.return_value = True
+        success, message = self._download()
+        self.assertTrue(success, message)
+        inputs, output_file = self.transcoder.remux.call_args[0][:2]
+        self.assertEqual(output_file, os.path.join(self.video_dir, 'demo.mov'))
+        self.assertEqual([os.path.basename(path) for path in inputs], ['demo.mp4', 'demo_audio.m4a'])
+        self.transcoder.transcode_video.assert_not_called()
+        self.assertEqual(os.listdir(self.video_dir), ['demo.mov'])
+        self.redis_manager.update_task_status.assert_called_with('test_task_001', 'completed', progress=100,
+                                                                 save_path=output_file)
+
+    def test_other_codecs_remuxed_then_transcoded(self):
+        """其他编码先封装成一个 mp4，再转码"""
+        self.transcoder.copy_compatible.return_value = False
+        success, message = self._download()
+        self.assertTrue(success, message)
+        self.assertTrue(self.transcoder.remux.call_args[0][1].endswith('demo_merged.mp4'))
+        self.transcoder.transcode_video.assert_called_once_with(
+            os.path.join(self.video_dir, 'demo.mp4'), os.path.join(self.video_dir, 'demo.mov'), 'test_task_001')
+
+    def test_remux_failure_reported(self):
+        """封装失败时任务失败，不再转码"""
+        self.transcoder.remux.side_effect = None
+        self.transcoder.remux.return_value = (False, '封装超时：超过10分钟未完成')
+        success, message = self._download()
+        self.assertFalse(success)
+        self.assertIn('封装超时', message)
+        self.transcoder.transcode_video.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试自适应转码编码策略
+"""
+
+import unittest
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.core.encoding_policy import EncodingPolicy
+from backend.config.config import Config
+
+
+class TestEncodingPolicy(unittest.TestCase):
+    """测试编码参数选择"""
+
+    def setUp(self):
+        self.policy = EncodingPolicy(cpu_count=8)
+
+    def test_idle_short_video_uses_slowest_preset(self):
+        """空闲时短视频使用画质最好的预设"""
+        encoding = self.policy.select(1280, 720, 120, queue_depth=0)
+        self.assertEqual(encoding['preset'], Config.X264_PRESET_LADDER[0])
+        self.assertEqual(encoding['crf'], 22)
+        self.assertEqual(encoding['threads'], 8)
+
+    def test_backlog_moves_to_faster_preset(self):
+        """队列积压时换更快的预设"""
+        idle = self.policy.select(1280, 720, 120, queue_depth=0)
+        busy = self.policy.select(1280, 720, 120, queue_depth=Config.TRANSCODE_QUEUE_STEP * 2)
+        ladder = Config.X264_PRESET_LADDER
+        self.assertGreater(ladder.index(busy['preset']), ladder.index(idle['preset']))
+
+    def test_large_long_video_is_faster(self):
+        """4K长视频比同样负载下的短视频更快"""
+        encoding = self.policy.select(3840, 2160, Config.TRANSCODE_LONG_VIDEO_SECONDS + 1)
+        self.assertEqual(encoding['preset'], Config.X264_PRESET_LADDER[2])
+        self.assertEqual(encoding['crf'], Config.TRANSCODE_DEFAULT_CRF)
+
+    def test_crf_boost_is_capped(self):
+        """最快预设仍积压时CRF只小幅提高"""
+        encoding = self.policy.select(640, 480, 60, queue_depth=1000)
+        self.assertEqual(encoding['preset'], Config.X264_PRESET_LADDER[-1])
+        self.assertEqual(encoding['crf'], 21 + Config.TRANSCODE_MAX_CRF_BOOST)
+
+    def test_threads_split_between_transcodes(self):
+        """并发转码平分CPU"""
+        encoding = self.policy.select(1280, 720, 60, active_transcodes=3)
+        self.assertEqual(encoding['threads'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
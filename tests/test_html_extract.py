@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试单遍扫描的页面解析
+"""
+
+import unittest
+import sys
+import os
+import json
+from urllib.parse import quote
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.core import html_extract
+from backend.core.video_scraper import VideoScraper
+
+RENDER_STATE = {'app': {}, '41': {'aweme': {'detail': {
+    'awemeId': '7300', 'desc': '渲染数据标题',
+    'video': {'playAddr': [{'src': '//v26-web.douyinvod.com/abc/video.mp4?a=1'}]},
+}}}}
+
+
+def _page(*scripts, title='页面标题 - 抖音'):
+    return (f'<html><head><title>{title}</title><meta property="og:video" content="https://v.example.com/og.mp4?a=1&amp;b=2">'
+            f'</head><body>{"".join(scripts)}</body></html>')
+
+
+class TestScan(unittest.TestCase):
+    """测试扫描和按需解码"""
+
+    def test_states_identified_by_prefix(self):
+        """按前缀识别页面状态，脚本里的其他内容不影响"""
+        html = _page('<script>var x = "<title>假标题</title>";</script>',
+                     f'<script id="RENDER_DATA" type="application/json">{quote(json.dumps(RENDER_STATE))}</script>',
+                     '<script>window.__INITIAL_STATE__={"videoData":{"title":"B站"}};(function(){}())</script>')
+        page = html_extract.scan(html)
+        self.assertEqual(page.title, '页面标题 - 抖音')
+        self.assertEqual(page.meta['og:video'], 'https://v.example.com/og.mp4?a=1&b=2')
+        self.assertEqual(page.state('RENDER_DATA'), RENDER_STATE)
+        self.assertEqual(page.state('__INITIAL_STATE__'), {'videoData': {'title': 'B站'}})
+        self.assertIsNone(page.state('_ROUTER_DATA'))
+
+    def test_undefined_and_broken_json(self):
+        """JS的undefined按null处理，解析失败返回None"""
+        page = html_extract.scan(_page('<script>window._SSR_HYDRATED_DATA={"a":undefined,"b":[undefined,1]}</script>',
+                                       '<script>window.__data={broken</script>'))
+        self.assertEqual(page.state('_SSR_HYDRATED_DATA'), {'a': None, 'b': [None, 1]})
+        self.assertIsNone(page.state('__data'))
+
+    def test_walk_paths(self):
+        """路径中的 * 匹配任意键和下标"""
+        path = html_extract.compile_path('*.aweme.detail.video.playAddr.0.src')
+        self.assertEqual(path, ('*', 'aweme', 'detail', 'video', 'playAddr', 0, 'src'))
+        self.assertEqual(html_extract.walk(RENDER_STATE, path), '//v26-web.douyinvod.com/abc/video.mp4?a=1')
+        self.assertIsNone(html_extract.walk(RENDER_STATE, html_extract.compile_path('*.aweme.detail.video.playAddr.5.src')))
+
+    def test_percent_decode(self):
+        """URL解码结果与 unquote 一致，格式不规范时也能解码"""
+        self.assertEqual(html_extract._percent_decode('%E4%B8%AD%20a+b%25'), '中 a+b%')
+        self.assertEqual(html_extract._percent_decode('abc%2'), 'abc%2')
+
+
+class TestScraperExtraction(unittest.TestCase):
+    """测试抓取器各平台的提取"""
+
+    def setUp(self):
+        self.scraper = VideoScraper()
+
+    def test_douyin_render_data(self):
+        """抖音网页版的 RENDER_DATA"""
+        html = _page(f'<script id="RENDER_DATA" type="application/json">{quote(json.dumps(RENDER_STATE))}</script>')
+        page = html_extract.scan(html)
+        self.assertEqual(self.scraper._extract_douyin_video_url_from_html(html, page),
+                         'https://v26-web.douyinvod.com/abc/video.mp4?a=1')
+        self.assertEqual(self.scraper._extract_douyin_item_ids(html, page), ['7300'])
+        self.assertEqual(self.scraper._extract_douyin_title(html, page), '页面标题')
+
+    def test_douyin_router_data(self):
+        """分享页的 _ROUTER_DATA"""
+        state = {'loaderData': {'video_(id)/page': {'videoInfoRes': {'item_list': [{
+            'aweme_id': '7301', 'desc': '分享页',
+            'video': {'play_addr': {'url_list': ['https://aweme.snssdk.com/aweme/v1/playwm/?video_id=v1']}}}]}}}}
+        html = _page(f'<script>window._ROUTER_DATA = {json.dumps(state)}</script>', title='')
+        self.assertEqual(self.scraper._extract_douyin_video_url_from_html(html),
+                         'https://aweme.snssdk.com/aweme/v1/playwm/?video_id=v1')
+        self.assertEqual(self.scraper._extract_douyin_title(html), '分享页')
+        self.assertEqual(self.scraper._extract_douyin_item_ids(html), ['7301'])
+
+    def test_douyin_fallbacks(self):
+        """页面状态里没有时依次用meta和全文匹配"""
+        self.assertEqual(self.scraper._extract_douyin_video_url_from_html(_page()), 'https://v.example.com/og.mp4?a=1&b=2')
+        text = ('"cover":"https://p3.example.com/a.mp4" '
+                '"play_addr":{"url_list":[{"url":"https://v3.douyinvod.com/b.mp4\\u0026x=1"}]}')
+        self.assertEqual(self.scraper._extract_douyin_video_url_from_html(text), 'https://v3.douyinvod.com/b.mp4&x=1')
+        self.assertEqual(self.scraper._extract_douyin_item_ids('{"aweme_id":"123"}'), ['123'])
+        self.assertIsNone(self.scraper._extract_douyin_video_url_from_html('"url":"https://www.douyin.com/video/123"'))
+
+    def test_bilibili_and_toutiao_titles(self):
+        """标题只读<title>，缺失时用页面状态或JSON字段"""
+        self.assertEqual(self.scraper._extract_bilibili_title('<title>视频_哔哩哔哩_bilibili</title>'), '视频')
+        self.assertEqual(self.scraper._extract_bilibili_title(
+            '<script>window.__INITIAL_STATE__={"videoData":{"title":"状态标题"}}</script>'), '状态标题')
+        self.assertEqual(self.scraper._extract_toutiao_title('{"article_title":"头条"}'), '头条')
+        self.assertEqual(self.scraper._extract_toutiao_item_id('"group_id":"1","item_id":"2"'), '2')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试指标注册表与 /metrics 文本格式
+"""
+
+import unittest
+import sys
+import os
+from unittest.mock import Mock, patch
+import requests
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.core.metrics import Registry, Counter, Histogram
+from backend.core import http_client, metrics
+
+
+class TestMetricsRegistry(unittest.TestCase):
+    """测试指标输出格式"""
+
+    def setUp(self):
+        self.registry = Registry()
+
+    def test_counter_with_labels(self):
+        """计数器按标签分别累加"""
+        counter = Counter('test_bytes_total', '测试计数', ['platform'], registry=self.registry)
+        counter.labels('bilibili').inc(100)
+        counter.labels('bilibili').inc(50)
+        counter.labels('douyin').inc()
+
+        text = self.registry.render()
+        self.assertIn('# TYPE test_bytes_total counter', text)
+        self.assertIn('test_bytes_total{platform="bilibili"} 150', text)
+        self.assertIn('test_bytes_total{platform="douyin"} 1', text)
+
+    def test_histogram_buckets_are_cumulative(self):
+        """直方图桶为累计值并包含+Inf、_sum、_count"""
+        histogram = Histogram('test_seconds', '测试耗时', ['stage'], buckets=(1, 10), registry=self.registry)
+        histogram.labels('parse').observe(0.5)
+        histogram.labels('parse').observe(5)
+        histogram.labels('parse').observe(50)
+
+        text = self.registry.render()
+        self.assertIn('test_seconds_bucket{stage="parse",le="1"} 1', text)
+        self.assertIn('test_seconds_bucket{stage="parse",le="10"} 2', text)
+        self.assertIn('test_seconds_bucket{stage="parse",le="+Inf"} 3', text)
+        self.assertIn('test_seconds_sum{stage="parse"} 55.5', text)
+        self.assertIn('test_seconds_count{stage="parse"} 3', text)
+
+
+class TestHttpClient(unittest.TestCase):
+    """测试上游错误按主机统计"""
+
+    def _errors(self, host, reason):
+        return metrics.HTTP_ERRORS.labels(host, reason).value
+
+    def test_error_status_counted_by_host(self):
+        """4xx/5xx响应计入对应主机"""
+        before = self._errors('api.bilibili.com', '412')
+        with patch('backend.core.http_client.requests.get', return_value=Mock(status_code=412)):
+            http_client.get('https://api.bilibili.com/x/web-interface/view')
+        self.assertEqual(self._errors('api.bilibili.com', '412'), before + 1)
+
+    def test_exception_counted_and_reraised(self):
+        """网络异常计数后继续抛出"""
+        before = self._errors('v.douyin.com', 'Timeout')
+        with patch('backend.core.http_client.requests.get', side_effect=requests.Timeout()):
+            with self.assertRaises(requests.Timeout):
+                http_client.get('https://v.douyin.com/abc')
+        self.assertEqual(self._errors('v.douyin.com', 'Timeout'), before + 1)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
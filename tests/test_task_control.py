@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试任务暂停/取消信号与断点续传
+"""
+
+import unittest
+import sys
+import os
+import tempfile
+from unittest.mock import Mock, patch
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.core.task_control import TaskControl, TaskInterrupted
+from backend.core.video_downloader import VideoDownloader
+
+
+class FakeResponse:
+    """模拟requests的流式响应"""
+
+    def __init__(self, chunks, status_code=200, headers=None):
+        self.chunks = chunks
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.closed = False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size=8192):
+        for chunk in self.chunks:
+            yield chunk
+
+    def close(self):
+        self.closed = True
+
+
+
+class TestTaskControl(unittest.TestCase):
+    """测试任务控制信号"""
+
+    def setUp(self):
+        self.redis_manager = Mock()
+        self.redis_manager.get_task_control.return_value = None
+        self.control = TaskControl(self.redis_manager)
+
+    def test_token_raises_after_signal(self):
+        """收到信号后令牌检查抛出中断"""
+        token = self.control.token('test_task_001')
+        token.check()
+        self.control.send('test_task_001', 'pause')
+        with self.assertRaises(TaskInterrupted) as ctx:
+            token.check()
+        self.assertEqual(ctx.exception.action, 'pause')
+
+    def test_signal_terminates_registered_process(self):
+        """取消时立即终止登记的FFmpeg进程和关闭HTTP响应"""
+        process = Mock(spec=['terminate'])
+        response = Mock(spec=['close'])
+        self.control.register('test_task_001', process)
+        self.control.register('test_task_001', response)
+        self.control.send('test_task_001', 'cancel')
+        process.terminate.assert_called_once()
+        response.close.assert_called_once()
+
+    def test_clear_removes_signal(self):
+        """继续任务时清除旧信号"""
+        self.control.send('test_task_001', 'pause')
+        self.control.clear('test_task_001')
+        self.assertFalse(self.control.token('test_task_001').is_set())
+
+    def test_signal_seeded_from_redis(self):
+        """排队期间收到的信号在开始处理时生效"""
+        self.redis_manager.get_task_control.return_value = 'cancel'
+        self.assertTrue(self.control.token('test_task_001').is_set())
+
+
+class TestResumableDownload(unittest.TestCase):
+    """测试断点续传下载"""
+
+    def setUp(self):
+        self.redis_manager = Mock()
+        self.redis_manager.get_task_control.return_value = None
+        self.control = TaskControl(self.redis_manager)
+        self.downloader = VideoDownloader(self.redis_manager, self.control)
+        self.tmpdir = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.tmpdir, 'video.mp4')
+
+    def test_pause_keeps_partial_file(self):
+        """暂停后保留已下载的部分"""
+        token = self.control.token('test_task_001')
+
+        def chunks():
+            yield b'a' * 10
+            self.control.send('test_task_001', 'pause')
+            yield b'b' * 10
+
+        response = FakeResponse(chunks(), headers={'content-length': '20'})
+        with patch('backend.core.http_client.requests.get', return_value=response):
+            with self.assertRaises(TaskInterrupted):
+                self.downloader._download_stream('http://cdn/video', {}, self.file_path, 'test_task_001', token)
+
+        self.assertTrue(os.path.exists(self.file_path + '.part'))
+        self.assertFalse(os.path.exists(self.file_path))
+
+    def test_resume_uses_range_request(self):
+        """继续下载时从已有字节处发起Range请求"""
+        with open(self.file_path + '.part', 'wb') as f:
+            f.write(b'a' * 10)
+
+        response = FakeResponse([b'b' * 10], status_code=206, headers={'content-length': '10'})
+        with patch('backend.core.http_client.requests.get', return_value=response) as mock_get:
+            self.downloader._download_stream('http://cdn/video', {}, self.file_path, 'test_task_001')
+
+        self.assertEqual(mock_get.call_args[1]['headers']['Range'], 'bytes=10-')
+        with open(self.file_path, 'rb') as f:
+            self.assertEqual(f.read(), b'a' * 10 + b'b' * 10)
+
+    def test_cancel_removes_partial_file(self):
+        """取消后删除未完成的文件"""
+        self.control.send('test_task_001', 'cancel')
+        token = self.control.token('test_task_001')
+        response = FakeResponse([b'a' * 10])
+        with patch('backend.core.http_client.requests.get', return_value=response):
+            with self.assertRaises(TaskInterrupted):
+                self.downloader._download_stream('http://cdn/video', {}, self.file_path, 'test_task_001', token)
+        self.assertFalse(os.path.exists(self.file_path + '.part'))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试任务日志缓冲与结构化输出
+"""
+
+import unittest
+import sys
+import os
+import json
+import logging
+from unittest.mock import Mock, patch
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.core.task_logger import TaskLogSink, JsonFormatter
+from backend.config.config import Config
+
+
+class TestTaskLogSink(unittest.TestCase):
+    """测试任务日志缓冲区"""
+
+    def setUp(self):
+        self.redis_manager = Mock()
+        self.sink = TaskLogSink(self.redis_manager)
+
+    def test_logs_are_batched(self):
+        """未达到阈值前不写Redis，flush时一次写入"""
+        self.sink.log('test_task_001', '第一条')
+        self.sink.log('test_task_001', '第二条')
+        self.redis_manager.add_task_logs.assert_not_called()
+
+        self.sink.flush()
+        batch = self.redis_manager.add_task_logs.call_args[0][0]
+        self.assertEqual(len(batch['test_task_001']), 2)
+        self.assertTrue(batch['test_task_001'][1].endswith('第二条'))
+
+    def test_flush_at_batch_size(self):
+        """单个任务攒满阈值立即写入"""
+        for i in range(Config.TASK_LOG_BATCH_SIZE):
+            self.sink.log('test_task_001', f'日志 {i}')
+        self.redis_manager.add_task_logs.assert_called_once()
+
+    def test_level_filter(self):
+        """低于配置级别的日志被丢弃"""
+        with patch.object(self.sink, 'level', logging.INFO):
+            self.sink.log('test_task_001', '调试信息', logging.DEBUG)
+        self.sink.flush()
+        self.redis_manager.add_task_logs.assert_not_called()
+
+
+class TestJsonFormatter(unittest.TestCase):
+    """测试JSON日志格式"""
+
+    def test_record_includes_task_id(self):
+        """日志输出为带任务ID的单行JSON"""
+        record = logging.LogRecord('bubbletv.task', logging.INFO, __file__, 1, '✅ 转码成功', None, None)
+        record.task_id = 'test_task_001'
+        entry = json.loads(JsonFormatter().format(record))
+        self.assertEqual(entry['level'], 'INFO')
+        self.assertEqual(entry['task_id'], 'test_task_001')
+        self.assertEqual(entry['message'], '✅ 转码成功')
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试任务租约心跳与僵尸任务回收
+"""
+
+import unittest
+import sys
+import os
+import time
+from unittest.mock import Mock, patch
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.core import task_reaper
+from backend.core.task_control import TaskControl, TaskInterrupted
+from backend.core.task_reaper import TaskHeartbeat, TaskReaper
+from backend.config.config import Config
+
+
+class TestTaskReaper(unittest.TestCase):
+    """测试僵尸任务回收"""
+
+    def setUp(self):
+        self.redis_manager = Mock()
+        self.redis_manager.get_inflight_tasks.return_value = {'test_task_001'}
+        self.redis_manager.get_task_lease.return_value = None
+        self.redis_manager.pop_due_retries.return_value = []
+        self.reaper = TaskReaper(self.redis_manager)
+
+    def test_live_lease_is_skipped(self):
+        """租约未过期的任务不回收"""
+        self.redis_manager.get_task_lease.return_value = 'worker-1'
+        self.assertEqual(self.reaper.reap_once(), [])
+        self.redis_manager.update_task_status.assert_not_called()
+
+    def test_expired_task_requeued_with_backoff(self):
+        """租约过期的任务按退避时间重新排队"""
+        self.redis_manager.get_task.return_value = {'id': 'test_task_001', 'status': 'downloading'}
+        self.redis_manager.increment_task_retry.return_value = 2
+
+        with patch('backend.core.task_reaper.time.time', return_value=1000):
+            reaped = self.reaper.reap_once()
+
+        self.assertEqual(reaped, ['test_task_001'])
+        args, kwargs = self.redis_manager.update_task_status.call_args
+        self.assertEqual(args[1], 'pending')
+        self.assertIn('error_message', kwargs)
+        _, ready_at = self.redis_manager.schedule_task_retry.call_args[0]
+        self.assertEqual(ready_at, 1000 + Config.TASK_RETRY_BACKOFF_BASE * 2)
+
+    def test_expired_task_fails_after_max_retries(self):
+        """超过最大重试次数后标记失败"""
+        self.redis_manager.get_task.return_value = {'id': 'test_task_001', 'status': 'transcoding'}
+        self.redis_manager.increment_task_retry.return_value = Config.TASK_MAX_RETRIES + 1
+
+        self.reaper.reap_once()
+
+        args, kwargs = self.redis_manager.update_task_status.call_args
+        self.assertEqual(args[1], 'failed')
+        self.assertIn('转码', kwargs['error_message'])
+        self.redis_manager.schedule_task_retry.assert_not_called()
+
+    def test_finished_task_only_releases_lease(self):
+        """已结束的任务只清理执行中记录"""
+        self.redis_manager.get_task.return_value = {'id': 'test_task_001', 'status': 'completed'}
+        self.assertEqual(self.reaper.reap_once(), [])
+        self.redis_manager.release_task_lease.assert_called_once_with('test_task_001')
+        self.redis_manager.update_task_status.assert_not_called()
+
+    def test_promote_skips_cancelled_task(self):
+        """等待重试期间被取消的任务不再入队"""
+        self.redis_manager.get_inflight_tasks.return_value = set()
+        self.redis_manager.pop_due_retries.return_value = [{'id': 'test_task_001'}]
+        self.redis_manager.get_task.return_value = {'id': 'test_task_001', 'status': 'cancelled'}
+        self.assertEqual(self.reaper.promote_due_retries(), 0)
+        self.redis_manager.add_task_to_queue.assert_not_called()
+
+
+class TestTaskHeartbeat(unittest.TestCase):
+    """测试租约心跳"""
+
+    def test_lease_released_on_exit(self):
+        """正常结束时释放自己的租约"""
+        redis_manager = Mock()
+        redis_manager.get_task_lease.return_value = 'owner-1'
+        with TaskHeartbeat(redis_manager, 'test_task_001', owner='owner-1'):
+            redis_manager.acquire_task_lease.assert_called_once_with('test_task_001', 'owner-1', Config.TASK_LEASE_TTL)
+        redis_manager.release_task_lease.assert_called_once_with('test_task_001')
+
+    def test_reaped_lease_not_released(self):
+        """租约已被他人接管时不释放"""
+        redis_manager = Mock()
+        redis_manager.get_task_lease.return_value = 'owner-2'
+        with TaskHeartbeat(redis_manager, 'test_task_001', owner='owner-1'):
+            pass
+        redis_manager.release_task_lease.assert_not_called()
+
+    def test_stall_interrupts_task_and_keeps_lease(self):
+        """长时间无进度时先在本进程中断任务，租约留给回收器，工作线程不再写状态"""
+        redis_manager = Mock()
+        redis_manager.get_task_lease.return_value = 'owner-1'
+        redis_manager.get_task_activity.return_value = time.time() - 100
+        redis_manager.get_task_control.return_value = None
+        control = TaskControl(redis_manager)
+        process = Mock(spec=['terminate'])
+        control.register('test_task_001', process)
+        token = control.token('test_task_001')
+
+        with patch.multiple(task_reaper.Config, TASK_HEARTBEAT_INTERVAL=0.01, TASK_STALL_TIMEOUT=10):
+            with TaskHeartbeat(redis_manager, 'test_task_001', owner='owner-1', task_control=control) as heartbeat:
+                heartbeat._thread.join(timeout=2)
+                process.terminate.assert_called_once()
+                with self.assertRaises(TaskInterrupted) as ctx:
+                    token.check()
+                self.assertEqual(ctx.exception.action, 'stall')
+                self.assertFalse(heartbeat.holds_lease())
+        # 中断只在本进程内，不广播
+        redis_manager.set_task_control.assert_not_called()
+        redis_manager.release_task_lease.assert_not_called()
+        redis_manager.renew_task_lease.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试任务阶段耗时分解
+"""
+
+import unittest
+import sys
+import os
+from unittest.mock import Mock, patch
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.core.task_timings import TaskTimings
+
+
+class TestTaskTimings(unittest.TestCase):
+    """测试阶段耗时记录与汇总"""
+
+    def setUp(self):
+        self.redis_manager = Mock()
+        self.timings = TaskTimings(self.redis_manager)
+
+    def test_stage_records_seconds_bytes_and_throughput(self):
+        """阶段记录耗时、字节数和吞吐，按执行顺序排列"""
+        with patch('backend.core.task_timings.time.perf_counter', side_effect=[0, 2, 10, 11]):
+            with self.timings.stage('test_task_001', 'transcode'):
+                pass
+            with self.timings.stage('test_task_001', 'download_video') as stage:
+                stage['bytes'] += 4000
+
+        result = self.timings.get('test_task_001')
+        self.assertEqual(list(result['stages']), ['download_video', 'transcode'])
+        self.assertEqual(result['stages']['download_video']['bytes_per_second'], 4000)
+        self.assertEqual(result['stages']['transcode']['seconds'], 2)
+        self.assertEqual(result['total_seconds'], 3)
+
+    def test_save_writes_and_forgets(self):
+        """保存后写入Redis并清除本地记录"""
+        with self.timings.stage('test_task_001', 'parse'):
+            pass
+        self.timings.save('test_task_001')
+        self.redis_manager.save_task_timings.assert_called_once()
+        self.assertEqual(self.timings.get('test_task_001')['stages'], {})
+        self.assertIsNone(self.timings.save('test_task_001'))
+
+    def test_summary_percentiles(self):
+        """汇总最近任务各阶段分位数"""
+        self.redis_manager.get_recent_timings.return_value = [
+            {'stages': {'transcode': {'seconds': s, 'bytes': 0, 'bytes_per_second': None}}, 'total_seconds': s}
+            for s in range(1, 101)
+        ]
+        summary = self.timings.summary()
+        self.assertEqual(summary['tasks'], 100)
+        self.assertEqual(summary['stages']['transcode']['seconds'], {'p50': 50, 'p90': 90, 'p99': 99})
+        self.assertIsNone(summary['stages']['transcode']['bytes_per_second'])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
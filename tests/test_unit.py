@@ -38,6 +38,9 @@ class TestRedisManager(unittest.TestCase):
             keys = self.redis_manager.redis_client.keys(pattern)
             for key in keys:
                 self.redis_manager.redis_client.delete(key)
+            for task_id in self.redis_manager.redis_client.hkeys('task_status'):
+                if task_id.startswith('test_'):
+                    self.redis_manager.redis_client.hdel('task_status', task_id)
         except:
             pass
     
@@ -200,6 +203,19 @@ class TestRedisManager(unittest.TestCase):
         retrieved_task = self.redis_manager.get_task(task_id)
         self.assertIsNone(retrieved_task)
     
+    def test_count_tasks_by_status(self):
+        """测试按状态统计任务数"""
+        before = self.redis_manager.count_tasks_by_status()
+        self.redis_manager.set_task('test_task_010', {'id': 'test_task_010', 'status': 'pending'})
+        self.redis_manager.set_task('test_task_011', {'id': 'test_task_011', 'status': 'pending'})
+        self.redis_manager.update_task_status('test_task_011', 'failed')
+        self.redis_manager.set_task('test_task_012', {'id': 'test_task_012', 'status': 'pending'})
+        self.redis_manager.delete_task('test_task_012')
+        
+        counts = self.redis_manager.count_tasks_by_status()
+        self.assertEqual(counts.get('pending', 0), before.get('pending', 0) + 1)
+        self.assertEqual(counts.get('failed', 0), before.get('failed', 0) + 1)
+    
     def test_update_download_speed(self):
         """测试更新下载速度"""
         task_id = 'test_task_009'
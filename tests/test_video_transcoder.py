@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试视频转码器（不依赖真实FFmpeg）
+"""
+
+import unittest
+import sys
+import os
+import tempfile
+from unittest.mock import Mock, patch
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.core.video_transcoder import VideoTranscoder
+from backend.config.config import Config
+
+
+class TestSegmentedTranscode(unittest.TestCase):
+    """测试长视频分段并行转码"""
+
+    def setUp(self):
+        self.redis_manager = Mock()
+        self.transcoder = VideoTranscoder(self.redis_manager)
+        self.tmpdir = tempfile.mkdtemp()
+        self.input_file = os.path.join(self.tmpdir, 'movie.mp4')
+        self.output_file = os.path.join(self.tmpdir, 'movie.mov')
+        open(self.input_file, 'wb').close()
+        self.commands = []
+        self.timeouts = []
+
+    def _fake_step(self, cmd, task_id, running, lock, timeout, on_progress=None):
+        """记录命令并生成对应的输出文件"""
+        self.commands.append(cmd)
+        self.timeouts.append(timeout)
+        target = cmd[-1]
+        if '%04d' in target:
+            for i in range(3):
+                open(target % i, 'wb').close()
+        elif cmd[1:3] == ['-f', 'concat']:
+            with open(cmd[cmd.index('-i') + 1]) as f:
+                self.concat_list = f.read()
+            open(target, 'wb').close()
+        else:
+            open(target, 'wb').close()
+
+    def test_segments_encoded_and_concatenated_in_order(self):
+        """分段编码后按顺序拼接，音频单独编码后混流"""
+        probe = {'duration': 7200, 'width': 1920, 'height': 1080, 'audio_codec': 'aac'}
+        encoding = {'preset': 'fast', 'crf': 23, 'threads': 8}
+
+        with patch.object(self.transcoder, '_run_ffmpeg_step', side_effect=self._fake_step):
+            success, message = self.transcoder._transcode_segmented(
+                self.input_file, self.output_file, 'test_task_001', probe, encoding)
+
+        self.assertTrue(success, message)
+        # 切分 + 3段视频 + 1路音频 + 拼接
+        self.assertEqual(len(self.commands), 6)
+        self.assertLess(self.concat_list.index('enc_0000'), self.concat_list.index('enc_0002'))
+        concat_cmd = self.commands[-1]
+        self.assertIn('1:a', concat_cmd)
+        self.assertEqual(concat_cmd[concat_cmd.index('-c') + 1], 'copy')
+        # 临时分段目录已清理
+        self.assertEqual([f for f in os.listdir(self.tmpdir) if f.startswith('.segments_')], [])
+
+    def test_segment_failure_reports_error(self):
+        """任一段失败时整体失败并删除输出"""
+        probe = {'duration': 7200, 'width': 1920, 'height': 1080}
+        encoding = {'preset': 'fast', 'crf': 23, 'threads': 4}
+
+        def failing_step(cmd, *args):
+            if 'libx264' in cmd:
+                raise Exception('编码失败')
+            self._fake_step(cmd, *args)
+
+        with patch.object(self.transcoder, '_run_ffmpeg_step', side_effect=failing_step):
+            success, message = self.transcoder._transcode_segmented(
+                self.input_file, self.output_file, 'test_task_001', probe, encoding)
+
+        self.assertFalse(success)
+        self.assertIn('编码失败', message)
+        self.assertFalse(os.path.exists(self.output_file))
+
+    def test_audio_and_concat_timeouts_follow_full_duration(self):
+        """整段音频编码和拼接按整片时长设超时，视频段按段长设超时"""
+        probe = {'duration': 7200, 'width': 1920, 'height': 1080, 'audio_codec': 'aac'}
+        encoding = {'preset': 'fast', 'crf': 23, 'threads': 8}
+
+        with patch.object(self.transcoder, '_run_ffmpeg_step', side_effect=self._fake_step):
+            self.transcoder._transcode_segmented(self.input_file, self.output_file, 'test_task_001', probe, encoding)
+
+        timeouts = dict(zip((cmd[-1] for cmd in self.commands), self.timeouts))
+        audio = next(t for target, t in timeouts.items() if target.endswith('audio.m4a'))
+        segment = next(t for target, t in timeouts.items() if 'enc_' in target)
+        self.assertEqual(audio, self.transcoder._transcode_timeout(7200))
+        self.assertEqual(segment, self.transcoder._transcode_timeout(Config.TRANSCODE_SEGMENT_SECONDS))
+        self.assertEqual(self.timeouts[-1], self.transcoder._transcode_timeout(7200, Config.REMUX_TIMEOUT_FACTOR))
+
+    def test_progress_reported_while_segments_encode(self):
+        """各步骤运行中按已编码时长汇总进度，不必等整段完成"""
+        probe = {'duration': 900, 'width': 1920, 'height': 1080}
+        encoding = {'preset': 'fast', 'crf': 23, 'threads': 8}
+
+        def step(cmd, task_id, running, lock, timeout, on_progress=None):
+            if 'libx264' in cmd:
+                on_progress(150)
+                on_progress(300)
+            self._fake_step(cmd, task_id, running, lock, timeout)
+
+        with patch.object(self.transcoder, '_run_ffmpeg_step', side_effect=step):
+            self.transcoder._transcode_segmented(self.input_file, self.output_file, 'test_task_001', probe, encoding)
+
+        progresses = [c.kwargs['progress'] for c in self.redis_manager.update_task_status.call_args_list]
+        self.assertEqual(progresses, sorted(progresses))
+        self.assertIn(95, progresses)
+        self.assertGreater(len(set(progresses)), 3)
+
+    def test_keepalive_steps_not_counted_as_jobs(self):
+        """切分和拼接的进度回调只刷新状态，已编码时长只按编码步骤记录"""
+        probe = {'duration': 900, 'width': 1920, 'height': 1080, 'audio_codec': 'aac'}
+        encoding = {'preset': 'fast', 'crf': 23, 'threads': 8}
+        callbacks = []
+
+        def step(cmd, task_id, running, lock, timeout, on_progress=None):
+            callbacks.append(on_progress)
+            on_progress(1.0)
+            on_progress(2.0)
+            self._fake_step(cmd, task_id, running, lock, timeout)
+
+        with patch.object(self.transcoder, '_run_ffmpeg_step', side_effect=step):
+            success, _ = self.transcoder._transcode_segmented(
+                self.input_file, self.output_file, 'test_task_001', probe, encoding)
+
+        self.assertTrue(success)
+        progress = callbacks[0].__self__
+        self.assertIs(callbacks[-1].__self__, progress)
+        # 3段视频 + 1路音频
+        self.assertEqual(sorted(progress.encoded), [0, 1, 2, 3])
+        self.assertTrue(all(type(index) is int for index in progress.encoded))
+        self.assertEqual(sum(progress.encoded.values()), 8.0)
+
+    def test_step_progress_parsed(self):
+        """子步骤的 -progress 输出按进度块回调已编码秒数"""
+        seen = []
+        lines = ['out_time_us=1500000\n', 'progress=continue\n', 'out_time_us=3000000\n', 'progress=end\n']
+        self.transcoder._read_step_progress(iter(lines), seen.append)
+        self.assertEqual(seen, [1.5, 3.0])
+
+    def test_timeout_scales_with_duration(self):
+        """超时随视频时长增长"""
+        self.assertEqual(self.transcoder._transcode_timeout(10), Config.TRANSCODE_MIN_TIMEOUT)
+        self.assertEqual(self.transcoder._transcode_timeout(7200), 7200 * Config.TRANSCODE_TIMEOUT_FACTOR)
+
+
+class TestProgressMonitor(unittest.TestCase):
+    """测试 -progress 输出解析"""
+
+    def setUp(self):
+        self.redis_manager = Mock()
+        self.transcoder = VideoTranscoder(self.redis_manager)
+
+    def test_progress_parsed_and_deduplicated(self):
+        """只在百分比变化时更新进度，结束时为100%"""
+        lines = [
+            'out_time_us=5000000\n', 'progress=continue\n',
+            'out_time_us=5100000\n', 'progress=continue\n',
+            'out_time_us=50000000\n', 'progress=continue\n',
+            'progress=end\n'
+        ]
+        self.transcoder._read_progress(iter(lines), 'test_task_001', 100)
+
+        progresses = [c[1]['progress'] for c in self.redis_manager.update_task_status.call_args_list]
+        self.assertEqual(progresses, [5, 50, 100])
+
+    def test_stderr_tail_is_bounded(self):
+        """stderr只保留最后若干行"""
+        from collections import deque
+        tail = deque(maxlen=Config.FFMPEG_STDERR_TAIL_LINES)
+        self.transcoder._drain_stderr(iter(f'line {i}\n' for i in range(1000)), tail)
+        self.assertEqual(len(tail), Config.FFMPEG_STDERR_TAIL_LINES)
+        self.assertEqual(tail[-1], 'line 999')
+
+
+FAKE_FFMPEG = """
+import sys
+args = sys.argv[1:]
+if args == ['-version']:
+    sys.exit(0)
+inputs = [args[i + 1] for i, arg in enumerate(args) if arg == '-i']
+with open(args[-1], 'wb') as out:
+    for path in inputs:
+        with open(path, 'rb') as f:
+            out.write(f.read())
+print('progress=end', flush=True)
+"""
+
+
+class TestStreamTranscode(unittest.TestCase):
+    """测试经命名管道边下载边转码（用脚本代替FFmpeg，按顺序读完各路输入）"""
+
+    def setUp(self):
+        self.redis_manager = Mock()
+        self.transcoder = VideoTranscoder(self.redis_manager)
+        self.tmpdir = tempfile.mkdtemp()
+        self.output_file = os.path.join(self.tmpdir, 'movie.mov')
+        script = os.path.join(self.tmpdir, 'ffmpeg')
+        with open(script, 'w') as f:
+            f.write(f'#!{sys.executable}\n{FAKE_FFMPEG}')
+        os.chmod(script, 0o755)
+        self.transcoder.ffmpeg_path = script
+
+    def test_inputs_piped_into_ffmpeg(self):
+        """两路输入各经一个管道送入，视频、音频分别映射"""
+        def video(write):
+            for _ in range(4):
+                write(b'v' * 300 * 1024)
+
+        def audio(write):
+            write(b'a' * 1024)
+
+        with patch.object(self.transcoder, '_run_transcode', wraps=self.transcoder._run_transcode) as run:
+            success, message = self.transcoder.transcode_stream([video, audio], self.output_file, 'test_task_001',
+                                                                {'duration': 60, 'height': 1080})
+        self.assertTrue(success, message)
+        with open(self.output_file, 'rb') as f:
+            self.assertEqual(f.read(), b'v' * 1200 * 1024 + b'a' * 1024)
+        cmd = run.call_args[0][0]
+        self.assertIn('1:a:0', cmd)
+        self.assertEqual(self.transcoder.timings.get('test_task_001')['stages']['stream_transcode']['bytes'],
+                         1200 * 1024 + 1024)
+        # 管道目录已清理
+        self.assertEqual([f for f in os.listdir(self.tmpdir) if f.startswith('.pipes_')], [])
+
+    def test_feed_error_fails_and_removes_output(self):
+        """一路输入出错时结束FFmpeg，不留下截断的文件"""
+        def video(write):
+            write(b'v' * 1024)
+            raise Exception('connection reset')
+
+        success, message = self.transcoder.transcode_stream([video], self.output_file, 'test_task_001', {})
+        self.assertFalse(success)
+        self.assertIn('connection reset', message)
+        self.assertFalse(os.path.exists(self.output_file))
+
+
+class TestRemux(unittest.TestCase):
+    """测试DASH音视频不重新编码的封装"""
+
+    def setUp(self):
+        self.redis_manager = Mock()
+        self.transcoder = VideoTranscoder(self.redis_manager)
+        self.tmpdir = tempfile.mkdtemp()
+        self.inputs = [os.path.join(self.tmpdir, 'video.mp4'), os.path.join(self.tmpdir, 'audio.m4a')]
+        for path, data in zip(self.inputs, (b'video', b'audio')):
+            with open(path, 'wb') as f:
+                f.write(data)
+        self.output_file = os.path.join(self.tmpdir, 'movie.mov')
+
+    def test_copy_with_faststart(self):
+        """两路流都复制，faststart，按扩展名封装，超时按封装的倍数"""
+        probe = {'duration': 3600, 'video_codec': 'h264', 'audio_codec': 'aac'}
+        with patch.object(self.transcoder, '_run_transcode', return_value=(True, '封装成功')) as run:
+            success, message = self.transcoder.remux(self.inputs, self.output_file, 'test_task_001', probe)
+        self.assertTrue(success, message)
+        cmd, task_id, duration, timeout, output_file = run.call_args[0]
+        self.assertEqual(cmd[cmd.index('-c') + 1], 'copy')
+        self.assertEqual(cmd[cmd.index('-movflags') + 1], '+faststart')
+        self.assertEqual(cmd[cmd.index('-f') + 1], 'mov')
+        self.assertIn('1:a:0', cmd)
+        self.assertNotIn('libx264', cmd)
+        self.assertEqual(timeout, max(Config.TRANSCODE_MIN_TIMEOUT, int(3600 * Config.REMUX_TIMEOUT_FACTOR)))
+        self.assertEqual(run.call_args[1]['label'], '封装')
+        self.assertEqual(self.transcoder.timings.get('test_task_001')['stages']['merge']['bytes'], 10)
+
+    def test_runs_ffmpeg_and_reports(self):
+        """经同一个运行器执行，返回封装的结果"""
+        script = os.path.join(self.tmpdir, 'ffmpeg')
+        with open(script, 'w') as f:
+            f.write(f'#!{sys.executable}\n{FAKE_FFMPEG}')
+        os.chmod(script, 0o755)
+        self.transcoder.ffmpeg_path = script
+        success, message = self.transcoder.remux(self.inputs, self.output_file, 'test_task_001', {'duration': 10})
+        self.assertEqual((success, message), (True, '封装成功'))
+        with open(self.output_file, 'rb') as f:
+            self.assertEqual(f.read(), b'videoaudio')
+        self.redis_manager.update_task_status.assert_called_with('test_task_001', 'transcoding', progress=100)
+
+    def test_probe_and_compatibility(self):
+        """合并各路的探测结果，只有 H.264 + AAC 直接封装"""
+        probes = {self.inputs[0]: {'duration': 60.0, 'video_codec': 'h264', 'width': 1920, 'height': 1080},
+                  self.inputs[1]: {'duration': 60.2, 'audio_codec': 'aac'}}
+        with patch.object(self.transcoder, '_probe_video', side_effect=lambda path: dict(probes[path])):
+            probe = self.transcoder.probe_inputs(self.inputs)
+        self.assertEqual(probe['duration'], 60.2)
+        self.assertTrue(self.transcoder.copy_compatible(probe))
+        self.assertFalse(self.transcoder.copy_compatible(dict(probe, video_codec='hevc')))
+        self.assertFalse(self.transcoder.copy_compatible(dict(probe, audio_codec='flac')))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试 yt-dlp 实例池和解析结果缓存
+"""
+
+import unittest
+import sys
+import os
+from types import SimpleNamespace
+from unittest.mock import Mock, patch
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.core import ytdlp_pool
+from backend.core.ytdlp_pool import YtDlpPool
+
+INFO = {'id': '7300', 'title': '测试视频', 'url': 'https://v.example.com/a.mp4', 'ext': 'mp4'}
+
+
+class FakeYoutubeDL:
+    created = []
+
+    def __init__(self, params):
+        self.params = params
+        self.cookiejar = Mock()
+        self._progress_hooks = []
+        self.extract_info = Mock(return_value=dict(INFO))
+        self.process_ie_result = Mock(side_effect=self._process)
+        self.seen = []
+        FakeYoutubeDL.created.append(self)
+
+    def _parse_outtmpl(self):
+        self.seen.append(dict(self.params.get('outtmpl') or {}))
+
+    def add_progress_hook(self, hook):
+        self._progress_hooks.append(hook)
+
+    def sanitize_info(self, info):
+        return info
+
+    def _process(self, info, download=False):
+        for hook in self._progress_hooks:
+            hook({'status': 'finished'})
+        return info
+
+
+class TestYtDlpPool(unittest.TestCase):
+    """测试实例复用和信息缓存"""
+
+    def setUp(self):
+        FakeYoutubeDL.created = []
+        patcher = patch.object(ytdlp_pool, '_load_yt_dlp', return_value=SimpleNamespace(YoutubeDL=FakeYoutubeDL))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.cookies = SimpleNamespace(version=1, apply_to=Mock())
+        self.cookie_jars = Mock()
+        self.cookie_jars.get.side_effect = lambda platform: self.cookies
+        self.pool = YtDlpPool(self.cookie_jars)
+
+    def test_instances_reused(self):
+        """归还的实例下次直接借出，Cookie只装一次"""
+        with self.pool.instance('douyin') as first:
+            pass
+        with self.pool.instance('douyin') as second:
+            pass
+        self.assertIs(first, second)
+        self.assertEqual(len(FakeYoutubeDL.created), 1)
+        self.cookies.apply_to.assert_called_once_with(first.cookiejar)
+
+    def test_concurrent_checkout_and_failure(self):
+        """同时借出时各用各的实例，出错的实例不归还"""
+        with self.pool.instance('douyin') as a, self.pool.instance('douyin') as b:
+            self.assertIsNot(a, b)
+        with self.assertRaises(RuntimeError):
+            with self.pool.instance('douyin') as c:
+                raise RuntimeError('下载失败')
+        self.assertEqual(self.pool._idle[('douyin', 1)], [b] if c is a else [a])
+
+    def test_cookie_version_change(self):
+        """Cookie版本变化后新建实例，旧版本的空闲实例丢弃"""
+        with self.pool.instance('douyin') as old:
+            pass
+        self.cookies = SimpleNamespace(version=2, apply_to=Mock())
+        with self.pool.instance('douyin') as new:
+            pass
+        self.assertIsNot(old, new)
+        self.assertEqual(list(self.pool._idle), [('douyin', 2)])
+
+    def test_extract_info_cached(self):
+        """缓存期内同一URL不再提取，返回的是副本"""
+        info = self.pool.extract_info('https://v.douyin.com/abc/', 'douyin')
+        info['title'] = '被调用方修改'
+        again = self.pool.extract_info('https://v.douyin.com/abc/', 'douyin')
+        self.assertEqual(again['title'], '测试视频')
+        ydl = FakeYoutubeDL.created[0]
+        ydl.extract_info.assert_called_once_with('https://v.douyin.com/abc/', download=False)
+
+        with patch.object(ytdlp_pool.Config, 'YTDLP_INFO_TTL', 0):
+            self.pool._info.clear()
+            self.pool.extract_info('https://v.douyin.com/abc/', 'douyin')
+            self.pool.extract_info('https://v.douyin.com/abc/', 'douyin')
+        self.assertEqual(ydl.extract_info.call_count, 3)
+
+    def test_download_reuses_extracted_info(self):
+        """下载阶段复用解析结果，输出路径和进度回调只在本次生效"""
+        self.pool.extract_info('https://v.douyin.com/abc/', 'douyin')
+        hook = Mock()
+        self.pool.download('https://v.douyin.com/abc/', 'douyin', '/tmp/out.mp4', progress_hook=hook)
+
+        ydl = FakeYoutubeDL.created[0]
+        ydl.extract_info.assert_called_once()
+        ydl.process_ie_result.assert_called_once_with(INFO, download=True)
+        hook.assert_called_once_with({'status': 'finished'})
+        self.assertIn({'default': '/tmp/out.mp4'}, ydl.seen)
+        self.assertEqual(ydl._progress_hooks, [])
+        self.assertNotEqual(ydl.params.get('outtmpl'), {'default': '/tmp/out.mp4'})
+
+
+if __name__ == '__main__':
+    unittest.main()